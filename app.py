@@ -1,13 +1,17 @@
+import utils_perfil
+utils_perfil.inicio_pagina("Início") # Antes dos demais imports: mede o custo de abrir a página
 import streamlit as st
 import pandas as pd
-from datetime import date, datetime, timedelta 
+from datetime import date, datetime 
 import random
 import time
-from PIL import Image
 import re
 import html
 import utils 
+import utils_banco
 import utils_chamados
+import utils_importacao
+utils_perfil.imports_prontos()
 
 # ----------------- Configuração da Página e CSS -----------------
 st.set_page_config(page_title="Projetos - GESTÃO", page_icon="📋", layout="wide")
@@ -20,6 +24,8 @@ def run_importer_dialog():
     st.info("Faça upload do arquivo 'Template.xlsx' ou '.csv'.")
     uploaded_file = st.file_uploader("Arquivo", type=["xlsx", "csv"])
     if uploaded_file:
+        checksum, tamanho, pular = utils_importacao.verificar_arquivo_repetido(uploaded_file, "chamados")
+        if pular: return
         try:
             if uploaded_file.name.endswith('.csv'):
                 df = pd.read_csv(uploaded_file, sep=';', dtype=str, encoding='utf-8-sig')
@@ -27,11 +33,12 @@ def run_importer_dialog():
                     uploaded_file.seek(0)
                     df = pd.read_csv(uploaded_file, sep=',', dtype=str, encoding='utf-8-sig')
             else:
-                df = pd.read_excel(uploaded_file, dtype=str)
+                df = utils_importacao.ler_excel(uploaded_file, dtype=str)
             
             if st.button("Processar Importação"):
                 with st.spinner("Importando..."):
                     sucesso, qtd = utils_chamados.bulk_insert_chamados_db(df)
+                    utils_importacao.registrar_importacao(checksum, "chamados", uploaded_file.name, tamanho, len(df), qtd, sucesso)
                     if sucesso:
                         st.success(f"{qtd} registros importados!")
                         time.sleep(1)
@@ -44,11 +51,13 @@ def run_pedido_importer_dialog():
     st.info("Atualize a coluna **Nº Pedido** usando uma planilha com: **CHAMADO** e **PEDIDO**.")
     uploaded_pedidos = st.file_uploader("Planilha de Pedidos (.xlsx/.csv)", type=["xlsx", "csv"])
     if uploaded_pedidos:
+        checksum, tamanho, pular = utils_importacao.verificar_arquivo_repetido(uploaded_pedidos, "pedidos")
+        if pular: return
         try:
             if uploaded_pedidos.name.endswith('.csv'): 
                 df_ped = pd.read_csv(uploaded_pedidos, sep=';', header=0, dtype=str)
             else: 
-                df_ped = pd.read_excel(uploaded_pedidos, header=0, dtype=str)
+                df_ped = utils_importacao.ler_excel(uploaded_pedidos, header=0, dtype=str)
             
             df_ped.columns = [str(c).strip().upper() for c in df_ped.columns]
             
@@ -59,12 +68,15 @@ def run_pedido_importer_dialog():
                     with st.spinner("Atualizando..."):
                         df_bd = utils_chamados.carregar_chamados_db()
                         id_map = df_bd.set_index('Nº Chamado')['ID'].to_dict()
-                        count = 0
+                        count = falhas = 0
                         for i, row in df_ped.iterrows():
                             c_key = str(row['CHAMADO']).strip(); p_val = str(row['PEDIDO']).strip()
                             if c_key in id_map and p_val:
-                                utils_chamados.atualizar_chamado_db(id_map[c_key], {'Nº Pedido': p_val})
-                                count += 1
+                                if utils_chamados.atualizar_chamado_db(id_map[c_key], {'Nº Pedido': p_val}): count += 1
+                                else: falhas += 1
+                        utils_importacao.registrar_importacao(checksum, "pedidos", uploaded_pedidos.name, tamanho, len(df_ped), count,
+                                                              falhas == 0, f"{falhas} atualizações falharam" if falhas else "")
+                        if falhas: st.error(f"{falhas} pedidos não foram gravados ({count} gravados)."); st.stop()
                         st.success(f"{count} pedidos atualizados!")
                         time.sleep(1); st.rerun()
         except Exception as e: st.error(f"Erro: {e}")
@@ -74,19 +86,24 @@ def run_link_importer_dialog():
     st.info("Atualize Links com planilha: **CHAMADO** e **LINK**.")
     uploaded_links = st.file_uploader("Arquivo", type=["xlsx", "csv"])
     if uploaded_links:
+        checksum, tamanho, pular = utils_importacao.verificar_arquivo_repetido(uploaded_links, "links")
+        if pular: return
         # (Lógica simplificada para caber aqui)
         try:
             if uploaded_links.name.endswith('.csv'): df_l = pd.read_csv(uploaded_links, sep=';', dtype=str)
-            else: df_l = pd.read_excel(uploaded_links, dtype=str)
+            else: df_l = utils_importacao.ler_excel(uploaded_links, dtype=str)
             df_l.columns = [str(c).strip().upper() for c in df_l.columns]
             if st.button("Processar Links"):
                  df_bd = utils_chamados.carregar_chamados_db()
                  id_map = df_bd.set_index('Nº Chamado')['ID'].to_dict()
-                 c=0
+                 c=0; falhas=0
                  for _, r in df_l.iterrows():
                      if r['CHAMADO'] in id_map: 
-                         utils_chamados.atualizar_chamado_db(id_map[r['CHAMADO']], {'Link Externo': r['LINK']})
-                         c+=1
+                         if utils_chamados.atualizar_chamado_db(id_map[r['CHAMADO']], {'Link Externo': r['LINK']}): c+=1
+                         else: falhas+=1
+                 utils_importacao.registrar_importacao(checksum, "links", uploaded_links.name, tamanho, len(df_l), c,
+                                                       falhas == 0, f"{falhas} atualizações falharam" if falhas else "")
+                 if falhas: st.error(f"{falhas} links não foram gravados ({c} gravados)."); st.stop()
                  st.success(f"{c} links atualizados!"); time.sleep(1); st.rerun()
         except: st.error("Erro no arquivo.")
 
@@ -183,6 +200,7 @@ def tela_login():
 
     # --- IMAGEM PRINCIPAL ---
     try:
+        from PIL import Image # Só a tela de login usa
         imagem_principal = Image.open("Foto 2.jpg")
     except Exception:
         st.error("Não foi possível carregar 'Foto 2.jpg'.")
@@ -381,40 +399,32 @@ def tela_cockpit():
    
     st.title("📌 Visão Geral (Cockpit)")
     
-    df = utils_chamados.carregar_chamados_db()
-    if df.empty:
+    # Totais por projeto saem do cubo de chamados (cache por versão): filtrar não volta ao banco
+    cubo = utils_chamados.carregar_cubo()
+    if cubo is None or len(cubo) == 0:
         st.info("Nenhum dado encontrado. Use o menu lateral para importar.")
         return
 
-    # Tratamento
-    df['Agendamento'] = pd.to_datetime(df['Agendamento'], errors='coerce')
-    status_fim = ['concluído', 'finalizado', 'faturado', 'fechado', 'equipamento entregue']
-    
-    # KPIs
-    pendentes = df[~df['Status'].str.lower().isin(status_fim)]
-    hoje = pd.Timestamp.today().normalize()
-    atrasados = pendentes[pendentes['Agendamento'] < hoje]
-    prox = pendentes[(pendentes['Agendamento'] >= hoje) & (pendentes['Agendamento'] <= hoje + timedelta(days=5))]
+    f1, f2, f3 = st.columns(3)
+    filtros = {
+        'gestor': f1.multiselect("Gestor", cubo.opcoes('gestor'), key="cockpit_gestor"),
+        'analista': f2.multiselect("Analista", cubo.opcoes('analista'), key="cockpit_analista"),
+        'uf': f3.multiselect("UF", cubo.opcoes('uf'), key="cockpit_uf"),
+    }
+    kpis, df_projetos = utils_chamados.carregar_cockpit(**filtros)
 
     m1, m2, m3 = st.columns(3)
-    m1.metric("📦 Total de Chamados", len(df))
-    m2.metric("🚨 Atrasados Geral", len(atrasados), delta_color="inverse")
-    m3.metric("📅 Vencendo na Semana", len(prox))
+    m1.metric("📦 Total de Chamados", kpis['total'])
+    m2.metric("🚨 Atrasados Geral", kpis['atrasados'], delta_color="inverse")
+    m3.metric("📅 Vencendo na Semana", kpis['vencendo'])
 
     st.markdown("---")
     st.subheader("Meus Projetos")
     
     # Grid de Projetos
-    lista_projetos = sorted(df['Projeto'].dropna().unique().tolist())
     cols = st.columns(3)
     
-    for i, proj in enumerate(lista_projetos):
-        df_p = df[df['Projeto'] == proj]
-        total_p = len(df_p)
-        concluidos = len(df_p[df_p['Status'].str.lower().isin(status_fim)])
-        atrasados_p = len(df_p[(~df_p['Status'].str.lower().isin(status_fim)) & (df_p['Agendamento'] < hoje)])
-        perc = int((concluidos / total_p) * 100) if total_p > 0 else 0
-        
+    for i, (proj, total_p, concluidos, atrasados_p, perc) in enumerate(df_projetos.itertuples(index=False)):
         # Cor
         cor = "#3498db"
         if atrasados_p > 0: cor = "#e74c3c"
@@ -573,9 +583,6 @@ def main():
             tela_cockpit()
 
 if __name__ == "__main__":
-    utils.criar_tabelas_iniciais() 
+    utils_banco.preparar_banco() # Uma vez por processo (cache)
     main()
-
-
-
-
+    utils_perfil.fim_pagina()
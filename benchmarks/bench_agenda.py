@@ -0,0 +1,115 @@
+"""
+Benchmark do feed de eventos da Agenda, com PostgreSQL local.
+
+Compara o caminho antigo (carregar_chamados_db + groupby com lambdas +
+iterrows sobre todo o histórico agendado) com utils_chamados.carregar_eventos_agenda
+(só a janela visível do calendário) e confere que os eventos de cada mês são
+os mesmos, com e sem filtro de analista.
+
+ATENÇÃO: as tabelas do banco informado são APAGADAS. Use um banco só para isso.
+
+Uso (na raiz do projeto):
+    python benchmarks/bench_agenda.py --dsn postgresql://localhost/agenda_bench --linhas 20000
+"""
+import argparse
+import logging
+import os
+import random
+import sys
+import time
+from datetime import date, timedelta
+
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(__file__))
+import bench_pipeline_importacao as pipeline  # noqa: E402
+import gerador_dados  # noqa: E402
+utils_chamados = pipeline.utils_chamados
+
+STATUS = ['Não Iniciado', 'Em Andamento', 'Pendência de Infra', 'Concluído', 'Cancelado', None]
+
+
+# --- IMPLEMENTAÇÃO ANTERIOR (REFERÊNCIA) ---
+# Mesmo agrupamento da página; nulos viram '' (o astype(str) do pandas 3 mantém NaN).
+
+def _legado(analista):
+    df = utils_chamados.carregar_chamados_db()
+    if analista: df = df[df['Analista'] == analista]
+    df = df.assign(Agendamento=pd.to_datetime(df['Agendamento'], errors='coerce')).dropna(subset=['Agendamento'])
+    for c in ['Nº Chamado', 'Descrição', 'Status', 'Sub-Status', 'Analista', 'Técnico']:
+        df[c] = df[c].astype(object).where(df[c].notna(), None)
+    df[['Nome Agência', 'Projeto']] = df[['Nome Agência', 'Projeto']].fillna('N/A')
+    df_agrupado = df.groupby(['Agendamento', 'Nome Agência', 'Projeto']).agg({
+        'Nº Chamado': lambda x: ', '.join(sorted(set(x))),
+        'Descrição': lambda x: ' | '.join(x.dropna()),
+        'Status': 'first', 'Sub-Status': 'first', 'Analista': 'first', 'Técnico': 'first',
+        'ID': 'first', 'Agencia_Cod': 'first'
+    }).reset_index()
+    eventos = []
+    for _, row in df_agrupado.iterrows():
+        cod = '' if pd.isna(row.get('Agencia_Cod')) else row.get('Agencia_Cod')
+        nome = str(row.get('Nome Agência', 'N/A')).strip()
+        agencia = f"{cod} - {nome}" if cod and cod not in nome else nome
+        texto = {c: '' if pd.isna(row[c]) else str(row[c]) for c in ['Nº Chamado', 'Descrição', 'Status', 'Sub-Status', 'Analista', 'Técnico']}
+        eventos.append({
+            "title": f"{agencia} - {row['Projeto']}", "color": utils_chamados.get_status_color(texto['Status']),
+            "start": row['Agendamento'].strftime('%Y-%m-%d'), "end": row['Agendamento'].strftime('%Y-%m-%d'), "allDay": True,
+            "extendedProps": {"ID": str(row['ID']), "Chamado": texto['Nº Chamado'], "Projeto": row['Projeto'], "Agência": agencia,
+                              "Analista": texto['Analista'], "Técnico": texto['Técnico'], "Status": texto['Status'],
+                              "Sub-Status": texto['Sub-Status'], "Descrição": texto['Descrição']}
+        })
+    return eventos
+
+
+def _espalhar_agendamentos(conn, dias, seed=42):
+    """Agendamentos em ~dias em torno de hoje (alguns sem data), vários chamados no mesmo dia/agência."""
+    rnd = random.Random(seed)
+    hoje = date.today()
+    with conn.cursor() as cur:
+        cur.execute("SELECT id, agencia_nome FROM chamados ORDER BY id")
+        linhas = cur.fetchall()
+        por_agencia = {}
+        for i, agencia in linhas:
+            dia = por_agencia.get(agencia) if rnd.random() < 0.3 else None
+            dia = dia or (hoje + timedelta(days=rnd.randint(-dias, 60)) if rnd.random() < 0.9 else None)
+            por_agencia[agencia] = dia
+            cur.execute("UPDATE chamados SET data_agendamento = %s, status_chamado = %s, tecnico = %s, analista = %s WHERE id = %s",
+                        (dia, rnd.choice(STATUS), rnd.choice(['JOÃO', None]), rnd.choice(gerador_dados.PESSOAS + [None]), i))
+    conn.commit()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--dsn", required=True, help="PostgreSQL local (as tabelas são apagadas!)")
+    parser.add_argument("--linhas", type=int, default=20_000, help="linhas da carteira sintética")
+    parser.add_argument("--dias", type=int, default=720, help="histórico agendado (dias para trás)")
+    args = parser.parse_args()
+
+    logging.getLogger("streamlit").setLevel(logging.ERROR)
+    conn, _ = pipeline.conectar(args.dsn)
+    pipeline.limpar_banco()
+    pipeline.medir_chamados(gerador_dados.para_xlsx(gerador_dados.gerar_carteira(args.linhas), "carteira.xlsx"))
+    _espalhar_agendamentos(conn, args.dias)
+
+    hoje = date.today()
+    meses = [date(hoje.year + (hoje.month - 1 + k) // 12, (hoje.month - 1 + k) % 12 + 1, 1) for k in range(-3, 2)]
+    analista = utils_chamados.listar_analistas_agenda()[0]
+    for filtro in [None, analista]:
+        utils_chamados.st.cache_data.clear()
+        t = time.perf_counter(); todos = _legado(filtro); t_antigo = time.perf_counter() - t
+        t_novo, tamanho = 0.0, 0
+        for mes in meses:
+            inicio = mes - timedelta(days=(mes.weekday() + 1) % 7)
+            fim = inicio + timedelta(days=42)
+            t = time.perf_counter(); eventos = utils_chamados.carregar_eventos_agenda(filtro, inicio, fim); t_novo += time.perf_counter() - t
+            esperado = [e for e in todos if inicio.isoformat() <= e['start'] < fim.isoformat()]
+            chave = lambda e: (e['start'], e['title'], e['extendedProps']['ID'])
+            assert sorted(eventos, key=chave) == sorted(esperado, key=chave), f"Eventos divergentes em {mes:%m/%Y} ({filtro})"
+            tamanho += len(eventos)
+        t = time.perf_counter(); utils_chamados.carregar_eventos_agenda(filtro, inicio, fim); t_cache = time.perf_counter() - t
+        print(f"[{filtro or 'Todos'}] histórico {len(todos)} eventos: antigo {t_antigo:.2f}s por render | "
+              f"janela de 6 semanas {t_novo / len(meses) * 1000:.1f}ms ({tamanho / len(meses):.0f} eventos) | cache {t_cache * 1000:.2f}ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,103 @@
+"""
+Benchmark da tela inicial (Cockpit), com PostgreSQL local.
+
+Compara o caminho antigo (carregar todos os chamados e filtrar o DataFrame
+inteiro três vezes por projeto) com utils_chamados.carregar_cockpit (roll-up
+do cubo de chamados, montado uma vez por versão dos chamados). Confere KPIs e
+cards de todos os projetos e que qualquer escrita em chamados troca a versão.
+
+ATENÇÃO: as tabelas do banco informado são APAGADAS. Use um banco só para isso.
+
+Uso (na raiz do projeto):
+    python benchmarks/bench_cockpit.py --dsn postgresql://localhost/agenda_bench --linhas 20000 --projetos 300
+"""
+import argparse
+import logging
+import os
+import sys
+import time
+from datetime import timedelta
+
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(__file__))
+import bench_pipeline_importacao as pipeline  # noqa: E402
+import gerador_dados  # noqa: E402
+utils_chamados = pipeline.utils_chamados
+utils_financeiro = pipeline.utils_financeiro
+
+
+# --- IMPLEMENTAÇÃO ANTERIOR (REFERÊNCIA) ---
+
+def _legado():
+    utils_chamados.st.cache_data.clear()
+    df = utils_chamados.carregar_chamados_db()
+    df['Agendamento'] = pd.to_datetime(df['Agendamento'], errors='coerce')
+    status_fim = ['concluído', 'finalizado', 'faturado', 'fechado', 'equipamento entregue']
+    pendentes = df[~df['Status'].str.lower().isin(status_fim)]
+    hoje = pd.Timestamp.today().normalize()
+    atrasados = pendentes[pendentes['Agendamento'] < hoje]
+    prox = pendentes[(pendentes['Agendamento'] >= hoje) & (pendentes['Agendamento'] <= hoje + timedelta(days=5))]
+    kpis = {'total': len(df), 'atrasados': len(atrasados), 'vencendo': len(prox)}
+
+    cards = []
+    for proj in sorted(df['Projeto'].dropna().unique().tolist()):
+        df_p = df[df['Projeto'] == proj]
+        total_p = len(df_p)
+        concluidos = len(df_p[df_p['Status'].str.lower().isin(status_fim)])
+        atrasados_p = len(df_p[(~df_p['Status'].str.lower().isin(status_fim)) & (df_p['Agendamento'] < hoje)])
+        perc = int((concluidos / total_p) * 100) if total_p > 0 else 0
+        cards.append((proj, total_p, concluidos, atrasados_p, perc))
+    return kpis, cards
+
+def _novo():
+    kpis, df = utils_chamados.carregar_cockpit()
+    return kpis, [tuple(r) for r in df.itertuples(index=False)]
+
+
+def _variar_chamados(conn, n_projetos):
+    """Espalha projetos, status e agendamentos (com nulos) para o cockpit ter o que contar."""
+    with conn.cursor() as cur:
+        cur.execute("""
+            UPDATE chamados SET
+                projeto_nome = CASE WHEN id %% 53 = 0 THEN NULL ELSE 'PROJETO ' || lpad((id * 7 %% %(n)s)::text, 3, '0') END,
+                status_chamado = (ARRAY['Concluído', 'CONCLUÍDO', 'Em andamento', 'Finalizado', 'Pendente', 'Faturado', NULL,
+                                        'Equipamento Entregue', 'Fechado', 'Não Iniciado'])[1 + id %% 10],
+                data_agendamento = CASE WHEN id %% 11 = 0 THEN NULL ELSE current_date + (id * 13 %% 61 - 30) END
+        """, {'n': n_projetos})
+    conn.commit()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--dsn", required=True, help="PostgreSQL local (as tabelas são apagadas!)")
+    parser.add_argument("--linhas", type=int, default=20_000, help="linhas da carteira sintética")
+    parser.add_argument("--projetos", type=int, default=300)
+    parser.add_argument("--repeticoes", type=int, default=3)
+    args = parser.parse_args()
+
+    logging.getLogger("streamlit").setLevel(logging.ERROR)
+    conn, _ = pipeline.conectar(args.dsn)
+    pipeline.limpar_banco()
+    pipeline.medir_chamados(gerador_dados.para_xlsx(gerador_dados.gerar_carteira(args.linhas), "carteira.xlsx"))
+
+    versao = utils_financeiro.versao_dados('chamados')
+    _variar_chamados(conn, args.projetos)
+    assert utils_financeiro.versao_dados('chamados') > versao, "UPDATE em chamados não trocou a versão"
+
+    antigo, novo = _legado(), _novo()
+    assert antigo == novo, "Cockpit divergente"
+
+    t_antigo = min(_cronometro(_legado) for _ in range(args.repeticoes))
+    t_frio = min(_cronometro(lambda: (utils_chamados._cubo_por_versao.clear(), _novo())) for _ in range(args.repeticoes))
+    t_quente = min(_cronometro(_novo) for _ in range(args.repeticoes))
+
+    print(f"{antigo[0]['total']} chamados, {len(antigo[1])} projetos: KPIs e cards conferem")
+    print(f"Cockpit: antigo {t_antigo:.3f}s | montando o cubo {t_frio * 1000:.1f}ms | em cache (mesma versão) {t_quente * 1000:.1f}ms")
+
+def _cronometro(func):
+    inicio = time.perf_counter(); func(); return time.perf_counter() - inicio
+
+
+if __name__ == "__main__":
+    main()
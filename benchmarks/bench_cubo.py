@@ -0,0 +1,135 @@
+"""
+Benchmark do cubo de chamados (Cockpit e fatias do Indicadores), com PostgreSQL local.
+
+Compara o caminho antigo (refiltrar o DataFrame de todos os chamados a cada
+fatia) com utils_chamados.CuboChamados (montado uma vez por versão dos
+chamados; filtrar e agrupar só mexem nas células do cubo). Confere totais e
+roll-ups de fatias sorteadas por projeto, analista, gestor, UF, status,
+sub-status e semana.
+
+ATENÇÃO: as tabelas do banco informado são APAGADAS. Use um banco só para isso.
+
+Uso (na raiz do projeto):
+    python benchmarks/bench_cubo.py --dsn postgresql://localhost/agenda_bench --linhas 20000 --fatias 200
+"""
+import argparse
+import logging
+import os
+import random
+import sys
+import time
+from datetime import timedelta
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(__file__))
+import bench_pipeline_importacao as pipeline  # noqa: E402
+import gerador_dados  # noqa: E402
+utils_chamados = pipeline.utils_chamados
+
+COLUNAS = {'projeto': 'Projeto', 'analista': 'Analista', 'gestor': 'Gestor', 'uf': 'UF',
+           'status': 'Status', 'sub_status': 'Sub-Status', 'semana': 'Semana'}
+
+
+# --- IMPLEMENTAÇÃO ANTERIOR (REFERÊNCIA) ---
+
+def _preparar_legado(df):
+    df = df.copy()
+    df['Agendamento'] = pd.to_datetime(df['Agendamento'], errors='coerce')
+    iso = df['Agendamento'].dt.isocalendar()
+    df['Semana'] = [None if pd.isna(a) else f"{a:04d}-W{s:02d}" for a, s in zip(iso['year'], iso['week'])]
+    return df
+
+def _legado(df, filtros, por):
+    """Uma passada no DataFrame inteiro por fatia, como a tela fazia."""
+    hoje = pd.Timestamp.today().normalize()
+    for dim, valores in filtros.items():
+        if valores: df = df[df[COLUNAS[dim]].isin(valores)]
+    concluido = df['Status'].str.lower().isin(utils_chamados.STATUS_FIM)
+    medidas = pd.DataFrame({
+        'total': 1,
+        'concluidos': concluido.astype(int),
+        'atrasados': (~concluido & (df['Agendamento'] < hoje)).astype(int),
+        'vencendo': (~concluido & df['Agendamento'].between(hoje, hoje + timedelta(days=5))).astype(int),
+        'valor': pd.to_numeric(df['Valor_Calculado'], errors='coerce').fillna(0.0),
+    }, index=df.index)
+    totais = {m: medidas[m].sum().item() for m in medidas.columns}
+    grupos = medidas.groupby(df[COLUNAS[por]].astype(object).where(df[COLUNAS[por]].notna(), '(vazio)'), sort=True).sum()
+    return totais, grupos
+
+def _novo(cubo, filtros, por):
+    fatia = cubo.filtrar(**filtros)
+    grupos = fatia.agrupar(por)
+    grupos[por] = grupos[por].where(grupos[por].notna(), '(vazio)')
+    return fatia.totais(), grupos.set_index(por).sort_index()
+
+
+def _variar_chamados(conn):
+    """Espalha as dimensões do cubo (com nulos) pelos chamados da carteira sintética."""
+    with conn.cursor() as cur:
+        cur.execute("""
+            UPDATE chamados SET
+                projeto_nome = CASE WHEN id % 53 = 0 THEN NULL ELSE 'PROJETO ' || lpad((id * 7 % 40)::text, 2, '0') END,
+                analista = CASE WHEN id % 17 = 0 THEN NULL ELSE 'Analista ' || (id % 12) END,
+                gestor = CASE WHEN id % 19 = 0 THEN NULL ELSE 'Gestor ' || (id % 6) END,
+                agencia_uf = (ARRAY['SP', 'RJ', 'MG', 'BA', 'PR', NULL])[1 + id % 6],
+                status_chamado = (ARRAY['Concluído', 'CONCLUÍDO', 'Em andamento', 'Finalizado', 'Pendente', 'Faturado', NULL,
+                                        'Equipamento Entregue', 'Fechado', 'Não Iniciado'])[1 + id % 10],
+                sub_status = (ARRAY['Enviar Book', 'Follow-up', 'Acionar técnico', NULL])[1 + id % 4],
+                data_agendamento = CASE WHEN id % 11 = 0 THEN NULL ELSE current_date + (id * 13 % 181 - 90) END,
+                valor_calculado = CASE WHEN id % 9 = 0 THEN NULL ELSE (id % 500) * 1.25 END
+        """)
+    conn.commit()
+
+
+def _sortear_fatias(cubo, n, seed=42):
+    rnd = random.Random(seed)
+    fatias = []
+    for _ in range(n):
+        dims = rnd.sample(list(COLUNAS), rnd.randint(0, 3))
+        filtros = {d: rnd.sample(cubo.opcoes(d), min(len(cubo.opcoes(d)), rnd.randint(1, 3))) for d in dims}
+        fatias.append((filtros, rnd.choice(list(COLUNAS))))
+    return fatias
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--dsn", required=True, help="PostgreSQL local (as tabelas são apagadas!)")
+    parser.add_argument("--linhas", type=int, default=20_000, help="linhas da carteira sintética")
+    parser.add_argument("--fatias", type=int, default=200)
+    args = parser.parse_args()
+
+    logging.getLogger("streamlit").setLevel(logging.ERROR)
+    conn, _ = pipeline.conectar(args.dsn)
+    pipeline.limpar_banco()
+    pipeline.medir_chamados(gerador_dados.para_xlsx(gerador_dados.gerar_carteira(args.linhas), "carteira.xlsx"))
+    _variar_chamados(conn)
+
+    inicio = time.perf_counter()
+    cubo = utils_chamados.carregar_cubo()
+    t_montagem = time.perf_counter() - inicio
+    df = _preparar_legado(utils_chamados.carregar_chamados_db())
+    fatias = _sortear_fatias(cubo, args.fatias)
+
+    for filtros, por in fatias:
+        (t_antigo, g_antigo), (t_novo, g_novo) = _legado(df, filtros, por), _novo(cubo, filtros, por)
+        assert t_antigo.keys() == t_novo.keys() and all(np.isclose(t_antigo[m], t_novo[m]) for m in t_antigo), f"Totais divergentes em {filtros}"
+        assert g_antigo.index.tolist() == g_novo.index.tolist(), f"Grupos divergentes em {filtros} por {por}"
+        for m in utils_chamados.MEDIDAS_CUBO:
+            assert np.allclose(g_antigo[m].to_numpy(dtype=float), g_novo[m].to_numpy(dtype=float)), f"{m} divergente em {filtros} por {por}"
+
+    t_antigo = _cronometro(lambda: [_legado(df, f, p) for f, p in fatias]) / len(fatias)
+    t_novo = _cronometro(lambda: [_novo(cubo, f, p) for f, p in fatias]) / len(fatias)
+    t_filtro = _cronometro(lambda: [cubo.filtrar(**f).totais() for f, _ in fatias]) / len(fatias)
+
+    print(f"{len(df)} chamados em {len(cubo)} células (cubo montado em {t_montagem * 1000:.0f}ms); {len(fatias)} fatias conferem")
+    print(f"Por fatia: DataFrame {t_antigo * 1000:.2f}ms | cubo filtrar+agrupar {t_novo * 1000:.2f}ms | "
+          f"cubo só filtrar+totais {t_filtro * 1e6:.0f}µs")
+
+def _cronometro(func):
+    inicio = time.perf_counter(); func(); return time.perf_counter() - inicio
+
+
+if __name__ == "__main__":
+    main()
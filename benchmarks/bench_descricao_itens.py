@@ -0,0 +1,125 @@
+"""
+Micro-benchmark da montagem de descrições/itens de equipamento na importação.
+
+Compara a implementação antiga (apply linha a linha + juntar_textos por grupo)
+com as funções vetorizadas de utils_chamados e confere que a saída é idêntica.
+
+Uso (na raiz do projeto):
+    python benchmarks/bench_descricao_itens.py --linhas 100000
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+import utils_chamados  # noqa: E402
+
+EQUIPAMENTOS = ["CAMERA BULLET", "DVR 16 CANAIS", "SENSOR IVP", "CENTRAL DE ALARME", "NOBREAK", "", "nan"]
+SISTEMAS = ["CFTV", "ALARME", "INCENDIO", ""]
+QUANTIDADES = ["1", "2", "0", "", "None", "4", "1.0"]
+
+
+# --- IMPLEMENTAÇÃO ANTERIOR (REFERÊNCIA) ---
+
+def _legado_descricao(row):
+    equip = str(row['nome_equipamento'])
+    qtd = str(row['quantidade'])
+    if equip.lower() in ['nan', 'none', '', 'nat']: equip = ""
+    if qtd.lower() in ['nan', 'none', '', 'nat']: qtd = ""
+    if qtd.endswith('.0'): qtd = qtd[:-2]
+    if equip:
+        if qtd and qtd != '0': return f"{qtd} - {equip}"
+        return equip
+    return row.get('descricao_projeto', '')
+
+def _legado_item(row):
+    qtd = str(row['Qtd']).strip()
+    desc = str(row['Nome_equipamento']).strip()
+    if not desc: desc = str(row['Sistema']).strip()
+    if not desc: return ""
+    if qtd and qtd not in ["0", "nan", "", "None"]: return f"{qtd} - {desc}"
+    return desc
+
+def _legado_juntar(lista):
+    limpos = [str(x) for x in lista if str(x).strip() not in ["", "nan", "None"]]
+    return " | ".join(dict.fromkeys(limpos))
+
+
+# --- GERAÇÃO DA PLANILHA SINTÉTICA ---
+
+def gerar_linhas(n_linhas, linhas_por_chamado=4, seed=42):
+    rnd = random.Random(seed)
+    n_chamados = max(1, n_linhas // linhas_por_chamado)
+    return pd.DataFrame({
+        'Nº Chamado': [f"GTS-{rnd.randint(1, n_chamados):06d}" for _ in range(n_linhas)],
+        'Cód. Agência': [str(rnd.randint(1, 3000)) for _ in range(n_linhas)],
+        'Sistema': [rnd.choice(SISTEMAS) for _ in range(n_linhas)],
+        'Cod_equipamento': [str(rnd.randint(1000, 9999)) for _ in range(n_linhas)],
+        'Nome_equipamento': [rnd.choice(EQUIPAMENTOS) for _ in range(n_linhas)],
+        'Qtd': [rnd.choice(QUANTIDADES) for _ in range(n_linhas)],
+    })
+
+
+def _agrupar(df_final, vetorizado):
+    ignoradas = ['Sistema', 'Qtd', 'Item_Formatado', 'Nome_equipamento', 'Cod_equipamento']
+    regras = {c: 'first' for c in df_final.columns if c not in ignoradas}
+    regras['Sistema'] = 'first'
+    if not vetorizado:
+        regras['Item_Formatado'] = _legado_juntar
+        return df_final.groupby('Nº Chamado', as_index=False).agg(regras)
+    regras['Item_Formatado'] = 'first'
+    df_grouped = df_final.groupby('Nº Chamado', as_index=False).agg(regras)
+    itens = utils_chamados.juntar_textos_unicos(df_final, 'Nº Chamado', 'Item_Formatado')
+    df_grouped['Item_Formatado'] = df_grouped['Nº Chamado'].map(itens).fillna("")
+    return df_grouped
+
+
+def _cronometrar(func, repeticoes):
+    tempos = []
+    for _ in range(repeticoes):
+        inicio = time.perf_counter()
+        resultado = func()
+        tempos.append(time.perf_counter() - inicio)
+    return min(tempos), resultado
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--linhas", type=int, default=100_000)
+    parser.add_argument("--repeticoes", type=int, default=3)
+    args = parser.parse_args()
+
+    df = gerar_linhas(args.linhas).fillna("")
+
+    # 1. Gestão: Item_Formatado + junção por chamado
+    def antigo_gestao():
+        d = df.copy(); d['Item_Formatado'] = d.apply(_legado_item, axis=1)
+        return _agrupar(d, vetorizado=False)
+
+    def novo_gestao():
+        d = df.copy(); d['Item_Formatado'] = utils_chamados.formatar_itens_importacao(d)
+        return _agrupar(d, vetorizado=True)
+
+    t_antigo, r_antigo = _cronometrar(antigo_gestao, args.repeticoes)
+    t_novo, r_novo = _cronometrar(novo_gestao, args.repeticoes)
+    assert r_antigo.equals(r_novo), "Saída divergente no agrupamento da Gestão"
+    print(f"Gestão (formatar + agrupar) {args.linhas} linhas: antigo {t_antigo:.3f}s | vetorizado {t_novo:.3f}s | {t_antigo / t_novo:.1f}x")
+
+    # 2. bulk_insert_chamados_db: descricao_projeto
+    df_bulk = pd.DataFrame({
+        'nome_equipamento': df['Nome_equipamento'].replace("", np.nan),
+        'quantidade': df['Qtd'].replace("", np.nan),
+    })
+    t_antigo, r_antigo = _cronometrar(lambda: df_bulk.apply(_legado_descricao, axis=1), args.repeticoes)
+    t_novo, r_novo = _cronometrar(lambda: utils_chamados.formatar_descricao_equipamentos(df_bulk), args.repeticoes)
+    assert r_antigo.tolist() == r_novo.tolist(), "Saída divergente em descricao_projeto"
+    print(f"descricao_projeto {args.linhas} linhas: antigo {t_antigo:.3f}s | vetorizado {t_novo:.3f}s | {t_antigo / t_novo:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
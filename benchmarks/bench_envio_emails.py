@@ -0,0 +1,180 @@
+"""
+Benchmark do envio dos relatórios por e-mail contra um servidor SMTP local de depuração.
+
+Sobe um servidor SMTP mínimo (sem TLS nem autenticação) que simula o custo
+de abrir sessão (conexão + STARTTLS + login) e de aceitar cada mensagem, e
+compara o caminho antigo (uma conexão nova por e-mail, um depois do outro)
+com utils_relatorios.enviar_emails (fila + pool de conexões) enviando um
+relatório individual por analista. Confere que cada analista recebeu só o
+seu, que uma recusa temporária (451) é reenviada, que uma recusa definitiva
+(550) não é, e, com --dsn, as linhas gravadas em log_envio_email.
+
+Uso (na raiz do projeto):
+    python benchmarks/bench_envio_emails.py --analistas 30
+    python benchmarks/bench_envio_emails.py --analistas 30 --dsn postgresql://localhost/agenda_bench
+"""
+import argparse
+import email
+import email.policy
+import logging
+import os
+import smtplib
+import socketserver
+import sys
+import threading
+import time
+from datetime import date
+from email.mime.multipart import MIMEMultipart
+from email.mime.text import MIMEText
+
+sys.path.insert(0, os.path.dirname(__file__))
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+import bench_relatorio_html  # noqa: E402
+import utils_relatorios  # noqa: E402
+
+
+# --- SERVIDOR SMTP DE DEPURAÇÃO ---
+
+class ServidorSMTP(socketserver.ThreadingTCPServer):
+    """Guarda as mensagens aceitas; recusas programadas por destinatário: {email: [códigos]}."""
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, latencia_sessao, latencia_mensagem, recusas=None):
+        super().__init__(("127.0.0.1", 0), _SessaoSMTP)
+        self.latencia_sessao, self.latencia_mensagem = latencia_sessao, latencia_mensagem
+        self.recusas = {k: list(v) for k, v in (recusas or {}).items()}
+        self.recebidas, self.sessoes = [], 0
+        self.trava = threading.Lock()
+
+class _SessaoSMTP(socketserver.StreamRequestHandler):
+    def _responder(self, linha):
+        self.wfile.write(linha.encode() + b"\r\n")
+
+    def handle(self):
+        srv = self.server
+        with srv.trava: srv.sessoes += 1
+        time.sleep(srv.latencia_sessao) # Conexão + STARTTLS + login de um servidor real
+        self._responder("220 localhost ESMTP depuracao")
+        para = []
+        while True:
+            linha = self.rfile.readline()
+            if not linha: return
+            verbo = linha.decode(errors="replace").strip()[:4].upper()
+            if verbo == "EHLO": self._responder("250-localhost"); self._responder("250 8BITMIME")
+            elif verbo == "HELO": self._responder("250 localhost")
+            elif verbo == "MAIL": para = []; self._responder("250 OK")
+            elif verbo == "RCPT": para.append(linha.decode().split(":", 1)[1].strip().strip("<>")); self._responder("250 OK")
+            elif verbo == "DATA":
+                self._responder("354 fim com <CRLF>.<CRLF>")
+                dados = []
+                for l in iter(self.rfile.readline, b""):
+                    if l == b".\r\n": break
+                    dados.append(l[1:] if l.startswith(b"..") else l)
+                time.sleep(srv.latencia_mensagem)
+                with srv.trava:
+                    codigos = srv.recusas.get(para[0]) if para else None
+                    codigo = codigos.pop(0) if codigos else 250
+                    if codigo == 250: srv.recebidas.append((list(para), email.message_from_bytes(b"".join(dados), policy=email.policy.default)))
+                self._responder({250: "250 OK", 451: "451 tente mais tarde", 550: "550 caixa inexistente"}[codigo])
+            elif verbo in ("RSET", "NOOP"): self._responder("250 OK")
+            elif verbo == "QUIT": self._responder("221 tchau"); return
+            else: self._responder("502 comando nao implementado")
+
+
+# --- IMPLEMENTAÇÃO ANTERIOR (REFERÊNCIA) ---
+
+def _legado_enviar(config, destinatario, assunto, corpo_html):
+    """enviar_email da página: conexão nova por e-mail (STARTTLS/login só se o servidor tiver)."""
+    msg = MIMEMultipart()
+    msg["From"], msg["To"], msg["Subject"] = config["user"], destinatario, assunto
+    msg.attach(MIMEText(corpo_html, "html", "utf-8"))
+    with smtplib.SMTP(config["smtp_server"], config["smtp_port"]) as server:
+        server.send_message(msg)
+
+
+def _conferir_caixas(servidor, mensagens):
+    recebidas = {para[0]: msg for para, msg in servidor.recebidas}
+    for m in mensagens:
+        msg = recebidas.get(m['destinatarios'])
+        assert msg is not None, f"{m['destinatarios']} não recebeu"
+        corpo = msg.get_body(preferencelist=("html",)).get_content()
+        assert corpo == m['corpo_html'], f"Corpo divergente para {m['destinatarios']}"
+        assert msg['Subject'] == m['assunto']
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--analistas", type=int, default=30)
+    parser.add_argument("--linhas", type=int, default=5_000, help="chamados da base sintética")
+    parser.add_argument("--latencia-sessao", type=float, default=0.4, help="s para abrir sessão (conexão+TLS+login)")
+    parser.add_argument("--latencia-mensagem", type=float, default=0.15, help="s para o servidor aceitar cada e-mail")
+    parser.add_argument("--dsn", help="PostgreSQL local para conferir log_envio_email (opcional)")
+    args = parser.parse_args()
+
+    logging.getLogger("streamlit").setLevel(logging.ERROR)
+    if args.dsn:
+        import bench_pipeline_importacao as pipeline
+        conn, _ = pipeline.conectar(args.dsn)
+        utils_relatorios.criar_tabela_log_email()
+    else:
+        utils_relatorios.registrar_envios = lambda lote, resultados: None # sem banco: só o envio
+
+    hoje = date.today()
+    bench_relatorio_html.ANALISTAS[:] = [f"Analista {i}" for i in range(args.analistas)]
+    df = bench_relatorio_html.gerar_chamados(args.linhas, hoje)
+    relatorios = utils_relatorios.relatorios_por_analista(df, hoje)
+    assunto = f"Relatório Gestão - {hoje.strftime('%d/%m/%Y')}"
+    mensagens = [{'destinatarios': f"{a.lower().replace(' ', '.')}@exemplo.com.br", 'assunto': assunto,
+                  'corpo_html': corpo, 'analista': a} for a, corpo in relatorios.items()]
+    for analista, corpo in relatorios.items():
+        outros = [a for a in relatorios if a != analista and f"👤 {a}<" in corpo]
+        assert not outros, f"Relatório de {analista} com chamados de {outros}"
+
+    # Antes: uma sessão por e-mail, em série
+    servidor = ServidorSMTP(args.latencia_sessao, args.latencia_mensagem)
+    threading.Thread(target=servidor.serve_forever, daemon=True).start()
+    config = {"user": "relatorios@exemplo.com.br", "smtp_server": "127.0.0.1", "smtp_port": servidor.server_address[1], "starttls": False}
+    inicio = time.perf_counter()
+    for m in mensagens: _legado_enviar(config, m['destinatarios'], m['assunto'], m['corpo_html'])
+    t_antigo = time.perf_counter() - inicio
+    _conferir_caixas(servidor, mensagens)
+    sessoes_antigo = servidor.sessoes
+    servidor.shutdown(); servidor.server_close()
+
+    # Agora: fila + pool; uma recusa temporária e uma definitiva
+    temporaria, definitiva = mensagens[0]['destinatarios'], mensagens[1]['destinatarios']
+    servidor = ServidorSMTP(args.latencia_sessao, args.latencia_mensagem, {temporaria: [451], definitiva: [550]})
+    threading.Thread(target=servidor.serve_forever, daemon=True).start()
+    config["smtp_port"] = servidor.server_address[1]
+    inicio = time.perf_counter()
+    resultados = utils_relatorios.enviar_emails(mensagens, config, espera=0.2)
+    t_novo = time.perf_counter() - inicio
+    por_destino = {r['destinatarios']: r for r in resultados}
+    assert por_destino[temporaria]['situacao'] == 'enviado' and por_destino[temporaria]['tentativas'] == 2, por_destino[temporaria]
+    assert por_destino[definitiva]['situacao'] == 'falhou' and por_destino[definitiva]['tentativas'] == 1, por_destino[definitiva]
+    _conferir_caixas(servidor, [m for m in mensagens if m['destinatarios'] != definitiva])
+    pool = utils_relatorios.pool_smtp(config)
+
+    # Segundo envio (outro rerun): o pool já está aberto
+    inicio = time.perf_counter()
+    utils_relatorios.enviar_emails(mensagens[2:], config)
+    t_quente = time.perf_counter() - inicio
+    sessoes_novo = servidor.sessoes
+
+    if args.dsn:
+        with conn.cursor() as cur:
+            cur.execute("SELECT situacao, tentativas FROM log_envio_email WHERE destinatarios = %s ORDER BY id DESC LIMIT 1", (definitiva,))
+            assert cur.fetchone() == ('falhou', 1), "Log sem a recusa definitiva"
+        conn.commit()
+    pool.fechar(); servidor.shutdown(); servidor.server_close()
+
+    print(f"{len(mensagens)} relatórios individuais ({sum(len(m['corpo_html']) for m in mensagens) / 1024:.0f} KB) conferidos"
+          f"{' e gravados no log' if args.dsn else ''}")
+    print(f"Antigo (sessão por e-mail, em série): {t_antigo:.2f}s, {sessoes_antigo} sessões")
+    print(f"Fila + pool ({utils_relatorios.ENVIOS_SIMULTANEOS} em paralelo, com 1 reenvio): {t_novo:.2f}s | "
+          f"segundo envio com o pool aberto: {t_quente:.2f}s | {sessoes_novo} sessões no total")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,155 @@
+"""
+Benchmark do histórico diário de status (página Indicadores), com PostgreSQL local.
+
+Monta logs sintéticos com mudanças de Status/Ação datadas e compara a
+reconstrução em pandas (reler log_chamado de todos os chamados e remontar o
+estado de cada dia, que é o que uma tendência exigiria sem a tabela) com
+utils_indicadores: fato_status_diario gravado pelo job + dia de hoje ao vivo.
+Confere as contagens de todos os dias e que regravar é idempotente.
+
+ATENÇÃO: as tabelas do banco informado são APAGADAS. Use um banco só para isso.
+
+Uso (na raiz do projeto):
+    python benchmarks/bench_fato_status_diario.py --dsn postgresql://localhost/agenda_bench --linhas 20000 --dias 90
+"""
+import argparse
+import logging
+import os
+import random
+import re
+import sys
+import time
+from datetime import date, timedelta
+
+import pandas as pd
+from psycopg2.extras import execute_values
+
+sys.path.insert(0, os.path.dirname(__file__))
+import bench_pipeline_importacao as pipeline  # noqa: E402
+import gerador_dados  # noqa: E402
+utils_chamados = pipeline.utils_chamados
+import utils_indicadores  # noqa: E402
+
+STATUS = ['Não Iniciado', 'Em Andamento', 'Pendência de Infra', 'Concluído', 'Finalizado', 'Cancelado', 'Faturado']
+SUB_STATUS = ['Abrir chamado Btime', 'Acionar técnico', 'Follow-up', 'Enviar Book', 'Aguardando Faturamento', '']
+ANALISTAS = ['ANA SOUZA', 'BRUNO LIMA', 'CARLA DIAS', None]
+CHAVES = ['status', 'sub_status', 'analista', 'projeto', 'situacao_sla']
+
+
+# --- IMPLEMENTAÇÃO ANTERIOR (REFERÊNCIA): REPLAY DO LOG EM PANDAS ---
+
+def _situacao(status, agendamento, fechamento, hoje):
+    status_fim = ['concluído', 'finalizado', 'faturado', 'fechado', 'equipamento entregue']
+    status = str(status).lower()
+    if status in status_fim:
+        if pd.notna(fechamento) and pd.notna(agendamento) and fechamento > agendamento + timedelta(days=1):
+            return "Finalizado com Atraso"
+        return "Finalizado no Prazo"
+    if "cancelado" in status: return "Cancelado"
+    if pd.notna(agendamento):
+        return "Em Aberto (Atrasado)" if agendamento < hoje else "Em Aberto (No Prazo)"
+    return "Sem Data"
+
+def _valor(v, padrao=None):
+    return padrao if v is None or (isinstance(v, float) and pd.isna(v)) else v
+
+def _legado(dias):
+    utils_chamados.st.cache_data.clear()
+    df = utils_chamados.carregar_chamados_db()
+    padrao = re.compile(utils_indicadores.PADRAO_LOG_STATUS)
+    mudancas = [[(pd.to_datetime(d, dayfirst=True).date(), campo, antes) for d, campo, antes in padrao.findall(str(log or ''))]
+                for log in df['Log do Chamado']]
+    linhas = []
+    for dia in dias:
+        for row, mud in zip(df.to_dict('records'), mudancas):
+            if pd.notna(row['Abertura']) and row['Abertura'] > dia: continue
+            estado = {'Status': _valor(row['Status']), 'Ação': _valor(row['Sub-Status'])}
+            for campo in estado:
+                depois = [antes for d, c, antes in mud if c == campo and d > dia]
+                if depois: estado[campo] = None if depois[0] == 'None' else depois[0]
+            fech = row['Fechamento'] if pd.notna(row['Fechamento']) and row['Fechamento'] <= dia else None
+            linhas.append((dia, _valor(estado['Status'], 'N/A'), _valor(estado['Ação'], 'N/A'), _valor(row['Analista'], 'Não Definido'),
+                           _valor(row['Projeto'], 'Geral'), _situacao(estado['Status'], row['Agendamento'], fech, dia)))
+    return pd.DataFrame(linhas, columns=['dia'] + CHAVES).value_counts().rename('qtd')
+
+
+def _historico_sintetico(conn, n_dias, seed=42):
+    """Abertura nos últimos n_dias e 0-4 mudanças datadas por chamado; o estado atual é a última."""
+    rnd = random.Random(seed)
+    hoje = date.today()
+    with conn.cursor() as cur:
+        cur.execute("SELECT id FROM chamados ORDER BY id")
+        ids = [r[0] for r in cur.fetchall()]
+    valores = []
+    for i in ids:
+        abertura = hoje - timedelta(days=rnd.randint(0, n_dias + 10))
+        status, sub, log = rnd.choice([None] + STATUS), rnd.choice([None] + SUB_STATUS), []
+        for d in sorted(abertura + timedelta(days=rnd.randint(0, (hoje - abertura).days)) for _ in range(rnd.randint(0, 4))):
+            novo = rnd.choice(STATUS)
+            log.append(f"{d:%d/%m/%Y} Bench: Status '{status}' -> '{novo}'"); status = novo
+            if rnd.random() < 0.6:
+                novo = rnd.choice(SUB_STATUS)
+                log.append(f"{d:%d/%m/%Y} Bench: Ação '{sub}' -> '{novo}'"); sub = novo
+        agend = abertura + timedelta(days=rnd.randint(-5, 40)) if rnd.random() < 0.8 else None
+        fech = agend + timedelta(days=rnd.randint(-2, 6)) if agend and status in ('Concluído', 'Finalizado', 'Faturado') else None
+        valores.append((i, abertura, status, sub or None, "\n".join(log) or None, agend, fech, rnd.choice(ANALISTAS)))
+    with conn.cursor() as cur:
+        execute_values(cur, """
+            UPDATE chamados AS c SET data_abertura = v.abertura::date, status_chamado = v.status, sub_status = v.sub,
+                   log_chamado = v.log, data_agendamento = v.agend::date, data_fechamento = v.fech::date, analista = v.analista
+            FROM (VALUES %s) AS v(id, abertura, status, sub, log, agend, fech, analista) WHERE c.id = v.id
+        """, valores)
+    conn.commit()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--dsn", required=True, help="PostgreSQL local (as tabelas são apagadas!)")
+    parser.add_argument("--linhas", type=int, default=20_000, help="linhas da carteira sintética")
+    parser.add_argument("--dias", type=int, default=90)
+    args = parser.parse_args()
+
+    logging.getLogger("streamlit").setLevel(logging.ERROR)
+    conn, _ = pipeline.conectar(args.dsn)
+    pipeline.limpar_banco()
+    pipeline.medir_chamados(gerador_dados.para_xlsx(gerador_dados.gerar_carteira(args.linhas), "carteira.xlsx"))
+    _historico_sintetico(conn, args.dias)
+
+    utils_indicadores.criar_tabela_fato_status_diario()
+    with conn.cursor() as cur: cur.execute("TRUNCATE fato_status_diario")
+    conn.commit()
+    hoje = date.today()
+    inicio = hoje - timedelta(days=args.dias)
+
+    t = time.perf_counter(); ok, n_dias = utils_indicadores.registrar_fato_status_diario(inicio); t_job = time.perf_counter() - t
+    assert ok and n_dias == args.dias, "Job não gravou os dias"
+    tabela = pd.read_sql("SELECT count(*) AS linhas, sum(qtd) AS qtd FROM fato_status_diario", conn).iloc[0]
+    assert utils_indicadores.registrar_fato_status_diario(inicio)[0], "Regravação falhou"
+    assert pd.read_sql("SELECT count(*) AS linhas, sum(qtd) AS qtd FROM fato_status_diario", conn).iloc[0].equals(tabela), "Regravar não é idempotente"
+    assert utils_indicadores.registrar_fato_status_diario() == (True, 0), "Job sem datas deveria estar em dia"
+
+    dias = [inicio + timedelta(days=i) for i in range(args.dias + 1)]
+    t = time.perf_counter(); esperado = _legado(dias); t_antigo = time.perf_counter() - t
+
+    utils_chamados.st.cache_data.clear()
+    t = time.perf_counter()
+    partes = [utils_indicadores.carregar_tendencia(inicio, hoje, dim) for dim in utils_indicadores.DIMENSOES_FATO]
+    t_novo = time.perf_counter() - t
+    gravado = pd.read_sql("SELECT * FROM fato_status_diario", conn)
+    gravado['dia'] = pd.to_datetime(gravado['dia']).dt.date
+    gravado = gravado.set_index(['dia'] + CHAVES)['qtd']
+
+    esperado_passado = esperado[esperado.index.get_level_values('dia') < hoje]
+    assert gravado.sort_index().equals(esperado_passado.sort_index().astype(gravado.dtype)), "Dias gravados divergentes"
+    for dim, df in zip(utils_indicadores.DIMENSOES_FATO, partes):
+        coluna = utils_indicadores.DIMENSOES_FATO[dim]
+        ref = esperado.groupby(['dia', coluna]).sum()
+        novo = df.assign(dia=df['dia'].dt.date).set_index(['dia', dim])['qtd']
+        assert novo.sort_index().tolist() == ref.sort_index().tolist(), f"Tendência divergente ({dim})"
+
+    print(f"{int(esperado.sum() / len(dias))} chamados/dia em média, {args.dias} dias + hoje: {int(tabela['linhas'])} linhas no fato, conferem")
+    print(f"Job ({args.dias} dias): {t_job:.2f}s | tendência: replay do log {t_antigo:.2f}s | fato (5 dimensões) {t_novo * 1000:.0f}ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,99 @@
+"""
+Benchmark do cache de figuras da página Indicadores, com PostgreSQL local.
+
+Roda a página de verdade (streamlit.testing AppTest) e mede reruns que não
+mudam o período nem os dados (como a atualização automática da TV), alternando
+a dimensão da tendência: com o cache de utils_indicadores.figura e com o cache limpo a cada rerun
+(o comportamento antigo, todas as figuras refeitas). Confere que os specs
+enviados ao navegador são idênticos nos dois casos.
+
+ATENÇÃO: as tabelas do banco informado são APAGADAS. Use um banco só para isso.
+
+Uso (na raiz do projeto):
+    python benchmarks/bench_figuras_indicadores.py --dsn postgresql://localhost/agenda_bench --linhas 20000
+"""
+import argparse
+import logging
+import os
+import random
+import sys
+import time
+from datetime import date, timedelta
+
+from streamlit.testing.v1 import AppTest
+
+sys.path.insert(0, os.path.dirname(__file__))
+import bench_pipeline_importacao as pipeline  # noqa: E402
+import gerador_dados  # noqa: E402
+import utils_indicadores  # noqa: E402
+
+PAGINA = os.path.join(pipeline.RAIZ, "pages", "3_📊_Indicadores.py")
+STATUS = ['Não Iniciado', 'Em Andamento', 'Pendência de Infra', 'Concluído', 'Finalizado', 'Cancelado']
+
+
+def _datas_sinteticas(conn, seed=42):
+    """Abertura, agendamento e fechamento em torno de hoje, para todos os gráficos terem dados."""
+    rnd = random.Random(seed)
+    hoje = date.today()
+    with conn.cursor() as cur:
+        cur.execute("SELECT id FROM chamados ORDER BY id")
+        for (i,) in cur.fetchall():
+            agend = hoje + timedelta(days=rnd.randint(-40, 40))
+            status = rnd.choice(STATUS)
+            fech = agend + timedelta(days=rnd.randint(-1, 5)) if status in ('Concluído', 'Finalizado') else None
+            cur.execute("UPDATE chamados SET data_abertura = %s, data_agendamento = %s, data_fechamento = %s, status_chamado = %s WHERE id = %s",
+                        (agend - timedelta(days=rnd.randint(0, 90)), agend, fech, status, i))
+    conn.commit()
+
+
+def _specs(at):
+    return [el.proto.spec for el in at.get("plotly_chart")]
+
+def _rerun(at, n):
+    """Alterna a dimensão da tendência e roda a página."""
+    at.selectbox(key="dim_tendencia").set_value(list(utils_indicadores.DIMENSOES_FATO)[n % 2])
+    inicio = time.perf_counter()
+    at.run()
+    assert not at.exception, at.exception
+    return time.perf_counter() - inicio
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--dsn", required=True, help="PostgreSQL local (as tabelas são apagadas!)")
+    parser.add_argument("--linhas", type=int, default=20_000, help="linhas da carteira sintética")
+    parser.add_argument("--reruns", type=int, default=5)
+    args = parser.parse_args()
+
+    logging.getLogger("streamlit").setLevel(logging.ERROR)
+    conn, _ = pipeline.conectar(args.dsn)
+    pipeline.limpar_banco()
+    pipeline.medir_chamados(gerador_dados.para_xlsx(gerador_dados.gerar_carteira(args.linhas), "carteira.xlsx"))
+    _datas_sinteticas(conn)
+
+    at = AppTest.from_file(PAGINA, default_timeout=300)
+    at.session_state["logado"] = True
+    at.run()
+    assert not at.exception, at.exception
+    tempos = at.session_state["tempos_figuras"]
+    assert len(tempos) == 7 and all(t["Origem"] == "montado" for t in tempos.values()), tempos
+    montagem = sum(t["Montagem (ms)"] for t in tempos.values())
+
+    _rerun(at, 1) # Monta a tendência da outra dimensão
+    t_cache = min(_rerun(at, n) for n in range(args.reruns))
+    assert all(t["Origem"] == "cache" for t in at.session_state["tempos_figuras"].values()), "Figura refeita sem mudar o período"
+    specs_cache = _specs(at)
+
+    t_antigo = []
+    for n in range(args.reruns):
+        utils_indicadores._spec_figura.clear()
+        t_antigo.append(_rerun(at, n))
+    assert _specs(at) == specs_cache, "Figura do cache diferente da montada na hora"
+
+    detalhe = ", ".join(f"{nome} {t['Montagem (ms)']:.0f}" for nome, t in tempos.items())
+    print(f"{len(tempos)} figuras montadas em {montagem:.0f}ms ({detalhe})")
+    print(f"Rerun sem mudar o período: figuras refeitas {min(t_antigo) * 1000:.0f}ms | cache {t_cache * 1000:.0f}ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,195 @@
+"""
+Benchmark dos importadores de books e liberação (página Financeiro), com
+PostgreSQL local.
+
+Compara o caminho antigo (iterrows + executemany de upsert por linha e a
+sincronia da página com atualizar_chamado_db por chamado) com os
+importadores atuais (parse vetorizado -> COPY para staging -> merge e um
+UPDATE com join em chamados) e confere que books_faturamento,
+faturamento_liberado e os campos sincronizados dos chamados ficam iguais.
+
+A referência lê as datas com dayfirst=True (dd/mm/aaaa, como a versão nova);
+o código antigo lia '05/03/2025' como 3 de maio. Textos vazios, que antes
+iam para o banco como 'nan', são comparados como NULL.
+
+Os books passam por .xlsx e ler_excel(dtype=str), como na página: as células
+de data de verdade chegam como '2025-03-05 00:00:00', que o dayfirst da
+referência troca (5 de março vira 3 de maio). Por isso as datas não entram
+na comparação com a referência; as gravadas pela versão nova são conferidas
+com as datas geradas.
+
+ATENÇÃO: as tabelas do banco informado são APAGADAS. Use um banco só para isso.
+
+Uso (na raiz do projeto):
+    python benchmarks/bench_importacao_financeiro.py --dsn postgresql://localhost/agenda_bench --linhas 20000
+"""
+import argparse
+import logging
+import os
+import sys
+import time
+from datetime import date, datetime
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(__file__))
+import bench_pipeline_importacao as pipeline  # noqa: E402
+import gerador_dados  # noqa: E402
+utils_chamados = pipeline.utils_chamados
+utils_financeiro = pipeline.utils_financeiro
+utils_importacao = pipeline.utils_importacao
+
+CAMPOS_CHAMADO = "chamado_id, protocolo, data_fechamento, chk_financeiro_banco"
+
+
+# --- IMPLEMENTAÇÃO ANTERIOR (REFERÊNCIA) ---
+
+def _legado_books(df_books):
+    conn = utils_financeiro.get_valid_conn_fin()
+    vals_books = []
+    for _, row in df_books.iterrows():
+        data_conc = pd.to_datetime(row.get('DATA CONCLUSAO'), errors='coerce', dayfirst=True)
+        data_env = pd.to_datetime(row.get('DATA ENVIO'), errors='coerce', dayfirst=True)
+        vals_books.append((
+            str(row['CHAMADO']), str(row.get('SERVIÇO', '')), str(row.get('SISTEMA', '')),
+            str(row.get('PROTOCOLO', '')), data_conc.date() if pd.notna(data_conc) else None,
+            str(row.get('BOOK PRONTO?', '')), data_env.date() if pd.notna(data_env) else None,
+        ))
+    with conn.cursor() as cur:
+        cur.executemany("""
+            INSERT INTO books_faturamento (chamado, servico, sistema, protocolo, data_conclusao, book_pronto, data_envio)
+            VALUES (%s, %s, %s, %s, %s, %s, %s)
+            ON CONFLICT (chamado) DO UPDATE SET
+                servico = EXCLUDED.servico, sistema = EXCLUDED.sistema, protocolo = EXCLUDED.protocolo,
+                data_conclusao = EXCLUDED.data_conclusao, book_pronto = EXCLUDED.book_pronto, data_envio = EXCLUDED.data_envio
+        """, vals_books)
+    conn.commit()
+
+    # Sincronia Rápida da página
+    df_bd = utils_chamados.carregar_chamados_db()
+    id_map = df_bd.set_index('Nº Chamado')['ID'].to_dict()
+    for _, r in df_books.iterrows():
+        i_d = id_map.get(r.get('CHAMADO'))
+        if i_d:
+            current_row = df_bd[df_bd['ID'] == i_d].iloc[0]
+            updates = {'Nº Protocolo': r.get('PROTOCOLO')}
+            if str(r.get('BOOK PRONTO?', r.get('BOOK PRONTO', ''))).upper() == 'SIM':
+                updates['chk_financeiro_book'] = 'TRUE'
+                if pd.isna(current_row.get('Data Book Enviado')): updates['Data Book Enviado'] = date.today()
+            dt_conc = pd.to_datetime(r.get('DATA CONCLUSAO'), errors='coerce', dayfirst=True)
+            if not pd.isna(dt_conc): updates['Data Finalização'] = dt_conc
+            utils_chamados.atualizar_chamado_db(i_d, updates)
+
+def _legado_liberacao(df):
+    conn = utils_financeiro.get_valid_conn_fin()
+    vals = []
+    for _, row in df.iterrows():
+        def safe_num(col_name):
+            try:
+                v_float = float(pd.to_numeric(row.get(col_name), errors='coerce'))
+                return v_float if not np.isnan(v_float) else 0.0
+            except Exception:
+                return 0.0
+        vals.append(tuple(str(row.get(c, '')) for c in [
+            'CHAMADO', 'CODIGO_DO_PONTO', 'NOME_PONTO', 'UFAGENCIA', 'CIDADEAGENCIA', 'NOME_SISTEMA',
+            'SERVICO', 'TIPO_SERVICO', 'CODIGO_DO_EQUIPAMENTO', 'NOME_EQUIPAMENTO'])
+            + (safe_num('QUANTIDADE_LIBERADA'), safe_num('VALORUNITARIO'), safe_num('TOTAL'))
+            + tuple(str(row.get(c, '')) for c in ['PROTOCOLOATENDIMENTO', 'NOME_PROJETO', 'NOMEUSUARIO']))
+    with conn.cursor() as cur:
+        cur.executemany("""
+            INSERT INTO faturamento_liberado
+            (chamado, codigo_ponto, nome_ponto, uf_agencia, cidade_agencia, nome_sistema, servico, tipo_servico, cod_equipamento, nome_equipamento, qtd_liberada, valor_unitario, total, protocolo_atendimento, nome_projeto, nome_usuario)
+            VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
+            ON CONFLICT (chamado) DO UPDATE SET
+                qtd_liberada = EXCLUDED.qtd_liberada, valor_unitario = EXCLUDED.valor_unitario, total = EXCLUDED.total,
+                protocolo_atendimento = EXCLUDED.protocolo_atendimento, servico = EXCLUDED.servico
+        """, vals)
+    conn.commit()
+
+    # Sincronia Imediata da página
+    df_bd = utils_chamados.carregar_chamados_db()
+    id_map = df_bd.set_index('Nº Chamado')['ID'].to_dict()
+    for _, row in df.iterrows():
+        ch = str(row.get('CHAMADO', '')).strip()
+        if ch in id_map:
+            i_d = id_map[ch]
+            curr = df_bd[df_bd['ID'] == i_d].iloc[0]
+            upd = {'Status Financeiro': 'FATURADO', 'chk_financeiro_banco': 'TRUE'}
+            if pd.isna(curr.get('Data Faturamento')): upd['Data Faturamento'] = date.today()
+            utils_chamados.atualizar_chamado_db(i_d, upd)
+
+
+# --- ESTADO DO BANCO ---
+
+def _resetar(conn):
+    with conn.cursor() as cur:
+        cur.execute("TRUNCATE books_faturamento, faturamento_liberado RESTART IDENTITY;")
+        cur.execute("UPDATE chamados SET protocolo = NULL, data_fechamento = NULL, chk_financeiro_banco = 'FALSE';")
+    conn.commit()
+    utils_financeiro.st.cache_data.clear()
+
+def _estado(conn):
+    def normaliza(df):
+        return df.replace({'nan': None, 'None': None, '': None}).astype(object).where(lambda d: d.notna(), None)
+    tabelas = {
+        "books_faturamento": "SELECT chamado, servico, sistema, protocolo, data_conclusao, book_pronto, data_envio FROM books_faturamento ORDER BY chamado",
+        "faturamento_liberado": "SELECT * FROM faturamento_liberado ORDER BY chamado",
+        "chamados": f"SELECT {CAMPOS_CHAMADO} FROM chamados ORDER BY chamado_id",
+    }
+    estado = {nome: normaliza(pd.read_sql(q, conn)) for nome, q in tabelas.items()}
+    estado["faturamento_liberado"] = estado["faturamento_liberado"].drop(columns=['id'])
+    return estado
+
+def _rodar(conn, func_books, func_lib, df_books, df_lib):
+    _resetar(conn)
+    tempos = {}
+    inicio = time.perf_counter(); func_books(df_books.copy()); tempos["books"] = time.perf_counter() - inicio
+    inicio = time.perf_counter(); func_lib(df_lib.copy()); tempos["liberacao"] = time.perf_counter() - inicio
+    return tempos, _estado(conn)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--dsn", required=True, help="PostgreSQL local (as tabelas são apagadas!)")
+    parser.add_argument("--linhas", type=int, default=20_000, help="linhas da carteira sintética")
+    args = parser.parse_args()
+
+    logging.getLogger("streamlit").setLevel(logging.ERROR)
+    _, conn = pipeline.conectar(args.dsn)
+    pipeline.limpar_banco()
+
+    carteira = gerador_dados.gerar_carteira(args.linhas)
+    pipeline.medir_chamados(gerador_dados.para_xlsx(carteira, "carteira.xlsx"))
+    chamados = gerador_dados.chamados_da_carteira(carteira)
+    books = gerador_dados.gerar_books(chamados)
+    df_books = utils_importacao.ler_excel(gerador_dados.para_xlsx(books, "books.xlsx"), dtype=str)
+    df_lib = gerador_dados.gerar_liberacao(carteira).astype(str)
+
+    t_antigo, e_antigo = _rodar(conn, _legado_books, _legado_liberacao, df_books, df_lib)
+    t_novo, e_novo = _rodar(conn, utils_financeiro.importar_planilha_books, utils_financeiro.importar_planilha_liberacao, df_books, df_lib)
+
+    datas = {"books_faturamento": ["data_conclusao", "data_envio"], "chamados": ["data_fechamento"]}
+    for nome in e_antigo:
+        pd.testing.assert_frame_equal(e_antigo[nome].drop(columns=datas.get(nome, [])),
+                                      e_novo[nome].drop(columns=datas.get(nome, [])), check_dtype=False, obj=nome)
+
+    # Datas: texto dd/mm/aaaa e células de data do Excel, conferidas com o que foi gerado
+    erros_antigo = 0
+    for coluna, origem in [("data_conclusao", "DATA CONCLUSAO"), ("data_envio", "DATA ENVIO")]:
+        esperado = books.set_index("CHAMADO")[origem].map(
+            lambda v: v.date() if isinstance(v, pd.Timestamp) else (datetime.strptime(v, "%d/%m/%Y").date() if v else None))
+        for estado, novo in [(e_novo, True), (e_antigo, False)]:
+            gravado = estado["books_faturamento"].set_index("chamado")[coluna]
+            erradas = (gravado.reindex(esperado.index).astype(object) != esperado.astype(object)) & esperado.notna()
+            if novo: assert not erradas.any(), f"{coluna}: {erradas.sum()} datas trocadas, ex. {erradas[erradas].index[:3].tolist()}"
+            else: erros_antigo += int(erradas.sum())
+    print(f"Datas dos books conferidas (referência antiga trocou dia/mês em {erros_antigo} células de data do Excel)")
+
+    for etapa in t_antigo:
+        print(f"{etapa:<10} ({len(df_books) if etapa == 'books' else len(df_lib)} linhas): "
+              f"antigo {t_antigo[etapa]:.2f}s | staging+COPY {t_novo[etapa] * 1000:.0f}ms | {t_antigo[etapa] / t_novo[etapa]:.0f}x")
+
+
+if __name__ == "__main__":
+    main()
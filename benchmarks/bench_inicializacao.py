@@ -0,0 +1,79 @@
+"""
+Benchmark do cold start das páginas, com PostgreSQL local.
+
+Roda cada página (usuário logado) num processo Python novo pelo AppTest do
+Streamlit e imprime o que utils_perfil mediu na primeira execução: tempo dos
+imports, tempo até a página ficar pronta e os pacotes que ela carregou. Só o
+streamlit já está importado, como no servidor antes da primeira visita.
+
+As páginas leem e criam tabelas no banco informado (nada é apagado), mas é
+melhor apontar para o banco dos outros benchmarks.
+
+Uso (na raiz do projeto):
+    python benchmarks/bench_inicializacao.py --dsn postgresql://localhost/agenda_bench
+"""
+import argparse
+import glob
+import json
+import os
+import subprocess
+import sys
+
+RAIZ = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+
+
+def _rodar_pagina(arquivo, secrets):
+    """Executado no processo filho: uma página, uma execução, relatório em JSON na última linha."""
+    import logging
+    logging.getLogger("streamlit").setLevel(logging.ERROR)
+    sys.path.insert(0, RAIZ)
+    from streamlit.testing.v1 import AppTest
+    import utils_perfil
+
+    at = AppTest.from_file(arquivo, default_timeout=300)
+    for chave, valor in secrets.items(): at.secrets[chave] = valor
+    at.session_state['logado'] = True
+    at.session_state['usuario'] = 'Benchmark'
+    at.run()
+    erros = [str(e.value) for e in at.exception]
+    print(json.dumps({'perfis': utils_perfil.relatorio(), 'erros': erros}, ensure_ascii=False))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--dsn", required=True, help="PostgreSQL local")
+    parser.add_argument("--pagina", help=argparse.SUPPRESS) # uso interno (processo filho)
+    parser.add_argument("--secrets", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.pagina:
+        _rodar_pagina(args.pagina, json.loads(args.secrets))
+        return
+
+    from psycopg2.extensions import parse_dsn
+    dsn = parse_dsn(args.dsn)
+    secrets = {
+        'postgres': {'PGHOST': dsn.get('host', 'localhost'), 'PGPORT': dsn.get('port', '5432'),
+                     'PGUSER': dsn.get('user', ''), 'PGPASSWORD': dsn.get('password', ''),
+                     'PGDATABASE': dsn.get('dbname', '')},
+        'GOOGLE_API_KEY': 'benchmark', # a página do assistente só importa o modelo na primeira pergunta
+    }
+
+    paginas = [os.path.join(RAIZ, "app.py")] + sorted(glob.glob(os.path.join(RAIZ, "pages", "*.py")))
+    print(f"{'Página':<20} {'imports':>9} {'pronta':>9} {'módulos':>8}  pacotes")
+    for arquivo in paginas:
+        saida = subprocess.run([sys.executable, "-W", "ignore", __file__, "--dsn", args.dsn, "--pagina", arquivo,
+                                "--secrets", json.dumps(secrets)], cwd=RAIZ, capture_output=True, text=True)
+        linhas = [l for l in saida.stdout.splitlines() if l.startswith('{')]
+        if saida.returncode or not linhas:
+            print(f"{os.path.basename(arquivo)}: falhou\n{saida.stderr[-2000:]}")
+            continue
+        resultado = json.loads(linhas[-1])
+        for erro in resultado['erros']: print(f"  ! {os.path.basename(arquivo)}: {erro}")
+        for pagina, p in resultado['perfis'].items():
+            print(f"{pagina:<20} {p['Imports (ms)']:>7.0f}ms {p['Primeira renderização (ms)']:>7.0f}ms "
+                  f"{p['Módulos carregados']:>8}  {p['Pacotes carregados'][:80]}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,129 @@
+"""
+Benchmark da leitura de planilhas dos importadores (openpyxl x calamine).
+
+Gera planilhas no formato das que recebemos (carteira de chamados, LPU com
+três abas, books e liberação), inclui as planilhas reais da raiz do projeto
+(projetos, config, usuarios) e mede o tempo de leitura de cada motor
+instalado. Quando há mais de um motor, confere que os DataFrames são iguais.
+
+Uso (na raiz do projeto):
+    python benchmarks/bench_leitura_planilhas.py --linhas 20000
+    python benchmarks/bench_leitura_planilhas.py --arquivo minha_lpu.xlsx
+"""
+import argparse
+import io
+import os
+import random
+import sys
+import time
+
+import pandas as pd
+
+RAIZ = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+sys.path.insert(0, RAIZ)
+import utils_importacao  # noqa: E402
+
+MOTORES = ["openpyxl"] + (["calamine"] if utils_importacao._calamine_disponivel() else [])
+
+
+# --- GERAÇÃO DAS PLANILHAS SINTÉTICAS ---
+
+def _carteira(n, rnd):
+    cols = {f"COL_{i:02d}": [f"v{rnd.randint(0, 999)}" for _ in range(n)] for i in range(23)}
+    cols["COL_00"] = [f"GTS-{rnd.randint(1, n // 4 + 1):06d}" for _ in range(n)]
+    cols["COL_06"] = [f"{rnd.randint(1, 28):02d}/{rnd.randint(1, 12):02d}/2025" for _ in range(n)]
+    cols["COL_11"] = [rnd.randint(0, 10) for _ in range(n)]
+    return {"Carteira": pd.DataFrame(cols)}
+
+def _lpu(n, rnd):
+    equip = [f"EQUIPAMENTO {i}" for i in range(n)]
+    return {
+        "Valores fixo": pd.DataFrame({"TIPO DO SERVIÇO": [f"SERVICO {i}" for i in range(200)],
+                                      "VALOR": [round(rnd.uniform(50, 900), 2) for _ in range(200)]}),
+        "Serviço": pd.DataFrame({"EQUIPAMENTO": equip, "CODIGOEQUIPAMENTO": [str(1000 + i) for i in range(n)],
+                                 "SISTEMA": [rnd.choice(["CFTV", "ALARME", "INCENDIO"]) for _ in range(n)],
+                                 "DESATIVAÇÃO": [round(rnd.uniform(10, 300), 2) for _ in range(n)],
+                                 "REINSTALAÇÂO": [round(rnd.uniform(10, 300), 2) for _ in range(n)]}),
+        "Equipamento": pd.DataFrame({"EQUIPAMENTO": equip, "CODIGOEQUIPAMENTO": [str(1000 + i) for i in range(n)],
+                                     "SISTEMA": [rnd.choice(["CFTV", "ALARME", "INCENDIO"]) for _ in range(n)],
+                                     "PRECO": [round(rnd.uniform(100, 5000), 2) for _ in range(n)]}),
+    }
+
+def _books(n, rnd):
+    return {"Books": pd.DataFrame({
+        "CHAMADO": [f"GTS-{i:06d}" for i in range(n)],
+        "BOOK PRONTO?": [rnd.choice(["SIM", "NÃO", ""]) for _ in range(n)],
+        "DATA ENVIO": [pd.Timestamp("2025-01-01") + pd.Timedelta(days=rnd.randint(0, 300)) for _ in range(n)],
+        "DATA CONCLUSAO": [pd.Timestamp("2025-01-01") + pd.Timedelta(days=rnd.randint(0, 300)) for _ in range(n)],
+        "PROTOCOLO": [str(rnd.randint(10**8, 10**9)) for _ in range(n)],
+    })}
+
+def _liberacao(n, rnd):
+    colunas = ["CHAMADO", "CODIGO_DO_PONTO", "NOME_PONTO", "UFAGENCIA", "CIDADEAGENCIA", "NOME_SISTEMA",
+               "SERVICO", "TIPO_SERVICO", "CODIGO_DO_EQUIPAMENTO", "NOME_EQUIPAMENTO", "PROTOCOLOATENDIMENTO",
+               "NOME_PROJETO", "NOMEUSUARIO"]
+    df = pd.DataFrame({c: [f"{c[:4]}{rnd.randint(0, 9999)}" for _ in range(n)] for c in colunas})
+    df["QUANTIDADE_LIBERADA"] = [rnd.randint(1, 5) for _ in range(n)]
+    df["VALORUNITARIO"] = [round(rnd.uniform(10, 900), 2) for _ in range(n)]
+    df["TOTAL"] = df["QUANTIDADE_LIBERADA"] * df["VALORUNITARIO"]
+    return {"Liberação": df}
+
+def _para_xlsx(abas):
+    buffer = io.BytesIO()
+    with pd.ExcelWriter(buffer, engine="openpyxl") as writer:
+        for nome, df in abas.items():
+            df.to_excel(writer, sheet_name=nome, index=False)
+    return buffer.getvalue()
+
+
+# --- MEDIÇÃO ---
+
+def _ler(dados, motor):
+    return pd.read_excel(io.BytesIO(dados), sheet_name=None, dtype=str, engine=motor)
+
+def _cronometrar(dados, motor, repeticoes):
+    tempos = []
+    for _ in range(repeticoes):
+        inicio = time.perf_counter()
+        resultado = _ler(dados, motor)
+        tempos.append(time.perf_counter() - inicio)
+    return min(tempos), resultado
+
+def _iguais(a, b):
+    return a.keys() == b.keys() and all(a[k].fillna("").equals(b[k].fillna("")) for k in a)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--linhas", type=int, default=20_000, help="linhas da carteira/liberação sintéticas")
+    parser.add_argument("--repeticoes", type=int, default=3)
+    parser.add_argument("--arquivo", action="append", default=[], help="planilha extra a medir (pode repetir)")
+    args = parser.parse_args()
+
+    rnd = random.Random(42)
+    planilhas = {
+        f"carteira ({args.linhas} linhas)": _para_xlsx(_carteira(args.linhas, rnd)),
+        "lpu (3 abas)": _para_xlsx(_lpu(max(1, args.linhas // 10), rnd)),
+        f"books ({args.linhas // 2} linhas)": _para_xlsx(_books(max(1, args.linhas // 2), rnd)),
+        f"liberação ({args.linhas} linhas)": _para_xlsx(_liberacao(args.linhas, rnd)),
+    }
+    for caminho in ["projetos.xlsx", "config.xlsx", "usuarios.xlsx"] + args.arquivo:
+        caminho_abs = caminho if os.path.isabs(caminho) else os.path.join(RAIZ, caminho)
+        if os.path.exists(caminho_abs):
+            with open(caminho_abs, "rb") as f: planilhas[os.path.basename(caminho)] = f.read()
+
+    print(f"Motor padrão do app: {utils_importacao.MOTOR_EXCEL} | motores medidos: {', '.join(MOTORES)}")
+    for nome, dados in planilhas.items():
+        tempos = {}; resultados = {}
+        for motor in MOTORES:
+            tempos[motor], resultados[motor] = _cronometrar(dados, motor, args.repeticoes)
+        linha = f"{nome:<28} " + " | ".join(f"{m} {t:.3f}s" for m, t in tempos.items())
+        if len(MOTORES) > 1:
+            linha += f" | {tempos['openpyxl'] / tempos['calamine']:.1f}x"
+            if not _iguais(resultados["openpyxl"], resultados["calamine"]):
+                linha += " | ATENÇÃO: conteúdo divergente"
+        print(linha)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,153 @@
+"""
+Benchmark do painel da página Indicadores, com PostgreSQL local.
+
+Compara o caminho antigo (carregar_chamados_db + groupby dos "projetos" em
+pandas + filtros e contagens) com utils_indicadores.carregar_painel (GROUPING
+SETS no banco, só o período) e confere KPIs, SLA, SLA por analista, aging,
+status e entregas em vários períodos.
+
+ATENÇÃO: as tabelas do banco informado são APAGADAS. Use um banco só para isso.
+
+Uso (na raiz do projeto):
+    python benchmarks/bench_painel_indicadores.py --dsn postgresql://localhost/agenda_bench --linhas 20000
+"""
+import argparse
+import logging
+import os
+import random
+import sys
+import time
+from datetime import date, timedelta
+
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(__file__))
+import bench_pipeline_importacao as pipeline  # noqa: E402
+import gerador_dados  # noqa: E402
+import utils_indicadores  # noqa: E402
+utils_chamados = pipeline.utils_chamados
+
+STATUS = ['Não Iniciado', 'Em Andamento', 'Pendência de Infra', 'PENDÊNCIA EQUIPAMENTO', 'pendencia cliente',
+          'Concluído', 'Finalizado', 'FATURADO', 'Cancelado', 'Equipamento Entregue', None]
+
+
+# --- IMPLEMENTAÇÃO ANTERIOR (REFERÊNCIA) ---
+
+def _legado_situacao(row, hoje):
+    """calcular_situacao da página, linha a linha (a mesma regra do _SQL_SITUACAO_SLA)."""
+    status_fim = ['concluído', 'finalizado', 'faturado', 'fechado', 'equipamento entregue']
+    status = str(row['Status']).lower()
+    agendamento, fechamento = row['Agendamento'], row['Fechamento']
+    if status in status_fim:
+        if pd.notna(fechamento) and pd.notna(agendamento):
+            if fechamento > agendamento + timedelta(days=1): return "Finalizado com Atraso"
+        return "Finalizado no Prazo"
+    if "cancelado" in status: return "Cancelado"
+    if pd.notna(agendamento):
+        if agendamento < hoje: return "Em Aberto (Atrasado)"
+        return "Em Aberto (No Prazo)"
+    return "Sem Data"
+
+def _legado(inicio, fim):
+    df_raw = utils_chamados.carregar_chamados_db()
+    hoje = pd.Timestamp.today().normalize()
+    for col in ['Agendamento', 'Fechamento', 'Abertura']:
+        df_raw[col] = pd.to_datetime(df_raw[col], errors='coerce')
+    df_raw['Nome Agência'] = df_raw['Nome Agência'].fillna('N/A')
+    df_raw['Projeto'] = df_raw['Projeto'].fillna('Geral')
+    agg_rules = {'Status': 'first', 'Sub-Status': 'first', 'Analista': 'first', 'Fechamento': 'first',
+                 'Abertura': 'first', 'Nº Chamado': 'first', 'ID': 'first'}
+    df_proj = df_raw.groupby(['Agendamento', 'Nome Agência', 'Projeto'], dropna=False).agg(agg_rules).reset_index()
+    ts_inicio = pd.to_datetime(inicio)
+    ts_fim = pd.to_datetime(fim) + timedelta(hours=23, minutes=59, seconds=59)
+    df_filtrado = df_proj[(df_proj['Agendamento'] >= ts_inicio) & (df_proj['Agendamento'] <= ts_fim)].copy()
+    status_fim = list(utils_chamados.STATUS_FIM)
+    df_filtrado['Situacao_SLA'] = [_legado_situacao(r, hoje) for r in df_filtrado.to_dict('records')]
+    df_abertos = df_filtrado[(~df_filtrado['Status'].str.lower().isin(status_fim)) &
+                             (~df_filtrado['Status'].str.contains('cancelado', case=False, na=False))]
+    df_finalizados = df_filtrado[df_filtrado['Status'].str.lower().isin(status_fim)]
+    df_aging = df_abertos.dropna(subset=['Abertura']).copy()
+
+    sla = df_filtrado['Situacao_SLA'].value_counts()
+    analistas = df_filtrado['Analista'].fillna("Não Definido")
+    sla_analista = df_filtrado.groupby([analistas, 'Situacao_SLA']).size().reset_index(name='Qtd')
+    faixas = pd.cut((hoje - df_aging['Abertura']).dt.days, bins=[-999, 15, 30, 60, 9999], labels=utils_indicadores.FAIXAS_AGING)
+    df_entregas = df_proj[df_proj['Status'].str.lower().isin(status_fim) & pd.notna(df_proj['Fechamento'])]
+    df_entregas = df_entregas[(df_entregas['Fechamento'] >= ts_inicio) & (df_entregas['Fechamento'] <= ts_fim)]
+    return {
+        'kpis': {'total': len(df_filtrado), 'abertos': len(df_abertos),
+                 'pendencia': int(df_filtrado['Status'].str.contains("Pendencia|Pendência", na=False, case=False).sum()),
+                 'fin_prazo': int((df_finalizados['Situacao_SLA'] == "Finalizado no Prazo").sum()),
+                 'fin_atraso': int((df_finalizados['Situacao_SLA'] == "Finalizado com Atraso").sum()),
+                 'abertos_com_abertura': len(df_aging)},
+        'sla': dict(sla),
+        'sla_analista': sla_analista.sort_values(['Analista', 'Situacao_SLA']).values.tolist(),
+        'aging': faixas.value_counts().sort_index().tolist(),
+        'status': dict(df_filtrado['Status'].value_counts()),
+        'entregas': df_entregas['Fechamento'].dt.strftime('%d/%m').value_counts().sort_index().reset_index().values.tolist(),
+    }
+
+def _comparavel(painel):
+    return {
+        'kpis': painel['kpis'],
+        'sla': dict(zip(painel['sla']['Situação'], painel['sla']['Qtd'])),
+        'sla_analista': painel['sla_analista'].values.tolist(),
+        'aging': painel['aging']['Qtd'].tolist(),
+        'status': dict(zip(painel['status']['Status'], painel['status']['Qtd'])),
+        'entregas': painel['entregas'].values.tolist(),
+    }
+
+
+def _dados_sinteticos(conn, seed=42):
+    """Datas em torno de hoje e vários chamados por (agendamento, agência, projeto), com nulos."""
+    rnd = random.Random(seed)
+    hoje = date.today()
+    with conn.cursor() as cur:
+        cur.execute("SELECT id FROM chamados ORDER BY id")
+        anterior = None
+        for (i,) in cur.fetchall():
+            if anterior and rnd.random() < 0.4:
+                agend, agencia, projeto = anterior # mesmo projeto do chamado anterior
+            else:
+                agend = hoje + timedelta(days=rnd.randint(-120, 60)) if rnd.random() < 0.95 else None
+                agencia = rnd.choice(['AG 0001 CENTRO', 'AG 0002 NORTE', 'AG 0003 SUL', None])
+                projeto = rnd.choice(gerador_dados.PROJETOS + [None])
+            anterior = (agend, agencia, projeto)
+            status = rnd.choice(STATUS)
+            base = agend or hoje
+            fech = base + timedelta(days=rnd.randint(-2, 6)) if rnd.random() < 0.5 else None
+            abertura = base - timedelta(days=rnd.randint(0, 120)) if rnd.random() < 0.9 else None
+            cur.execute("""UPDATE chamados SET data_agendamento = %s, agencia_nome = %s, projeto_nome = %s, status_chamado = %s,
+                           data_fechamento = %s, data_abertura = %s, analista = %s WHERE id = %s""",
+                        (agend, agencia, projeto, status, fech, abertura, rnd.choice(gerador_dados.PESSOAS + [None]), i))
+    conn.commit()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--dsn", required=True, help="PostgreSQL local (as tabelas são apagadas!)")
+    parser.add_argument("--linhas", type=int, default=20_000, help="linhas da carteira sintética")
+    args = parser.parse_args()
+
+    logging.getLogger("streamlit").setLevel(logging.ERROR)
+    conn, _ = pipeline.conectar(args.dsn)
+    pipeline.limpar_banco()
+    pipeline.medir_chamados(gerador_dados.para_xlsx(gerador_dados.gerar_carteira(args.linhas), "carteira.xlsx"))
+    _dados_sinteticos(conn)
+
+    hoje = date.today()
+    periodos = [(hoje - timedelta(days=30), hoje + timedelta(days=30)), (hoje - timedelta(days=200), hoje + timedelta(days=200)),
+                (hoje, hoje), (hoje + timedelta(days=300), hoje + timedelta(days=400))]
+    for inicio, fim in periodos:
+        utils_chamados.st.cache_data.clear()
+        t = time.perf_counter(); esperado = _legado(inicio, fim); t_antigo = time.perf_counter() - t
+        utils_chamados.st.cache_data.clear()
+        t = time.perf_counter(); painel = utils_indicadores.carregar_painel(inicio, fim); t_novo = time.perf_counter() - t
+        novo = _comparavel(painel)
+        for chave in esperado:
+            assert novo[chave] == esperado[chave], f"{chave} divergente em {inicio}..{fim}: {novo[chave]} != {esperado[chave]}"
+        print(f"{inicio:%d/%m/%Y}..{fim:%d/%m/%Y}: {painel['kpis']['total']} projetos | antigo {t_antigo * 1000:.0f}ms | SQL {t_novo * 1000:.0f}ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,178 @@
+"""
+Benchmark por etapa dos importadores, com dados sintéticos e PostgreSQL local.
+
+Para cada tamanho (linhas da carteira) mede separadamente:
+- chamados (carga inicial e reimportação): ler, mapear, agrupar, separar
+  novos/existentes, gravar (bulk_insert_chamados_db + updates) e status;
+- pedidos, books e liberação: ler, normalizar cabeçalhos e gravar.
+
+O resultado sai em JSON para comparar versões (guarde um arquivo por release).
+ATENÇÃO: as tabelas chamados, books_faturamento e faturamento_liberado do
+banco informado são APAGADAS. Use um banco só para isso.
+
+Uso (na raiz do projeto):
+    createdb agenda_bench
+    python benchmarks/bench_pipeline_importacao.py --dsn postgresql://localhost/agenda_bench \\
+        --tamanhos 1000,10000 --saida bench_importacao.json
+"""
+import argparse
+import json
+import logging
+import os
+import platform
+import subprocess
+import sys
+import time
+from contextlib import contextmanager
+from datetime import datetime
+
+import pandas as pd
+import psycopg2
+
+RAIZ = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+sys.path.insert(0, RAIZ)
+sys.path.insert(0, os.path.dirname(__file__))
+import utils_chamados  # noqa: E402
+import utils_financeiro  # noqa: E402
+import utils_importacao  # noqa: E402
+import gerador_dados  # noqa: E402
+
+
+class Cronometro:
+    """Acumula o tempo (s) de cada etapa nomeada."""
+    def __init__(self):
+        self.etapas = {}
+
+    @contextmanager
+    def etapa(self, nome):
+        inicio = time.perf_counter()
+        yield
+        self.etapas[nome] = round(self.etapas.get(nome, 0) + time.perf_counter() - inicio, 4)
+
+
+# --- BANCO ---
+
+def conectar(dsn):
+    """Aponta as conexões em cache dos módulos para o banco do benchmark."""
+    conn_ch = psycopg2.connect(dsn); conn_ch.autocommit = False
+    conn_fin = psycopg2.connect(dsn); conn_fin.autocommit = False
+    utils_chamados._get_cached_connection = lambda: conn_ch
+    utils_financeiro._get_cached_connection_fin = lambda: conn_fin
+    return conn_ch, conn_fin
+
+def limpar_banco():
+    utils_financeiro.criar_tabela_books()
+    utils_financeiro.criar_tabela_liberacao()
+    utils_financeiro.criar_tabelas_resumo_financeiro()
+    conn = utils_financeiro.get_valid_conn_fin()
+    with conn.cursor() as cur:
+        cur.execute("TRUNCATE books_faturamento, faturamento_liberado RESTART IDENTITY;")
+    conn.commit()
+    ok, msg = utils_chamados.recriar_banco_do_zero()
+    if not ok: raise RuntimeError(msg)
+
+
+# --- ETAPAS ---
+
+def medir_chamados(arquivo):
+    c = Cronometro()
+    arquivo.seek(0)
+    with c.etapa("ler"): df_raw = utils_importacao.ler_planilha_chamados(arquivo)
+    with c.etapa("mapear"): df_final = utils_importacao.mapear_colunas_carteira(df_raw)
+    with c.etapa("agrupar"): df_grouped = utils_importacao.agrupar_chamados_importados(df_final)
+    with c.etapa("separar"):
+        df_banco = utils_chamados.carregar_chamados_db()
+        df_insert, df_update = utils_importacao.separar_novos_e_existentes(df_grouped, df_banco)
+    with c.etapa("gravar"):
+        if not df_insert.empty: utils_chamados.bulk_insert_chamados_db(df_insert)
+        if not df_update.empty: utils_importacao.atualizar_chamados_existentes(df_update)
+    with c.etapa("status"): utils_importacao.recalcular_status_importados(df_grouped)
+    return c.etapas, {"linhas": len(df_raw), "chamados": len(df_grouped), "novos": len(df_insert), "existentes": len(df_update)}
+
+def medir_pedidos(arquivo):
+    c = Cronometro()
+    with c.etapa("ler"): df_ped = utils_importacao.ler_excel(arquivo, header=0, dtype=str)
+    with c.etapa("normalizar"): df_ped.columns = [str(col).strip().upper() for col in df_ped.columns]
+    with c.etapa("gravar"):
+        id_map = utils_chamados.carregar_chamados_db().set_index('Nº Chamado')['ID'].to_dict()
+        gravados, _ = utils_importacao.aplicar_planilha_pedidos(df_ped, id_map)
+    return c.etapas, {"linhas": len(df_ped), "gravados": gravados}
+
+def medir_financeiro(arquivo, importador):
+    c = Cronometro()
+    with c.etapa("ler"): df = utils_importacao.ler_excel(arquivo, dtype=str)
+    with c.etapa("normalizar"): df.columns = [str(col).strip().upper() for col in df.columns]
+    with c.etapa("gravar"): ok, msg = importador(df)
+    if not ok: raise RuntimeError(msg)
+    return c.etapas, {"linhas": len(df)}
+
+
+def rodar_tamanho(n_linhas):
+    carteira = gerador_dados.gerar_carteira(n_linhas)
+    chamados = gerador_dados.chamados_da_carteira(carteira)
+    arq_carteira = gerador_dados.para_xlsx(carteira, "carteira.xlsx")
+    arquivos = {
+        "pedidos": gerador_dados.para_xlsx(gerador_dados.gerar_pedidos(chamados), "pedidos.xlsx"),
+        "books": gerador_dados.para_xlsx(gerador_dados.gerar_books(chamados), "books.xlsx"),
+        "liberacao": gerador_dados.para_xlsx(gerador_dados.gerar_liberacao(carteira), "liberacao.xlsx"),
+    }
+
+    limpar_banco()
+    resultados = []
+    for cenario in ["carga_inicial", "reimportacao"]:
+        etapas, info = medir_chamados(arq_carteira)
+        resultados.append({"importador": "chamados", "cenario": cenario, **info, "etapas": etapas})
+
+    etapas, info = medir_pedidos(arquivos["pedidos"])
+    resultados.append({"importador": "pedidos", **info, "etapas": etapas})
+    etapas, info = medir_financeiro(arquivos["books"], utils_financeiro.importar_planilha_books)
+    resultados.append({"importador": "books", **info, "etapas": etapas})
+    etapas, info = medir_financeiro(arquivos["liberacao"], utils_financeiro.importar_planilha_liberacao)
+    resultados.append({"importador": "liberacao", **info, "etapas": etapas})
+
+    for r in resultados:
+        r["tamanho"] = n_linhas
+        r["total"] = round(sum(r["etapas"].values()), 4)
+    return resultados
+
+
+def _commit_atual():
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], cwd=RAIZ, text=True).strip()
+    except Exception:
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--dsn", required=True, help="PostgreSQL local (as tabelas são apagadas!)")
+    parser.add_argument("--tamanhos", default="1000,10000", help="ex.: 1000,10000,100000")
+    parser.add_argument("--saida", help="arquivo JSON (padrão: imprime na saída)")
+    args = parser.parse_args()
+
+    logging.getLogger("streamlit").setLevel(logging.ERROR) # sem runtime o streamlit avisa a cada cache
+    conectar(args.dsn)
+    relatorio = {
+        "gerado_em": datetime.now().isoformat(timespec="seconds"),
+        "commit": _commit_atual(),
+        "python": platform.python_version(),
+        "pandas": pd.__version__,
+        "motor_excel": utils_importacao.MOTOR_EXCEL,
+        "resultados": [],
+    }
+    for n in [int(t) for t in args.tamanhos.split(",") if t.strip()]:
+        for r in rodar_tamanho(n):
+            relatorio["resultados"].append(r)
+            etapas = " | ".join(f"{k} {v:.2f}s" for k, v in r["etapas"].items())
+            rotulo = f"{r['importador']} {r.get('cenario', '')}".strip()
+            print(f"[{n}] {rotulo:<24} total {r['total']:.2f}s ({etapas})", file=sys.stderr)
+
+    saida = json.dumps(relatorio, ensure_ascii=False, indent=2)
+    if args.saida:
+        with open(args.saida, "w", encoding="utf-8") as f: f.write(saida)
+    else:
+        print(saida)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,104 @@
+"""
+Micro-benchmark da precificação dos chamados pela LPU (página Financeiro).
+
+Compara o calcular_valor_linha antigo (apply linha a linha) com
+utils_financeiro.calcular_valores_lpu e com o IndiceLPU (equipamento resolvido
+no índice) e confere que os valores são idênticos. Também confere que nomes
+que só diferem em acento/pontuação caem no mesmo preço pelo índice.
+
+Uso (na raiz do projeto):
+    python benchmarks/bench_precificacao_lpu.py --linhas 100000
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+import utils_financeiro  # noqa: E402
+
+SERVICOS = ["Instalação Nova", "Desativação", "desativacao", "Desinstalação", "Reinstalação",
+            "Remanejamento", "Manutenção", "Vistoria Técnica", " VISITA FIXA ", "", None, np.nan]
+EQUIPAMENTOS = [f"Equipamento {i}" for i in range(400)] + ["", None, np.nan, " camera bullet "]
+QUANTIDADES = [1, 2, 3, 0, None, np.nan, 10]
+
+
+# --- IMPLEMENTAÇÃO ANTERIOR (REFERÊNCIA) ---
+
+def _legado_valor_linha(row, lpu_f, lpu_s, lpu_e):
+    serv = str(row.get('Serviço', '')).strip().lower()
+    equip = str(row.get('Equipamento', '')).strip().lower()
+    qtd = pd.to_numeric(row.get('Qtd.', 0), errors='coerce')
+    if pd.isna(qtd) or qtd == 0: qtd = 1
+
+    if serv in lpu_f: return lpu_f[serv]
+    if equip in lpu_s:
+        keywords_desinst = ['desativacao', 'desinstalação', 'desinstalacao']
+        if any(x in serv for x in keywords_desinst): return lpu_s[equip].get('desativacao', 0.0) * qtd
+        keywords_reinst = ['reinstalacao', 'reinstalação', 'instalação nova', 'instalacao nova', 'remanejamento']
+        if any(x in serv for x in keywords_reinst): return lpu_s[equip].get('reinstalacao', 0.0) * qtd
+    if equip in lpu_e: return lpu_e.get(equip, 0.0) * qtd
+    return 0.0
+
+
+# --- DADOS SINTÉTICOS (MESMO FORMATO DOS DICIONÁRIOS DO IndiceLPU) ---
+
+def gerar_lpu(seed=42):
+    rnd = random.Random(seed)
+    lpu_f = {"visita fixa": 150.0, "vistoria técnica": 90.0}
+    lpu_s = {f"equipamento {i}": {"desativacao": round(rnd.uniform(10, 200), 2), "reinstalacao": round(rnd.uniform(10, 300), 2)}
+             for i in range(0, 400, 2)}
+    lpu_e = {f"equipamento {i}": round(rnd.uniform(50, 3000), 2) for i in range(0, 400, 3)}
+    lpu_e["camera bullet"] = 480.0
+    return lpu_f, lpu_s, lpu_e
+
+def gerar_chamados(n_linhas, seed=42):
+    rnd = random.Random(seed)
+    return pd.DataFrame({
+        'Serviço': [rnd.choice(SERVICOS) for _ in range(n_linhas)],
+        'Equipamento': [rnd.choice(EQUIPAMENTOS) for _ in range(n_linhas)],
+        'Qtd.': pd.array([rnd.choice(QUANTIDADES) for _ in range(n_linhas)], dtype="Float64").astype(float),
+    })
+
+
+def _cronometrar(func, repeticoes):
+    tempos = []
+    for _ in range(repeticoes):
+        inicio = time.perf_counter()
+        resultado = func()
+        tempos.append(time.perf_counter() - inicio)
+    return min(tempos), resultado
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--linhas", type=int, default=100_000)
+    parser.add_argument("--repeticoes", type=int, default=3)
+    args = parser.parse_args()
+
+    lpu_f, lpu_s, lpu_e = gerar_lpu()
+    df = gerar_chamados(args.linhas)
+
+    t_antigo, r_antigo = _cronometrar(lambda: df.apply(lambda x: _legado_valor_linha(x, lpu_f, lpu_s, lpu_e), axis=1), args.repeticoes)
+    t_novo, r_novo = _cronometrar(lambda: utils_financeiro.calcular_valores_lpu(df, lpu_f, lpu_s, lpu_e), args.repeticoes)
+    assert np.array_equal(r_antigo.to_numpy(dtype=float), r_novo.to_numpy(), equal_nan=True), "Valores divergentes"
+
+    indice = utils_financeiro.IndiceLPU(0, lpu_f, lpu_s, lpu_e)
+    t_indice, r_indice = _cronometrar(lambda: indice.calcular_valores(df), args.repeticoes)
+    assert np.array_equal(r_novo.to_numpy(), r_indice.to_numpy()), "Índice divergente da precificação direta"
+
+    variantes = pd.DataFrame({'Serviço': ["Instalação Nova"] * 3, 'Qtd.': [2, 2, 2],
+                              'Equipamento': ["camera bullet", "Câmera-Bullet", "  CAMERA   BULLET."]})
+    assert indice.calcular_valores(variantes).nunique() == 1, "Apelido não resolveu para o mesmo equipamento"
+    assert indice.sugerir_equipamento("camera bulet") == "camera bullet"
+
+    print(f"Precificação LPU {args.linhas} linhas: antigo {t_antigo:.3f}s | vetorizado {t_novo * 1000:.1f}ms | "
+          f"índice {t_indice * 1000:.1f}ms | {t_antigo / t_novo:.0f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,153 @@
+"""
+Micro-benchmark do HTML do relatório diário por e-mail (página Relatórios).
+
+Compara o caminho antigo (formatar_df_para_html com iterrows célula a célula,
+chamado duas vezes por analista sobre os DataFrames refiltrados) com
+utils_relatorios.relatorio_html. Confere cada tabela byte a byte e o e-mail
+inteiro (a menos do espaço em branco entre as tags do cabeçalho).
+
+Uso (na raiz do projeto):
+    python benchmarks/bench_relatorio_html.py --linhas 5000
+"""
+import argparse
+import html
+import os
+import random
+import re
+import sys
+import time
+from datetime import date, timedelta
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+import utils_relatorios  # noqa: E402
+
+STATUS = ["Em andamento", "Pendente", "Finalizado", "CONCLUÍDO", "Cancelado", "Não Iniciado", None, "Pendência de Infra"]
+ANALISTAS = [f"Analista {i}" for i in range(25)] + [None, "O'Brien & <Filhos>"]
+
+
+# --- IMPLEMENTAÇÃO ANTERIOR (REFERÊNCIA) ---
+
+def _legado_tabela(df, titulo, hoje):
+    if df.empty:
+        return f"<h4 style='color:#34495E; font-family: Arial, sans-serif;'>{titulo}</h4><p style='font-family:Arial, sans-serif; color: #555;'>Nenhum chamado encontrado.</p>"
+    familia_fonte = "'Arial', sans-serif"
+    html_output = f"<h4 style='color:#34495E; font-family: {familia_fonte};'>{titulo}</h4>"
+    html_output += f"""<table style='border-collapse: collapse; width: 100%; font-family: {familia_fonte}; font-size: 0.85em; min-width: 600px; box-shadow: 0 0 10px rgba(0,0,0,0.1);'>"""
+    html_output += "<thead><tr>"
+    for col in df.columns:
+        html_output += f"<th style='background-color: #1565C0; color: #FFFFFF; text-align: left; padding: 10px; border-bottom: 2px solid #0D47A1;'>{html.escape(str(col))}</th>"
+    html_output += "</tr></thead><tbody>"
+    for i, row in df.iterrows():
+        current_row_style = "#f3f3f3" if i % 2 == 0 else "#ffffff"
+        html_output += f"<tr style='background-color: {current_row_style};'>"
+        for col in df.columns:
+            val = row[col]
+            display_val = html.escape(str(val)) if pd.notna(val) and val is not None else ""
+            cell_style = "padding: 10px; text-align: left; border-bottom: 1px solid #dddddd;"
+            if col == 'Aging (Dias)' and isinstance(val, (int, float)) and val > 15:
+                cell_style += " color: #D32F2F; font-weight: bold;"
+            if col == 'Agendamento' and val == hoje.strftime('%d/%m/%Y'):
+                cell_style += " color: #D32F2F; font-weight: bold;"
+            html_output += f"<td style='{cell_style}'>{display_val}</td>"
+        html_output += "</tr>"
+    html_output += "</tbody></table><br>"
+    return html_output
+
+def _legado(df, hoje, tabelas=None):
+    df = df.copy()
+    df['Agendamento'] = pd.to_datetime(df['Agendamento'], errors='coerce').dt.date
+    df['Abertura'] = pd.to_datetime(df['Abertura'], errors='coerce').dt.date
+    df['Analista'] = df['Analista'].fillna('Sem Analista')
+    df['Aging (Dias)'] = (hoje - df['Abertura']).apply(lambda x: x.days if pd.notna(x) else 0).astype(int)
+    proxima_segunda = hoje + timedelta(days=(7 - hoje.weekday()))
+    status_fim = ["finalizado", "concluído", "faturado", "fechado", "cancelado"]
+    df_backlog = df[(pd.isna(df['Agendamento'])) & (~df['Status'].str.lower().isin(status_fim))]
+    df_vencidos = df[(df['Agendamento'] < hoje) & (~df['Status'].str.lower().isin(status_fim))].copy()
+    df_proxima_semana = df[(df['Agendamento'] >= hoje) & (df['Agendamento'] <= proxima_segunda)].copy()
+    lista_analistas = sorted(pd.concat([df_vencidos['Analista'], df_proxima_semana['Analista']]).unique())
+    colunas = ['Nº Chamado', 'Projeto', 'Nome Agência', 'Agendamento', 'Status', 'Aging (Dias)']
+
+    corpo = f"<h2>Relatório de Gestão - {hoje.strftime('%d/%m/%Y')}</h2>{len(df_vencidos)}|{len(df_proxima_semana)}|{len(df_backlog)}"
+    if not lista_analistas: corpo += "<p>Sem pendências críticas ou agendamentos próximos.</p>"
+    for analista in lista_analistas:
+        corpo += f"<hr><h3 style='background-color: #E3F2FD; padding: 10px; border-radius: 4px; color: #0D47A1;'>👤 {html.escape(str(analista))}</h3>"
+        for base, titulo in [(df_vencidos, "🚨 Vencidos"), (df_proxima_semana, "🗓️ Próximos Agendamentos")]:
+            df_a = base[base['Analista'] == analista].copy()
+            if not df_a.empty:
+                df_a = df_a[colunas]
+                df_a['Agendamento'] = df_a['Agendamento'].apply(lambda x: x.strftime('%d/%m/%Y') if x else '-')
+                tabela = _legado_tabela(df_a, f"{titulo} ({len(df_a)})", hoje)
+                if tabelas is not None: tabelas.append(tabela)
+                corpo += tabela
+    return corpo
+
+
+# --- DADOS SINTÉTICOS (MESMAS COLUNAS DO carregar_chamados_db) ---
+
+def gerar_chamados(n, hoje, seed=42):
+    rnd = random.Random(seed)
+    def _dia(faixa, nulos):
+        return None if rnd.random() < nulos else hoje + timedelta(days=rnd.randint(*faixa))
+    df = pd.DataFrame({
+        'ID': range(n, 0, -1),
+        'Nº Chamado': [f"GTS-{i:07d}" for i in range(n)],
+        'Projeto': [rnd.choice(["Projeto A", "Projeto <B>", "Projeto \"C\"", None]) for _ in range(n)],
+        'Nome Agência': [rnd.choice(["Agência Centro", "Agência & Filial", "Ag. d'Oeste", None]) for _ in range(n)],
+        'Agendamento': [_dia((-40, 12), 0.15) for _ in range(n)],
+        'Abertura': [_dia((-90, 0), 0.2) for _ in range(n)],
+        'Status': [rnd.choice(STATUS) for _ in range(n)],
+        'Analista': [rnd.choice(ANALISTAS) for _ in range(n)],
+    })
+    return df
+
+
+def _cronometrar(func, repeticoes):
+    tempos = []
+    for _ in range(repeticoes):
+        inicio = time.perf_counter()
+        resultado = func()
+        tempos.append(time.perf_counter() - inicio)
+    return min(tempos), resultado
+
+
+def _sem_cabecalho(corpo):
+    """Tabelas e títulos por analista do e-mail (o resumo do topo é só formatação)."""
+    return corpo[corpo.index("<hr>"):] if "<hr>" in corpo else ""
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--linhas", type=int, default=5_000)
+    parser.add_argument("--repeticoes", type=int, default=3)
+    args = parser.parse_args()
+
+    hoje = date.today()
+    df = gerar_chamados(args.linhas, hoje)
+
+    tabelas = []
+    antigo = _legado(df, hoje, tabelas)
+    novo = utils_relatorios.relatorio_html(df, hoje)
+    rodape = "<br><p style='color: #777; font-size: 0.8em;'><em>Gerado automaticamente pelo Sistema de Gestão.</em></p></body></html>"
+    assert _sem_cabecalho(antigo) + rodape == _sem_cabecalho(novo), "Tabelas por analista divergentes"
+    partes = utils_relatorios.separar_relatorio(df, hoje)
+    resumo = re.sub(r"\s+", " ", novo[:novo.index("<hr>")])
+    for chave in ['vencidos', 'semana', 'backlog']:
+        assert f">{len(partes[chave])}</td>" in resumo, f"Resumo sem a contagem de {chave}"
+    assert f"{len(partes['vencidos'])}|{len(partes['semana'])}|{len(partes['backlog'])}" in antigo, "Contagens do resumo divergentes"
+
+    # Tabela isolada: índice fora de ordem, nulos e um aging float (também destacado)
+    amostra = df.head(40).assign(**{'Aging (Dias)': np.linspace(0, 30, 40)}).sample(frac=1, random_state=1)
+    amostra['Agendamento'] = amostra['Agendamento'].map(lambda d: d.strftime('%d/%m/%Y') if d else None)
+    assert _legado_tabela(amostra, "t", hoje) == utils_relatorios.tabela_html(amostra, "t", hoje), "Tabela isolada divergente"
+
+    t_antigo, _ = _cronometrar(lambda: _legado(df, hoje), args.repeticoes)
+    t_novo, _ = _cronometrar(lambda: utils_relatorios.relatorio_html(df, hoje), args.repeticoes)
+    print(f"Relatório {args.linhas} chamados ({len(tabelas)} tabelas, {len(novo) / 1024:.0f} KB): "
+          f"antigo {t_antigo:.3f}s | vetorizado {t_novo * 1000:.1f}ms | {t_antigo / t_novo:.0f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,117 @@
+"""
+Benchmark da lista por agência da página Financeiro, com PostgreSQL local.
+
+Compara o caminho antigo (carregar todos os chamados, montar Agencia_Combinada
+com apply, classificar, ordenar as agências em Python e agrupar a página) com
+o resumo por agência mantido no banco (contagem + página por chave + chamados
+só das agências da página). Confere que todas as páginas trazem as mesmas
+agências, chamados, status e totais, e que a manutenção incremental (edição de
+um chamado) deixa o resumo igual ao recálculo completo.
+
+ATENÇÃO: as tabelas do banco informado são APAGADAS. Use um banco só para isso.
+
+Uso (na raiz do projeto):
+    python benchmarks/bench_resumo_agencias.py --dsn postgresql://localhost/agenda_bench --linhas 20000
+"""
+import argparse
+import logging
+import os
+import sys
+import time
+
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(__file__))
+import bench_pipeline_importacao as pipeline  # noqa: E402
+import gerador_dados  # noqa: E402
+utils_chamados = pipeline.utils_chamados
+utils_financeiro = pipeline.utils_financeiro
+
+ITENS_POR_PAGINA = 10
+
+
+# --- IMPLEMENTAÇÃO ANTERIOR (REFERÊNCIA) ---
+
+def _legado_formatar_agencia(id_agencia, nome_agencia):
+    try:
+        id_agencia_limpo = str(id_agencia).split('.')[0]
+        id_str = f"AG {int(id_agencia_limpo):04d}"
+    except Exception: id_str = str(id_agencia).strip()
+    nome_str = str(nome_agencia).strip()
+    if nome_str.startswith(id_agencia_limpo): nome_str = nome_str[len(id_agencia_limpo):].strip(" -")
+    return f"{id_str} - {nome_str}"
+
+def _legado_paginas():
+    """Todas as páginas como a página montava: {agência: [(chamado, status, valor)]} por página."""
+    utils_financeiro.st.cache_data.clear()
+    df = utils_chamados.carregar_chamados_db()
+    df['Agencia_Combinada'] = df.apply(lambda x: _legado_formatar_agencia(x['Cód. Agência'], x['Nome Agência']), axis=1)
+    df['Valor_Calculado'] = pd.to_numeric(df['Valor_Calculado'], errors='coerce').fillna(0.0)
+    df['Status_Fin'] = utils_financeiro.classificar_status_financeiro(
+        df, utils_financeiro.carregar_books_db(), utils_financeiro.carregar_liberacao_db())['Status_Fin']
+    agencias = sorted(df['Agencia_Combinada'].unique())
+    paginas = []
+    for inicio in range(0, len(agencias), ITENS_POR_PAGINA):
+        df_pagina = df[df['Agencia_Combinada'].isin(agencias[inicio:inicio + ITENS_POR_PAGINA])]
+        paginas.append({ag: list(zip(g['Nº Chamado'], g['Status_Fin'], g['Valor_Calculado'].round(2)))
+                        for ag, g in df_pagina.groupby('Agencia_Combinada')})
+    return paginas
+
+def _nova_pagina(apos):
+    utils_financeiro.st.cache_data.clear()
+    df_ag = utils_financeiro.carregar_pagina_agencias(apos=apos, limite=ITENS_POR_PAGINA)
+    agencias = df_ag['agencia'].tolist()
+    df = utils_financeiro.carregar_chamados_das_agencias(tuple(agencias))
+    return agencias, {ag: list(zip(g['Nº Chamado'], g['Status_Fin'], g['Valor_Calculado'].round(2)))
+                      for ag, g in df.groupby('Agencia_Combinada', sort=False)}
+
+
+def _resumo(conn):
+    return pd.read_sql("SELECT * FROM fin_resumo_agencias ORDER BY agencia", conn)
+
+def _conferir_incremental(conn):
+    """Edita chamados (agência, preço) por atualizar_chamado_db e compara com o recálculo completo."""
+    df = pd.read_sql("SELECT id FROM chamados ORDER BY id LIMIT 3", conn)
+    ids = df['id'].tolist()
+    utils_chamados.atualizar_chamado_db(ids[0], {'Cód. Agência': '7.0', 'Nome Agência': '7 - AGENCIA MOVIDA'})
+    utils_chamados.atualizar_chamado_db(ids[1], {'Cód. Agência': None, 'Nome Agência': 'SEM CODIGO'})
+    utils_chamados.atualizar_chamado_db(ids[2], {'Qtd.': '40'})
+    incremental = _resumo(conn)
+    utils_financeiro.atualizar_resumo_financeiro()
+    pd.testing.assert_frame_equal(incremental, _resumo(conn), obj="resumo incremental x completo")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--dsn", required=True, help="PostgreSQL local (as tabelas são apagadas!)")
+    parser.add_argument("--linhas", type=int, default=20_000, help="linhas da carteira sintética")
+    args = parser.parse_args()
+
+    logging.getLogger("streamlit").setLevel(logging.ERROR)
+    _, conn = pipeline.conectar(args.dsn)
+    pipeline.limpar_banco()
+
+    carteira = gerador_dados.gerar_carteira(args.linhas)
+    pipeline.medir_chamados(gerador_dados.para_xlsx(carteira, "carteira.xlsx"))
+    chamados = gerador_dados.chamados_da_carteira(carteira)
+    utils_financeiro.importar_planilha_books(gerador_dados.gerar_books(chamados))
+    utils_financeiro.importar_planilha_liberacao(gerador_dados.gerar_liberacao(carteira))
+    _conferir_incremental(conn)
+
+    inicio = time.perf_counter(); paginas_antigas = _legado_paginas(); t_antigo = time.perf_counter() - inicio
+
+    tempos, apos = [], None
+    for n, esperado in enumerate(paginas_antigas):
+        inicio = time.perf_counter(); agencias, pagina = _nova_pagina(apos); tempos.append(time.perf_counter() - inicio)
+        assert pagina == esperado, f"Página {n + 1} divergente"
+        apos = agencias[-1]
+    assert not _nova_pagina(apos)[0], "Agências sobrando depois da última página"
+
+    inicio = time.perf_counter(); utils_financeiro.atualizar_resumo_financeiro(); t_completo = time.perf_counter() - inicio
+    print(f"{len(paginas_antigas)} páginas de agências, {len(chamados)} chamados: conferem (incluindo edição incremental)")
+    print(f"Página: antigo {t_antigo:.2f}s (qualquer página) | resumo {min(tempos) * 1000:.1f}ms (1ª) .. {max(tempos) * 1000:.1f}ms (pior)")
+    print(f"Recálculo completo do resumo: {t_completo * 1000:.0f}ms")
+
+
+if __name__ == "__main__":
+    main()
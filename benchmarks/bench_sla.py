@@ -0,0 +1,126 @@
+"""
+Micro-benchmark do SLA por regra (aba sla, utils.calcular_sla).
+
+Compara o calcular_sla antigo (cópia da aba sla a cada linha) com
+RegrasSLA.classificar e com utils.calcular_sla linha a linha (regras
+compiladas uma vez), e confere que rótulos e cores são idênticos. A situação
+de SLA do dashboard é calculada no banco: ver bench_painel_indicadores.py.
+
+Uso (na raiz do projeto):
+    python benchmarks/bench_sla.py --linhas 50000
+"""
+import argparse
+import logging
+import os
+import random
+import sys
+import time
+from datetime import date, timedelta
+
+import pandas as pd
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+import utils  # noqa: E402
+import utils_sla  # noqa: E402
+
+STATUS = ["Não Iniciado", "Em Andamento", "Concluído", "finalizado", "Faturado", "Cancelado",
+          "Cancelado pelo cliente", "Equipamento Entregue", "Pendência de Infra", None]
+PROJETOS = ["Projeto Modernização", "PROJETO EXPANSÃO", "projeto retrofit", "Projeto Sem Regra", "", None]
+DEMANDAS = ["Instalação", "Desativação", "Vistoria", "", None, 3.0]
+
+
+# --- IMPLEMENTAÇÃO ANTERIOR (REFERÊNCIA) ---
+
+def _legado_sla(projeto_row, df_sla):
+    data_agendamento = pd.to_datetime(projeto_row.get("Agendamento"), errors='coerce')
+    data_finalizacao = pd.to_datetime(projeto_row.get("Data de Finalização"), errors='coerce')
+    projeto_nome = str(projeto_row.get("Projeto", "")).upper(); demanda = projeto_row.get("Demanda", "")
+    if pd.isna(data_agendamento): return "SLA: N/D", "gray"
+    if df_sla.empty: return "SLA: N/A", "gray"
+    if "Nome do Projeto" not in df_sla.columns or "Demanda" not in df_sla.columns or "Prazo (dias)" not in df_sla.columns:
+        return "SLA: Config Inválida", "gray"
+    df_sla_upper = df_sla.copy(); df_sla_upper["Nome do Projeto"] = df_sla_upper["Nome do Projeto"].astype(str).str.upper(); df_sla_upper["Demanda"] = df_sla_upper["Demanda"].astype(str)
+    rule = df_sla_upper[(df_sla_upper["Nome do Projeto"] == projeto_nome) & (df_sla_upper["Demanda"] == str(demanda))]
+    if rule.empty: rule = df_sla_upper[(df_sla_upper["Nome do Projeto"] == projeto_nome) & (df_sla_upper["Demanda"].isin(['', 'nan', 'None']))]
+    if rule.empty: return "SLA: N/A (Regra ñ enc.)", "gray"
+    try: prazo_raw = rule.iloc[0]["Prazo (dias)"]; prazo_dias = int(float(prazo_raw))
+    except (ValueError, TypeError, IndexError): return "SLA: Inválido", "red"
+    start_date = data_agendamento.date(); hoje = date.today()
+    if pd.notna(data_finalizacao):
+        end_date = data_finalizacao.date(); dias_corridos = (end_date - start_date).days
+        if dias_corridos <= prazo_dias: return f"Finalizado Prazo ({dias_corridos}d)", "#66BB6A"
+        else: atraso = dias_corridos - prazo_dias; return f"Finalizado Atraso ({atraso}d)", "#EF5350"
+    else:
+        dias_corridos = (hoje - start_date).days; dias_restantes = prazo_dias - dias_corridos
+        if dias_restantes < 0: return f"Atrasado {-dias_restantes}d", "#EF5350"
+        elif dias_restantes == 0: return "SLA Vence Hoje!", "#FFA726"
+        else: return f"SLA: {dias_restantes}d restantes", "#66BB6F"
+
+
+# --- DADOS SINTÉTICOS ---
+
+def gerar_sla():
+    """Aba sla como sai do banco (demanda vazia = regra do projeto, prazo inválido, regra repetida)."""
+    return pd.DataFrame({
+        "Nome do Projeto": ["PROJETO MODERNIZAÇÃO", "Projeto Modernização", "PROJETO EXPANSÃO", "Projeto Expansão", "PROJETO RETROFIT", "PROJETO RETROFIT", ""],
+        "Demanda": ["Instalação", "", "", "Vistoria", "Instalação", "3.0", ""],
+        "Prazo (dias)": [10, 20, "15", "abc", 5.0, 7, 30],
+    })
+
+def gerar_projetos(n_linhas, seed=42):
+    rnd = random.Random(seed)
+    base = pd.Timestamp.today().normalize()
+    def _data(): return rnd.choice([base + timedelta(days=rnd.randint(-60, 30), hours=rnd.randint(0, 23)), None])
+    agend = [_data() for _ in range(n_linhas)]
+    return pd.DataFrame({
+        'Status': [rnd.choice(STATUS) for _ in range(n_linhas)],
+        'Projeto': [rnd.choice(PROJETOS) for _ in range(n_linhas)],
+        'Demanda': pd.Series([rnd.choice(DEMANDAS) for _ in range(n_linhas)], dtype=object),
+        'Agendamento': pd.to_datetime(pd.Series(agend)),
+        'Fechamento': pd.to_datetime(pd.Series([a + timedelta(days=rnd.randint(-1, 4), hours=rnd.randint(0, 23)) if a is not None and rnd.random() < 0.5 else None for a in agend])),
+        'Data de Finalização': [a.date() + timedelta(days=rnd.randint(0, 40)) if a is not None and rnd.random() < 0.4 else None for a in agend],
+    })
+
+
+def _cronometrar(func, repeticoes):
+    tempos = []
+    for _ in range(repeticoes):
+        inicio = time.perf_counter()
+        resultado = func()
+        tempos.append(time.perf_counter() - inicio)
+    return min(tempos), resultado
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--linhas", type=int, default=50_000)
+    parser.add_argument("--repeticoes", type=int, default=3)
+    args = parser.parse_args()
+
+    logging.getLogger("streamlit").setLevel(logging.ERROR)
+    df, df_sla = gerar_projetos(args.linhas), gerar_sla()
+
+    amostra = df.head(min(args.linhas, 5000))
+    t_antigo, r_antigo = _cronometrar(lambda: [_legado_sla(r, df_sla) for r in amostra.to_dict('records')], 1)
+    t_antigo *= len(df) / len(amostra)
+    regras = utils_sla.compilar_regras_sla(df_sla)
+    t_novo, r_novo = _cronometrar(lambda: regras.classificar(df), args.repeticoes)
+    assert r_antigo == list(zip(r_novo['SLA'].head(len(amostra)), r_novo['Cor_SLA'].head(len(amostra)))), "SLA divergente"
+    registros = amostra.to_dict('records')
+    t_linha, por_linha = _cronometrar(lambda: [utils.calcular_sla(r, regras) for r in registros], args.repeticoes)
+    assert por_linha == r_antigo, "calcular_sla divergente"
+    assert [utils.calcular_sla(r, df_sla) for r in registros[:200]] == r_antigo[:200], "calcular_sla (aba sla) divergente"
+    for config in [pd.DataFrame(), df_sla.drop(columns=["Prazo (dias)"])]:
+        esperado = [_legado_sla(r, config) for r in registros[:50]]
+        assert esperado == list(utils_sla.RegrasSLA(config).classificar(amostra.head(50)).itertuples(index=False, name=None))
+        assert esperado == [utils_sla.RegrasSLA(config).classificar_linha(r) for r in registros[:50]]
+    print(f"SLA por regra {args.linhas} linhas: antigo ~{t_antigo:.2f}s (estimado por {len(amostra)}) | "
+          f"vetorizado {t_novo * 1000:.1f}ms | {t_antigo / t_novo:.0f}x")
+    print(f"SLA linha a linha (calcular_sla com as regras compiladas): antigo {t_antigo / len(df) * 1e6:.0f}us | "
+          f"novo {t_linha / len(amostra) * 1e6:.0f}us por linha")
+    faixas = r_novo['SLA'].str.replace(r'[-\d]+', 'N', regex=True).value_counts().to_dict()
+    print(f"Distribuição: {faixas}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,143 @@
+"""
+Benchmark dos KPIs financeiros do topo da página Financeiro, com PostgreSQL local.
+
+Compara a consulta antiga (status de todos os chamados recalculado a partir de
+chamados/books/liberação a cada render) com os snapshots mensais
+(fin_snapshots dos meses fechados + período aberto). Confere, por ano, que os
+KPIs são idênticos, que as linhas por agência somam o total, que a evolução
+mensal fecha com os KPIs, e que a edição incremental e a virada de mês deixam
+os snapshots iguais ao recálculo completo.
+
+ATENÇÃO: as tabelas do banco informado são APAGADAS. Use um banco só para isso.
+
+Uso (na raiz do projeto):
+    python benchmarks/bench_snapshots_financeiros.py --dsn postgresql://localhost/agenda_bench --linhas 20000
+"""
+import argparse
+import logging
+import os
+import sys
+import time
+from datetime import date
+
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(__file__))
+import bench_pipeline_importacao as pipeline  # noqa: E402
+import gerador_dados  # noqa: E402
+utils_chamados = pipeline.utils_chamados
+utils_financeiro = pipeline.utils_financeiro
+
+
+# --- IMPLEMENTAÇÃO ANTERIOR (REFERÊNCIA) ---
+
+def _legado_kpis(conn, ano):
+    query = utils_financeiro.SQL_STATUS_FINANCEIRO + """
+        , filtrados AS (
+            SELECT * FROM status_fin
+            WHERE %(ano)s::INTEGER IS NULL OR EXTRACT(YEAR FROM data_abertura) = %(ano)s::INTEGER
+        )
+        SELECT status_fin, COUNT(*), COALESCE(SUM(valor), 0) FROM filtrados GROUP BY status_fin
+        UNION ALL
+        SELECT 'BOOKS ENVIADOS', COUNT(*), COALESCE(SUM(valor), 0) FROM filtrados WHERE book_enviado
+    """
+    with conn.cursor() as cur:
+        cur.execute(query, {'ano': ano})
+        linhas = cur.fetchall()
+    conn.commit()
+    return {status: {'qtd': int(qtd), 'valor': float(valor)} for status, qtd, valor in linhas if qtd}
+
+
+def _novos_kpis(ano):
+    utils_financeiro.st.cache_data.clear()
+    return {s: v for s, v in utils_financeiro.carregar_kpis_financeiros(ano).items() if v['qtd']}
+
+def _snapshots(conn):
+    return pd.read_sql("SELECT periodo, agencia, status_fin, qtd, valor FROM fin_snapshots ORDER BY 1, 2, 3", conn)
+
+def _conferir(conn, anos, rotulo):
+    for ano in anos:
+        assert _legado_kpis(conn, ano) == _novos_kpis(ano), f"KPIs divergentes ({rotulo}, ano {ano})"
+
+    totais = pd.read_sql("""
+        SELECT periodo, status_fin, sum(qtd) FILTER (WHERE agencia <> '') AS agencias, sum(qtd) FILTER (WHERE agencia = '') AS total
+        FROM fin_snapshots GROUP BY 1, 2
+    """, conn)
+    assert (totais['agencias'] == totais['total']).all(), f"Agências não somam o total ({rotulo})"
+
+    for ano in [a for a in anos if a]:
+        evol = utils_financeiro.carregar_evolucao_financeira(ano).groupby('Status_Fin')[['Qtd', 'Valor']].sum()
+        kpis = _novos_kpis(ano)
+        assert {s: int(q) for s, q in evol['Qtd'].items()} == {s: v['qtd'] for s, v in kpis.items()}, f"Evolução ≠ KPIs ({rotulo}, {ano})"
+
+def _conferir_recalculo(conn, rotulo):
+    atual = _snapshots(conn)
+    utils_financeiro.atualizar_resumo_financeiro()
+    pd.testing.assert_frame_equal(atual, _snapshots(conn), obj=f"snapshots {rotulo} x recálculo completo")
+
+
+def _espalhar_datas(conn):
+    """A carga sintética abre tudo hoje: distribui a abertura por ~22 meses (e ~1% sem data)."""
+    with conn.cursor() as cur:
+        cur.execute("""
+            UPDATE chamados SET data_abertura = CASE WHEN id % 97 = 0 THEN NULL
+                                                     ELSE date '2025-01-01' + (id * 37 % 660) END
+        """)
+    conn.commit()
+    utils_financeiro.atualizar_resumo_financeiro()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--dsn", required=True, help="PostgreSQL local (as tabelas são apagadas!)")
+    parser.add_argument("--linhas", type=int, default=20_000, help="linhas da carteira sintética")
+    parser.add_argument("--repeticoes", type=int, default=5)
+    args = parser.parse_args()
+
+    logging.getLogger("streamlit").setLevel(logging.ERROR)
+    _, conn = pipeline.conectar(args.dsn)
+    pipeline.limpar_banco()
+
+    carteira = gerador_dados.gerar_carteira(args.linhas)
+    pipeline.medir_chamados(gerador_dados.para_xlsx(carteira, "carteira.xlsx"))
+    chamados = gerador_dados.chamados_da_carteira(carteira)
+    utils_financeiro.importar_planilha_books(gerador_dados.gerar_books(chamados))
+    utils_financeiro.importar_planilha_liberacao(gerador_dados.gerar_liberacao(carteira))
+    _espalhar_datas(conn)
+    anos = [None, 2025, 2026]
+
+    # Mês aberto no meio da massa: parte dos KPIs vem dos snapshots, parte ao vivo
+    hoje = utils_financeiro._inicio_periodo_aberto
+    try:
+        utils_financeiro._inicio_periodo_aberto = lambda: date(2025, 7, 1)
+        utils_financeiro.atualizar_resumo_financeiro()
+        _conferir(conn, anos, "aberto 07/2025")
+
+        utils_financeiro._inicio_periodo_aberto = lambda: date(2025, 10, 1)
+        utils_financeiro.manter_resumo_financeiro() # virada: fecha 07, 08 e 09/2025
+        _conferir(conn, anos, "virada para 10/2025")
+        _conferir_recalculo(conn, "virada")
+    finally:
+        utils_financeiro._inicio_periodo_aberto = hoje
+
+    utils_financeiro.atualizar_resumo_financeiro()
+    ids = pd.read_sql("SELECT id FROM chamados WHERE data_abertura < '2025-06-01' ORDER BY id LIMIT 2", conn)['id'].tolist()
+    utils_chamados.atualizar_chamado_db(ids[0], {'Abertura': date(2025, 11, 15)})
+    utils_chamados.atualizar_chamado_db(ids[1], {'Qtd.': '40'})
+    _conferir(conn, anos, "edição incremental")
+    _conferir_recalculo(conn, "incremental")
+
+    tempos_antigo, tempos_novo = [], []
+    for _ in range(args.repeticoes):
+        inicio = time.perf_counter(); _legado_kpis(conn, 2025); tempos_antigo.append(time.perf_counter() - inicio)
+        inicio = time.perf_counter(); _novos_kpis(2025); tempos_novo.append(time.perf_counter() - inicio)
+    inicio = time.perf_counter(); utils_financeiro.atualizar_resumo_financeiro(); t_completo = time.perf_counter() - inicio
+
+    n_snap = len(_snapshots(conn))
+    print(f"{len(chamados)} chamados, {n_snap} linhas de snapshot: KPIs conferem (por ano, virada de mês e edição incremental)")
+    print(f"KPIs do ano: antigo {min(tempos_antigo) * 1000:.1f}ms | snapshots {min(tempos_novo) * 1000:.1f}ms")
+    print(f"Recálculo completo do resumo + snapshots: {t_completo * 1000:.0f}ms")
+
+
+if __name__ == "__main__":
+    main()
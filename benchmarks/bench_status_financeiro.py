@@ -0,0 +1,109 @@
+"""
+Micro-benchmark da classificação financeira dos chamados (página Financeiro).
+
+Compara o caminho antigo (iterrows nos books + definir_status_financeiro com
+apply/pd.Series por linha) com utils_financeiro.classificar_status_financeiro
+e confere que Status_Fin, Cor_Fin e o conjunto de books enviados são idênticos.
+
+Uso (na raiz do projeto):
+    python benchmarks/bench_status_financeiro.py --linhas 50000
+"""
+import argparse
+import os
+import random
+import sys
+import time
+from datetime import date, timedelta
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+import utils_financeiro  # noqa: E402
+
+
+# --- IMPLEMENTAÇÃO ANTERIOR (REFERÊNCIA) ---
+
+def _legado_status(row, dict_books_info, set_liberados):
+    chamado_id = str(row['Nº Chamado']).strip()
+    if chamado_id in set_liberados:
+        return "FATURADO (Pago)", "#2E7D32"
+    if chamado_id in dict_books_info:
+        info_book = dict_books_info[chamado_id]
+        book_pronto = str(info_book.get('book_pronto', '')).strip().upper() == 'SIM'
+        tem_data_envio = str(info_book.get('data_envio', '')).strip() not in ['', 'nan', 'None']
+        if book_pronto or tem_data_envio:
+            return "PENDENTE FATURAMENTO", "#FB8C00"
+        else:
+            return "PENDENTE ENVIO BOOK", "#C62828"
+    return "POTENCIAL", "#1565C0"
+
+def _legado(df_chamados, df_books, df_lib):
+    set_liberados = set(df_lib['chamado'].astype(str).str.strip()) if not df_lib.empty else set()
+    dict_books_info = {}
+    ids_books_enviados_total = set()
+    books = df_books.copy()
+    books.columns = [c.upper().strip() for c in books.columns]
+    for _, row_b in books.iterrows():
+        ch = str(row_b.get('CHAMADO', '')).strip()
+        pronto = row_b.get('BOOK PRONTO?', row_b.get('BOOK PRONTO', row_b.get('PRONTO', '')))
+        dt_env = row_b.get('DATA ENVIO', row_b.get('ENVIO', ''))
+        dict_books_info[ch] = {'book_pronto': pronto, 'data_envio': dt_env}
+        if str(pronto).strip().upper() == 'SIM' or str(dt_env).strip() not in ['', 'nan', 'None']:
+            ids_books_enviados_total.add(ch)
+    status = df_chamados.apply(lambda x: pd.Series(_legado_status(x, dict_books_info, set_liberados)), axis=1)
+    status.columns = ['Status_Fin', 'Cor_Fin']
+    status['Book_Enviado'] = df_chamados['Nº Chamado'].astype(str).str.strip().isin(ids_books_enviados_total)
+    return status
+
+
+# --- DADOS SINTÉTICOS ---
+
+def gerar_dados(n_chamados, seed=42):
+    rnd = random.Random(seed)
+    chamados = [f"GTS-{i:07d}" for i in range(n_chamados)]
+    df_chamados = pd.DataFrame({'Nº Chamado': [c if rnd.random() < 0.9 else f" {c} " for c in chamados]})
+    com_book = rnd.sample(chamados, n_chamados // 2)
+    df_books = pd.DataFrame({
+        'chamado': com_book,
+        'BOOK PRONTO?': [rnd.choice(["SIM", "sim ", "NÃO", "", None]) for _ in com_book],
+        'DATA ENVIO': [rnd.choice([date(2025, 1, 1) + timedelta(days=rnd.randint(0, 300)), None, np.nan, ""]) for _ in com_book],
+    })
+    df_lib = pd.DataFrame({'chamado': rnd.sample(chamados, n_chamados // 5) + ["GTS-INEXISTENTE"]})
+    return df_chamados, df_books, df_lib
+
+
+def _cronometrar(func, repeticoes):
+    tempos = []
+    for _ in range(repeticoes):
+        inicio = time.perf_counter()
+        resultado = func()
+        tempos.append(time.perf_counter() - inicio)
+    return min(tempos), resultado
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--linhas", type=int, default=50_000)
+    parser.add_argument("--repeticoes", type=int, default=3)
+    args = parser.parse_args()
+
+    df_chamados, df_books, df_lib = gerar_dados(args.linhas)
+    t_antigo, r_antigo = _cronometrar(lambda: _legado(df_chamados, df_books, df_lib), args.repeticoes)
+    t_novo, r_novo = _cronometrar(lambda: utils_financeiro.classificar_status_financeiro(df_chamados, df_books, df_lib), args.repeticoes)
+
+    for col in ['Status_Fin', 'Cor_Fin', 'Book_Enviado']:
+        assert r_antigo[col].tolist() == r_novo[col].tolist(), f"Divergência em {col}"
+
+    # Colunas como vêm do banco (book_pronto / data_envio): o classificador lê direto
+    df_books_db = df_books.rename(columns={'BOOK PRONTO?': 'book_pronto', 'DATA ENVIO': 'data_envio'})
+    r_db = utils_financeiro.classificar_status_financeiro(df_chamados, df_books_db, df_lib)
+    assert r_db.equals(r_novo), "Colunas do banco classificadas diferente do layout da planilha"
+
+    contagem = r_novo['Status_Fin'].value_counts().to_dict()
+    print(f"Status financeiro {args.linhas} chamados: antigo {t_antigo:.3f}s | vetorizado {t_novo * 1000:.1f}ms | {t_antigo / t_novo:.0f}x")
+    print(f"Distribuição: {contagem}")
+
+
+if __name__ == "__main__":
+    main()
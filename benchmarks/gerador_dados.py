@@ -0,0 +1,147 @@
+"""
+Gerador de planilhas sintéticas no formato das que o sistema importa.
+
+- carteira de chamados: 23 colunas por posição fixa (layout do importador da
+  Gestão), várias linhas de equipamento por chamado e ~1/3 de chamados -E-;
+- pedidos (CHAMADO, PEDIDO, DATA_ENVIO);
+- books (CHAMADO, SERVIÇO, SISTEMA, PROTOCOLO, DATA CONCLUSAO, BOOK PRONTO?, DATA ENVIO),
+  datas metade em texto dd/mm/aaaa, metade em células de data do Excel;
+- liberação (layout do relatório de faturamento liberado).
+
+Pode ser importado pelos benchmarks ou rodado direto para gerar arquivos:
+    python benchmarks/gerador_dados.py --linhas 10000 --saida /tmp/planilhas
+"""
+import argparse
+import io
+import os
+import random
+
+import pandas as pd
+
+SISTEMAS = ["CFTV", "ALARME", "INCENDIO", "CONTROLE DE ACESSO"]
+EQUIPAMENTOS = ["CAMERA BULLET", "CAMERA DOME", "DVR 16 CANAIS", "SENSOR IVP", "CENTRAL DE ALARME",
+                "NOBREAK", "HD 2TB", "TECLADO", "SIRENE", "DETECTOR DE FUMACA"]
+SERVICOS = ["INSTALAÇÃO NOVA", "DESATIVAÇÃO", "REINSTALAÇÃO", "MANUTENÇÃO", "VISTORIA", "REMANEJAMENTO"]
+PROJETOS = ["PROJETO MODERNIZAÇÃO", "PROJETO EXPANSÃO", "PROJETO RETROFIT", "PROJETO AGÊNCIA NOVA"]
+PESSOAS = ["ANA SOUZA", "BRUNO LIMA", "CARLA DIAS", "DIEGO ROCHA", "ELISA MOURA"]
+UFS = ["SP", "RJ", "MG", "PR", "RS", "BA", "PE"]
+
+
+def _data(rnd, ano=2025):
+    return pd.Timestamp(ano, 1, 1) + pd.Timedelta(days=rnd.randint(0, 364))
+
+
+def gerar_carteira(n_linhas, itens_por_chamado=(1, 6), seed=42):
+    """Carteira com ~n_linhas linhas; cada chamado tem entre 1 e 6 linhas de equipamento."""
+    rnd = random.Random(seed)
+    linhas = []
+    n_chamado = 0
+    while len(linhas) < n_linhas:
+        n_chamado += 1
+        tipo = "E" if rnd.random() < 0.33 else "S"
+        chamado = f"GTS-{tipo}-{n_chamado:07d}"
+        agencia = rnd.randint(1, 5000)
+        base = {
+            0: chamado, 1: f"{agencia:04d}", 2: f"AG {agencia:04d} CENTRO", 3: rnd.choice(UFS),
+            4: rnd.choice(SERVICOS), 5: rnd.choice(PROJETOS), 6: _data(rnd).strftime("%d/%m/%Y"),
+            7: "", 20: rnd.choice(PESSOAS), 22: rnd.choice(PESSOAS),
+        }
+        for _ in range(rnd.randint(*itens_por_chamado)):
+            linha = dict(base)
+            linha[8] = rnd.choice(SISTEMAS)
+            linha[9] = str(rnd.randint(1000, 9999))
+            linha[10] = rnd.choice(EQUIPAMENTOS)
+            linha[11] = str(rnd.randint(1, 8))
+            linhas.append(linha)
+            if len(linhas) >= n_linhas: break
+
+    df = pd.DataFrame(linhas[:n_linhas]).reindex(columns=range(23)).fillna("")
+    df.columns = ["Chamado", "Cód. Agência", "Nome Agência", "UF", "Serviço", "Projeto", "Agendamento",
+                  "Obs", "Sistema", "Código", "Descrição Equipamento", "Qtd"] + \
+                 [f"Extra {i}" for i in range(12, 20)] + ["Gestor", "Extra 21", "Analista"]
+    return df
+
+
+def chamados_da_carteira(df_carteira):
+    return df_carteira["Chamado"].drop_duplicates().tolist()
+
+
+def gerar_pedidos(chamados, seed=42):
+    rnd = random.Random(seed)
+    equip = [c for c in chamados if "-E-" in c]
+    return pd.DataFrame({
+        "CHAMADO": equip,
+        "PEDIDO": [f"PED{rnd.randint(10**6, 10**7)}" for _ in equip],
+        "DATA_ENVIO": [_data(rnd).strftime("%d/%m/%Y") for _ in equip],
+    })
+
+
+def _celula_data(rnd, data):
+    """Metade como texto dd/mm/aaaa, metade como célula de data de verdade do Excel."""
+    return data if rnd.random() < 0.5 else data.strftime("%d/%m/%Y")
+
+
+def gerar_books(chamados, seed=42):
+    rnd = random.Random(seed)
+    serv = [c for c in chamados if "-E-" not in c]
+    return pd.DataFrame({
+        "CHAMADO": serv,
+        "SERVIÇO": [rnd.choice(SERVICOS) for _ in serv],
+        "SISTEMA": [rnd.choice(SISTEMAS) for _ in serv],
+        "PROTOCOLO": [str(rnd.randint(10**8, 10**9)) for _ in serv],
+        "DATA CONCLUSAO": [_celula_data(rnd, _data(rnd)) for _ in serv],
+        "BOOK PRONTO?": [rnd.choice(["SIM", "NÃO", ""]) for _ in serv],
+        "DATA ENVIO": [_celula_data(rnd, _data(rnd)) if rnd.random() < 0.6 else "" for _ in serv],
+    })
+
+
+def gerar_liberacao(df_carteira, seed=42):
+    """Uma linha liberada por item de equipamento de ~metade dos chamados."""
+    rnd = random.Random(seed)
+    liberados = set(c for c in chamados_da_carteira(df_carteira) if rnd.random() < 0.5)
+    df = df_carteira[df_carteira["Chamado"].isin(liberados)]
+    qtd = pd.to_numeric(df["Qtd"], errors="coerce").fillna(1)
+    unit = pd.Series([round(rnd.uniform(20, 900), 2) for _ in range(len(df))], index=df.index)
+    return pd.DataFrame({
+        "CHAMADO": df["Chamado"], "CODIGO_DO_PONTO": df["Cód. Agência"], "NOME_PONTO": df["Nome Agência"],
+        "UFAGENCIA": df["UF"], "CIDADEAGENCIA": "CIDADE", "NOME_SISTEMA": df["Sistema"],
+        "SERVICO": df["Serviço"], "TIPO_SERVICO": df["Serviço"], "CODIGO_DO_EQUIPAMENTO": df["Código"],
+        "NOME_EQUIPAMENTO": df["Descrição Equipamento"], "QUANTIDADE_LIBERADA": qtd, "VALORUNITARIO": unit,
+        "TOTAL": (qtd * unit).round(2), "PROTOCOLOATENDIMENTO": [str(rnd.randint(10**8, 10**9)) for _ in range(len(df))],
+        "NOME_PROJETO": df["Projeto"], "NOMEUSUARIO": "SISTEMA",
+    }).reset_index(drop=True)
+
+
+def para_xlsx(df, nome="planilha.xlsx"):
+    """Serializa como .xlsx em memória, com .name como um arquivo do st.file_uploader."""
+    buffer = io.BytesIO()
+    df.to_excel(buffer, index=False, engine="openpyxl")
+    buffer.seek(0)
+    buffer.name = nome
+    return buffer
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--linhas", type=int, default=10_000)
+    parser.add_argument("--saida", default=".")
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    os.makedirs(args.saida, exist_ok=True)
+    carteira = gerar_carteira(args.linhas, seed=args.seed)
+    chamados = chamados_da_carteira(carteira)
+    arquivos = {
+        f"carteira_{args.linhas}.xlsx": carteira,
+        f"pedidos_{args.linhas}.xlsx": gerar_pedidos(chamados, args.seed),
+        f"books_{args.linhas}.xlsx": gerar_books(chamados, args.seed),
+        f"liberacao_{args.linhas}.xlsx": gerar_liberacao(carteira, args.seed),
+    }
+    for nome, df in arquivos.items():
+        caminho = os.path.join(args.saida, nome)
+        df.to_excel(caminho, index=False, engine="openpyxl")
+        print(f"{caminho}: {len(df)} linhas")
+
+
+if __name__ == "__main__":
+    main()
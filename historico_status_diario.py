@@ -0,0 +1,69 @@
+"""
+Grava o histórico diário de status (fato_status_diario) sem navegador (cron / timer do systemd).
+
+Completa os dias que faltam até ontem, como o dashboard de Indicadores fazia
+ao abrir. Analista e projeto de cada dia entram como estão na hora da
+gravação, por isso o job deve rodar todo dia, logo depois da meia-noite.
+Lê o banco do .streamlit/secrets.toml do projeto (o script roda a partir da
+própria pasta). Duas execuções ao mesmo tempo (ou o app) esperam uma pela
+outra no banco.
+
+Código de saída: 0 em dia (gravou ou não havia o que gravar), 2 erro de
+configuração ou banco.
+
+Uso:
+    python historico_status_diario.py
+    python historico_status_diario.py --inicio 2026-09-01 --fim 2026-09-30   # regrava um período
+
+Exemplo de crontab (todo dia, 0h10):
+    10 0 * * *  /caminho/venv/bin/python /caminho/projeto/historico_status_diario.py >> /var/log/historico_status_diario.log 2>&1
+"""
+import argparse
+import logging
+import os
+import sys
+import time
+from datetime import date
+
+log = logging.getLogger("historico_status_diario")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--inicio", type=date.fromisoformat, default=None, help="primeiro dia AAAA-MM-DD (padrão: o dia após o último gravado)")
+    parser.add_argument("--fim", type=date.fromisoformat, default=None, help="último dia AAAA-MM-DD (padrão: ontem)")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+    if args.fim and not args.inicio:
+        log.error("--fim precisa de --inicio."); return 2
+
+    os.chdir(os.path.dirname(os.path.abspath(__file__))) # .streamlit/secrets.toml e imports do projeto
+    sys.path.insert(0, os.getcwd())
+    inicio = time.perf_counter()
+
+    import streamlit.config
+    import streamlit.logger
+    streamlit.config.get_option("logger.level") # Lê a config agora: depois ela não volta o nível do log
+    streamlit.logger.set_log_level("error") # Avisos de "sem sessão/runtime": aqui não há um
+    import utils_chamados
+    import utils_indicadores
+
+    if utils_chamados.get_valid_conn() is None:
+        log.error("Sem conexão com o PostgreSQL (confira [postgres] no .streamlit/secrets.toml)."); return 2
+    utils_indicadores.criar_tabela_fato_status_diario()
+
+    try:
+        dias = utils_indicadores.gravar_fato_status_diario(args.inicio, args.fim)
+    except Exception:
+        log.exception("Falha ao gravar o histórico diário de status (nada foi gravado)")
+        return 2
+
+    if dias: log.info("%d dia(s) gravado(s): %s a %s", len(dias), dias[0].strftime('%d/%m/%Y'), dias[-1].strftime('%d/%m/%Y'))
+    else: log.info("Histórico já estava em dia")
+    log.info("total %.0f ms", (time.perf_counter() - inicio) * 1000)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
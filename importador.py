@@ -1,6 +1,7 @@
 import streamlit as st
 import pandas as pd
-import utils # Importa nosso arquivo de utilidades com a conexão já estabelecida
+import utils # Importa nosso arquivo de utilidades (a conexão abre no primeiro uso)
+import utils_importacao
 import json
 
 st.set_page_config(page_title="Importador de Dados", layout="wide")
@@ -16,7 +17,7 @@ with st.expander("1. Importar Projetos", expanded=True):
     st.write("Antes de importar, você pode limpar todos os projetos existentes para evitar duplicatas.")
     if st.button("🗑️ Limpar Todos os Projetos Antigos", type="primary"):
         try:
-            with utils.conn.cursor() as cur:
+            with utils.get_db_connection().cursor() as cur:
                 cur.execute("DELETE FROM projetos;")
             st.success("Tabela de projetos limpa com sucesso! Agora você pode importar os dados.")
         except Exception as e:
@@ -26,7 +27,7 @@ with st.expander("1. Importar Projetos", expanded=True):
 
     if uploaded_file_projetos:
         try:
-            df_projetos = pd.read_excel(uploaded_file_projetos)
+            df_projetos = utils_importacao.ler_excel(uploaded_file_projetos)
             st.write("Pré-visualização dos dados a serem importados:")
             st.dataframe(df_projetos.head())
 
@@ -53,7 +54,7 @@ with st.expander("1. Importar Projetos", expanded=True):
                     total_rows = len(df_para_inserir)
                     success_count = 0
                     
-                    with utils.conn.cursor() as cur:
+                    with utils.get_db_connection().cursor() as cur:
                         for index, row in df_para_inserir.iterrows():
                             # Converte dados que precisam ser JSON para o formato correto
                             for col_json in ['log_agendamento', 'etapas_concluidas']:
@@ -92,7 +93,7 @@ with st.expander("2. Importar Configurações e Usuários"):
         if uploaded_file_config:
             if st.button("▶️ Iniciar Importação das Configurações"):
                 try:
-                    xls = pd.ExcelFile(uploaded_file_config)
+                    xls = utils_importacao.abrir_excel(uploaded_file_config)
                     abas_config = ['status', 'agencias', 'projetos_nomes', 'tecnicos', 'sla', 'perguntas', 'etapas_evolucao']
                     count_success = 0
                     with st.spinner("Importando abas de configuração..."):
@@ -112,9 +113,9 @@ with st.expander("2. Importar Configurações e Usuários"):
         if uploaded_file_users:
             if st.button("▶️ Iniciar Importação dos Usuários"):
                 try:
-                    df_users = pd.read_excel(uploaded_file_users)
+                    df_users = utils_importacao.ler_excel(uploaded_file_users)
                     with st.spinner("Importando usuários..."):
-                        with utils.conn.cursor() as cur:
+                        with utils.get_db_connection().cursor() as cur:
                             cur.execute("DELETE FROM usuarios;") # Limpa usuários antigos
                             for _, row in df_users.iterrows():
                                 cur.execute("INSERT INTO usuarios (nome, email, senha) VALUES (%s, %s, %s)",
@@ -1,12 +1,16 @@
+import utils_perfil
+utils_perfil.inicio_pagina("Gestão de Projetos") # Antes dos demais imports: mede o custo de abrir a página
 import streamlit as st
 import pandas as pd
+import utils_banco
 import utils_chamados
 import utils # Para carregar listas de configuração
-import plotly.express as px
+import utils_importacao
 from datetime import date, timedelta, datetime
 import time
 import math
 import io
+utils_perfil.imports_prontos()
 
 st.set_page_config(page_title="Gestão de Projetos", page_icon="📊", layout="wide")
 utils.load_css()
@@ -60,6 +64,8 @@ if "logado" not in st.session_state or not st.session_state.logado:
     st.warning("Por favor, faça o login na página principal (app.py) antes de acessar esta página.")
     st.stop()
 
+utils_banco.preparar_banco()
+
 # --- UTILS LOCAIS ---
 SERVICOS_SEM_EQUIPAMENTO = [
    "vistoria", "adequação de gerador (recall)", "desinstalação total", "recolhimento de eqto",
@@ -86,7 +92,7 @@ def clean_val(val, default="N/A"):
 def open_chamado_dialog(row_dict):
     # Identifica Tipo
     n_chamado = str(row_dict.get('Nº Chamado', ''))
-    is_equip = '-e-' in n_chamado.lower() or '-E-' in n_chamado
+    is_equip = row_dict.get('Tipo_Chamado') == 'EQUIP'
 
     # Carrega Listas
     try:
@@ -288,157 +294,11 @@ def open_chamado_dialog(row_dict):
                             grupo_projeto.at[i, k] = v
                     
                     ids_grupo = grupo_projeto['ID'].tolist()
-                    calcular_e_atualizar_status_projeto(grupo_projeto, ids_grupo)
+                    utils_chamados.calcular_e_atualizar_status_projeto(grupo_projeto, ids_grupo)
 
                 st.toast("✅ Salvo e Atualizado com Sucesso!", icon="💾")
                 st.rerun()    
                 
-# --- LÓGICA DE STATUS: CHAMADO E PROJETO ---
-def calcular_e_atualizar_status_projeto(df_projeto, ids_para_atualizar):
-    """
-    1. Calcula o status individual de cada chamado (Sub-Status).
-    2. Calcula o status macro do projeto baseado no conjunto.
-    """
-    
-    updates_batch = {} 
-    chamados_calculados = [] 
-
-    for idx, row in df_projeto.iterrows():
-        n_chamado = str(row.get('Nº Chamado', ''))
-        is_equip = '-e-' in n_chamado.lower() or '-E-' in n_chamado
-        
-        # --- LEITURA DE DADOS ---
-        # Verifica se campos chave estão preenchidos
-        link_presente = row.get('Link Externo') and str(row.get('Link Externo')).strip() not in ['', 'nan', 'None']
-        n_pedido = row.get('Nº Pedido') and str(row.get('Nº Pedido')).strip() not in ['', 'nan', 'None']
-        
-        # Verifica se tem Técnico (NOVO CRITÉRIO)
-        tecnico_presente = row.get('Técnico') and str(row.get('Técnico')).strip() not in ['', 'nan', 'None']
-
-        # Banco de Dados
-        db_liberacao_banco = str(row.get('chk_financeiro_banco', '')).upper() == 'TRUE'
-        db_book_controle_sim = str(row.get('Book Enviado', '')).upper() == 'SIM'
-        
-        # Checkboxes UI
-        chk_cancelado = str(row.get('chk_cancelado', '')).upper() == 'TRUE'
-        chk_pend_eq = str(row.get('chk_pendencia_equipamento', '')).upper() == 'TRUE'
-        chk_pend_infra = str(row.get('chk_pendencia_infra', '')).upper() == 'TRUE'
-        chk_alteracao = str(row.get('chk_alteracao_chamado', '')).upper() == 'TRUE'
-        
-        chk_envio_parcial = str(row.get('chk_envio_parcial', '')).upper() == 'TRUE'
-        chk_entregue_total = str(row.get('chk_equipamento_entregue', '')).upper() == 'TRUE'
-        chk_followup = str(row.get('chk_status_enviado', '')).upper() == 'TRUE'
-
-        novo_sub_status = "Em análise"
-        
-        # --- LÓGICA INDIVIDUAL ---
-        
-        if chk_cancelado:
-            novo_sub_status = "Cancelado"
-        
-        elif db_liberacao_banco:
-            novo_sub_status = "Faturado"
-        
-        elif chk_pend_eq:
-            novo_sub_status = "Pendência de equipamento"
-        
-        elif chk_pend_infra:
-            novo_sub_status = "Pendência de Infra"
-        
-        elif chk_alteracao:
-            novo_sub_status = "Alteração do chamado"
-            
-        else:
-            # Fluxo Normal (Sem pendência ou cancelamento)
-            if is_equip:
-                # LÓGICA EQUIPAMENTO (-E-)
-                if chk_entregue_total:
-                    novo_sub_status = "Equipamento entregue"
-                elif chk_envio_parcial:
-                    novo_sub_status = "Equipamento enviado Parcial"
-                elif row.get('Data Envio') and pd.notna(row.get('Data Envio')):
-                    novo_sub_status = "Equipamento enviado"
-                elif n_pedido:
-                    novo_sub_status = "Aguardando envio"
-                else:
-                    novo_sub_status = "Solicitar equipamento"
-            
-            else:
-                # LÓGICA SERVIÇO (SEM -E-)
-                if db_book_controle_sim:
-                    novo_sub_status = "Aguardando Faturamento"
-                elif chk_followup:
-                    novo_sub_status = "Enviar Book"
-                elif tecnico_presente:
-                    # Se tem técnico mas não fez follow-up ainda -> Follow-up
-                    novo_sub_status = "Follow-up" 
-                elif link_presente:
-                    # Tem link mas não tem técnico -> Acionar técnico
-                    novo_sub_status = "Acionar técnico" 
-                else:
-                    # Não tem link -> Abrir chamado
-                    novo_sub_status = "Abrir chamado Btime" 
-
-        updates_batch[row['ID']] = {"Sub-Status": novo_sub_status}
-        
-        chamado_obj = {
-            "ID": row['ID'],
-            "Tipo": "EQUIP" if is_equip else "SERV",
-            "SubStatus": novo_sub_status,
-            "Cancelado": chk_cancelado,
-            "Faturado": db_liberacao_banco
-        }
-        chamados_calculados.append(chamado_obj)
-
-    # --- PARTE B: CALCULAR STATUS DO PROJETO (CABEÇALHO) ---
-    
-    total = len(chamados_calculados)
-    if total == 0: return False
-
-    ativos = [c for c in chamados_calculados if not c['Cancelado']]
-    faturados_count = sum(1 for c in ativos if c['Faturado'])
-    
-    status_projeto = "Não Iniciado"
-    
-    if len(ativos) == 0: # Todos cancelados
-        status_projeto = "Cancelado"
-    else:
-        # Definição dos critérios de Status Macro
-        todos_finalizados_banco = all(c['Faturado'] for c in ativos)
-        
-        def is_concluido(c):
-            s = c['SubStatus']
-            return s in ["Faturado", "Aguardando Faturamento", "Equipamento entregue", "Enviar Book"] 
-        
-        todos_concluidos = all(is_concluido(c) for c in ativos)
-        
-        def is_nao_iniciado(c):
-            s = c['SubStatus']
-            return s in ["Solicitar equipamento", "Abrir chamado Btime"]
-        
-        todos_nao_iniciados = all(is_nao_iniciado(c) for c in ativos)
-
-        if todos_finalizados_banco:
-            status_projeto = "Finalizado"
-        elif todos_concluidos:
-            status_projeto = "Concluído"
-        elif todos_nao_iniciados:
-            status_projeto = "Não Iniciado"
-        else:
-            status_projeto = "Em Andamento"
-    
-    # --- APLICAÇÃO DOS UPDATES ---
-    
-    # 1. Atualiza Sub-Status Individual
-    for cid, data in updates_batch.items():
-        utils_chamados.atualizar_chamado_db(cid, data)
-    
-    # 2. Atualiza Status Macro em todos
-    for row in chamados_calculados:
-        utils_chamados.atualizar_chamado_db(row['ID'], {"Status": status_projeto}) 
-              
-    return True
-    
 # --- FUNÇÕES DE IMPORTAÇÃO/EXPORTAÇÃO ---
 @st.dialog("Importar Chamados", width="large")
 def run_importer_dialog():
@@ -447,22 +307,14 @@ def run_importer_dialog():
 
     if uploaded_files:
         dfs_list = []
+        arquivos_ledger = [] # (checksum, tamanho, nome, linhas) dos arquivos que serão aplicados
         for uploaded_file in uploaded_files:
+            checksum, tamanho, pular = utils_importacao.verificar_arquivo_repetido(uploaded_file, "chamados")
+            if pular: continue
             try:
-                if uploaded_file.name.endswith('.csv'):
-                    try:
-                        df = pd.read_csv(uploaded_file, sep=';', header=0, dtype=str, encoding='utf-8-sig')
-                        if len(df.columns) < 5: 
-                            uploaded_file.seek(0)
-                            df = pd.read_csv(uploaded_file, sep=',', header=0, dtype=str, encoding='utf-8-sig')
-                    except:
-                        uploaded_file.seek(0)
-                        df = pd.read_csv(uploaded_file, sep=None, engine='python', header=0, dtype=str)
-                else:
-                    df = pd.read_excel(uploaded_file, header=0, dtype=str)
-                
-                df.dropna(how='all', inplace=True)
+                df = utils_importacao.ler_planilha_chamados(uploaded_file)
                 dfs_list.append(df)
+                arquivos_ledger.append((checksum, tamanho, uploaded_file.name, len(df)))
             except Exception as e:
                 st.error(f"Erro ao ler '{uploaded_file.name}': {e}")
                 return
@@ -472,55 +324,11 @@ def run_importer_dialog():
                 df_raw = pd.concat(dfs_list, ignore_index=True)
                 if len(df_raw.columns) < 12: st.error("Arquivo com colunas insuficientes."); return
 
-                dados_mapeados = {
-                    'Nº Chamado': df_raw.iloc[:, 0], 'Cód. Agência': df_raw.iloc[:, 1], 'Nome Agência': df_raw.iloc[:, 2],
-                    'agencia_uf': df_raw.iloc[:, 3], 'Analista': df_raw.iloc[:, 22] if len(df_raw.columns) > 22 else "",
-                    'Gestor': df_raw.iloc[:, 20] if len(df_raw.columns) > 20 else "", 'Serviço': df_raw.iloc[:, 4],
-                    'Projeto': df_raw.iloc[:, 5], 'Agendamento': df_raw.iloc[:, 6], 
-                    'Sistema': df_raw.iloc[:, 8], 
-                    'Cod_equipamento': df_raw.iloc[:, 9], 'Nome_equipamento': df_raw.iloc[:, 10], 'Qtd': df_raw.iloc[:, 11]
-                }
-                df_final = pd.DataFrame(dados_mapeados).fillna("")
-
-                def formatar_item(row):
-                    qtd = str(row['Qtd']).strip()
-                    desc = str(row['Nome_equipamento']).strip()
-                    if not desc: desc = str(row['Sistema']).strip()
-                    if not desc: return ""
-                    if qtd and qtd not in ["0", "nan", "", "None"]: return f"{qtd} - {desc}"
-                    return desc
-
-                df_final['Item_Formatado'] = df_final.apply(formatar_item, axis=1)
-
-                def juntar_textos(lista):
-                    limpos = [str(x) for x in lista if str(x).strip() not in ["", "nan", "None"]]
-                    return " | ".join(dict.fromkeys(limpos))
-
-                colunas_ignoradas_agg = ['Sistema', 'Qtd', 'Item_Formatado', 'Nome_equipamento', 'Cod_equipamento']
-                regras = {c: 'first' for c in df_final.columns if c not in colunas_ignoradas_agg}
-                regras['Sistema'] = 'first' 
-                regras['Item_Formatado'] = juntar_textos 
-                
-                df_grouped = df_final.groupby('Nº Chamado', as_index=False).agg(regras)
-                df_grouped['Equipamento'] = df_grouped['Item_Formatado']
-                df_grouped['Descrição'] = df_grouped['Item_Formatado']
+                df_final = utils_importacao.mapear_colunas_carteira(df_raw)
+                df_grouped = utils_importacao.agrupar_chamados_importados(df_final)
 
                 df_banco = utils_chamados.carregar_chamados_db()
-                lista_novos = []; lista_atualizar = []
-                
-                if not df_banco.empty:
-                    mapa_ids = dict(zip(df_banco['Nº Chamado'].astype(str).str.strip(), df_banco['ID']))
-                    for row in df_grouped.to_dict('records'):
-                        chamado_num = str(row['Nº Chamado']).strip()
-                        if not chamado_num or chamado_num.lower() == 'nan': continue
-                        if chamado_num in mapa_ids:
-                            row['ID_Banco'] = mapa_ids[chamado_num]
-                            lista_atualizar.append(row)
-                        else: lista_novos.append(row)
-                else: lista_novos = [r for r in df_grouped.to_dict('records') if str(r['Nº Chamado']).strip()]
-
-                df_insert = pd.DataFrame(lista_novos)
-                df_update = pd.DataFrame(lista_atualizar)
+                df_insert, df_update = utils_importacao.separar_novos_e_existentes(df_grouped, df_banco)
 
                 c1, c2 = st.columns(2)
                 c1.metric("🆕 Criar Novos", len(df_insert))
@@ -530,43 +338,35 @@ def run_importer_dialog():
 
                 if st.button("🚀 Processar Importação"):
                     bar = st.progress(0); status_txt = st.empty()
+                    ins_ok, ins_qtd, upd_qtd = True, 0, 0
                     
                     if not df_insert.empty:
                         status_txt.text("Inserindo novos chamados...")
-                        utils_chamados.bulk_insert_chamados_db(df_insert)
+                        ins_ok, ins_qtd = utils_chamados.bulk_insert_chamados_db(df_insert)
                     bar.progress(30)
                     
                     if not df_update.empty:
                         status_txt.text("Atualizando dados básicos e equipamentos...")
-                        total = len(df_update)
-                        for i, row in enumerate(df_update.to_dict('records')):
-                            updates = {
-                                'Sistema': row['Sistema'], 
-                                'Equipamento': row['Equipamento'],
-                                'Descrição': row['Descrição'],
-                                'Serviço': row['Serviço'], 'Projeto': row['Projeto'],
-                                'Agendamento': row['Agendamento'], 'Analista': row['Analista'], 'Gestor': row['Gestor']
-                            }
-                            utils_chamados.atualizar_chamado_db(row['ID_Banco'], updates)
-                            if total > 0: bar.progress(30 + int((i / total) * 30))
+                        upd_qtd = utils_importacao.atualizar_chamados_existentes(df_update, lambda f: bar.progress(30 + int(f * 30)))
                     else: bar.progress(60)
 
                     status_txt.text("🔄 Aplicando regras automáticas de Status...")
-                    df_todos = utils_chamados.carregar_chamados_db()
-                    chamados_imp = df_grouped['Nº Chamado'].astype(str).str.strip().tolist()
-                    df_afetados = df_todos[df_todos['Nº Chamado'].astype(str).str.strip().isin(chamados_imp)]
-                    
-                    if not df_afetados.empty:
-                        total_calc = len(df_afetados); passo = 0
-                        for num_chamado, grupo in df_afetados.groupby('Nº Chamado'):
-                            ids_grupo = grupo['ID'].tolist()
-                            calcular_e_atualizar_status_projeto(grupo, ids_grupo)
-                            passo += len(grupo)
-                            bar.progress(min(60 + int((passo / total_calc) * 40), 100))
+                    status_ok = utils_importacao.recalcular_status_importados(df_grouped, lambda f: bar.progress(min(60 + int(f * 40), 100)))
                     
                     bar.progress(100); status_txt.text("Concluído!")
+                    # Ledger com o resultado real: importação com falha fica como ERRO e pode ser reenviada
+                    falhas = []
+                    if not ins_ok: falhas.append(f"inserção de {len(df_insert)} chamados falhou")
+                    if upd_qtd < len(df_update): falhas.append(f"{len(df_update) - upd_qtd} de {len(df_update)} atualizações falharam")
+                    if not status_ok: falhas.append("regras de status não gravaram em todos os chamados")
+                    for checksum, tamanho, nome_arq, linhas in arquivos_ledger:
+                        utils_importacao.registrar_importacao(checksum, "chamados", nome_arq, tamanho, linhas, ins_qtd + upd_qtd,
+                                                              not falhas, "; ".join(falhas))
+                    st.cache_data.clear()
+                    if falhas:
+                        st.error(f"Importação incompleta: {'; '.join(falhas)}. O arquivo pode ser reenviado."); return
                     st.success("Importação e Automação finalizadas!"); time.sleep(1.5)
-                    st.cache_data.clear(); st.rerun()
+                    st.rerun()
 
             except Exception as e: st.error(f"Erro no processamento: {e}")
 
@@ -582,6 +382,8 @@ def run_pedido_importer_dialog():
     uploaded_pedidos = st.file_uploader("Planilha de Pedidos (.xlsx/.csv)", type=["xlsx", "csv"], key="ped_up_key")
     
     if uploaded_pedidos:
+        checksum, tamanho, pular = utils_importacao.verificar_arquivo_repetido(uploaded_pedidos, "pedidos")
+        if pular: return
         try:
             if uploaded_pedidos.name.endswith('.csv'): 
                 df_ped = pd.read_csv(uploaded_pedidos, sep=';', header=0, dtype=str)
@@ -589,7 +391,7 @@ def run_pedido_importer_dialog():
                     uploaded_pedidos.seek(0)
                     df_ped = pd.read_csv(uploaded_pedidos, sep=',', header=0, dtype=str)
             else: 
-                df_ped = pd.read_excel(uploaded_pedidos, header=0, dtype=str)
+                df_ped = utils_importacao.ler_excel(uploaded_pedidos, header=0, dtype=str)
             
             # Normaliza colunas (Remove espaços e coloca maiúsculo)
             df_ped.columns = [str(c).strip().upper() for c in df_ped.columns]
@@ -615,41 +417,13 @@ def run_pedido_importer_dialog():
                         # Mapa: Nome do Chamado (Excel) -> ID Interno (Banco)
                         id_map = df_bd.set_index('Nº Chamado')['ID'].to_dict()
                         
-                        count = 0
-                        total = len(df_ped)
                         bar = st.progress(0)
+                        count, falhas = utils_importacao.aplicar_planilha_pedidos(df_ped, id_map, bar.progress)
+                        total = len(df_ped)
                         
-                        for i, row in df_ped.iterrows():
-                            chamado_key = str(row['CHAMADO']).strip()
-                            
-                            if chamado_key in id_map:
-                                internal_id = id_map[chamado_key]
-                                updates = {}
-                                
-                                # Processa Pedido
-                                if tem_pedido:
-                                    val_ped = str(row['PEDIDO']).strip()
-                                    if val_ped and val_ped.lower() not in ['nan', 'none', '']:
-                                        updates['Nº Pedido'] = val_ped
-                                        
-                                # Processa Data Envio
-                                if tem_data:
-                                    val_dt = str(row['DATA_ENVIO']).strip()
-                                    if val_dt and val_dt.lower() not in ['nan', 'none', '']:
-                                        # Tenta converter a data
-                                        try:
-                                            dt_obj = pd.to_datetime(val_dt, dayfirst=True).date()
-                                            updates['Data Envio'] = dt_obj
-                                        except:
-                                            pass # Se falhar a data, ignora ou grava string se preferir
-                                
-                                # Se tiver algo para atualizar, chama o banco
-                                if updates:
-                                    utils_chamados.atualizar_chamado_db(internal_id, updates)
-                                    count += 1
-                            
-                            bar.progress((i + 1) / total)
-                        
+                        utils_importacao.registrar_importacao(checksum, "pedidos", uploaded_pedidos.name, tamanho, total, count,
+                                                              falhas == 0, f"{falhas} atualizações falharam" if falhas else "")
+                        if falhas: st.error(f"{falhas} chamados não foram atualizados ({count} gravados). O arquivo pode ser reenviado."); st.stop()
                         st.success(f"✅ {count} chamados atualizados com sucesso!")
                         time.sleep(1.5)
                         st.cache_data.clear() 
@@ -673,6 +447,8 @@ def run_link_importer_dialog():
     uploaded_links = st.file_uploader("Planilha de Links (.xlsx/.csv)", type=["xlsx", "csv"], key="link_up_key")
     
     if uploaded_links:
+        checksum, tamanho, pular = utils_importacao.verificar_arquivo_repetido(uploaded_links, "links")
+        if pular: return
         try:
             # Leitura do arquivo (lógica padrão)
             if uploaded_links.name.endswith('.csv'): 
@@ -681,7 +457,7 @@ def run_link_importer_dialog():
                     uploaded_links.seek(0)
                     df_link = pd.read_csv(uploaded_links, sep=',', header=0, dtype=str)
             else: 
-                df_link = pd.read_excel(uploaded_links, header=0, dtype=str)
+                df_link = utils_importacao.ler_excel(uploaded_links, header=0, dtype=str)
             
             # Normaliza colunas para Maiúsculo
             df_link.columns = [str(c).strip().upper() for c in df_link.columns]
@@ -701,7 +477,7 @@ def run_link_importer_dialog():
                         # Mapa: Chamado -> ID Interno
                         id_map = df_bd.set_index('Nº Chamado')['ID'].to_dict()
                         
-                        count = 0
+                        count = falhas = 0
                         total = len(df_link)
                         bar = st.progress(0)
                         
@@ -713,11 +489,14 @@ def run_link_importer_dialog():
                             if chamado_key in id_map and link_val and link_val.lower() not in ['nan', 'none', '']:
                                 internal_id = id_map[chamado_key]
                                 # Chama o atualizador do banco
-                                utils_chamados.atualizar_chamado_db(internal_id, {'Link Externo': link_val})
-                                count += 1
+                                if utils_chamados.atualizar_chamado_db(internal_id, {'Link Externo': link_val}): count += 1
+                                else: falhas += 1
                             
                             bar.progress((i + 1) / total)
                         
+                        utils_importacao.registrar_importacao(checksum, "links", uploaded_links.name, tamanho, total, count,
+                                                              falhas == 0, f"{falhas} atualizações falharam" if falhas else "")
+                        if falhas: st.error(f"{falhas} links não foram gravados ({count} gravados). O arquivo pode ser reenviado."); st.stop()
                         st.success(f"✅ {count} links atualizados!")
                         time.sleep(1.5)
                         st.rerun()
@@ -787,7 +566,7 @@ with st.sidebar:
                 count_mudou = 0
                 for num_chamado, grupo in df_todos.groupby('Nº Chamado'):
                     ids_grupo = grupo['ID'].tolist()
-                    if calcular_e_atualizar_status_projeto(grupo, ids_grupo):
+                    if utils_chamados.calcular_e_atualizar_status_projeto(grupo, ids_grupo):
                         count_mudou += 1
                 st.success(f"Processo finalizado! {count_mudou} projetos tiveram status alterado.")
                 time.sleep(2)
@@ -1239,8 +1018,7 @@ else:
                         cc = utils_chamados.get_status_color(r.get('Status', ''))
                         sv = (str(r.get('Serviço', ''))[:20] + '..') if len(str(r.get('Serviço', ''))) > 22 else r.get('Serviço', '')
                         an = str(r.get('Analista', 'N/D')).split(' ')[0].upper()
-                        ag = str(r.get('Cód. Agência', '')).split('.')[0]
+                        ag = '' if pd.isna(r.get('Agencia_Cod')) else r.get('Agencia_Cod')
                         st.markdown(f"""<div style="background:white; border-left:4px solid {cc}; padding:6px; margin-bottom:6px; box-shadow:0 1px 2px #eee; font-size:0.8em;"><b>{sv}</b><br><div style="display:flex; justify-content:space-between; margin-top:4px;"><span>🏠 {ag}</span><span style="background:#E3F2FD; color:#1565C0; padding:1px 4px; border-radius:3px; font-weight:bold;">{an}</span></div></div>""", unsafe_allow_html=True)
 
-
-
+utils_perfil.fim_pagina()
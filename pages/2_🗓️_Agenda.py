@@ -1,128 +1,86 @@
+import utils_perfil
+utils_perfil.inicio_pagina("Agenda") # Antes dos demais imports: mede o custo de abrir a página
 import streamlit as st
 import utils  # Mantemos para o CSS
 import utils_chamados # <--- IMPORTANTE: O arquivo da Pag 7
 import html
-import pandas as pd
-from datetime import date
+from datetime import date, timedelta
 
 # Dependência opcional
 try:
     from streamlit_calendar import calendar
 except Exception:
     calendar = None
+utils_perfil.imports_prontos()
 
 st.set_page_config(page_title="Agenda - GESTÃO", page_icon="🗓️", layout="wide")
 utils.load_css()
 
-def tela_calendario():
-    st.markdown("<div class='section-title-center'>AGENDA DE PROJETOS</div>", unsafe_allow_html=True)
-    
-    # 1. CARREGA DA MESMA FONTE DA PAG 7
-    df = utils_chamados.carregar_chamados_db()
-    
-    # Garante que o DataFrame não está vazio
-    if df.empty:
-        st.info("Nenhum projeto encontrado para exibir na agenda.")
-        return
+VISOES = {"Mês": "dayGridMonth", "Semana (lista)": "listWeek"}
 
-    # Filtro de Analista
-    lista_analistas = ["Todos"] + sorted(df['Analista'].dropna().unique().tolist())
-    analista_selecionado = st.selectbox("Filtrar por Analista:", lista_analistas)
+def janela_visivel(ref, visao):
+    """
+    (inicio, fim exclusive) dos dias que o calendário mostra em torno de ref:
+    no mês, a grade de 6 semanas começando no domingo (pt-br); na lista, a semana.
+    """
+    if visao == "listWeek":
+        inicio = ref - timedelta(days=(ref.weekday() + 1) % 7)
+        return inicio, inicio + timedelta(days=7)
+    primeiro = ref.replace(day=1)
+    inicio = primeiro - timedelta(days=(primeiro.weekday() + 1) % 7)
+    return inicio, inicio + timedelta(days=42)
 
-    if analista_selecionado != "Todos":
-        df_filtrado = df[df['Analista'] == analista_selecionado]
+def navegar(passo):
+    """Avança/volta um mês ou uma semana (passo = +1/-1); 0 volta para hoje."""
+    ref = st.session_state.agenda_ref
+    if passo == 0: st.session_state.agenda_ref = date.today()
+    elif VISOES[st.session_state.agenda_visao] == "listWeek": st.session_state.agenda_ref = ref + timedelta(weeks=passo)
     else:
-        df_filtrado = df
-    
-    st.divider()
-    
-    # 2. TRATAMENTO DE DATAS
-    df_filtrado['Agendamento'] = pd.to_datetime(df_filtrado['Agendamento'], errors='coerce')
+        mes = ref.month - 1 + passo
+        st.session_state.agenda_ref = date(ref.year + mes // 12, mes % 12 + 1, 1)
 
-    # Remove agendamentos vazios
-    df_calendario = df_filtrado.dropna(subset=['Agendamento']).copy()
+def tela_calendario():
+    st.markdown("<div class='section-title-center'>AGENDA DE PROJETOS</div>", unsafe_allow_html=True)
 
-    if df_calendario.empty:
-        st.info("Nenhum projeto com data de agendamento para exibir (com o filtro atual).")
-        return
-        
     if calendar is None:
         st.error("ERRO: O componente de calendário não está instalado.")
         return
 
-    # --- 3. AGRUPAMENTO ---
-    # Convertemos colunas para string
-    cols_to_str = ['Nº Chamado', 'Descrição', 'Status', 'Sub-Status', 'Analista', 'Técnico', 'Cód. Agência'] # Adicionei Cód. Agência aqui por segurança
-    for c in cols_to_str:
-        if c in df_calendario.columns:
-            df_calendario[c] = df_calendario[c].astype(str)
+    # 1. FILTROS (analistas e eventos vêm do banco já filtrados, com cache por versão dos chamados)
+    lista_analistas = ["Todos"] + utils_chamados.listar_analistas_agenda()
+    c_an, c_vis = st.columns([2, 1])
+    analista_selecionado = c_an.selectbox("Filtrar por Analista:", lista_analistas)
+    c_vis.radio("Visão:", list(VISOES), horizontal=True, key="agenda_visao")
+
+    # 2. NAVEGAÇÃO: o calendário só recebe os eventos da janela visível
+    if "agenda_ref" not in st.session_state: st.session_state.agenda_ref = date.today()
+    c_ant, c_hoje, c_prox, _ = st.columns([1, 1, 1, 6])
+    c_ant.button("◀", on_click=navegar, args=(-1,), use_container_width=True)
+    c_hoje.button("Hoje", on_click=navegar, args=(0,), use_container_width=True)
+    c_prox.button("▶", on_click=navegar, args=(1,), use_container_width=True)
+
+    visao = VISOES[st.session_state.agenda_visao]
+    ref = st.session_state.agenda_ref
+    inicio, fim = janela_visivel(ref, visao)
+    analista = None if analista_selecionado == "Todos" else analista_selecionado
+    eventos = utils_chamados.carregar_eventos_agenda(analista, inicio, fim)
+
+    st.divider()
+    if not eventos:
+        st.caption("Nenhum projeto agendado neste período (com o filtro atual).")
 
-    # Agrupa incluindo 'Cód. Agência' na chave para não perder essa informação
-    # Se uma agência tiver códigos diferentes para o mesmo nome (raro, mas possível), vai separar.
-    # Se preferir agrupar apenas por nome e pegar o primeiro código, mova 'Cód. Agência' para o dicionário agg com 'first'
-    
-    # Opção A: Agrupar por Código também (Mais seguro se tiver nomes iguais)
-    # df_agrupado = df_calendario.groupby(['Agendamento', 'Cód. Agência', 'Nome Agência', 'Projeto']).agg({ ...
-    
-    # Opção B: Manter agrupamento atual e pegar o código via 'first' (Mais simples para o código existente)
-    df_agrupado = df_calendario.groupby(['Agendamento', 'Nome Agência', 'Projeto']).agg({
-        'Nº Chamado': lambda x: ', '.join(sorted(set(x))), 
-        'Descrição': lambda x: ' | '.join(x),              
-        'Status': 'first',      
-        'Sub-Status': 'first',
-        'Analista': 'first',
-        'Técnico': 'first',
-        'ID': 'first',
-        'Cód. Agência': 'first' # <--- ADICIONADO: Pega o código da agência
-    }).reset_index()
-
-    # 4. MONTAGEM DOS EVENTOS
-    eventos = []
-    for _, row in df_agrupado.iterrows():
-        # Definição de cores
-        cor_evento = utils_chamados.get_status_color(row.get('Status'))
-        
-        # --- MUDANÇA AQUI: Combina Código e Nome ---
-        cod = str(row.get('Cód. Agência', '')).replace('.0', '').strip() # Remove decimal se houver
-        nome = str(row.get('Nome Agência', 'N/A')).strip()
-        
-        # Se o código já estiver no nome, não repete
-        if cod and cod not in nome:
-            nome_agencia_display = f"{cod} - {nome}"
-        else:
-            nome_agencia_display = nome
-            
-        nome_projeto = row.get('Projeto', 'N/A')
-        
-        eventos.append({
-            "title": f"{nome_agencia_display} - {nome_projeto}", # Usa o nome combinado
-            "color": cor_evento,
-            "start": row['Agendamento'].strftime('%Y-%m-%d'),
-            "end": row['Agendamento'].strftime('%Y-%m-%d'),
-            "allDay": True,
-            "extendedProps": {
-                "ID": str(row.get('ID', '')),
-                "Chamado": str(row.get('Nº Chamado', '')),
-                "Projeto": nome_projeto,
-                "Agência": nome_agencia_display, # Passa o nome combinado para o detalhe também
-                "Analista": str(row.get('Analista', '')),
-                "Técnico": str(row.get('Técnico', '')),
-                "Status": str(row.get('Status', '')),
-                "Sub-Status": str(row.get('Sub-Status', '')),
-                "Descrição": str(row.get('Descrição', ''))
-            }
-        })
-    
     opcoes_calendario = {
-        "headerToolbar": {"left": "prev,next today", "center": "title", "right": "dayGridMonth,listWeek"},
-        "initialView": "dayGridMonth", 
+        "headerToolbar": {"left": "", "center": "title", "right": ""}, # Navegação pelos botões acima
+        "initialView": visao,
+        "initialDate": ref.isoformat(),
         "locale": "pt-br",
         "buttonText": {"today": "hoje", "month": "mês", "week": "semana", "list": "lista"},
         "navLinks": True,
         "selectable": True
     }
-    
-    state = calendar(events=eventos, options=opcoes_calendario, key="calendario_geral")
+
+    # A chave muda com a janela: o componente remonta já na data escolhida
+    state = calendar(events=eventos, options=opcoes_calendario, key=f"calendario_geral_{visao}_{inicio}")
     
     # 5. EXIBIÇÃO DOS DETALHES
     if state and state.get("eventClick"):
@@ -160,3 +118,5 @@ if st.sidebar.button("Logout", key="logout_agenda_geral"):
     st.session_state.clear(); st.rerun()
 
 tela_calendario()
+
+utils_perfil.fim_pagina()
@@ -1,59 +1,24 @@
+import utils_perfil
+utils_perfil.inicio_pagina("Indicadores") # Antes dos demais imports: mede o custo de abrir a página
 import streamlit as st
 import pandas as pd
 import utils
+import utils_banco
 import utils_chamados
+import utils_indicadores
+import utils_sla
 from datetime import date, datetime, timedelta
-
-# Tenta importar Plotly
-try:
-    import plotly.express as px
-except ImportError:
-    px = None
+utils_perfil.imports_prontos()
 
 st.set_page_config(page_title="Indicadores - GESTÃO", page_icon="📊", layout="wide")
 utils.load_css()
+utils_banco.preparar_banco()
 
 def tela_dashboard():
     st.markdown("<div class='section-title-center'>DASHBOARD DE INDICADORES</div>", unsafe_allow_html=True)
     
-    # --- 1. CARREGAMENTO ---
-    df_raw = utils_chamados.carregar_chamados_db()
-
-    if df_raw.empty:
-        st.info("Nenhum dado disponível.")
-        return
-    
-    if px is None:
-        st.error("Erro: Plotly não instalado.")
-        return
-
-    # --- 2. TRATAMENTO DE DATAS ---
-    # Converte tudo para datetime do Pandas e força erros virarem NaT
-    for col in ['Agendamento', 'Fechamento', 'Abertura']:
-        if col in df_raw.columns:
-            df_raw[col] = pd.to_datetime(df_raw[col], errors='coerce')
-
-    # --- 3. AGRUPAMENTO (VISÃO DE PROJETO) ---
-    # Transforma linhas de equipamentos em 1 linha por projeto
-    
-    # Preenche vazios essenciais para o agrupamento
-    df_raw['Nome Agência'] = df_raw['Nome Agência'].fillna('N/A')
-    df_raw['Projeto'] = df_raw['Projeto'].fillna('Geral')
-    
-    agg_rules = {
-        'Status': 'first',
-        'Sub-Status': 'first',
-        'Analista': 'first',
-        'Fechamento': 'first',
-        'Abertura': 'first',
-        'Nº Chamado': 'first',
-        'ID': 'first'
-    }
-    
-    # Agrupa
-    df_proj = df_raw.groupby(['Agendamento', 'Nome Agência', 'Projeto'], dropna=False).agg(agg_rules).reset_index()
-
-    # --- 4. FILTROS ---
+    # --- 1. FILTROS ---
+    # (o histórico diário de status é gravado pelo historico_status_diario.py, no cron)
     st.markdown("#### 📅 Filtro de Período")
     
     c1, c2 = st.columns(2)
@@ -63,119 +28,66 @@ def tela_dashboard():
         d_inicio_input = st.date_input("De:", value=hoje - timedelta(days=30))
     with c2: 
         d_fim_input = st.date_input("Até:", value=hoje + timedelta(days=30))
-    
-    # Convertemos os inputs (date) para Timestamps (datetime64[ns])
-    ts_inicio = pd.to_datetime(d_inicio_input)
-    # Ajustamos o fim para pegar o final do dia (23:59:59)
-    ts_fim = pd.to_datetime(d_fim_input) + timedelta(hours=23, minutes=59, seconds=59)
 
-    # Filtra DataFrame Principal (Baseado no Agendamento)
-    mask_periodo = (df_proj['Agendamento'] >= ts_inicio) & (df_proj['Agendamento'] <= ts_fim)
-    df_filtrado = df_proj[mask_periodo].copy()
-    
-    if df_filtrado.empty:
-        st.warning("Nenhum projeto encontrado neste período de agendamento.")
+    # --- 2. AGREGAÇÕES (VISÃO DE PROJETO) ---
+    # Um projeto = chamados do mesmo agendamento, agência e projeto. O banco agrupa
+    # os agendados no período e devolve só as contagens dos cartões e gráficos.
+    painel = utils_indicadores.carregar_painel(d_inicio_input, d_fim_input)
+    if painel is None: return
+    kpis = painel['kpis']
 
-    # --- 5. CÁLCULO DE SLA E STATUS ---
-    status_fim = ['concluído', 'finalizado', 'faturado', 'fechado', 'equipamento entregue']
-    
-    def calcular_situacao(row):
-        status = str(row['Status']).lower()
-        agendamento = row['Agendamento']
-        fechamento = row['Fechamento']
-        
-        # 1. FINALIZADOS
-        if status in status_fim:
-            # Se tem data de fechamento e ela foi depois do agendamento -> Atrasou
-            if pd.notna(fechamento) and pd.notna(agendamento):
-                if fechamento > agendamento + timedelta(days=1): # Tolerância de 1 dia
-                    return "Finalizado com Atraso"
-            return "Finalizado no Prazo"
-        
-        # 2. CANCELADOS
-        if "cancelado" in status:
-            return "Cancelado"
-            
-        # 3. EM ABERTO
-        if pd.notna(agendamento):
-            if agendamento < hoje:
-                return "Em Aberto (Atrasado)"
-            return "Em Aberto (No Prazo)"
-        
-        return "Sem Data"
+    if kpis['total'] == 0:
+        st.info("Nenhum dado disponível: nenhum projeto agendado neste período.")
+        return
 
-    if not df_filtrado.empty:
-        df_filtrado['Situacao_SLA'] = df_filtrado.apply(calcular_situacao, axis=1)
-    else:
-        df_filtrado['Situacao_SLA'] = []
+    # Plotly (~80ms no primeiro import) só carrega quando o dashboard vai ser desenhado
+    try:
+        import plotly.express as px
+    except ImportError:
+        st.error("Erro: Plotly não instalado.")
+        return
 
-    # --- CORREÇÃO DO ERRO AQUI ---
-    # Separação dos DataFrames para KPIs
-    
-    # Abertos: Não Finalizados E Não Cancelados
-    # Usamos case=False dentro do contains em vez de .str.lower().contains
-    df_abertos = df_filtrado[
-        (~df_filtrado['Status'].str.lower().isin(status_fim)) & 
-        (~df_filtrado['Status'].str.contains('cancelado', case=False, na=False))
-    ]
-    
-    df_finalizados = df_filtrado[df_filtrado['Status'].str.lower().isin(status_fim)]
-    
-    # --- 6. CARTÕES (KPIs) ---
+    # --- 3. CARTÕES (KPIs) ---
     st.divider()
     
-    qtd_total = len(df_filtrado)
-    qtd_abertos = len(df_abertos)
-    
-    # Pendência (Busca texto parcial)
-    qtd_pendencia = len(df_filtrado[df_filtrado['Status'].str.contains("Pendencia|Pendência", na=False, case=False)])
-    
-    # SLA Global
-    fin_prazo = len(df_finalizados[df_finalizados['Situacao_SLA'] == "Finalizado no Prazo"])
-    fin_atraso = len(df_finalizados[df_finalizados['Situacao_SLA'] == "Finalizado com Atraso"])
-    
     k1, k2, k3, k4, k5 = st.columns(5)
-    k1.metric("Projetos (Período)", qtd_total)
-    k2.metric("Em Aberto", qtd_abertos)
-    k3.metric("Com Pendência", qtd_pendencia, delta_color="inverse")
-    k4.metric("Entregues no Prazo", fin_prazo, delta_color="normal")
-    k5.metric("Entregues Atrasados", fin_atraso, delta_color="inverse")
+    k1.metric("Projetos (Período)", kpis['total'])
+    k2.metric("Em Aberto", kpis['abertos'])
+    k3.metric("Com Pendência", kpis['pendencia'], delta_color="inverse")
+    k4.metric("Entregues no Prazo", kpis['fin_prazo'], delta_color="normal")
+    k5.metric("Entregues Atrasados", kpis['fin_atraso'], delta_color="inverse")
     
     st.divider()
 
-    # --- 7. GRÁFICOS ---
-    
+    # --- 4. GRÁFICOS ---
+    # Cada figura sai do cache de utils_indicadores.figura enquanto o período e os
+    # chamados não mudarem: as funções montar_* só rodam quando o gráfico é refeito.
+    st.session_state['tempos_figuras'] = {}
+    def grafico(nome, montar):
+        return utils_indicadores.figura(nome, d_inicio_input, d_fim_input, montar)
+
     # LINHA 1: SLA
     c_g1, c_g2 = st.columns(2)
     
-    cores_sla = {
-        "Finalizado no Prazo": "#2E7D32", 
-        "Finalizado com Atraso": "#F9A825", 
-        "Em Aberto (No Prazo)": "#1565C0", 
-        "Em Aberto (Atrasado)": "#C62828", 
-        "Cancelado": "#9E9E9E",
-        "Sem Data": "#607D8B"
-    }
+    cores_sla = utils_sla.CORES_SITUACAO
 
     with c_g1:
         st.subheader("📊 SLA Geral")
-        if not df_filtrado.empty:
-            sla_counts = df_filtrado['Situacao_SLA'].value_counts().reset_index()
-            sla_counts.columns = ['Situação', 'Qtd']
-            fig_sla = px.pie(sla_counts, names='Situação', values='Qtd', color='Situação',
-                             color_discrete_map=cores_sla, hole=0.4)
-            st.plotly_chart(fig_sla, use_container_width=True)
+        if kpis['total']:
+            def montar_sla():
+                return px.pie(painel['sla'], names='Situação', values='Qtd', color='Situação',
+                              color_discrete_map=cores_sla, hole=0.4)
+            st.plotly_chart(grafico('sla_geral', montar_sla), use_container_width=True)
         else:
             st.info("Sem dados.")
 
     with c_g2:
         st.subheader("👤 SLA por Analista")
-        if not df_filtrado.empty:
-            df_filtrado['Analista'] = df_filtrado['Analista'].fillna("Não Definido")
-            sla_analista = df_filtrado.groupby(['Analista', 'Situacao_SLA']).size().reset_index(name='Qtd')
-            fig_sla_ana = px.bar(sla_analista, x='Analista', y='Qtd', color='Situacao_SLA',
-                                 color_discrete_map=cores_sla, barmode='stack', text_auto=True)
-            st.plotly_chart(fig_sla_ana, use_container_width=True)
+        if kpis['total']:
+            def montar_sla_analista():
+                return px.bar(painel['sla_analista'], x='Analista', y='Qtd', color='Situacao_SLA',
+                              color_discrete_map=cores_sla, barmode='stack', text_auto=True)
+            st.plotly_chart(grafico('sla_analista', montar_sla_analista), use_container_width=True)
         else:
             st.info("Sem dados.")
 
@@ -186,21 +98,13 @@ def tela_dashboard():
     
     with c_g3:
         st.subheader("⏳ Aging (Projetos em Aberto)")
-        if not df_abertos.empty:
+        if kpis['abertos']:
             # Aging baseado na data de ABERTURA
-            df_aging = df_abertos.dropna(subset=['Abertura']).copy()
-            if not df_aging.empty:
-                df_aging['Dias Aberto'] = (hoje - df_aging['Abertura']).dt.days
-                bins = [-999, 15, 30, 60, 9999]
-                labels = ['0-15 dias', '16-30 dias', '31-60 dias', '+60 dias']
-                df_aging['Faixa'] = pd.cut(df_aging['Dias Aberto'], bins=bins, labels=labels)
-                
-                aging_counts = df_aging['Faixa'].value_counts().sort_index().reset_index()
-                aging_counts.columns = ['Faixa', 'Qtd']
-                
-                fig_aging = px.bar(aging_counts, x='Faixa', y='Qtd', text_auto=True,
-                                   color_discrete_sequence=['#FF7043'])
-                st.plotly_chart(fig_aging, use_container_width=True)
+            if kpis['abertos_com_abertura']:
+                def montar_aging():
+                    return px.bar(painel['aging'], x='Faixa', y='Qtd', text_auto=True,
+                                  color_discrete_sequence=['#FF7043'])
+                st.plotly_chart(grafico('aging', montar_aging), use_container_width=True)
             else:
                 st.info("Projetos abertos sem data de abertura cadastrada.")
         else:
@@ -208,13 +112,13 @@ def tela_dashboard():
 
     with c_g4:
         st.subheader("📌 Status")
-        if not df_filtrado.empty:
-            st_counts = df_filtrado['Status'].value_counts().reset_index()
-            st_counts.columns = ['Status', 'Qtd']
-            cores_st = {s: utils_chamados.get_status_color(s) for s in st_counts['Status']}
-            fig_st = px.pie(st_counts, names='Status', values='Qtd', color='Status',
-                            color_discrete_map=cores_st, hole=0.4)
-            st.plotly_chart(fig_st, use_container_width=True)
+        if kpis['total']:
+            def montar_status():
+                st_counts = painel['status']
+                cores_st = {s: utils_chamados.get_status_color(s) for s in st_counts['Status']}
+                return px.pie(st_counts, names='Status', values='Qtd', color='Status',
+                              color_discrete_map=cores_st, hole=0.4)
+            st.plotly_chart(grafico('status', montar_status), use_container_width=True)
         else:
             st.info("Sem dados.")
 
@@ -223,27 +127,84 @@ def tela_dashboard():
     # LINHA 3: HISTÓRICO DE ENTREGAS
     st.subheader("📅 Histórico de Entregas (Data de Fechamento)")
     
-    # Filtra projetos finalizados da base total (df_proj) que tenham data de fechamento
-    df_entregas = df_proj[
-        df_proj['Status'].str.lower().isin(status_fim) & 
-        pd.notna(df_proj['Fechamento'])
-    ].copy()
-    
-    # Aplica o filtro de data SOBRE A DATA DE FECHAMENTO (usando Timestamp seguro)
-    mask_entregas = (df_entregas['Fechamento'] >= ts_inicio) & (df_entregas['Fechamento'] <= ts_fim)
-    df_entregas_filtrado = df_entregas[mask_entregas]
-    
-    if not df_entregas_filtrado.empty:
-        df_entregas_filtrado['Mes'] = df_entregas_filtrado['Fechamento'].dt.strftime('%d/%m')
-        entregas_dia = df_entregas_filtrado['Mes'].value_counts().sort_index().reset_index()
-        entregas_dia.columns = ['Dia/Mês', 'Qtd Entregue']
-        
-        fig_evolucao = px.bar(entregas_dia, x='Dia/Mês', y='Qtd Entregue', text_auto=True)
-        fig_evolucao.update_traces(marker_color='#00695C')
-        st.plotly_chart(fig_evolucao, use_container_width=True)
+    # Projetos finalizados (de qualquer agendamento) com data de fechamento no período
+    if not painel['entregas'].empty:
+        def montar_entregas():
+            fig_evolucao = px.bar(painel['entregas'], x='Dia/Mês', y='Qtd Entregue', text_auto=True)
+            fig_evolucao.update_traces(marker_color='#00695C')
+            return fig_evolucao
+        st.plotly_chart(grafico('entregas', montar_entregas), use_container_width=True)
     else:
         st.info("Nenhuma entrega registrada (Data de Fechamento) neste período.")
 
+    st.divider()
+
+    # LINHA 4: TENDÊNCIAS (fato_status_diario: uma linha por dia, sem reler os logs)
+    st.subheader("📈 Tendências (Histórico Diário)")
+    c_t1, c_t2 = st.columns([1, 3])
+    dimensao = c_t1.selectbox("Quebrar por:", list(utils_indicadores.DIMENSOES_FATO), key="dim_tendencia")
+    df_tend = utils_indicadores.carregar_tendencia(d_inicio_input, min(d_fim_input, hoje.date()), dimensao)
+
+    if not df_tend.empty:
+        def montar_tendencia():
+            cores_tend = cores_sla if dimensao == 'Situação SLA' else None
+            if dimensao == 'Status':
+                cores_tend = {s: utils_chamados.get_status_color(s) for s in df_tend['Status'].unique()}
+            return px.line(df_tend, x='dia', y='qtd', color=dimensao, color_discrete_map=cores_tend,
+                           labels={'dia': 'Dia', 'qtd': 'Chamados'})
+        c_t2.plotly_chart(grafico(f'tendencia_{dimensao}', montar_tendencia), use_container_width=True)
+
+        # Atrasados no fim de cada semana
+        df_atraso = utils_indicadores.carregar_tendencia(d_inicio_input, min(d_fim_input, hoje.date()), 'Situação SLA')
+        df_atraso = df_atraso[df_atraso['Situação SLA'] == "Em Aberto (Atrasado)"].set_index('dia')['qtd']
+        if not df_atraso.empty:
+            st.markdown("##### 🚨 Em aberto atrasados (fim de semana)")
+            def montar_atrasados():
+                semanal = df_atraso.resample('W').last().dropna().reset_index()
+                semanal.columns = ['Semana', 'Qtd']
+                fig_atraso = px.bar(semanal, x='Semana', y='Qtd', text_auto=True)
+                fig_atraso.update_traces(marker_color=cores_sla["Em Aberto (Atrasado)"])
+                return fig_atraso
+            st.plotly_chart(grafico('atrasados_semana', montar_atrasados), use_container_width=True)
+    else:
+        c_t2.info("Sem histórico gravado neste período (os dias são gravados pelo historico_status_diario.py, no cron).")
+
+    st.divider()
+
+    # LINHA 5: FATIAS (cubo de chamados: filtrar e reagrupar não voltam ao banco nem aos chamados)
+    st.subheader("🧊 Fatias dos Chamados")
+    cubo = utils_chamados.carregar_cubo()
+    if cubo is not None:
+        dims = utils_chamados.DIMENSOES_CUBO
+        c_f = st.columns(len(dims))
+        filtros = {dim: c_f[i].multiselect(rotulo, cubo.opcoes(dim), key=f"fatia_{dim}")
+                   for i, (rotulo, dim) in enumerate(dims.items())}
+        por = st.selectbox("Agrupar por:", list(dims), key="fatia_por")
+
+        fatia = cubo.filtrar(**filtros)
+        totais = fatia.totais()
+        f1, f2, f3, f4 = st.columns(4)
+        f1.metric("Chamados", totais['total'])
+        f2.metric("Concluídos", totais['concluidos'])
+        f3.metric("Atrasados", totais['atrasados'], delta_color="inverse")
+        f4.metric("Valor (LPU)", f"R$ {totais['valor']:,.2f}")
+
+        df_fatia = fatia.agrupar(dims[por]).sort_values('total', ascending=False, kind='stable')
+        df_fatia[dims[por]] = df_fatia[dims[por]].fillna('Não Definido')
+        df_fatia = df_fatia.rename(columns={
+            dims[por]: por, 'total': 'Chamados', 'concluidos': 'Concluídos', 'atrasados': 'Atrasados',
+            'vencendo': 'Vencendo (5 dias)', 'valor': 'Valor (R$)'})
+        if not df_fatia.empty:
+            c_d1, c_d2 = st.columns([2, 3])
+            c_d1.dataframe(df_fatia, hide_index=True, use_container_width=True)
+            c_d2.plotly_chart(px.bar(df_fatia, x=por, y=['Concluídos', 'Atrasados'], barmode='group'), use_container_width=True)
+        else:
+            st.info("Nenhum chamado nesta fatia.")
+
+    with st.expander("⏱️ Tempo dos gráficos (última renderização)"):
+        tempos = st.session_state.get('tempos_figuras', {})
+        st.dataframe(pd.DataFrame.from_dict(tempos, orient='index'), use_container_width=True)
+
 # --- CONTROLE DE LOGIN ---
 if "logado" not in st.session_state or not st.session_state.logado:
     st.warning("Faça login na página principal.")
@@ -255,3 +216,5 @@ if st.sidebar.button("Logout", key="logout_dash_v4"):
     st.session_state.clear(); st.rerun()
 
 tela_dashboard()
+
+utils_perfil.fim_pagina()
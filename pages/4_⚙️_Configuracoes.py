@@ -1,6 +1,9 @@
+import utils_perfil
+utils_perfil.inicio_pagina("Configurações") # Antes dos demais imports: mede o custo de abrir a página
 import streamlit as st
 import pandas as pd
 import utils # Importa nosso arquivo de utilidades
+utils_perfil.imports_prontos()
 
 st.set_page_config(page_title="Configurações - GESTÃO", page_icon="⚙️", layout="wide")
 utils.load_css()
@@ -104,10 +107,20 @@ def tela_gerenciar_listas():
                 else:
                     st.error(f"Falha ao salvar a lista de {tab_title}.")
 
+def tela_desempenho():
+    st.markdown("#### ⏱️ Inicialização das Páginas")
+    st.caption("Medido neste processo do servidor. A primeira execução de cada página inclui o custo dos imports (cold start); as seguintes reaproveitam os módulos já carregados.")
+    perfis = utils_perfil.relatorio()
+    if not perfis:
+        st.info("Nenhuma página medida ainda neste processo.")
+        return
+    st.dataframe(pd.DataFrame.from_dict(perfis, orient='index').rename_axis('Página'), use_container_width=True)
+
 def tela_configuracoes():
     st.title("⚙️ Configurações do Sistema")
     
-    config_options = {"Gerenciar Listas de Opções": tela_gerenciar_listas, "Gerenciar Prazos de SLA": tela_sla}
+    config_options = {"Gerenciar Listas de Opções": tela_gerenciar_listas, "Gerenciar Prazos de SLA": tela_sla,
+                      "Desempenho das Páginas": tela_desempenho}
     menu_tabs = st.tabs(list(config_options.keys()))
     
     for i, tab_title in enumerate(config_options.keys()):
@@ -125,3 +138,5 @@ if st.sidebar.button("Logout", use_container_width=True, key="logout_config"):
     st.rerun()
 
 tela_configuracoes()
+
+utils_perfil.fim_pagina()
@@ -1,12 +1,17 @@
+import utils_perfil
+utils_perfil.inicio_pagina("Financeiro") # Antes dos demais imports: mede o custo de abrir a página
 import streamlit as st
 import pandas as pd
+import utils_banco
 import utils_chamados
 import utils_financeiro
+import utils_importacao
 import utils
 import time
 import math
 import io
 from datetime import date
+utils_perfil.imports_prontos()
 
 st.set_page_config(page_title="Gestão Financeira", page_icon="💸", layout="wide")
 utils.load_css()
@@ -29,80 +34,32 @@ if "logado" not in st.session_state or not st.session_state.logado:
     st.stop()
 
 # --- INICIALIZAÇÃO DE TABELAS ---
-utils_financeiro.criar_tabelas_lpu()
-utils_financeiro.criar_tabela_books()
-utils_financeiro.criar_tabela_liberacao()
+utils_banco.preparar_banco() # Uma vez por processo (cache)
+utils_financeiro.manter_resumo_financeiro() # Valores pendentes e virada de mês: uma vez por mês
 
-if 'pag_fin_atual' not in st.session_state: st.session_state.pag_fin_atual = 0
+# Paginação por chave: última agência de cada página já visitada (None = início)
+if 'fin_cursores' not in st.session_state: st.session_state.fin_cursores = [None]
 
 # ==============================================================================
 # 1. FUNÇÕES AUXILIARES (MOVIDAS PARA O TOPO)
 # ==============================================================================
 
-def formatar_agencia_excel(id_agencia, nome_agencia):
-    try:
-        id_agencia_limpo = str(id_agencia).split('.')[0]
-        id_str = f"AG {int(id_agencia_limpo):04d}"
-    except: id_str = str(id_agencia).strip()
-    nome_str = str(nome_agencia).strip()
-    if nome_str.startswith(id_agencia_limpo): nome_str = nome_str[len(id_agencia_limpo):].strip(" -")
-    return f"{id_str} - {nome_str}"
-
 @st.cache_data(ttl=60)
 def carregar_dados_fin():
-    df_chamados = utils_chamados.carregar_chamados_db()
+    df_chamados = utils_chamados.carregar_chamados_db() # Agencia_Combinada já vem do banco (coluna gerada)
     
-    # Cria coluna combinada se possível
-    if not df_chamados.empty and 'Cód. Agência' in df_chamados.columns and 'Nome Agência' in df_chamados.columns:
-        df_chamados['Agencia_Combinada'] = df_chamados.apply(lambda x: formatar_agencia_excel(x['Cód. Agência'], x['Nome Agência']), axis=1)
+    # Valor pela LPU já vem gravado no chamado (chamados.valor_calculado)
+    if 'Valor_Calculado' in df_chamados.columns:
+        df_chamados['Valor_Calculado'] = pd.to_numeric(df_chamados['Valor_Calculado'], errors='coerce').fillna(0.0)
     elif not df_chamados.empty:
-        df_chamados['Agencia_Combinada'] = "N/A"
+        df_chamados['Valor_Calculado'] = 0.0
     
     return (
         df_chamados,
-        utils_financeiro.carregar_lpu_fixo(),
-        utils_financeiro.carregar_lpu_servico(),
-        utils_financeiro.carregar_lpu_equipamento(),
         utils_financeiro.carregar_books_db(),
         utils_financeiro.carregar_liberacao_db()
     )
 
-def calcular_valor_linha(row, lpu_f, lpu_s, lpu_e):
-    serv = str(row.get('Serviço', '')).strip().lower()
-    equip = str(row.get('Equipamento', '')).strip().lower()
-    qtd = pd.to_numeric(row.get('Qtd.', 0), errors='coerce')
-    if pd.isna(qtd) or qtd == 0: qtd = 1
-    
-    if serv in lpu_f: return lpu_f[serv]
-    if equip in lpu_s:
-        keywords_desinst = ['desativacao', 'desinstalação', 'desinstalacao']
-        if any(x in serv for x in keywords_desinst): return lpu_s[equip].get('desativacao', 0.0) * qtd
-        keywords_reinst = ['reinstalacao', 'reinstalação', 'instalação nova', 'instalacao nova', 'remanejamento']
-        if any(x in serv for x in keywords_reinst): return lpu_s[equip].get('reinstalacao', 0.0) * qtd
-    if equip in lpu_e: return lpu_e.get(equip, 0.0) * qtd
-    return 0.0
-
-def definir_status_financeiro(row, dict_books_info, set_liberados):
-    chamado_id = str(row['Nº Chamado']).strip()
-    
-    # 1. FATURADO (PAGO)
-    if chamado_id in set_liberados: 
-        return "FATURADO (Pago)", "#2E7D32" # Verde Escuro
-
-    # 2. PENDENTE FATURAMENTO
-    if chamado_id in dict_books_info:
-        info_book = dict_books_info[chamado_id]
-        book_pronto = str(info_book.get('book_pronto', '')).strip().upper() == 'SIM'
-        tem_data_envio = str(info_book.get('data_envio', '')).strip() not in ['', 'nan', 'None']
-        
-        if book_pronto or tem_data_envio:
-            return "PENDENTE FATURAMENTO", "#FB8C00" # Laranja
-        else:
-            return "PENDENTE ENVIO BOOK", "#C62828" # Vermelho
-            
-    # 3. POTENCIAL
-    return "POTENCIAL", "#1565C0" # Azul
-
 # ==============================================================================
 # 2. SIDEBAR E INTERFACE
 # ==============================================================================
@@ -114,24 +71,12 @@ with st.sidebar:
     if st.button("📊 Baixar Relatório Financeiro (.xlsx)"):
         with st.spinner("Gerando planilha financeira..."):
             # AGORA A FUNÇÃO JÁ EXISTE POIS FOI DEFINIDA ACIMA
-            df_raw, lpu_f, lpu_s, lpu_e, df_books, df_lib = carregar_dados_fin()
+            df_raw, df_books, df_lib = carregar_dados_fin()
             
             if not df_raw.empty:
-                df_raw['Valor_Total'] = df_raw.apply(lambda x: calcular_valor_linha(x, lpu_f, lpu_s, lpu_e), axis=1)
+                df_raw['Valor_Total'] = df_raw['Valor_Calculado']
                 
-                set_liberados = set(df_lib['chamado'].astype(str).str.strip()) if not df_lib.empty else set()
-                dict_books_info = {}
-                if not df_books.empty:
-                    df_books.columns = [c.upper().strip() for c in df_books.columns]
-                    for _, row_b in df_books.iterrows():
-                        ch = str(row_b.get('CHAMADO', '')).strip()
-                        pronto = row_b.get('BOOK PRONTO?', row_b.get('BOOK PRONTO', row_b.get('PRONTO', '')))
-                        dt_env = row_b.get('DATA ENVIO', row_b.get('ENVIO', ''))
-                        dict_books_info[ch] = {'book_pronto': pronto, 'data_envio': dt_env}
-                
-                df_raw['Status_KPI_Fin'] = df_raw.apply(
-                    lambda x: definir_status_financeiro(x, dict_books_info, set_liberados)[0], axis=1
-                )
+                df_raw['Status_KPI_Fin'] = utils_financeiro.classificar_status_financeiro(df_raw, df_books, df_lib)['Status_Fin']
                 
                 colunas_fin = [
                     'Nº Chamado', 'Status_KPI_Fin', 'Valor_Total', 
@@ -205,75 +150,72 @@ with st.sidebar:
     else:
         st.info("Base de Liberação vazia.")
 
+    # 4. Conferência do valor gravado x LPU atual
+    st.divider()
+    st.header("🔎 Conferir Valores LPU")
+    if st.button("Comparar valor gravado x recalculado", use_container_width=True):
+        df_div = utils_financeiro.verificar_valores_calculados()
+        if df_div.empty: st.success("Todos os valores gravados conferem com a LPU atual.")
+        else:
+            st.warning(f"{len(df_div)} chamados com valor divergente.")
+            st.dataframe(df_div, hide_index=True, use_container_width=True)
+    if st.button("🧩 Equipamentos fora da LPU", use_container_width=True):
+        df_sem_lpu = utils_financeiro.equipamentos_sem_preco()
+        if df_sem_lpu.empty: st.success("Todos os equipamentos dos chamados estão na LPU.")
+        else:
+            st.warning(f"{len(df_sem_lpu)} equipamentos sem preço na LPU.")
+            st.dataframe(df_sem_lpu, hide_index=True, use_container_width=True)
+    if st.button("♻️ Recalcular todos os valores", use_container_width=True):
+        ok, qtd = utils_financeiro.recalcular_valores_chamados()
+        if ok: st.success(f"{qtd} chamados com valor atualizado."); time.sleep(1); st.rerun()
+
 
-# --- MAIN: CARREGAMENTO DOS DADOS PARA O PAINEL ---
+# --- MAIN: KPIs DO TOPO (AGREGADOS NO BANCO) ---
 st.markdown("<div class='section-title-center'>PAINEL FINANCEIRO (KPIS DO ANO)</div>", unsafe_allow_html=True)
 
-with st.spinner("Processando dados financeiros..."):
-    # AGORA FUNCIONA PORQUE A FUNÇÃO JÁ FOI LIDA PELO PYTHON
-    df_chamados_raw, lpu_f, lpu_s, lpu_e, df_books, df_lib = carregar_dados_fin()
+_, col_ano, _ = st.columns([2, 1, 2])
+with col_ano:
+    ano_kpi = st.selectbox("Ano (abertura do chamado)", ["Todos"] + utils_financeiro.carregar_anos_chamados(), key="fin_ano_kpi")
+kpis = utils_financeiro.carregar_kpis_financeiros(None if ano_kpi == "Todos" else int(ano_kpi))
 
-if df_chamados_raw.empty:
-    st.warning("Sem dados. Importe chamados primeiro."); st.stop()
+k_fat = kpis['FATURADO (Pago)']; k_env = kpis['BOOKS ENVIADOS']; k_pend_fat = kpis['PENDENTE FATURAMENTO']
+k_pend_book = kpis['PENDENTE ENVIO BOOK']; k_pot = kpis['POTENCIAL']
 
-# --- PROCESSAMENTO DO DASHBOARD ---
-df_chamados_raw['Valor_Calculado'] = df_chamados_raw.apply(lambda x: calcular_valor_linha(x, lpu_f, lpu_s, lpu_e), axis=1)
+# --- EXIBIÇÃO DOS CARDS (5 COLUNAS) ---
+c1, c2, c3, c4, c5 = st.columns(5)
 
-# Dados Auxiliares
-set_liberados = set(df_lib['chamado'].astype(str).str.strip()) if not df_lib.empty else set()
-dict_books_info = {}
-ids_books_enviados_total = set()
+c1.metric("💰 Total Pago (Banco)", f"R$ {k_fat['valor']:,.2f}", f"{k_fat['qtd']} chamados")
+c2.metric("📤 Books Enviados (Total)", f"R$ {k_env['valor']:,.2f}", f"{k_env['qtd']} chamados", help="Soma de tudo que foi marcado como Enviado na planilha de books, pago ou não.")
+c3.metric("⏳ Pendente Recebimento", f"R$ {k_pend_fat['valor']:,.2f}", f"{k_pend_fat['qtd']} chamados", delta_color="off", help="Enviado mas ainda não consta na planilha do banco.")
+c4.metric("🚨 Pendente Envio Book", f"R$ {k_pend_book['valor']:,.2f}", f"{k_pend_book['qtd']} chamados", delta_color="inverse", help="Está na planilha de books mas sem SIM ou Data.")
+c5.metric("📈 Potencial (Aberto)", f"R$ {k_pot['valor']:,.2f}", f"{k_pot['qtd']} chamados", delta_color="normal")
 
-if not df_books.empty:
-    df_books.columns = [c.upper().strip() for c in df_books.columns]
-    for _, row_b in df_books.iterrows():
-        ch = str(row_b.get('CHAMADO', '')).strip()
-        pronto = row_b.get('BOOK PRONTO?', row_b.get('BOOK PRONTO', row_b.get('PRONTO', '')))
-        dt_env = row_b.get('DATA ENVIO', row_b.get('ENVIO', ''))
-        
-        dict_books_info[ch] = {'book_pronto': pronto, 'data_envio': dt_env}
-        
-        # Lógica para "Total Enviado"
-        is_sim = str(pronto).strip().upper() == 'SIM'
-        has_date = str(dt_env).strip() not in ['', 'nan', 'None']
-        if is_sim or has_date:
-            ids_books_enviados_total.add(ch)
-
-# Aplica Status Visual
-df_chamados_raw[['Status_Fin', 'Cor_Fin']] = df_chamados_raw.apply(
-    lambda x: pd.Series(definir_status_financeiro(x, dict_books_info, set_liberados)), axis=1
-)
-
-# --- CÁLCULO DOS KPIS ---
-df_faturado = df_chamados_raw[df_chamados_raw['Status_Fin'] == 'FATURADO (Pago)']
-df_pend_fat = df_chamados_raw[df_chamados_raw['Status_Fin'] == 'PENDENTE FATURAMENTO']
-df_pend_book = df_chamados_raw[df_chamados_raw['Status_Fin'] == 'PENDENTE ENVIO BOOK']
-df_potencial = df_chamados_raw[df_chamados_raw['Status_Fin'] == 'POTENCIAL']
-
-val_faturado = df_faturado['Valor_Calculado'].sum()
-val_pend_fat = df_pend_fat['Valor_Calculado'].sum()
-val_pend_book = df_pend_book['Valor_Calculado'].sum()
-val_potencial = df_potencial['Valor_Calculado'].sum()
-
-# KPI Extra: Total Enviado
-mask_total_enviados = df_chamados_raw['Nº Chamado'].astype(str).str.strip().isin(ids_books_enviados_total)
-df_total_enviados = df_chamados_raw[mask_total_enviados]
-val_total_enviados = df_total_enviados['Valor_Calculado'].sum()
-qtd_total_enviados = len(df_total_enviados)
-
-qtd_faturado = len(df_faturado)
-qtd_pend_fat = len(df_pend_fat)
-qtd_pend_book = len(df_pend_book)
-qtd_potencial = len(df_potencial)
+# --- EVOLUÇÃO MENSAL (SNAPSHOTS DOS MESES FECHADOS + MÊS ABERTO) ---
+with st.expander("📅 Evolução mensal (Faturado x Potencial)"):
+    ag_evol = st.selectbox("Agência", ["Todas"] + utils_financeiro.carregar_agencias_financeiro(), key="fin_ag_evol")
+    df_evol = utils_financeiro.carregar_evolucao_financeira(None if ano_kpi == "Todos" else int(ano_kpi), None if ag_evol == "Todas" else ag_evol)
 
-# --- EXIBIÇÃO DOS CARDS (5 COLUNAS) ---
-c1, c2, c3, c4, c5 = st.columns(5)
+    if df_evol.empty:
+        st.info("Sem chamados com data de abertura no período.")
+    else:
+        serie = df_evol.pivot_table(index='Periodo', columns='Status_Fin', values='Valor', aggfunc='sum')
+        serie = serie.reindex(columns=['FATURADO (Pago)', 'POTENCIAL'], fill_value=0.0).fillna(0.0)
+        serie.index = pd.to_datetime(serie.index)
+
+        atual = serie.iloc[-1]
+        anterior = serie.iloc[-2] if len(serie) > 1 else pd.Series(0.0, index=serie.columns)
+        m1, m2, m3 = st.columns(3)
+        m1.metric(f"💰 Faturado {serie.index[-1]:%m/%Y}", f"R$ {atual['FATURADO (Pago)']:,.2f}", f"{atual['FATURADO (Pago)'] - anterior['FATURADO (Pago)']:+,.2f} vs mês anterior")
+        m2.metric(f"📈 Potencial {serie.index[-1]:%m/%Y}", f"R$ {atual['POTENCIAL']:,.2f}", f"{atual['POTENCIAL'] - anterior['POTENCIAL']:+,.2f} vs mês anterior", delta_color="off")
+        m3.metric("💰 Faturado acumulado", f"R$ {serie['FATURADO (Pago)'].sum():,.2f}", f"{len(serie)} meses", delta_color="off")
+
+        st.line_chart(serie, color=["#2E7D32", "#1565C0"])
 
-c1.metric("💰 Total Pago (Banco)", f"R$ {val_faturado:,.2f}", f"{qtd_faturado} chamados")
-c2.metric("📤 Books Enviados (Total)", f"R$ {val_total_enviados:,.2f}", f"{qtd_total_enviados} chamados", help="Soma de tudo que foi marcado como Enviado na planilha de books, pago ou não.")
-c3.metric("⏳ Pendente Recebimento", f"R$ {val_pend_fat:,.2f}", f"{qtd_pend_fat} chamados", delta_color="off", help="Enviado mas ainda não consta na planilha do banco.")
-c4.metric("🚨 Pendente Envio Book", f"R$ {val_pend_book:,.2f}", f"{qtd_pend_book} chamados", delta_color="inverse", help="Está na planilha de books mas sem SIM ou Data.")
-c5.metric("📈 Potencial (Aberto)", f"R$ {val_potencial:,.2f}", f"{qtd_potencial} chamados", delta_color="normal")
+# --- AGÊNCIAS DO RESUMO (LISTA DETALHADA) ---
+lista_agencias = utils_financeiro.carregar_agencias_financeiro()
+
+if not lista_agencias:
+    st.warning("Sem dados. Importe chamados primeiro."); st.stop()
 
 st.divider()
 
@@ -282,28 +224,10 @@ col_sync, col_info = st.columns([1, 4])
 with col_sync:
     if st.button("🔄 Sincronizar Tudo", help="Atualiza a Página 7 com base nestes KPIs."):
         with st.spinner("Aplicando regras financeiras na gestão..."):
-            df_bd = utils_chamados.carregar_chamados_db()
-            id_map = df_bd.set_index('Nº Chamado')['ID'].to_dict()
-            
-            count_ops = 0
-            for index, row in df_chamados_raw.iterrows():
-                chamado_num = str(row['Nº Chamado'])
-                status_kpi = row['Status_Fin']
-                
-                if chamado_num in id_map:
-                    updates = {}
-                    if status_kpi == 'FATURADO (Pago)':
-                        updates = {'Status': 'Finalizado', 'Sub-Status': 'Faturado', 'chk_financeiro_banco': 'TRUE', 'chk_financeiro_book': 'TRUE'}
-                    elif status_kpi == 'PENDENTE FATURAMENTO':
-                        updates = {'Status': 'Finalizado', 'Sub-Status': 'Aguardando faturamento', 'chk_financeiro_book': 'TRUE'}
-                    elif status_kpi == 'PENDENTE ENVIO BOOK':
-                        updates = {'Status': 'Finalizado', 'Sub-Status': 'Enviar Book'}
-
-                    if updates:
-                        utils_chamados.atualizar_chamado_db(id_map[chamado_num], updates)
-                        count_ops += 1
-
-            st.toast(f"{count_ops} chamados sincronizados!", icon="✅"); time.sleep(1); st.rerun()
+            ok, alterados = utils_financeiro.sincronizar_status_financeiro()
+            if ok:
+                resumo = " | ".join(f"{status}: {qtd}" for status, qtd in alterados.items())
+                st.toast(f"{sum(alterados.values())} chamados sincronizados! ({resumo})", icon="✅"); time.sleep(1); st.rerun()
 
 with col_info:
     st.info("Este botão aplica os status dos KPIs acima lá na tela de Gestão de Projetos (Pág 7).")
@@ -316,10 +240,14 @@ with st.expander("⚙️ Importações (LPU, Books, Liberação)"):
     
     with tab1:
         up_lpu = st.file_uploader("LPU (.xlsx)", type=["xlsx"], key="up_lpu")
-        if up_lpu and st.button("Importar LPU"):
+        pular_lpu = False
+        if up_lpu: chk_lpu, tam_lpu, pular_lpu = utils_importacao.verificar_arquivo_repetido(up_lpu, "lpu")
+        if up_lpu and not pular_lpu and st.button("Importar LPU"):
             try:
-                xls = pd.read_excel(up_lpu, sheet_name=None)
+                xls = utils_importacao.ler_excel(up_lpu, sheet_name=None)
                 suc, msg = utils_financeiro.importar_lpu(xls.get('Valores fixo', pd.DataFrame()), xls.get('Serviço', pd.DataFrame()), xls.get('Equipamento', pd.DataFrame()))
+                linhas_lpu = sum(len(d) for d in xls.values())
+                utils_importacao.registrar_importacao(chk_lpu, "lpu", up_lpu.name, tam_lpu, linhas_lpu, linhas_lpu if suc else 0, suc, msg)
                 if suc: st.success(msg); st.cache_data.clear(); time.sleep(1); st.rerun()
                 else: st.error(msg)
             except Exception as e: st.error(f"Erro: {e}")
@@ -327,116 +255,83 @@ with st.expander("⚙️ Importações (LPU, Books, Liberação)"):
     with tab2:
         st.info("Importe a planilha de Controle de Books. O sistema verificará as colunas 'BOOK PRONTO?' e 'DATA ENVIO'.")
         up_bk = st.file_uploader("Books (.xlsx/.csv)", type=["xlsx", "csv"], key="up_bk")
-        if up_bk and st.button("Importar Books"):
+        pular_bk = False
+        if up_bk: chk_bk, tam_bk, pular_bk = utils_importacao.verificar_arquivo_repetido(up_bk, "books")
+        if up_bk and not pular_bk and st.button("Importar Books"):
             try:
-                df_b = pd.read_csv(up_bk, sep=';', dtype=str) if up_bk.name.endswith('.csv') else pd.read_excel(up_bk, dtype=str)
+                df_b = pd.read_csv(up_bk, sep=';', dtype=str) if up_bk.name.endswith('.csv') else utils_importacao.ler_excel(up_bk, dtype=str)
                 df_b.columns = [str(c).strip().upper() for c in df_b.columns]
-                
+
                 suc, msg = utils_financeiro.importar_planilha_books(df_b)
-                
-                if suc:
-                    st.success(msg)
-                    # Sincronia Rápida KPI
-                    df_bd = utils_chamados.carregar_chamados_db()
-                    id_map = df_bd.set_index('Nº Chamado')['ID'].to_dict()
-                    cnt = 0
-                    for _, r in df_b.iterrows():
-                        i_d = id_map.get(r.get('CHAMADO'))
-                        if i_d:
-                            current_row = df_bd[df_bd['ID'] == i_d].iloc[0]
-                            updates = {'Nº Protocolo': r.get('PROTOCOLO')}
-                            
-                            book_ok = str(r.get('BOOK PRONTO?', r.get('BOOK PRONTO', ''))).upper() == 'SIM'
-                            if book_ok:
-                                updates['chk_financeiro_book'] = 'TRUE'
-                                if pd.isna(current_row.get('Data Book Enviado')): updates['Data Book Enviado'] = date.today()
-
-                            dt_conc = pd.to_datetime(r.get('DATA CONCLUSAO'), errors='coerce')
-                            if not pd.isna(dt_conc): updates['Data Finalização'] = dt_conc
-
-                            utils_chamados.atualizar_chamado_db(i_d, updates)
-                            cnt += 1
-                    
-                    st.info(f"✅ {cnt} chamados atualizados com dados da planilha.")
-                    st.cache_data.clear(); time.sleep(1.5); st.rerun()
+                utils_importacao.registrar_importacao(chk_bk, "books", up_bk.name, tam_bk, len(df_b), len(df_b) if suc else 0, suc, msg)
+
+                if suc: st.success(msg); st.cache_data.clear(); time.sleep(1.5); st.rerun()
                 else: st.error(msg)
             except Exception as e: st.error(f"Erro: {e}")
 
     with tab3:
         st.info("Importe a planilha de Liberação (Banco). Chamados aqui viram 'Total Acumulado'.")
         up_lib = st.file_uploader("Liberação (.xlsx/.csv)", type=["xlsx", "csv"], key="up_lib")
-        if up_lib and st.button("Importar Liberação"):
+        pular_lib = False
+        if up_lib: chk_lib, tam_lib, pular_lib = utils_importacao.verificar_arquivo_repetido(up_lib, "liberacao")
+        if up_lib and not pular_lib and st.button("Importar Liberação"):
             try:
-                df_l = pd.read_csv(up_lib, sep=';', dtype=str) if up_lib.name.endswith('.csv') else pd.read_excel(up_lib, dtype=str)
+                df_l = pd.read_csv(up_lib, sep=';', dtype=str) if up_lib.name.endswith('.csv') else utils_importacao.ler_excel(up_lib, dtype=str)
                 df_l.columns = [str(c).strip().upper() for c in df_l.columns]
-                
+
                 suc, msg = utils_financeiro.importar_planilha_liberacao(df_l)
-                if suc:
-                    st.success(msg)
-                    # Sincronia Imediata
-                    df_bd = utils_chamados.carregar_chamados_db()
-                    id_map = df_bd.set_index('Nº Chamado')['ID'].to_dict()
-                    c_banco = 0
-                    for _, row in df_l.iterrows():
-                        ch = str(row.get('CHAMADO', '')).strip()
-                        if ch in id_map:
-                            i_d = id_map[ch]
-                            curr = df_bd[df_bd['ID'] == i_d].iloc[0]
-                            upd = {'Status Financeiro': 'FATURADO', 'chk_financeiro_banco': 'TRUE'}
-                            if pd.isna(curr.get('Data Faturamento')): upd['Data Faturamento'] = date.today()
-                            utils_chamados.atualizar_chamado_db(i_d, upd)
-                            c_banco += 1
-                    st.info(f"✅ {c_banco} chamados marcados como Faturado/Pago.")
-                    st.cache_data.clear(); time.sleep(1.5); st.rerun()
+                utils_importacao.registrar_importacao(chk_lib, "liberacao", up_lib.name, tam_lib, len(df_l), len(df_l) if suc else 0, suc, msg)
+                if suc: st.success(msg); st.cache_data.clear(); time.sleep(1.5); st.rerun()
                 else: st.error(msg)
             except Exception as e: st.error(f"Erro: {e}")
 
 # --- FILTROS E TABELA ---
+def voltar_primeira_pagina(): st.session_state.fin_cursores = [None]
+
 col_f1, col_f2, col_f3 = st.columns([2, 2, 4])
 with col_f1:
-    filtro_status_fin = st.multiselect("Filtrar KPI", options=df_chamados_raw['Status_Fin'].unique(), default=df_chamados_raw['Status_Fin'].unique(), on_change=lambda: st.session_state.update(pag_fin_atual=0))
+    opcoes_status = list(utils_financeiro.CORES_STATUS_FINANCEIRO)
+    filtro_status_fin = st.multiselect("Filtrar KPI", options=opcoes_status, default=opcoes_status, on_change=voltar_primeira_pagina)
 with col_f2:
-    filtro_agencia = st.selectbox("Filtrar Agência", options=["Todas"] + sorted(df_chamados_raw['Agencia_Combinada'].unique().tolist()), on_change=lambda: st.session_state.update(pag_fin_atual=0))
+    filtro_agencia = st.selectbox("Filtrar Agência", options=["Todas"] + lista_agencias, on_change=voltar_primeira_pagina)
 with col_f3:
-    busca = st.text_input("Busca Rápida", placeholder="Chamado, Protocolo, Valor...")
-    if busca: st.session_state.pag_fin_atual = 0
-
-df_view = df_chamados_raw[df_chamados_raw['Status_Fin'].isin(filtro_status_fin)]
-if filtro_agencia != "Todas": df_view = df_view[df_view['Agencia_Combinada'] == filtro_agencia]
-if busca:
-    t = busca.lower()
-    df_view = df_view[df_view.astype(str).apply(lambda x: x.str.lower().str.contains(t)).any(axis=1)]
-
-# PAGINAÇÃO
-lista_agencias_unicas = sorted(df_view['Agencia_Combinada'].unique())
-total_itens = len(lista_agencias_unicas)
+    busca = st.text_input("Busca Rápida", placeholder="Chamado, Protocolo, Valor...", on_change=voltar_primeira_pagina)
+
+filtros = dict(status_fin=tuple(filtro_status_fin), agencia=filtro_agencia, busca=busca or None)
+
+# PAGINAÇÃO (por chave, no resumo por agência: só as agências e chamados da página)
 ITENS_POR_PAGINA = 10
+total_itens = utils_financeiro.contar_agencias_financeiro(**filtros)
 total_paginas = math.ceil(total_itens / ITENS_POR_PAGINA)
-if st.session_state.pag_fin_atual >= total_paginas: st.session_state.pag_fin_atual = 0
-inicio = st.session_state.pag_fin_atual * ITENS_POR_PAGINA
-fim = inicio + ITENS_POR_PAGINA
-agencias_da_pagina = lista_agencias_unicas[inicio:fim]
+if len(st.session_state.fin_cursores) > max(1, total_paginas): voltar_primeira_pagina()
+pagina_atual = len(st.session_state.fin_cursores) - 1
+df_agencias_pagina = utils_financeiro.carregar_pagina_agencias(apos=st.session_state.fin_cursores[-1], limite=ITENS_POR_PAGINA, **filtros)
+agencias_da_pagina = df_agencias_pagina['agencia'].tolist() if not df_agencias_pagina.empty else []
 
 def nav_controls(key_prefix):
     c1, c2, c3, c4, c5 = st.columns([1, 1, 3, 1, 1])
     with c2:
-        if st.button("⬅️ Anterior", key=f"{key_prefix}_prev", disabled=(st.session_state.pag_fin_atual == 0)):
-            st.session_state.pag_fin_atual -= 1; st.rerun()
+        if st.button("⬅️ Anterior", key=f"{key_prefix}_prev", disabled=(pagina_atual == 0)):
+            st.session_state.fin_cursores.pop(); st.rerun()
     with c3:
-        st.markdown(f"<div style='text-align: center; padding-top: 5px;'>Página <strong>{st.session_state.pag_fin_atual + 1}</strong> de <strong>{max(1, total_paginas)}</strong></div>", unsafe_allow_html=True)
+        st.markdown(f"<div style='text-align: center; padding-top: 5px;'>Página <strong>{pagina_atual + 1}</strong> de <strong>{max(1, total_paginas)}</strong></div>", unsafe_allow_html=True)
     with c4:
-        if st.button("Próximo ➡️", key=f"{key_prefix}_next", disabled=(st.session_state.pag_fin_atual >= total_paginas - 1)):
-            st.session_state.pag_fin_atual += 1; st.rerun()
+        if st.button("Próximo ➡️", key=f"{key_prefix}_next", disabled=(pagina_atual >= total_paginas - 1 or not agencias_da_pagina)):
+            st.session_state.fin_cursores.append(agencias_da_pagina[-1]); st.rerun()
 
 st.divider()
 nav_controls("top")
 
-df_pagina = df_view[df_view['Agencia_Combinada'].isin(agencias_da_pagina)]
-agencias_view = df_pagina.groupby('Agencia_Combinada')
+df_pagina = utils_financeiro.carregar_chamados_das_agencias(tuple(agencias_da_pagina), filtros['status_fin'], filtros['busca'])
+agencias_view = df_pagina.groupby('Agencia_Combinada', sort=False)
+
+ultima_mov = df_agencias_pagina.set_index('agencia')['ultima_movimentacao'].to_dict() if agencias_da_pagina else {}
 
 for nome_agencia, df_ag in agencias_view:
     total_ag = df_ag['Valor_Calculado'].sum()
-    st.markdown(f"**🏦 {nome_agencia}** <span style='color:green; font-size:0.9em;'>(Total: R$ {total_ag:,.2f})</span>", unsafe_allow_html=True)
+    dt_mov = pd.to_datetime(ultima_mov.get(nome_agencia))
+    txt_mov = f" | Últ. movimentação: {dt_mov.strftime('%d/%m/%Y')}" if pd.notna(dt_mov) else ""
+    st.markdown(f"**🏦 {nome_agencia}** <span style='color:green; font-size:0.9em;'>(Total: R$ {total_ag:,.2f}{txt_mov})</span>", unsafe_allow_html=True)
     
     for _, row in df_ag.iterrows():
         chamado = row['Nº Chamado']
@@ -458,3 +353,5 @@ for nome_agencia, df_ag in agencias_view:
 if total_paginas > 1:
     st.divider()
     nav_controls("bottom")
+
+utils_perfil.fim_pagina()
@@ -1,14 +1,15 @@
+import utils_perfil
+utils_perfil.inicio_pagina("Assistente IA") # Antes dos demais imports: mede o custo de abrir a página
 import streamlit as st
 import pandas as pd
 import utils_chamados
 import utils
-import google.generativeai as genai
 from datetime import datetime, timedelta
 import json
 import re
 import time
-from fpdf import FPDF
 import io
+utils_perfil.imports_prontos()
 
 st.set_page_config(page_title="Agente IA", page_icon="🕵️", layout="wide")
 
@@ -27,14 +28,19 @@ st.markdown("""
 api_key = st.secrets.get("GOOGLE_API_KEY")
 if not api_key: st.error("🔑 Chave GOOGLE_API_KEY ausente."); st.stop()
 
-genai.configure(api_key=api_key)
-model = genai.GenerativeModel('gemini-flash-latest')
+@st.cache_resource(show_spinner=False)
+def carregar_modelo(api_key):
+    """Modelo Gemini; google.generativeai só é importado na primeira pergunta."""
+    import google.generativeai as genai
+    genai.configure(api_key=api_key)
+    return genai.GenerativeModel('gemini-flash-latest')
 
 # --- 3. FUNÇÃO GERADORA DE PDF ---
 def criar_pdf_chamado(id_chamado):
     df = utils_chamados.carregar_chamados_db()
     dados = df[df['ID'] == id_chamado].iloc[0]
     
+    from fpdf import FPDF # Só o comando gerar_pdf usa
     pdf = FPDF()
     pdf.add_page()
     pdf.set_font("Arial", size=12)
@@ -187,7 +193,7 @@ if prompt:
                 USUÁRIO DISSE: {prompt}
                 """
                 
-                response = model.generate_content(instrucao)
+                response = carregar_modelo(api_key).generate_content(instrucao)
                 texto_resp = response.text.strip()
                 
                 if "{" in texto_resp and '"acao":' in texto_resp:
@@ -222,6 +228,4 @@ if "logado" not in st.session_state or not st.session_state.logado:
     st.warning("Faça login na página principal.")
     st.stop()
 
-
-
-
+utils_perfil.fim_pagina()
@@ -0,0 +1,143 @@
+"""
+Relatório diário por e-mail sem navegador (cron / timer do systemd).
+
+Monta e envia o mesmo relatório do botão da página de Relatórios, lendo o
+banco e o SMTP do .streamlit/secrets.toml do projeto (o script roda a partir
+da própria pasta, de onde quer que seja chamado). Não sobe servidor: importa
+os módulos do app, envia, fecha as conexões SMTP e sai. O tempo de cada
+etapa vai para o log (stderr).
+
+Código de saída: 0 tudo enviado, 1 algum e-mail falhou, 2 erro de
+configuração, banco ou base vazia, 3 enviados mas o log_envio_email não foi
+gravado. Os erros de banco saem no log com a exceção.
+
+Uso:
+    python relatorio_diario.py --para gestor@empresa.com.br,coord@empresa.com.br
+    python relatorio_diario.py --individual --para gestor@empresa.com.br
+    python relatorio_diario.py --individual --sem-envio --salvar /tmp/relatorios
+
+Exemplo de crontab (dias úteis, 7h):
+    0 7 * * 1-5  /caminho/venv/bin/python /caminho/projeto/relatorio_diario.py --individual --para gestor@empresa.com.br >> /var/log/relatorio_diario.log 2>&1
+"""
+import argparse
+import logging
+import os
+import re
+import sys
+import time
+from contextlib import contextmanager
+from datetime import date, datetime
+
+log = logging.getLogger("relatorio_diario")
+
+
+@contextmanager
+def _etapa(nome, tempos):
+    """Cronometra uma etapa e registra no log."""
+    inicio = time.perf_counter()
+    yield
+    tempos[nome] = (time.perf_counter() - inicio) * 1000
+    log.info("%-18s %8.0f ms", nome, tempos[nome])
+
+
+def _salvar(pasta, mensagens):
+    """Grava o HTML de cada mensagem na pasta (consolidado.html, <analista>.html)."""
+    os.makedirs(pasta, exist_ok=True)
+    for m in mensagens:
+        nome = re.sub(r"[^\w.-]+", "_", str(m.get('analista') or "consolidado")).strip("_") or "sem_nome"
+        with open(os.path.join(pasta, f"{nome}.html"), "w", encoding="utf-8") as f:
+            f.write(m['corpo_html'])
+    log.info("%d arquivo(s) HTML em %s", len(mensagens), pasta)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--para", default="", help="e-mails do relatório consolidado, separados por vírgula")
+    parser.add_argument("--individual", action="store_true", help="envia também a cada analista só os chamados dele")
+    parser.add_argument("--data", type=date.fromisoformat, default=None, help="data de referência AAAA-MM-DD (padrão: hoje)")
+    parser.add_argument("--sem-envio", action="store_true", help="só monta o relatório (não precisa do SMTP)")
+    parser.add_argument("--salvar", metavar="PASTA", help="grava o HTML de cada e-mail na pasta")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+
+    destinatarios = []
+    if args.para:
+        destinatarios = [e.strip() for e in args.para.replace(';', ',').split(',') if e.strip()]
+        invalidos = [e for e in destinatarios if '@' not in e]
+        if invalidos:
+            log.error("E-mail(s) inválido(s) em --para: %s", ", ".join(invalidos)); return 2
+    if not destinatarios and not args.individual:
+        log.error("Informe --para e/ou --individual."); return 2
+
+    os.chdir(os.path.dirname(os.path.abspath(__file__))) # .streamlit/secrets.toml e imports do projeto
+    sys.path.insert(0, os.getcwd())
+    tempos = {}
+    inicio = time.perf_counter()
+
+    with _etapa("imports", tempos):
+        import streamlit.config
+        import streamlit.logger
+        streamlit.config.get_option("logger.level") # Lê a config agora: depois ela não volta o nível do log
+        streamlit.logger.set_log_level("error") # Avisos de "sem sessão/runtime": aqui não há um
+        import utils
+        import utils_chamados
+        import utils_relatorios
+
+    config = None
+    if not args.sem_envio:
+        with _etapa("secrets", tempos):
+            config = utils_relatorios.config_email()
+        if not config:
+            log.error("Credenciais de e-mail ausentes em [email] do .streamlit/secrets.toml."); return 2
+
+    with _etapa("conexão", tempos):
+        conectado = utils_chamados.get_valid_conn() is not None
+    if not conectado:
+        log.error("Sem conexão com o PostgreSQL (confira [postgres] no .streamlit/secrets.toml)."); return 2
+    if not utils_relatorios.criar_tabela_log_email():
+        log.error("Tabela log_envio_email indisponível (erro acima)."); return 2
+
+    with _etapa("carregar chamados", tempos):
+        df = utils_chamados.carregar_chamados_db()
+    if df.empty:
+        log.error("Base de chamados vazia ou ilegível (erro de leitura acima, se houver)."); return 2
+    log.info("%d chamados carregados", len(df))
+
+    emails = None
+    if args.individual:
+        with _etapa("carregar usuários", tempos):
+            emails = utils_relatorios.emails_dos_analistas(utils.carregar_usuarios_db())
+
+    hoje = args.data or date.today()
+    with _etapa("montar HTML", tempos):
+        mensagens, sem_email = utils_relatorios.mensagens_relatorio(df, hoje, destinatarios, emails)
+    if sem_email: log.warning("Sem e-mail cadastrado (não enviados): %s", ", ".join(sem_email))
+    log.info("%d e-mail(s) montado(s) para %s (%.0f KB)", len(mensagens), hoje.strftime('%d/%m/%Y'),
+             sum(len(m['corpo_html']) for m in mensagens) / 1024)
+    if args.salvar: _salvar(args.salvar, mensagens)
+
+    falhas, registrado = [], True
+    if mensagens and not args.sem_envio:
+        pool = utils_relatorios.pool_smtp(config)
+        lote = utils_relatorios.novo_lote()
+        try:
+            with _etapa("enviar", tempos):
+                resultados = utils_relatorios.enviar_emails(mensagens, config, registrar=False)
+        finally:
+            pool.fechar() # Processo de uma execução só: nada fica aberto esperando o próximo rerun
+        falhas = [r for r in resultados if r['situacao'] != 'enviado']
+        for r in falhas:
+            log.error("Falhou para %s após %d tentativa(s): %s", r['destinatarios'], r['tentativas'], r['erro'])
+        log.info("%d de %d e-mail(s) enviado(s)", len(resultados) - len(falhas), len(resultados))
+        with _etapa("gravar log", tempos):
+            registrado = utils_relatorios.registrar_envios(lote, resultados)
+        if not registrado: log.error("Envios do lote %s não gravados em log_envio_email.", lote)
+
+    log.info("%-18s %8.0f ms (fim %s)", "total", (time.perf_counter() - inicio) * 1000, datetime.now().strftime('%H:%M:%S'))
+    if not registrado: return 3
+    return 1 if falhas else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
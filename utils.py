@@ -8,8 +8,11 @@ import psycopg2
 from psycopg2 import sql
 import io
 import base64
+import logging
 from io import BytesIO
-from PIL import Image
+import utils_sla
+
+log = logging.getLogger(__name__) # Erros de banco também vão para o log: fora do app (cron) o st.error não aparece
 
 # (image_to_base64 - Sem alterações)
 def image_to_base64(image):
@@ -31,17 +34,20 @@ def get_db_connection():
         conn.autocommit = True 
         return conn
     except KeyError as e:
+        log.error("Credencial %s não encontrada nos Secrets", e)
         st.error(f"Erro Crítico: Credencial '{e}' não encontrada nos Secrets."); return None
     except Exception as e:
+        log.exception("Erro ao conectar ao DB")
         st.error(f"Erro ao conectar ao DB: {e}"); return None
 
-conn = get_db_connection() 
+# A conexão é aberta na primeira função que usar o banco (get_db_connection), não no import do módulo
 
 # --- >>> FUNÇÃO ATUALIZADA <<< ---
 # (criar_tabelas_iniciais - ATUALIZADO para adicionar a coluna automaticamente)
 def criar_tabelas_iniciais():
-    """Cria as tabelas e adiciona colunas ausentes se não existirem."""
-    if not conn: return
+    """Cria as tabelas e adiciona colunas ausentes se não existirem. Retorna True se deu certo."""
+    conn = get_db_connection()
+    if not conn: return False
     try:
         with conn.cursor() as cur:
             # 1. Cria a tabela de projetos (se não existir)
@@ -76,12 +82,22 @@ def criar_tabelas_iniciais():
             if not coluna_prioridade_existe:
                 cur.execute("ALTER TABLE projetos ADD COLUMN prioridade TEXT DEFAULT 'Média';")
 
+            # 3.1 Agendamento em dd/mm/aaaa ('N/A' sem data): coluna gerada, os loaders só leem
+            cur.execute("""
+                ALTER TABLE projetos ADD COLUMN IF NOT EXISTS agendamento_str TEXT GENERATED ALWAYS AS (
+                    coalesce(lpad(extract(day FROM agendamento)::text, 2, '0') || '/' ||
+                             lpad(extract(month FROM agendamento)::text, 2, '0') || '/' ||
+                             extract(year FROM agendamento)::text, 'N/A')
+                ) STORED;
+            """)
+
             # 4. Cria as outras tabelas (sem alterações)
             cur.execute("CREATE TABLE IF NOT EXISTS configuracoes (aba_nome TEXT PRIMARY KEY, dados_json JSONB);")
             cur.execute("CREATE TABLE IF NOT EXISTS usuarios (id SERIAL PRIMARY KEY, nome TEXT, email TEXT UNIQUE, senha TEXT);")
-            
+        return True
     except Exception as e:
         st.error(f"Erro ao criar/verificar tabelas: {e}")
+        return False
 # --- >>> FIM DA ATUALIZAÇÃO <<< ---
 
 
@@ -98,6 +114,7 @@ def _normalize_and_sanitize(data_dict: dict):
         k = re.sub(r'[^a-z0-9_ ]', '', k) 
         k = k.replace(' de ', ' ').replace(' ', '_') 
         if 'links' in k and 'referencia' in k: k = 'links_referencia'
+        if k == 'agendamento_str': continue # Coluna gerada pelo banco, não se grava
         
         if value is None or (isinstance(value, float) and pd.isna(value)): sanitized_value = None
         elif isinstance(value, (datetime, date)): sanitized_value = value.strftime('%Y-%m-%d')
@@ -109,6 +126,7 @@ def _normalize_and_sanitize(data_dict: dict):
 # (carregar_projetos_db - ATUALIZADO)
 @st.cache_data(ttl=60) 
 def carregar_projetos_db():
+    conn = get_db_connection()
     if not conn: return pd.DataFrame()
     try:
         df = pd.read_sql_query("SELECT * FROM projetos ORDER BY id DESC", conn) 
@@ -118,11 +136,9 @@ def carregar_projetos_db():
             'log_agendamento': 'Log Agendamento','etapas_concluidas': 'Etapas Concluidas', 
             'projeto': 'Projeto', 'status': 'Status','agendamento': 'Agendamento', 
             'demanda': 'Demanda', 'analista': 'Analista', 'gestor': 'Gestor', 'prioridade': 'Prioridade',
-            'links_referencia': 'Links de Referência' 
+            'links_referencia': 'Links de Referência', 'agendamento_str': 'Agendamento_str'
         }
         df = df.rename(columns={k: v for k, v in rename_map.items() if k in df.columns})
-        if 'Agendamento' in df.columns:
-            df['Agendamento_str'] = pd.to_datetime(df['Agendamento'], errors='coerce').dt.strftime('%d/%m/%Y').fillna("N/A")
         if 'Prioridade' in df.columns:
              df['Prioridade'] = df['Prioridade'].fillna('Média').replace(['', None], 'Média')
         else:
@@ -135,6 +151,7 @@ def carregar_projetos_db():
 # (carregar_projetos_sem_agendamento_db - ATUALIZADO)
 @st.cache_data(ttl=60)
 def carregar_projetos_sem_agendamento_db():
+    conn = get_db_connection()
     if not conn: return pd.DataFrame()
     try:
         df = pd.read_sql_query("SELECT * FROM projetos WHERE agendamento IS NULL ORDER BY id DESC", conn)
@@ -144,11 +161,9 @@ def carregar_projetos_sem_agendamento_db():
             'log_agendamento': 'Log Agendamento','etapas_concluidas': 'Etapas Concluidas', 
             'projeto': 'Projeto', 'status': 'Status','agendamento': 'Agendamento', 
             'demanda': 'Demanda', 'analista': 'Analista', 'gestor': 'Gestor', 'prioridade': 'Prioridade',
-            'links_referencia': 'Links de Referência'
+            'links_referencia': 'Links de Referência', 'agendamento_str': 'Agendamento_str'
         }
         df = df.rename(columns={k: v for k, v in rename_map.items() if k in df.columns})
-        if 'Agendamento' in df.columns:
-            df['Agendamento_str'] = pd.to_datetime(df['Agendamento'], errors='coerce').dt.strftime('%d/%m/%Y').fillna("N/A")
         if 'Prioridade' in df.columns:
              df['Prioridade'] = df['Prioridade'].fillna('Média').replace(['', None], 'Média')
         else:
@@ -160,6 +175,7 @@ def carregar_projetos_sem_agendamento_db():
 
 # (adicionar_projeto_db - Sem alterações)
 def adicionar_projeto_db(data: dict):
+    conn = get_db_connection()
     if not conn: return False
     try:
         if "Prioridade" not in data or data["Prioridade"] == "N/A":
@@ -179,6 +195,7 @@ def adicionar_projeto_db(data: dict):
 
 # (atualizar_projeto_db - ATUALIZADO)
 def atualizar_projeto_db(project_id, updates: dict):
+    conn = get_db_connection()
     if not conn: return False
     usuario_logado = st.session_state.get('usuario', 'Sistema') 
     try:
@@ -233,6 +250,7 @@ def atualizar_projeto_db(project_id, updates: dict):
 
 # (excluir_projeto_db - Sem alterações)
 def excluir_projeto_db(project_id):
+    conn = get_db_connection()
     if not conn: return False
     try:
         with conn.cursor() as cur: cur.execute("DELETE FROM projetos WHERE id = %s", (project_id,))
@@ -242,6 +260,7 @@ def excluir_projeto_db(project_id):
 # (carregar_config_db - Sem alterações)
 @st.cache_data(ttl=600)
 def carregar_config_db(tab_name):
+    conn = get_db_connection()
     if not conn: return pd.DataFrame()
     try:
         query = "SELECT dados_json FROM configuracoes WHERE aba_nome = %s"
@@ -255,6 +274,7 @@ def carregar_config_db(tab_name):
 
 # (salvar_config_db - Sem alterações)
 def salvar_config_db(df, tab_name):
+    conn = get_db_connection()
     if not conn: return False
     try:
         dados_json = df.to_json(orient='records'); sql_query = "INSERT INTO configuracoes (aba_nome, dados_json) VALUES (%s, %s) ON CONFLICT (aba_nome) DO UPDATE SET dados_json = EXCLUDED.dados_json;"
@@ -265,6 +285,7 @@ def salvar_config_db(df, tab_name):
 # (carregar_usuarios_db - Sem alterações)
 @st.cache_data(ttl=600)
 def carregar_usuarios_db():
+    conn = get_db_connection()
     if not conn: return pd.DataFrame(columns=['id', 'nome', 'email', 'senha'])
     try:
         df = pd.read_sql_query("SELECT id, nome, email, senha FROM usuarios", conn)
@@ -272,10 +293,13 @@ def carregar_usuarios_db():
         for col in expected_cols:
              if col not in df.columns: df[col] = None 
         return df[expected_cols] 
-    except Exception as e: st.error(f"Erro ao carregar usuários: {e}"); return pd.DataFrame(columns=['id', 'nome', 'email', 'senha'])
+    except Exception as e:
+        log.exception("Erro ao carregar usuários")
+        st.error(f"Erro ao carregar usuários: {e}"); return pd.DataFrame(columns=['id', 'nome', 'email', 'senha'])
 
 # (salvar_usuario_db - Sem alterações)
 def salvar_usuario_db(df):
+    conn = get_db_connection()
     if not conn: return False
     try:
         with conn.cursor() as cur:
@@ -315,6 +339,7 @@ def generate_excel_template_bytes():
 
 # (bulk_insert_projetos_db - ATUALIZADO)
 def bulk_insert_projetos_db(df: pd.DataFrame, usuario_logado: str):
+    conn = get_db_connection()
     if not conn: return False, 0
     column_map = {
         'Projeto': 'projeto', 'Descrição': 'descricao', 'Agência': 'agencia', 'Técnico': 'tecnico',
@@ -401,31 +426,16 @@ def get_status_color(status):
     elif 'pausad' in s: return "#FFEE58" 
     else: return "#64B5F6"  
 
-# (calcular_sla - Sem alterações)
+# (calcular_sla - usa as regras compiladas de utils_sla)
 def calcular_sla(projeto_row, df_sla):
-    data_agendamento = pd.to_datetime(projeto_row.get("Agendamento"), errors='coerce')
-    data_finalizacao = pd.to_datetime(projeto_row.get("Data de Finalização"), errors='coerce')
-    projeto_nome = str(projeto_row.get("Projeto", "")).upper(); demanda = projeto_row.get("Demanda", "")
-    if pd.isna(data_agendamento): return "SLA: N/D", "gray"
-    if df_sla.empty: return "SLA: N/A", "gray"
-    if "Nome do Projeto" not in df_sla.columns or "Demanda" not in df_sla.columns or "Prazo (dias)" not in df_sla.columns:
-         st.warning("Arquivo SLA sem colunas esperadas."); return "SLA: Config Inválida", "gray"
-    df_sla_upper = df_sla.copy(); df_sla_upper["Nome do Projeto"] = df_sla_upper["Nome do Projeto"].astype(str).str.upper(); df_sla_upper["Demanda"] = df_sla_upper["Demanda"].astype(str)
-    rule = df_sla_upper[(df_sla_upper["Nome do Projeto"] == projeto_nome) & (df_sla_upper["Demanda"] == str(demanda))]
-    if rule.empty: rule = df_sla_upper[(df_sla_upper["Nome do Projeto"] == projeto_nome) & (df_sla_upper["Demanda"].isin(['', 'nan', 'None']))]
-    if rule.empty: return "SLA: N/A (Regra ñ enc.)", "gray"
-    try: prazo_raw = rule.iloc[0]["Prazo (dias)"]; prazo_dias = int(float(prazo_raw)) 
-    except (ValueError, TypeError, IndexError): return "SLA: Inválido", "red"
-    start_date = data_agendamento.date(); hoje = date.today() 
-    if pd.notna(data_finalizacao):
-        end_date = data_finalizacao.date(); dias_corridos = (end_date - start_date).days
-        if dias_corridos <= prazo_dias: return f"Finalizado Prazo ({dias_corridos}d)", "#66BB6A" 
-        else: atraso = dias_corridos - prazo_dias; return f"Finalizado Atraso ({atraso}d)", "#EF5350" 
-    else: 
-        dias_corridos = (hoje - start_date).days; dias_restantes = prazo_dias - dias_corridos
-        if dias_restantes < 0: return f"Atrasado {-dias_restantes}d", "#EF5350" 
-        elif dias_restantes == 0: return "SLA Vence Hoje!", "#FFA726" 
-        else: return f"SLA: {dias_restantes}d restantes", "#66BB6F" 
+    """
+    Rótulo e cor do SLA de uma linha. df_sla pode ser a aba sla ou as regras já
+    compiladas (utils_sla.compilar_regras_sla(df_sla)): num laço, compile uma vez
+    fora dele. Para o DataFrame inteiro use .classificar(df) das regras.
+    """
+    # Aba avulsa: compilar direto sai mais barato que o hash do cache a cada linha
+    regras = df_sla if isinstance(df_sla, utils_sla.RegrasSLA) else utils_sla.RegrasSLA(df_sla)
+    return regras.classificar_linha(projeto_row)
 
 # (get_color_for_name - ATUALIZADO com hash() nativo)
 def get_color_for_name(name_str):
@@ -0,0 +1,40 @@
+import streamlit as st
+import utils
+import utils_chamados
+import utils_financeiro
+import utils_importacao
+import utils_indicadores
+import utils_relatorios
+
+# --- 1. INICIALIZAÇÃO DO BANCO (UMA VEZ POR PROCESSO) ---
+# Todas as tabelas, índices e gatilhos do app são criados/conferidos aqui, no
+# primeiro acesso do processo, e não a cada rerun: CREATE INDEX IF NOT EXISTS
+# trava a tabela antes de ver que o índice existe. Se alguma etapa falhar, nada
+# vai para o cache e o próximo rerun tenta de novo. Esquema novo = reiniciar o app.
+
+# Ordem importa: o resumo financeiro é montado a partir de chamados
+ETAPAS_ESQUEMA = [
+    utils.criar_tabelas_iniciais,
+    utils_importacao.criar_tabela_ledger,
+    utils_financeiro.criar_tabelas_lpu,
+    utils_chamados.criar_tabela_chamados,
+    utils_financeiro.criar_tabela_books,
+    utils_financeiro.criar_tabela_liberacao,
+    utils_financeiro.criar_tabelas_resumo_financeiro,
+    utils_indicadores.criar_tabela_fato_status_diario,
+    utils_relatorios.criar_tabela_log_email,
+]
+
+@st.cache_resource(show_spinner=False)
+def _esquema_pronto():
+    """Roda as etapas (cada uma mostra o próprio erro); levanta erro para a falha não ir ao cache."""
+    falhas = [etapa.__name__ for etapa in ETAPAS_ESQUEMA if not etapa()]
+    if falhas: raise RuntimeError(f"Falha em {', '.join(falhas)}")
+    return True
+
+def preparar_banco():
+    """Garante o esquema do banco. Retorna True se está pronto."""
+    try:
+        return _esquema_pronto()
+    except RuntimeError:
+        return False
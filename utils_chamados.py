@@ -8,6 +8,10 @@ from psycopg2 import sql
 import numpy as np 
 import sqlite3
 import unicodedata
+import logging
+import utils_financeiro
+
+log = logging.getLogger(__name__) # Erros de banco também vão para o log: fora do app (cron) o st.error não aparece
 
 # --- 1. GERENCIAMENTO DE CONEXÃO ROBUSTO (POSTGRESQL) ---
 
@@ -30,6 +34,7 @@ def _get_cached_connection():
         conn.autocommit = False 
         return conn
     except Exception as e: 
+        log.exception("Erro ao conectar ao PostgreSQL")
         st.error(f"Erro ao conectar ao PostgreSQL: {e}")
         return None
 
@@ -104,15 +109,41 @@ colunas_necessarias = {
     
     # Financeiro (Mantido)
     'chk_financeiro_banco': "TEXT DEFAULT 'FALSE'",
-    'book_enviado': "TEXT DEFAULT 'FALSE'"
+    'book_enviado': "TEXT DEFAULT 'FALSE'",
+    'valor_calculado': 'NUMERIC(12, 2)'  # Preço pela LPU (utils_financeiro.recalcular_valores_chamados)
+}
+
+# --- 1.1 COLUNAS GERADAS (CALCULADAS PELO BANCO, NUNCA GRAVADAS PELO APP) ---
+# Campos de exibição que as páginas recalculavam linha a linha a cada render.
+# Ficam fora de colunas_necessarias para não entrarem em INSERT/UPDATE.
+_SQL_COD_AGENCIA = "btrim(split_part(coalesce(agencia_id, 'nan'), '.', 1), E' \\t\\r\\n')"
+_SQL_NOME_AGENCIA = "btrim(coalesce(agencia_nome, 'nan'), E' \\t\\r\\n')"
+_SQL_AGENCIA_COMBINADA = f"""
+    CASE WHEN {_SQL_COD_AGENCIA} ~ '^[0-9]+$'
+         THEN 'AG ' || lpad({_SQL_COD_AGENCIA}::numeric::text, greatest(4, length({_SQL_COD_AGENCIA}::numeric::text)), '0')
+         ELSE btrim(coalesce(agencia_id, 'nan'), E' \\t\\r\\n')
+    END || ' - ' ||
+    CASE WHEN left({_SQL_NOME_AGENCIA}, length({_SQL_COD_AGENCIA})) = {_SQL_COD_AGENCIA}
+         THEN btrim(substr({_SQL_NOME_AGENCIA}, length({_SQL_COD_AGENCIA}) + 1), ' -')
+         ELSE {_SQL_NOME_AGENCIA}
+    END
+"""
+
+colunas_geradas = {
+    # Código da agência sem o '.0' que vem do Excel
+    'agencia_cod': "TEXT GENERATED ALWAYS AS (btrim(split_part(agencia_id, '.', 1), E' \\t\\r\\n')) STORED",
+    # "AG 0001 - NOME" (texto do antigo formatar_agencia_excel; vazio sai como "nan")
+    'agencia_combinada': f"TEXT GENERATED ALWAYS AS ({_SQL_AGENCIA_COMBINADA}) STORED",
+    # EQUIP (-E- no nº do chamado) ou SERV
+    'tipo_chamado': "TEXT GENERATED ALWAYS AS (CASE WHEN strpos(lower(chamado_id), '-e-') > 0 THEN 'EQUIP' ELSE 'SERV' END) STORED",
 }
 
 # --- 2. FUNÇÃO PARA CRIAR/ATUALIZAR A TABELA ---
 def criar_tabela_chamados():
-    """Cria a tabela e verifica colunas."""
+    """Cria a tabela e verifica colunas. Retorna True se deu certo."""
     global colunas_necessarias
     conn = get_valid_conn() # Pega conexão validada
-    if not conn: return
+    if not conn: return False
 
     try:
         with conn.cursor() as cur:
@@ -126,14 +157,18 @@ def criar_tabela_chamados():
             cur.execute("SELECT column_name FROM information_schema.columns WHERE table_name = 'chamados';")
             colunas_existentes = [row[0] for row in cur.fetchall()]
             
-            for coluna, tipo_coluna in colunas_necessarias.items():
+            for coluna, tipo_coluna in {**colunas_necessarias, **colunas_geradas}.items():
                 if coluna not in colunas_existentes:
                     cur.execute(f"ALTER TABLE chamados ADD COLUMN {coluna} {tipo_coluna};")
+
+            cur.execute("CREATE INDEX IF NOT EXISTS idx_chamados_agendamento ON chamados (data_agendamento);")
+            utils_financeiro.criar_gatilho_versao(cur, 'chamados', 'chamados')
             conn.commit()
-            
+        return True
     except Exception as e:
         conn.rollback()
         st.error(f"Erro ao verificar tabela: {e}")
+        return False
 
 # --- 3. FUNÇÃO PARA CARREGAR CHAMADOS ---
 @st.cache_data(ttl=60)
@@ -172,7 +207,9 @@ def carregar_chamados_db(agencia_id_filtro=None):
             'observacao_pendencias': 'Observações e Pendencias',
             'sub_status': 'Sub-Status',
             'id_projeto': 'ID_PROJETO',
-            'data_reagendamento': 'Reagendamento'
+            'data_reagendamento': 'Reagendamento',
+            'valor_calculado': 'Valor_Calculado',
+            'agencia_cod': 'Agencia_Cod', 'agencia_combinada': 'Agencia_Combinada', 'tipo_chamado': 'Tipo_Chamado'
         }
         df = df.rename(columns={k: v for k, v in rename_map.items() if k in df.columns})
         
@@ -186,16 +223,297 @@ def carregar_chamados_db(agencia_id_filtro=None):
 
         return df
     except Exception as e:
+        log.exception("Erro ao ler a tabela chamados")
         st.cache_resource.clear()
         st.error(f"Erro ao ler banco (tente recarregar a página): {e}")
         return pd.DataFrame()
 
+# --- 3.1 COCKPIT: CUBO DE CHAMADOS ---
+# Cockpit e Indicadores fatiam os mesmos chamados por projeto, analista,
+# gestor, UF, status, sub-status e semana. O banco agrupa os chamados uma vez
+# por versão (trigger em controle_versao) e por dia (atrasados dependem de
+# hoje) num cubo com as contagens de cada combinação; filtrar e reagrupar é
+# numpy sobre as células do cubo, sem voltar ao banco nem ao DataFrame.
+
+STATUS_FIM = ('concluído', 'finalizado', 'faturado', 'fechado', 'equipamento entregue')
+
+# Rótulo na tela -> dimensão do cubo (nome dos filtros de filtrar/agrupar)
+DIMENSOES_CUBO = {
+    'Projeto': 'projeto',
+    'Analista': 'analista',
+    'Gestor': 'gestor',
+    'UF': 'uf',
+    'Status': 'status',
+    'Sub-Status': 'sub_status',
+    'Semana': 'semana',
+}
+MEDIDAS_CUBO = ('total', 'concluidos', 'atrasados', 'vencendo', 'valor')
+
+# Semana ISO do agendamento (ex.: 2025-W07); chamados sem agendamento ficam sem semana
+SQL_CUBO = """
+    WITH base AS (
+        SELECT projeto_nome AS projeto, analista, gestor, agencia_uf AS uf,
+               status_chamado AS status, sub_status,
+               to_char(data_agendamento, 'IYYY-"W"IW') AS semana,
+               data_agendamento, valor_calculado,
+               coalesce(lower(status_chamado) = ANY(%(fim)s), FALSE) AS concluido
+        FROM chamados
+    )
+    SELECT projeto, analista, gestor, uf, status, sub_status, semana,
+           count(*) AS total,
+           count(*) FILTER (WHERE concluido) AS concluidos,
+           count(*) FILTER (WHERE NOT concluido AND data_agendamento < %(hoje)s) AS atrasados,
+           count(*) FILTER (WHERE NOT concluido AND data_agendamento BETWEEN %(hoje)s AND %(hoje)s + 5) AS vencendo,
+           coalesce(sum(valor_calculado), 0)::float8 AS valor
+    FROM base
+    GROUP BY 1, 2, 3, 4, 5, 6, 7
+"""
+
+class CuboChamados:
+    """
+    Contagens (total, concluidos, atrasados, vencendo) e soma de valor por
+    combinação das DIMENSOES_CUBO. Cada dimensão vira um código inteiro por
+    célula; filtrar() devolve um sub-cubo e agrupar() faz o roll-up.
+    """
+
+    def __init__(self, df):
+        self.rotulos = {}  # dimensão -> array de rótulos (None = vazio no banco)
+        self.codigos = {}  # dimensão -> código do rótulo em cada célula
+        self._posicao = {} # dimensão -> {rótulo: código}
+        for dim in DIMENSOES_CUBO.values():
+            codigos, unicos = pd.factorize(df[dim], use_na_sentinel=False)
+            self.rotulos[dim] = np.array([None if pd.isna(r) else r for r in unicos], dtype=object)
+            self.codigos[dim] = codigos.astype(np.intp)
+            self._posicao[dim] = {r: i for i, r in enumerate(self.rotulos[dim])}
+        self.medidas = {m: df[m].to_numpy(dtype=float if m == 'valor' else np.int64) for m in MEDIDAS_CUBO}
+
+    def __len__(self):
+        return len(self.medidas['total'])
+
+    def opcoes(self, dim):
+        """Rótulos da dimensão (sem o vazio), em ordem alfabética, para os filtros da tela."""
+        return sorted(r for r in self.rotulos[dim] if r is not None)
+
+    def _fatia(self, mascara):
+        fatia = object.__new__(CuboChamados)
+        fatia.rotulos, fatia._posicao = self.rotulos, self._posicao
+        fatia.codigos = {d: c[mascara] for d, c in self.codigos.items()}
+        fatia.medidas = {m: v[mascara] for m, v in self.medidas.items()}
+        return fatia
+
+    def filtrar(self, **filtros):
+        """Sub-cubo com as células cujos rótulos estão nas listas (dimensão=[rótulos]); lista vazia = sem filtro."""
+        mascara = np.ones(len(self), dtype=bool)
+        for dim, valores in filtros.items():
+            if not valores: continue
+            aceitos = np.zeros(len(self.rotulos[dim]), dtype=bool)
+            aceitos[[self._posicao[dim][v] for v in valores if v in self._posicao[dim]]] = True
+            mascara &= aceitos[self.codigos[dim]]
+        return self._fatia(mascara)
+
+    def totais(self):
+        """Soma de cada medida no cubo (dict)."""
+        return {m: v.sum().item() for m, v in self.medidas.items()}
+
+    def agrupar(self, *dims):
+        """Roll-up: DataFrame com as dimensões pedidas e as medidas somadas por combinação."""
+        if not dims: return pd.DataFrame([self.totais()])
+        tamanhos = [len(self.rotulos[d]) for d in dims]
+        chave = np.ravel_multi_index([self.codigos[d] for d in dims], tamanhos)
+        unicas, grupo = np.unique(chave, return_inverse=True)
+        colunas = {d: self.rotulos[d][c] for d, c in zip(dims, np.unravel_index(unicas, tamanhos))}
+        for m, v in self.medidas.items():
+            soma = np.bincount(grupo, weights=v, minlength=len(unicas))
+            colunas[m] = soma if m == 'valor' else soma.astype(np.int64)
+        return pd.DataFrame(colunas)
+
+@st.cache_resource(max_entries=4, show_spinner=False)
+def _cubo_por_versao(versao, hoje):
+    # Falha levanta exceção: o cache não guarda erro, a próxima chamada tenta de novo
+    conn = get_valid_conn()
+    if not conn: raise RuntimeError("Falha na conexão ao montar o cubo de chamados")
+    try:
+        df = pd.read_sql_query(SQL_CUBO, conn, params={'fim': list(STATUS_FIM), 'hoje': hoje})
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    return CuboChamados(df)
+
+def carregar_cubo():
+    """CuboChamados dos chamados atuais (montado uma vez por versão dos chamados e por dia), ou None se o banco falhar."""
+    try:
+        return _cubo_por_versao(utils_financeiro.versao_dados('chamados'), date.today())
+    except Exception as e:
+        st.error(f"Erro ao montar o cubo de chamados: {e}")
+        return None
+
+def carregar_cockpit(**filtros):
+    """
+    (kpis, df_projetos) da tela inicial, dos chamados que passam nos filtros
+    (dimensão=[rótulos], como em CuboChamados.filtrar). kpis: total, atrasados
+    e vencendo em 5 dias; df_projetos: Projeto, total, concluidos, atrasados e
+    perc, em ordem alfabética (sem os chamados sem projeto).
+    """
+    vazio = {'total': 0, 'atrasados': 0, 'vencendo': 0}, pd.DataFrame(columns=['Projeto', 'total', 'concluidos', 'atrasados', 'perc'])
+    cubo = carregar_cubo()
+    if cubo is None: return vazio
+
+    cubo = cubo.filtrar(**filtros)
+    totais = cubo.totais()
+    kpis = {'total': totais['total'], 'atrasados': totais['atrasados'], 'vencendo': totais['vencendo']}
+    df_proj = cubo.agrupar('projeto').rename(columns={'projeto': 'Projeto'})
+    df_proj = df_proj[df_proj['Projeto'].notna()].sort_values('Projeto')
+    df_proj = df_proj[['Projeto', 'total', 'concluidos', 'atrasados']].reset_index(drop=True)
+    df_proj['perc'] = (df_proj['concluidos'] / df_proj['total'] * 100).astype(int)
+    return kpis, df_proj
+
+# --- 3.2 AGENDA: EVENTOS SÓ DA JANELA VISÍVEL DO CALENDÁRIO ---
+# A Agenda montava eventos de todo o histórico agendado a cada rerun (groupby
+# com lambdas + iterrows). Aqui o banco agrupa só os dias da janela visível
+# (uma agenda por dia, agência e projeto) e o cache é por janela, analista e
+# versão dos chamados: trocar de mês busca só aquele mês.
+
+@st.cache_data(max_entries=4, show_spinner=False)
+def _analistas_por_versao(versao):
+    # Aqui e em _eventos_por_versao a falha levanta exceção: o cache não guarda erro
+    conn = get_valid_conn()
+    if not conn: raise RuntimeError("Falha na conexão ao listar analistas")
+    try:
+        with conn.cursor() as cur:
+            cur.execute("SELECT DISTINCT analista COLLATE \"C\" FROM chamados WHERE analista IS NOT NULL ORDER BY 1")
+            analistas = [r[0] for r in cur.fetchall()]
+        conn.commit()
+        return analistas
+    except Exception:
+        conn.rollback()
+        raise
+
+def listar_analistas_agenda():
+    """Analistas com chamados, em ordem alfabética."""
+    try:
+        return _analistas_por_versao(utils_financeiro.versao_dados('chamados'))
+    except Exception as e:
+        st.error(f"Erro ao listar analistas: {e}")
+        return []
+
+@st.cache_data(max_entries=48, show_spinner=False)
+def _eventos_por_versao(versao, analista, inicio, fim):
+    conn = get_valid_conn()
+    if not conn: raise RuntimeError("Falha na conexão ao carregar a agenda")
+
+    # "Primeiro" = primeiro não nulo na ordem do carregar_chamados_db (id decrescente)
+    def _primeiro(col): return f"(array_agg({col} ORDER BY id DESC) FILTER (WHERE {col} IS NOT NULL))[1]"
+    query = f"""
+        SELECT data_agendamento AS dia, agencia_nome, projeto_nome,
+               string_agg(DISTINCT chamado_id COLLATE "C", ', ' ORDER BY chamado_id COLLATE "C") AS chamados,
+               string_agg(descricao_projeto, ' | ' ORDER BY id DESC) AS descricao,
+               {_primeiro('status_chamado')} AS status, {_primeiro('sub_status')} AS sub_status,
+               {_primeiro('analista')} AS analista, {_primeiro('tecnico')} AS tecnico,
+               {_primeiro('agencia_cod')} AS agencia_cod, max(id) AS id
+        FROM chamados
+        WHERE data_agendamento >= %(inicio)s AND data_agendamento < %(fim)s
+          AND (%(analista)s::text IS NULL OR analista = %(analista)s)
+        GROUP BY 1, 2, 3
+        ORDER BY 1, 2, 3
+    """
+    try:
+        df = pd.read_sql_query(query, conn, params={'inicio': inicio, 'fim': fim, 'analista': analista})
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    if df.empty: return []
+
+    texto = {c: _texto_ou_vazio(df[c]) for c in ['chamados', 'descricao', 'status', 'sub_status', 'analista', 'tecnico', 'agencia_cod']}
+    nome = df['agencia_nome'].astype(object).where(df['agencia_nome'].notna(), 'N/A').astype(str).str.strip()
+    projeto = df['projeto_nome'].astype(object).where(df['projeto_nome'].notna(), 'N/A').astype(str)
+    cod = texto['agencia_cod']
+    com_cod = [bool(c) and c not in n for c, n in zip(cod, nome)] # Código já no nome não repete
+    agencia = nome.where(~pd.Series(com_cod, index=df.index), cod + ' - ' + nome)
+    dia = pd.to_datetime(df['dia']).dt.strftime('%Y-%m-%d')
+    status_unicos = texto['status'].unique()
+    cores = dict(zip(status_unicos, map(get_status_color, status_unicos)))
+
+    props = pd.DataFrame({
+        "ID": df['id'].astype(str), "Chamado": texto['chamados'], "Projeto": projeto,
+        "Agência": agencia, "Analista": texto['analista'], "Técnico": texto['tecnico'],
+        "Status": texto['status'], "Sub-Status": texto['sub_status'], "Descrição": texto['descricao'],
+    }).to_dict('records')
+    return [{"title": t, "color": c, "start": d, "end": d, "allDay": True, "extendedProps": p}
+            for t, c, d, p in zip(agencia + ' - ' + projeto, texto['status'].map(cores), dia, props)]
+
+def carregar_eventos_agenda(analista, inicio, fim):
+    """
+    Eventos do calendário (formato do streamlit_calendar) agendados entre
+    inicio (inclusive) e fim (exclusive): um por dia, agência e projeto.
+    analista None = todos.
+    """
+    try:
+        return _eventos_por_versao(utils_financeiro.versao_dados('chamados'), analista, inicio, fim)
+    except Exception as e:
+        st.error(f"Erro ao carregar a agenda: {e}")
+        return []
+
 # Função auxiliar para limpar texto (remover acentos e espaços)
 def normalizar_texto(texto):
     if not isinstance(texto, str): return str(texto)
     # Remove acentos e joga pra maiúsculo (ex: "Cód. Agência" -> "COD. AGENCIA")
     return ''.join(c for c in unicodedata.normalize('NFD', texto) if unicodedata.category(c) != 'Mn').upper().strip()
 
+# --- FORMATAÇÃO VETORIZADA DE ITENS (IMPORTAÇÃO) ---
+# As planilhas grandes têm várias linhas de equipamento por chamado; montar os
+# textos linha a linha com apply(axis=1) era o maior custo de CPU da importação.
+
+def _texto_ou_vazio(serie: pd.Series) -> pd.Series:
+    """Converte a coluna para texto, trocando nulos (None/NaN/NaT) por string vazia."""
+    return serie.astype(object).where(serie.notna(), '').astype(str)
+
+def formatar_descricao_equipamentos(df: pd.DataFrame) -> pd.Series:
+    """
+    Monta 'QTD - EQUIPAMENTO' para todas as linhas de uma vez.
+    Espera as colunas já renomeadas ('quantidade' e 'nome_equipamento').
+    """
+    vazios = ['nan', 'none', '', 'nat']
+
+    equip = _texto_ou_vazio(df['nome_equipamento'])
+    equip = equip.mask(equip.str.lower().isin(vazios), '')
+
+    qtd = _texto_ou_vazio(df['quantidade'])
+    qtd = qtd.mask(qtd.str.lower().isin(vazios), '')
+    qtd = qtd.str.replace(r'\.0$', '', regex=True) # Limpa decimal do Excel (ex: '1.0' vira '1')
+
+    # Sem equipamento na linha, mantém a descrição que já veio (ou vazio)
+    if 'descricao_projeto' in df.columns: fallback = df['descricao_projeto']
+    else: fallback = pd.Series('', index=df.index, dtype=object)
+
+    com_qtd = (qtd != '') & (qtd != '0')
+    descricao = equip.where(~com_qtd, qtd + ' - ' + equip)
+    return descricao.astype(object).where(equip != '', fallback)
+
+def formatar_itens_importacao(df: pd.DataFrame) -> pd.Series:
+    """
+    Monta o item do importador da Gestão ('Qtd - Nome_equipamento', usando o
+    Sistema quando não há nome de equipamento) de forma vetorizada.
+    """
+    qtd = _texto_ou_vazio(df['Qtd']).str.strip()
+    desc = _texto_ou_vazio(df['Nome_equipamento']).str.strip()
+    desc = desc.where(desc != '', _texto_ou_vazio(df['Sistema']).str.strip())
+
+    com_qtd = ~qtd.isin(['0', 'nan', '', 'None'])
+    item = desc.where(~com_qtd, qtd + ' - ' + desc)
+    return item.where(desc != '', '')
+
+def juntar_textos_unicos(df: pd.DataFrame, chave: str, coluna: str, sep: str = " | ") -> pd.Series:
+    """
+    Junta os textos de 'coluna' por 'chave' mantendo a ordem de aparição e sem repetir.
+    Retorna uma Series indexada pela chave (grupos sem texto válido ficam de fora).
+    """
+    textos = df[coluna].astype(str)
+    validos = df.loc[~textos.str.strip().isin(['', 'nan', 'None']), [chave]].assign(_texto=textos)
+    validos = validos.drop_duplicates(subset=[chave, '_texto'], keep='first')
+    return validos.groupby(chave, sort=False)['_texto'].agg(sep.join)
+
 # --- 4. FUNÇÃO PARA IMPORTAR CHAMADOS ---
 def bulk_insert_chamados_db(df: pd.DataFrame):
     """
@@ -267,27 +585,8 @@ def bulk_insert_chamados_db(df: pd.DataFrame):
     if 'quantidade' not in df_to_insert.columns: df_to_insert['quantidade'] = None
     if 'nome_equipamento' not in df_to_insert.columns: df_to_insert['nome_equipamento'] = None
 
-    def gerar_descricao_formatada(row):
-        equip = str(row['nome_equipamento'])
-        qtd = str(row['quantidade'])
-        
-        # Limpa valores nulos/estranhos
-        if equip.lower() in ['nan', 'none', '', 'nat']: equip = ""
-        if qtd.lower() in ['nan', 'none', '', 'nat']: qtd = ""
-        
-        # Limpa decimal do Excel (ex: '1.0' vira '1')
-        if qtd.endswith('.0'): qtd = qtd[:-2]
-        
-        # LÓGICA DE MONTAGEM
-        if equip:
-            if qtd and qtd != '0':
-                return f"{qtd} - {equip}" # Retorna "1 - CAMERA"
-            return equip # Retorna só "CAMERA" se qtd for vazia
-        
-        # Se não tiver equipamento na linha, retorna vazio ou descrição genérica
-        return row.get('descricao_projeto', '')
-
-    df_to_insert['descricao_projeto'] = df_to_insert.apply(gerar_descricao_formatada, axis=1)
+    # Ex: "1 - CAMERA", só "CAMERA" se a qtd for vazia (vetorizado)
+    df_to_insert['descricao_projeto'] = formatar_descricao_equipamentos(df_to_insert)
 
     # --- TRATAMENTO DE OUTROS CAMPOS ---
     cols_data = ['data_fechamento', 'data_agendamento']
@@ -320,6 +619,7 @@ def bulk_insert_chamados_db(df: pd.DataFrame):
             cur.executemany(query, values)
         conn.commit()
         st.cache_data.clear()
+        utils_financeiro.recalcular_valores_chamados(chamado_ids=df_final['chamado_id'].tolist())
         return True, len(values)
 
     except Exception as e:
@@ -343,14 +643,18 @@ def atualizar_chamado_db(chamado_id_interno, updates: dict):
             cur.execute("""
                 SELECT 
                     data_agendamento, data_fechamento, log_chamado, 
-                    status_chamado, sub_status, data_envio
+                    status_chamado, sub_status, data_envio,
+                    servico, nome_equipamento, quantidade,
+                    chamado_id, agencia_id, agencia_nome, data_abertura, valor_calculado
                 FROM chamados WHERE id = %s
             """, (chamado_id_interno,))
             current_data = cur.fetchone()
             
             if not current_data: return False
 
-            (c_agend, c_fech, c_log, c_status, c_sub_s, c_env) = current_data
+            (c_agend, c_fech, c_log, c_status, c_sub_s, c_env, c_serv, c_equip, c_qtd) = current_data[:9]
+            c_resumo = dict(zip(['chamado_id', 'agencia_id', 'agencia_nome', 'data_abertura', 'valor_calculado'], current_data[9:]), data_fechamento=c_fech)
+            if c_resumo['valor_calculado'] is not None: c_resumo['valor_calculado'] = float(c_resumo['valor_calculado'])
             c_log = c_log or "" 
 
             db_updates = {}
@@ -423,6 +727,15 @@ def atualizar_chamado_db(chamado_id_interno, updates: dict):
                     else: 
                         db_updates[db_k] = str(v)
 
+            # 2.1 Valor pela LPU, se mudou algum campo que entra no preço
+            if any(k in db_updates for k in utils_financeiro.COLUNAS_PRECO):
+                db_updates['valor_calculado'] = utils_financeiro.calcular_valor_chamado(
+                    cur,
+                    db_updates.get('servico', c_serv),
+                    db_updates.get('nome_equipamento', c_equip),
+                    db_updates.get('quantidade', c_qtd)
+                )
+
             # 3. Geração de Log
             log_entries = []
             hoje = date.today().strftime('%d/%m/%Y')
@@ -447,6 +760,10 @@ def atualizar_chamado_db(chamado_id_interno, updates: dict):
             vals = list(db_updates.values()) + [chamado_id_interno]
             
             cur.execute(query, vals)
+
+            # 5. Resumo financeiro por agência (só este chamado e as agências dele)
+            if any(k in db_updates and str(db_updates[k]) != str(c_resumo[k]) for k in utils_financeiro.COLUNAS_RESUMO_FINANCEIRO):
+                utils_financeiro.atualizar_resumo_financeiro([chamado_id_interno], cur)
             conn.commit()
             st.cache_data.clear()
             
@@ -457,6 +774,152 @@ def atualizar_chamado_db(chamado_id_interno, updates: dict):
         st.error(f"Erro ao atualizar banco: {e}")
         return False
         
+# --- 5.1 LÓGICA DE STATUS: CHAMADO E PROJETO ---
+def calcular_e_atualizar_status_projeto(df_projeto, ids_para_atualizar):
+    """
+    1. Calcula o status individual de cada chamado (Sub-Status).
+    2. Calcula o status macro do projeto baseado no conjunto.
+    """
+    
+    updates_batch = {} 
+    chamados_calculados = [] 
+
+    for idx, row in df_projeto.iterrows():
+        is_equip = row.get('Tipo_Chamado') == 'EQUIP'
+        
+        # --- LEITURA DE DADOS ---
+        # Verifica se campos chave estão preenchidos
+        link_presente = row.get('Link Externo') and str(row.get('Link Externo')).strip() not in ['', 'nan', 'None']
+        n_pedido = row.get('Nº Pedido') and str(row.get('Nº Pedido')).strip() not in ['', 'nan', 'None']
+        
+        # Verifica se tem Técnico (NOVO CRITÉRIO)
+        tecnico_presente = row.get('Técnico') and str(row.get('Técnico')).strip() not in ['', 'nan', 'None']
+
+        # Banco de Dados
+        db_liberacao_banco = str(row.get('chk_financeiro_banco', '')).upper() == 'TRUE'
+        db_book_controle_sim = str(row.get('Book Enviado', '')).upper() == 'SIM'
+        
+        # Checkboxes UI
+        chk_cancelado = str(row.get('chk_cancelado', '')).upper() == 'TRUE'
+        chk_pend_eq = str(row.get('chk_pendencia_equipamento', '')).upper() == 'TRUE'
+        chk_pend_infra = str(row.get('chk_pendencia_infra', '')).upper() == 'TRUE'
+        chk_alteracao = str(row.get('chk_alteracao_chamado', '')).upper() == 'TRUE'
+        
+        chk_envio_parcial = str(row.get('chk_envio_parcial', '')).upper() == 'TRUE'
+        chk_entregue_total = str(row.get('chk_equipamento_entregue', '')).upper() == 'TRUE'
+        chk_followup = str(row.get('chk_status_enviado', '')).upper() == 'TRUE'
+
+        novo_sub_status = "Em análise"
+        
+        # --- LÓGICA INDIVIDUAL ---
+        
+        if chk_cancelado:
+            novo_sub_status = "Cancelado"
+        
+        elif db_liberacao_banco:
+            novo_sub_status = "Faturado"
+        
+        elif chk_pend_eq:
+            novo_sub_status = "Pendência de equipamento"
+        
+        elif chk_pend_infra:
+            novo_sub_status = "Pendência de Infra"
+        
+        elif chk_alteracao:
+            novo_sub_status = "Alteração do chamado"
+            
+        else:
+            # Fluxo Normal (Sem pendência ou cancelamento)
+            if is_equip:
+                # LÓGICA EQUIPAMENTO (-E-)
+                if chk_entregue_total:
+                    novo_sub_status = "Equipamento entregue"
+                elif chk_envio_parcial:
+                    novo_sub_status = "Equipamento enviado Parcial"
+                elif row.get('Data Envio') and pd.notna(row.get('Data Envio')):
+                    novo_sub_status = "Equipamento enviado"
+                elif n_pedido:
+                    novo_sub_status = "Aguardando envio"
+                else:
+                    novo_sub_status = "Solicitar equipamento"
+            
+            else:
+                # LÓGICA SERVIÇO (SEM -E-)
+                if db_book_controle_sim:
+                    novo_sub_status = "Aguardando Faturamento"
+                elif chk_followup:
+                    novo_sub_status = "Enviar Book"
+                elif tecnico_presente:
+                    # Se tem técnico mas não fez follow-up ainda -> Follow-up
+                    novo_sub_status = "Follow-up" 
+                elif link_presente:
+                    # Tem link mas não tem técnico -> Acionar técnico
+                    novo_sub_status = "Acionar técnico" 
+                else:
+                    # Não tem link -> Abrir chamado
+                    novo_sub_status = "Abrir chamado Btime" 
+
+        updates_batch[row['ID']] = {"Sub-Status": novo_sub_status}
+        
+        chamado_obj = {
+            "ID": row['ID'],
+            "Tipo": "EQUIP" if is_equip else "SERV",
+            "SubStatus": novo_sub_status,
+            "Cancelado": chk_cancelado,
+            "Faturado": db_liberacao_banco
+        }
+        chamados_calculados.append(chamado_obj)
+
+    # --- PARTE B: CALCULAR STATUS DO PROJETO (CABEÇALHO) ---
+    
+    total = len(chamados_calculados)
+    if total == 0: return False
+
+    ativos = [c for c in chamados_calculados if not c['Cancelado']]
+    faturados_count = sum(1 for c in ativos if c['Faturado'])
+    
+    status_projeto = "Não Iniciado"
+    
+    if len(ativos) == 0: # Todos cancelados
+        status_projeto = "Cancelado"
+    else:
+        # Definição dos critérios de Status Macro
+        todos_finalizados_banco = all(c['Faturado'] for c in ativos)
+        
+        def is_concluido(c):
+            s = c['SubStatus']
+            return s in ["Faturado", "Aguardando Faturamento", "Equipamento entregue", "Enviar Book"] 
+        
+        todos_concluidos = all(is_concluido(c) for c in ativos)
+        
+        def is_nao_iniciado(c):
+            s = c['SubStatus']
+            return s in ["Solicitar equipamento", "Abrir chamado Btime"]
+        
+        todos_nao_iniciados = all(is_nao_iniciado(c) for c in ativos)
+
+        if todos_finalizados_banco:
+            status_projeto = "Finalizado"
+        elif todos_concluidos:
+            status_projeto = "Concluído"
+        elif todos_nao_iniciados:
+            status_projeto = "Não Iniciado"
+        else:
+            status_projeto = "Em Andamento"
+    
+    # --- APLICAÇÃO DOS UPDATES ---
+    
+    # 1. Atualiza Sub-Status Individual (ok = False se algum update falhar)
+    ok = True
+    for cid, data in updates_batch.items():
+        ok &= bool(atualizar_chamado_db(cid, data))
+    
+    # 2. Atualiza Status Macro em todos
+    for row in chamados_calculados:
+        ok &= bool(atualizar_chamado_db(row['ID'], {"Status": status_projeto}))
+              
+    return ok
+
 # --- 6. Funções de Cor ---
 def get_color_for_name(nome):
     """ Gera uma cor consistente baseada no nome. """
@@ -499,7 +962,7 @@ def recriar_banco_do_zero():
             cur.execute("DROP TABLE IF EXISTS chamados;")
             
             # 2. Monta a query de criação baseada no dicionário global 'colunas_necessarias'
-            colunas_sql = [f"{col} {tipo}" for col, tipo in colunas_necessarias.items()]
+            colunas_sql = [f"{col} {tipo}" for col, tipo in {**colunas_necessarias, **colunas_geradas}.items()]
             
             query_create = f"""
                 CREATE TABLE chamados (
@@ -508,9 +971,12 @@ def recriar_banco_do_zero():
                 );
             """
             cur.execute(query_create)
+            cur.execute("CREATE INDEX idx_chamados_agendamento ON chamados (data_agendamento);")
+            utils_financeiro.criar_gatilho_versao(cur, 'chamados', 'chamados')
             
         conn.commit()
         st.cache_data.clear() # Limpa o cache
+        utils_financeiro.atualizar_resumo_financeiro() # ids recomeçam: resumo por agência volta vazio
         return True, "✅ Banco recriado do ZERO com as novas colunas!"
         
     except Exception as e:
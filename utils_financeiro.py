@@ -2,8 +2,13 @@ import streamlit as st
 import pandas as pd
 import psycopg2
 from psycopg2 import sql
+from psycopg2.extras import execute_values
 import numpy as np
 import re
+import io
+import difflib
+import unicodedata
+from datetime import date
 
 # --- 1. GERENCIAMENTO DE CONEXÃO ---
 
@@ -32,12 +37,79 @@ def get_valid_conn_fin():
         conn = _get_cached_connection_fin() 
     return conn
 
+# --- 1.1 VERSÃO DOS DADOS (controle_versao) ---
+# Cada conjunto de dados (ex.: 'lpu') ganha uma versão nova a cada importação;
+# o que é compilado uma vez por processo (índice da LPU) usa a versão como chave.
+# Tabelas com muitos pontos de escrita (chamados) trocam de versão por trigger
+# (criar_gatilho_versao, chamado também por utils_chamados ao criar a tabela).
+
+def _criar_tabela_versao(cur):
+    cur.execute("""
+        CREATE TABLE IF NOT EXISTS controle_versao (
+            nome TEXT PRIMARY KEY,
+            versao BIGINT NOT NULL,
+            atualizado_em TIMESTAMP DEFAULT now()
+        );
+    """)
+
+def versao_dados(nome, cur=None):
+    """Versão atual do conjunto de dados (0 se nunca foi importado). Com cur, lê na transação dele."""
+    if cur is not None:
+        cur.execute("SELECT versao FROM controle_versao WHERE nome = %s", (nome,))
+        linha = cur.fetchone()
+        return linha[0] if linha else 0
+
+    conn = get_valid_conn_fin()
+    if not conn: return 0
+    try:
+        with conn.cursor() as c:
+            versao = versao_dados(nome, c)
+        conn.commit()
+        return versao
+    except Exception as e:
+        conn.rollback()
+        st.error(f"Erro ao ler versão de '{nome}': {e}")
+        return 0
+
+def _incrementar_versao(cur, nome):
+    """Nova versão (milissegundos desde 1970, sempre crescente) dentro da transação de quem importou."""
+    cur.execute("""
+        INSERT INTO controle_versao (nome, versao, atualizado_em)
+        VALUES (%(nome)s, (extract(epoch FROM clock_timestamp()) * 1000)::BIGINT, now())
+        ON CONFLICT (nome) DO UPDATE SET
+            versao = greatest(controle_versao.versao + 1, EXCLUDED.versao),
+            atualizado_em = EXCLUDED.atualizado_em
+    """, {'nome': nome})
+
+def criar_gatilho_versao(cur, tabela, nome):
+    """Trigger por comando: qualquer INSERT/UPDATE/DELETE/TRUNCATE em 'tabela' incrementa a versão 'nome'."""
+    gatilho = f"trg_versao_{tabela}"
+    cur.execute("SELECT 1 FROM pg_trigger WHERE tgname = %s AND tgrelid = %s::regclass", (gatilho, tabela))
+    if cur.fetchone(): return
+
+    _criar_tabela_versao(cur)
+    cur.execute("""
+        CREATE OR REPLACE FUNCTION fn_incrementar_versao() RETURNS trigger LANGUAGE plpgsql AS $$
+        BEGIN
+            INSERT INTO controle_versao (nome, versao, atualizado_em)
+            VALUES (TG_ARGV[0], (extract(epoch FROM clock_timestamp()) * 1000)::BIGINT, now())
+            ON CONFLICT (nome) DO UPDATE SET
+                versao = greatest(controle_versao.versao + 1, EXCLUDED.versao),
+                atualizado_em = EXCLUDED.atualizado_em;
+            RETURN NULL;
+        END $$;
+    """)
+    cur.execute(sql.SQL("""
+        CREATE TRIGGER {} AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON {}
+        FOR EACH STATEMENT EXECUTE FUNCTION fn_incrementar_versao({})
+    """).format(sql.Identifier(gatilho), sql.Identifier(tabela), sql.Literal(nome)))
+
 # --- 2. CRIAÇÃO DAS TABELAS LPU ---
 
 def criar_tabelas_lpu():
     """Cria as 3 tabelas para armazenar os preços da LPU, se não existirem."""
     conn = get_valid_conn_fin()
-    if not conn: return
+    if not conn: return False
     
     try:
         with conn.cursor() as cur:
@@ -72,10 +144,15 @@ def criar_tabelas_lpu():
                     reinstalacao NUMERIC(10, 2) DEFAULT 0.00
                 );
             """)
+
+            # Versão de cada conjunto de dados (a LPU troca de versão a cada importação)
+            _criar_tabela_versao(cur)
         conn.commit()
+        return True
     except Exception as e:
         conn.rollback()
         st.error(f"Erro ao criar tabelas LPU: {e}")
+        return False
 
 
 # --- 3. IMPORTAÇÃO DA LPU ---
@@ -154,62 +231,297 @@ def importar_lpu(df_fixo: pd.DataFrame, df_servico: pd.DataFrame, df_equip: pd.D
                 query_serv = "INSERT INTO lpu_servicos_equip (equipamento, codigo_equipamento, sistema, desativacao, reinstalacao) VALUES (%s, %s, %s, %s, %s) ON CONFLICT (equipamento) DO UPDATE SET codigo_equipamento = EXCLUDED.codigo_equipamento, sistema = EXCLUDED.sistema, desativacao = EXCLUDED.desativacao, reinstalacao = EXCLUDED.reinstalacao"
                 cur.executemany(query_serv, vals_serv_clean)
 
+            _incrementar_versao(cur, 'lpu')
+
         conn.commit()
         st.cache_data.clear() 
-        return True, "LPU importada com sucesso."
     
     except Exception as e:
         conn.rollback()
         return False, f"Erro ao importar LPU: {e}"
+
+    # Novos preços: reprecifica a base inteira de chamados
+    ok, qtd = recalcular_valores_chamados()
+    if not ok: return True, "LPU importada, mas houve erro ao recalcular o valor dos chamados."
+    return True, f"LPU importada com sucesso. {qtd} chamados com valor atualizado."
         
-# --- 4. FUNÇÕES DE LEITURA LPU (PARA A PÁGINA) ---
+# --- 4. ÍNDICE DA LPU (COMPILADO UMA VEZ POR PROCESSO E POR VERSÃO) ---
+# Fica no cache_resource (um objeto compartilhado, sem cópia por acesso e sem
+# ser apagado pelo st.cache_data.clear() dos outros gravadores); troca sozinho
+# quando importar_lpu grava uma versão nova em controle_versao.
+
+def _chave_apelido(texto):
+    """Chave tolerante de nome de equipamento: sem acento, pontuação nem espaços repetidos."""
+    sem_acento = ''.join(c for c in unicodedata.normalize('NFD', str(texto)) if unicodedata.category(c) != 'Mn')
+    return ' '.join(re.sub(r'[^0-9a-z]+', ' ', sem_acento.lower()).split())
+
+class IndiceLPU:
+    """
+    LPU compilada: dicionários fixo / servico / equipamento no formato de
+    calcular_valores_lpu, busca de equipamento pela chave normalizada ou pelo
+    apelido (ex.: "Câmera-Bullet" = "camera bullet") e sugestão aproximada
+    para os que não têm preço. Cada nome resolvido (achado ou não) é memorizado.
+    """
+
+    def __init__(self, versao, fixo, servico, equipamento):
+        self.versao = versao
+        self.fixo = fixo
+        self.servico = servico
+        self.equipamento = equipamento
+        self._apelidos = {}
+        for nome in sorted(set(servico) | set(equipamento)):
+            self._apelidos.setdefault(_chave_apelido(nome), nome)
+        self._lista_apelidos = list(self._apelidos)
+        self._resolvidos = {}  # chave do chamado -> nome na LPU (None = não está na LPU)
+        self._sugestoes = {}
+
+    def valor_fixo(self, servico):
+        return self.fixo.get(_normalize_key(servico))
+
+    def resolver_equipamento(self, nome):
+        """Nome do equipamento na LPU (exato ou por apelido), ou None."""
+        chave = "" if pd.isna(nome) else str(nome).strip().lower()
+        if chave not in self._resolvidos:
+            if chave in self.servico or chave in self.equipamento:
+                self._resolvidos[chave] = chave
+            else:
+                self._resolvidos[chave] = self._apelidos.get(_chave_apelido(chave)) if chave else None
+        return self._resolvidos[chave]
+
+    def resolver_equipamentos(self, serie):
+        """resolver_equipamento de uma coluna inteira, uma vez por nome distinto ("" = sem LPU)."""
+        codigos, unicos = pd.factorize(serie)
+        nomes = np.array([self.resolver_equipamento(n) or "" for n in unicos] + [""], dtype=object)
+        return pd.Series(nomes[codigos], index=serie.index, dtype=object)
+
+    def sugerir_equipamento(self, nome, semelhanca=0.8):
+        """Equipamento da LPU mais parecido (difflib), só para conferência; não entra no preço."""
+        chave = _chave_apelido(nome)
+        if chave not in self._sugestoes:
+            achados = difflib.get_close_matches(chave, self._lista_apelidos, n=1, cutoff=semelhanca)
+            self._sugestoes[chave] = self._apelidos[achados[0]] if achados else None
+        return self._sugestoes[chave]
+
+    def calcular_valores(self, df):
+        """Valor de cada linha ('Serviço', 'Equipamento', 'Qtd.'), com o equipamento resolvido no índice."""
+        if 'Equipamento' in df.columns:
+            df = df.assign(Equipamento=self.resolver_equipamentos(df['Equipamento']))
+        return calcular_valores_lpu(df, self.fixo, self.servico, self.equipamento)
+
+@st.cache_resource(max_entries=2, show_spinner=False)
+def _compilar_indice_lpu(versao):
+    conn = get_valid_conn_fin()
+    if not conn: raise RuntimeError("Falha na conexão ao compilar a LPU")
+    try:
+        df_f = pd.read_sql("SELECT servico, valor FROM lpu_valores_fixos", conn)
+        df_s = pd.read_sql("SELECT equipamento, desativacao, reinstalacao FROM lpu_servicos_equip", conn)
+        df_e = pd.read_sql("SELECT equipamento, preco FROM lpu_equipamentos", conn)
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+
+    fixo = df_f.set_index(df_f['servico'].str.lower())['valor'].to_dict()
+    df_s = df_s.set_index(df_s['equipamento'].str.lower())[['desativacao', 'reinstalacao']].fillna(0.0)
+    df_e['preco'] = df_e['preco'].fillna(0.0)
+    return IndiceLPU(versao, fixo, df_s.to_dict('index'), df_e.set_index(df_e['equipamento'].str.lower())['preco'].to_dict())
 
-@st.cache_data(ttl=3600) 
-def carregar_lpu_fixo():
-    """Carrega LPU Fixo como um dicionário para consulta rápida."""
+def obter_indice_lpu(cur=None):
+    """Índice da LPU da versão atual (compilado só na primeira chamada após cada importação)."""
+    return _compilar_indice_lpu(versao_dados('lpu', cur))
+
+def equipamentos_sem_preco():
+    """Equipamentos dos chamados que não estão na LPU, com quantos chamados e a sugestão mais parecida."""
     conn = get_valid_conn_fin()
-    if not conn: return {}
+    if not conn: return pd.DataFrame()
     try:
-        df = pd.read_sql("SELECT servico, valor FROM lpu_valores_fixos", conn)
-        return df.set_index(df['servico'].str.lower())['valor'].to_dict()
+        df = pd.read_sql("""
+            SELECT nome_equipamento AS "Equipamento", count(*) AS "Chamados"
+            FROM chamados WHERE coalesce(btrim(nome_equipamento), '') <> ''
+            GROUP BY nome_equipamento ORDER BY count(*) DESC
+        """, conn)
+        conn.commit()
+        indice = obter_indice_lpu()
     except Exception as e:
-        st.error(f"Erro ao carregar LPU Fixo: {e}")
-        return {}
+        conn.rollback()
+        st.error(f"Erro ao conferir equipamentos da LPU: {e}")
+        return pd.DataFrame()
+
+    df = df[indice.resolver_equipamentos(df['Equipamento']).eq("")]
+    return df.assign(**{'Sugestão na LPU': df['Equipamento'].map(indice.sugerir_equipamento)})
+
+# --- 4.1 PRECIFICAÇÃO DOS CHAMADOS PELA LPU (VETORIZADA) ---
+# Ordem da regra: valor fixo do serviço (sem multiplicar pela qtd) ->
+# desativação / reinstalação do equipamento -> preço do equipamento -> 0.
+
+PALAVRAS_DESATIVACAO = ['desativacao', 'desinstalação', 'desinstalacao']
+PALAVRAS_REINSTALACAO = ['reinstalacao', 'reinstalação', 'instalação nova', 'instalacao nova', 'remanejamento']
+
+def _chaves_lpu(df, coluna):
+    """
+    Normaliza (minúsculo, sem espaços nas pontas) só os valores distintos da coluna.
+    Retorna (códigos por linha, chaves únicas); código -1 (vazio) cai na última chave, "".
+    """
+    if coluna not in df.columns: return np.full(len(df), -1), pd.Series([""], dtype=object)
+    codigos, unicos = pd.factorize(df[coluna])
+    chaves = pd.Series(list(unicos) + [""], dtype=object).astype(str).str.strip().str.lower()
+    return codigos, chaves
+
+def calcular_valores_lpu(df: pd.DataFrame, lpu_f: dict, lpu_s: dict, lpu_e: dict) -> pd.Series:
+    """Valor de cada linha (colunas 'Serviço', 'Equipamento' e 'Qtd.') pelas três tabelas da LPU."""
+    cod_serv, serv = _chaves_lpu(df, 'Serviço')
+    cod_equip, equip = _chaves_lpu(df, 'Equipamento')
+    qtd = pd.to_numeric(df['Qtd.'], errors='coerce') if 'Qtd.' in df.columns else pd.Series(np.nan, index=df.index)
+    qtd = qtd.fillna(0).replace(0, 1).astype(float).to_numpy()
+
+    # Classificação e lookups feitos uma vez por valor distinto e expandidos pelos códigos
+    tem_fixo = serv.isin(lpu_f.keys()).to_numpy()[cod_serv]
+    eh_desativacao = serv.str.contains('|'.join(map(re.escape, PALAVRAS_DESATIVACAO)), regex=True).to_numpy()[cod_serv]
+    eh_reinstalacao = serv.str.contains('|'.join(map(re.escape, PALAVRAS_REINSTALACAO)), regex=True).to_numpy()[cod_serv]
+    tem_servico = equip.isin(lpu_s.keys()).to_numpy()[cod_equip]
+    tem_preco = equip.isin(lpu_e.keys()).to_numpy()[cod_equip]
+
+    valor_fixo = serv.map(lpu_f).astype(float).to_numpy()[cod_serv]
+    valor_desativacao = equip.map({k: v.get('desativacao', 0.0) for k, v in lpu_s.items()}).astype(float).to_numpy()[cod_equip]
+    valor_reinstalacao = equip.map({k: v.get('reinstalacao', 0.0) for k, v in lpu_s.items()}).astype(float).to_numpy()[cod_equip]
+    valor_preco = equip.map(lpu_e).astype(float).to_numpy()[cod_equip]
+
+    valores = np.select(
+        [tem_fixo, tem_servico & eh_desativacao, tem_servico & eh_reinstalacao, tem_preco],
+        [valor_fixo, valor_desativacao * qtd, valor_reinstalacao * qtd, valor_preco * qtd],
+        default=0.0
+    )
+    return pd.Series(valores, index=df.index, dtype=float)
+
+# --- 4.2 VALOR CALCULADO GRAVADO NO CHAMADO (chamados.valor_calculado) ---
+# O preço só muda quando a LPU é reimportada ou quando serviço, equipamento ou
+# quantidade do chamado mudam; os painéis leem o valor gravado.
+
+COLUNAS_PRECO = {'servico': 'Serviço', 'nome_equipamento': 'Equipamento', 'quantidade': 'Qtd.'}
 
-@st.cache_data(ttl=3600)
-def carregar_lpu_servico():
-    """Carrega LPU Serviço (D/R) como um dicionário para consulta rápida."""
+def calcular_valor_chamado(cur, servico, equipamento, quantidade):
+    """Valor de um único chamado pelo índice da LPU (a versão é lida no cursor recebido)."""
+    df = pd.DataFrame({'Serviço': [servico], 'Equipamento': [equipamento], 'Qtd.': [quantidade]})
+    return round(float(obter_indice_lpu(cur).calcular_valores(df).iloc[0]), 2)
+
+def _carregar_chamados_para_preco(conn, chamado_ids=None, somente_pendentes=False):
+    query = "SELECT id, chamado_id, servico, nome_equipamento, quantidade, valor_calculado FROM chamados"
+    params = None
+    if chamado_ids is not None:
+        query += " WHERE chamado_id = ANY(%s)"
+        params = ([str(c) for c in chamado_ids],)
+    elif somente_pendentes:
+        query += " WHERE valor_calculado IS NULL"
+    df = pd.read_sql_query(query, conn, params=params)
+    with conn.cursor() as cur:
+        indice = obter_indice_lpu(cur)
+    df['Valor_Recalculado'] = indice.calcular_valores(df.rename(columns=COLUNAS_PRECO)).round(2)
+    df['valor_calculado'] = pd.to_numeric(df['valor_calculado'], errors='coerce')
+    return df
+
+def recalcular_valores_chamados(chamado_ids=None, somente_pendentes=False):
+    """
+    Recalcula e grava chamados.valor_calculado (todos, só os chamado_ids informados
+    ou só os ainda sem valor) e atualiza o resumo por agência desses chamados.
+    Retorna (sucesso, quantidade de chamados alterados).
+    """
     conn = get_valid_conn_fin()
-    if not conn: return {}
+    if not conn: return False, 0
+
     try:
-        df = pd.read_sql("SELECT equipamento, desativacao, reinstalacao FROM lpu_servicos_equip", conn)
-        df.set_index(df['equipamento'].str.lower(), inplace=True)
-        df['desativacao'] = df['desativacao'].fillna(0.0)
-        df['reinstalacao'] = df['reinstalacao'].fillna(0.0)
-        return df[['desativacao', 'reinstalacao']].to_dict('index')
+        df = _carregar_chamados_para_preco(conn, chamado_ids, somente_pendentes)
+        alterados = df[(df['valor_calculado'] - df['Valor_Recalculado']).abs().gt(0.005) | df['valor_calculado'].isna()]
+        # Chamados recém-gravados (chamado_ids) podem ter mudado de agência/datas sem mudar de preço
+        completo = chamado_ids is None and not somente_pendentes
+        ids_resumo = df['id'].tolist() if chamado_ids is not None else alterados['id'].tolist()
+        if alterados.empty and not ids_resumo and not completo:
+            conn.commit()
+            return True, 0
+
+        vals = list(zip(alterados['id'].astype(int), alterados['Valor_Recalculado'].astype(float)))
+        with conn.cursor() as cur:
+            if vals:
+                execute_values(cur, """
+                    UPDATE chamados AS c SET valor_calculado = v.valor
+                    FROM (VALUES %s) AS v(id, valor)
+                    WHERE c.id = v.id
+                """, vals, page_size=1000)
+            _atualizar_resumo_financeiro(cur, None if completo else ids_resumo)
+        conn.commit()
+        st.cache_data.clear()
+        return True, len(vals)
     except Exception as e:
-        st.error(f"Erro ao carregar LPU Serviço: {e}")
-        return {}
+        conn.rollback()
+        st.error(f"Erro ao recalcular valores dos chamados: {e}")
+        return False, 0
 
-@st.cache_data(ttl=3600)
-def carregar_lpu_equipamento():
-    """Carrega LPU Equipamento (Preço) como um dicionário."""
+def verificar_valores_calculados():
+    """Compara o valor gravado com o recalculado pela LPU atual. Retorna só as divergências."""
     conn = get_valid_conn_fin()
-    if not conn: return {}
+    if not conn: return pd.DataFrame()
+
     try:
-        df = pd.read_sql("SELECT equipamento, preco FROM lpu_equipamentos", conn)
-        df['preco'] = df['preco'].fillna(0.0)
-        return df.set_index(df['equipamento'].str.lower())['preco'].to_dict()
+        df = _carregar_chamados_para_preco(conn)
+        conn.commit()
     except Exception as e:
-        st.error(f"Erro ao carregar LPU Equipamento: {e}")
-        return {}
+        conn.rollback()
+        st.error(f"Erro ao conferir valores dos chamados: {e}")
+        return pd.DataFrame()
+
+    divergentes = df[(df['valor_calculado'] - df['Valor_Recalculado']).abs().gt(0.005) | df['valor_calculado'].isna()]
+    return divergentes.rename(columns={
+        'chamado_id': 'Nº Chamado', **COLUNAS_PRECO,
+        'valor_calculado': 'Valor Gravado', 'Valor_Recalculado': 'Valor Recalculado'
+    }).drop(columns=['id'])
+
+# --- 4.3 PLANILHAS DE BOOKS/LIBERAÇÃO: LEITURA VETORIZADA E CARGA VIA COPY ---
+# A planilha vira colunas tipadas de uma vez, vai por COPY para uma tabela
+# temporária (staging) e o merge/sincronização com chamados é feito em SQL.
+
+def _chamados_planilha(df):
+    return df['CHAMADO'].astype(str).str.strip().where(df['CHAMADO'].notna(), '')
+
+def _texto_planilha(df, coluna):
+    """Texto da coluna como veio (None se vazio ou se a coluna não existir)."""
+    if coluna is None or coluna not in df.columns:
+        return pd.Series(None, index=df.index, dtype=object)
+    texto = df[coluna].astype(str)
+    return texto.where(df[coluna].notna() & texto.str.strip().ne(''), None)
+
+def _datas_planilha(df, coluna):
+    """dd/mm/aaaa ou célula de data do Excel -> date; inválidas viram None."""
+    if coluna not in df.columns:
+        return pd.Series(None, index=df.index, dtype=object)
+    # Célula de data lida com dtype=str chega como '2025-03-05 00:00:00': com dayfirst viraria 03/05
+    texto = df[coluna].astype(str).str.strip()
+    iso = texto.str.match(r'\d{4}-\d{2}-\d{2}').to_numpy()
+    datas = pd.Series(pd.NaT, index=df.index, dtype='datetime64[us]')
+    if iso.any(): datas[iso] = pd.to_datetime(texto[iso], errors='coerce', format='ISO8601')
+    if (~iso).any(): datas[~iso] = pd.to_datetime(texto[~iso], errors='coerce', dayfirst=True, format='mixed')
+    return datas.dt.date.astype(object).where(datas.notna(), None)
+
+def _numeros_planilha(df, coluna):
+    """Número da coluna; vazio, texto ou coluna ausente viram 0.0."""
+    if coluna not in df.columns:
+        return pd.Series(0.0, index=df.index)
+    return pd.to_numeric(df[coluna], errors='coerce').fillna(0.0).astype(float)
+
+def _copiar_para_staging(cur, tabela, df):
+    """COPY do DataFrame para a tabela (mesmos nomes de coluna). Vazio/None vira NULL."""
+    buffer = io.StringIO()
+    df.to_csv(buffer, index=False, header=False)
+    buffer.seek(0)
+    comando = sql.SQL("COPY {} ({}) FROM STDIN WITH (FORMAT csv)").format(
+        sql.Identifier(tabela), sql.SQL(', ').join(map(sql.Identifier, df.columns))
+    )
+    cur.copy_expert(comando.as_string(cur), buffer)
 
 # --- 5. TABELA DE BOOKS (ACUMULATIVO) ---
 
 def criar_tabela_books():
     """Cria a tabela para rastrear os books de faturamento, se não existir."""
     conn = get_valid_conn_fin()
-    if not conn: return
+    if not conn: return False
     
     try:
         with conn.cursor() as cur:
@@ -224,14 +536,21 @@ def criar_tabela_books():
                     book_pronto TEXT,
                     data_envio DATE
                 );
+                CREATE INDEX IF NOT EXISTS idx_books_chave ON books_faturamento (btrim(chamado, E' \\t\\r\\n'), id DESC);
             """)
         conn.commit()
+        return True
     except Exception as e:
         conn.rollback()
         st.error(f"Erro ao criar tabela books_faturamento: {e}")
+        return False
 
 def importar_planilha_books(df_books: pd.DataFrame):
-    """Importa/Atualiza books (Modo Acumulativo - Mantém histórico)."""
+    """Importa/Atualiza books (Modo Acumulativo - Mantém histórico) e sincroniza os chamados.
+
+    Nos chamados do book grava o protocolo e, quando houver, a data de conclusão
+    como data de fechamento. Chamado repetido na planilha: vale a última linha.
+    """
     conn = get_valid_conn_fin()
     if not conn: return False, "Falha na conexão"
     
@@ -241,34 +560,38 @@ def importar_planilha_books(df_books: pd.DataFrame):
         return False, "Erro: Coluna 'CHAMADO' não encontrada."
     if 'PROTOCOLO' not in df_books.columns:
         return False, "Erro: Coluna 'PROTOCOLO' não encontrada."
+
+    staging = pd.DataFrame({
+        'linha': np.arange(len(df_books)),
+        'chamado': _chamados_planilha(df_books),
+        'servico': _texto_planilha(df_books, 'SERVIÇO'),
+        'sistema': _texto_planilha(df_books, 'SISTEMA'),
+        'protocolo': _texto_planilha(df_books, 'PROTOCOLO'),
+        'data_conclusao': _datas_planilha(df_books, 'DATA CONCLUSAO'),
+        'book_pronto': _texto_planilha(df_books, _primeira_coluna(df_books, ['BOOK PRONTO?', 'BOOK PRONTO'])),
+        'data_envio': _datas_planilha(df_books, 'DATA ENVIO'),
+    })
+    staging = staging[staging['chamado'] != '']
         
     try:
         with conn.cursor() as cur:
             # SEM TRUNCATE - para não apagar o histórico
-            
-            vals_books = []
-            for _, row in df_books.iterrows():
-                
-                data_conc = pd.to_datetime(row.get('DATA CONCLUSAO'), errors='coerce')
-                data_env = pd.to_datetime(row.get('DATA ENVIO'), errors='coerce')
-                
-                d_conc = data_conc.date() if pd.notna(data_conc) else None
-                d_env = data_env.date() if pd.notna(data_env) else None
-                    
-                vals_books.append((
-                    str(row['CHAMADO']),
-                    str(row.get('SERVIÇO', '')),
-                    str(row.get('SISTEMA', '')),
-                    str(row.get('PROTOCOLO', '')),
-                    d_conc,
-                    str(row.get('BOOK PRONTO?', '')),
-                    d_env
-                ))
-            
-            query = """
+            cur.execute("""
+                CREATE TEMP TABLE stg_books (
+                    linha INT, chamado TEXT, servico TEXT, sistema TEXT, protocolo TEXT,
+                    data_conclusao DATE, book_pronto TEXT, data_envio DATE
+                ) ON COMMIT DROP;
+            """)
+            _copiar_para_staging(cur, 'stg_books', staging)
+
+            cur.execute("""
+                CREATE TEMP TABLE stg_books_final ON COMMIT DROP AS
+                SELECT DISTINCT ON (chamado) * FROM stg_books ORDER BY chamado, linha DESC;
+
                 INSERT INTO books_faturamento 
                 (chamado, servico, sistema, protocolo, data_conclusao, book_pronto, data_envio) 
-                VALUES (%s, %s, %s, %s, %s, %s, %s)
+                SELECT chamado, servico, sistema, protocolo, data_conclusao, book_pronto, data_envio
+                FROM stg_books_final
                 ON CONFLICT (chamado) DO UPDATE SET
                     servico = EXCLUDED.servico,
                     sistema = EXCLUDED.sistema,
@@ -276,12 +599,25 @@ def importar_planilha_books(df_books: pd.DataFrame):
                     data_conclusao = EXCLUDED.data_conclusao,
                     book_pronto = EXCLUDED.book_pronto,
                     data_envio = EXCLUDED.data_envio
-            """
-            cur.executemany(query, vals_books)
+            """)
+            n_books = cur.rowcount
+
+            # Sincronia com a Gestão: um UPDATE com join, só nas linhas que mudam
+            cur.execute("""
+                UPDATE chamados AS c SET
+                    protocolo = b.protocolo,
+                    data_fechamento = coalesce(b.data_conclusao, c.data_fechamento)
+                FROM stg_books_final b
+                WHERE btrim(c.chamado_id, E' \\t\\r\\n') = b.chamado
+                  AND (c.protocolo IS DISTINCT FROM b.protocolo
+                       OR c.data_fechamento IS DISTINCT FROM coalesce(b.data_conclusao, c.data_fechamento))
+            """)
+            n_chamados = cur.rowcount
+            _atualizar_resumo_financeiro(cur)
             
         conn.commit()
         st.cache_data.clear()
-        return True, f"{len(vals_books)} registros de book processados (Histórico mantido)."
+        return True, f"{n_books} registros de book processados (Histórico mantido). {n_chamados} chamados atualizados com dados da planilha."
         
     except Exception as e:
         conn.rollback()
@@ -305,7 +641,7 @@ def carregar_books_db():
 def criar_tabela_liberacao():
     """Cria a tabela para armazenar o espelho de faturamento do banco."""
     conn = get_valid_conn_fin()
-    if not conn: return
+    if not conn: return False
     try:
         with conn.cursor() as cur:
             cur.execute("""
@@ -328,14 +664,21 @@ def criar_tabela_liberacao():
                     nome_projeto TEXT,
                     nome_usuario TEXT
                 );
+                CREATE INDEX IF NOT EXISTS idx_liberado_chave ON faturamento_liberado (btrim(chamado, E' \\t\\r\\n'));
             """)
         conn.commit()
+        return True
     except Exception as e:
         conn.rollback()
         st.error(f"Erro ao criar tabela faturamento_liberado: {e}")
+        return False
 
 def importar_planilha_liberacao(df: pd.DataFrame):
-    """Importa liberação (Modo Acumulativo + Conversão Segura de Tipos)."""
+    """Importa liberação (Modo Acumulativo + Conversão Segura de Tipos) e marca os chamados como pagos.
+
+    Chamado repetido na planilha (um por item): cadastro da primeira linha,
+    quantidade/valores/protocolo/serviço da última.
+    """
     conn = get_valid_conn_fin()
     if not conn: return False, "Falha na conexão"
     
@@ -344,57 +687,74 @@ def importar_planilha_liberacao(df: pd.DataFrame):
     if 'CHAMADO' not in df.columns:
         return False, "Erro: Coluna 'CHAMADO' não encontrada."
 
+    staging = pd.DataFrame({
+        'linha': np.arange(len(df)),
+        'chamado': _chamados_planilha(df),
+        'codigo_ponto': _texto_planilha(df, 'CODIGO_DO_PONTO'),
+        'nome_ponto': _texto_planilha(df, 'NOME_PONTO'),
+        'uf_agencia': _texto_planilha(df, 'UFAGENCIA'),
+        'cidade_agencia': _texto_planilha(df, 'CIDADEAGENCIA'),
+        'nome_sistema': _texto_planilha(df, 'NOME_SISTEMA'),
+        'servico': _texto_planilha(df, 'SERVICO'),
+        'tipo_servico': _texto_planilha(df, 'TIPO_SERVICO'),
+        'cod_equipamento': _texto_planilha(df, 'CODIGO_DO_EQUIPAMENTO'),
+        'nome_equipamento': _texto_planilha(df, 'NOME_EQUIPAMENTO'),
+        'qtd_liberada': _numeros_planilha(df, 'QUANTIDADE_LIBERADA'),
+        'valor_unitario': _numeros_planilha(df, 'VALORUNITARIO'),
+        'total': _numeros_planilha(df, 'TOTAL'),
+        'protocolo_atendimento': _texto_planilha(df, 'PROTOCOLOATENDIMENTO'),
+        'nome_projeto': _texto_planilha(df, 'NOME_PROJETO'),
+        'nome_usuario': _texto_planilha(df, 'NOMEUSUARIO'),
+    })
+    staging = staging[staging['chamado'] != '']
+
     try:
         with conn.cursor() as cur:
             # SEM TRUNCATE
-            
-            vals = []
-            for _, row in df.iterrows():
-                
-                # Conversão segura de tipos
-                def safe_num(col_name):
-                    val = row.get(col_name)
-                    try:
-                        v_float = float(pd.to_numeric(val, errors='coerce'))
-                        return v_float if not np.isnan(v_float) else 0.0
-                    except:
-                        return 0.0
-                
-                vals.append((
-                    str(row.get('CHAMADO', '')),
-                    str(row.get('CODIGO_DO_PONTO', '')),
-                    str(row.get('NOME_PONTO', '')),
-                    str(row.get('UFAGENCIA', '')),
-                    str(row.get('CIDADEAGENCIA', '')),
-                    str(row.get('NOME_SISTEMA', '')),
-                    str(row.get('SERVICO', '')),
-                    str(row.get('TIPO_SERVICO', '')),
-                    str(row.get('CODIGO_DO_EQUIPAMENTO', '')),
-                    str(row.get('NOME_EQUIPAMENTO', '')),
-                    safe_num('QUANTIDADE_LIBERADA'),
-                    safe_num('VALORUNITARIO'),
-                    safe_num('TOTAL'),
-                    str(row.get('PROTOCOLOATENDIMENTO', '')),
-                    str(row.get('NOME_PROJETO', '')),
-                    str(row.get('NOMEUSUARIO', ''))
-                ))
-
-            query = """
+            cur.execute("""
+                CREATE TEMP TABLE stg_liberacao ON COMMIT DROP AS
+                SELECT 0::INT AS linha, chamado, codigo_ponto, nome_ponto, uf_agencia, cidade_agencia, nome_sistema,
+                       servico, tipo_servico, cod_equipamento, nome_equipamento, qtd_liberada, valor_unitario, total,
+                       protocolo_atendimento, nome_projeto, nome_usuario
+                FROM faturamento_liberado WITH NO DATA;
+            """)
+            _copiar_para_staging(cur, 'stg_liberacao', staging)
+
+            cur.execute("""
+                -- Como no upsert linha a linha: cadastro da 1ª linha do chamado, valores da última
+                CREATE TEMP TABLE stg_liberacao_final ON COMMIT DROP AS
+                SELECT p.chamado, p.codigo_ponto, p.nome_ponto, p.uf_agencia, p.cidade_agencia, p.nome_sistema,
+                       u.servico, p.tipo_servico, p.cod_equipamento, p.nome_equipamento, u.qtd_liberada, u.valor_unitario, u.total,
+                       u.protocolo_atendimento, p.nome_projeto, p.nome_usuario
+                FROM (SELECT DISTINCT ON (chamado) * FROM stg_liberacao ORDER BY chamado, linha) p
+                JOIN (SELECT DISTINCT ON (chamado) * FROM stg_liberacao ORDER BY chamado, linha DESC) u USING (chamado);
+
                 INSERT INTO faturamento_liberado 
                 (chamado, codigo_ponto, nome_ponto, uf_agencia, cidade_agencia, nome_sistema, servico, tipo_servico, cod_equipamento, nome_equipamento, qtd_liberada, valor_unitario, total, protocolo_atendimento, nome_projeto, nome_usuario)
-                VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
+                SELECT chamado, codigo_ponto, nome_ponto, uf_agencia, cidade_agencia, nome_sistema, servico, tipo_servico, cod_equipamento, nome_equipamento, qtd_liberada, valor_unitario, total, protocolo_atendimento, nome_projeto, nome_usuario
+                FROM stg_liberacao_final
                 ON CONFLICT (chamado) DO UPDATE SET
                     qtd_liberada = EXCLUDED.qtd_liberada,
                     valor_unitario = EXCLUDED.valor_unitario,
                     total = EXCLUDED.total,
                     protocolo_atendimento = EXCLUDED.protocolo_atendimento,
                     servico = EXCLUDED.servico
-            """
-            cur.executemany(query, vals)
+            """)
+            n_liberados = cur.rowcount
+
+            # Sincronia imediata com a Gestão: chamado liberado = pago pelo banco
+            cur.execute("""
+                UPDATE chamados AS c SET chk_financeiro_banco = 'TRUE'
+                FROM stg_liberacao_final l
+                WHERE btrim(c.chamado_id, E' \\t\\r\\n') = l.chamado
+                  AND c.chk_financeiro_banco IS DISTINCT FROM 'TRUE'
+            """)
+            n_chamados = cur.rowcount
+            _atualizar_resumo_financeiro(cur)
         
         conn.commit()
         st.cache_data.clear()
-        return True, f"{len(vals)} registros de liberação processados (Histórico mantido)."
+        return True, f"{n_liberados} registros de liberação processados (Histórico mantido). {n_chamados} chamados marcados como Faturado/Pago."
         
     except Exception as e:
         conn.rollback()
@@ -410,3 +770,611 @@ def carregar_liberacao_db():
     except Exception as e:
         st.error(f"Erro ao carregar liberação: {e}")
         return pd.DataFrame()
+
+# --- 7. STATUS FINANCEIRO DOS CHAMADOS (VETORIZADO) ---
+# FATURADO: chamado na liberação | PENDENTE FATURAMENTO: book pronto ('SIM') ou
+# com data de envio | PENDENTE ENVIO BOOK: só está nos books | POTENCIAL: o resto.
+
+CORES_STATUS_FINANCEIRO = {
+    "FATURADO (Pago)": "#2E7D32",       # Verde Escuro
+    "PENDENTE FATURAMENTO": "#FB8C00",  # Laranja
+    "PENDENTE ENVIO BOOK": "#C62828",   # Vermelho
+    "POTENCIAL": "#1565C0",             # Azul
+}
+
+def _chave_chamado(serie):
+    return serie.astype(str).str.strip()
+
+def _primeira_coluna(df, opcoes):
+    """Primeira das colunas (comparação em maiúsculo) que existir no df, ou None."""
+    por_nome = {str(c).strip().upper(): c for c in df.columns}
+    return next((por_nome[o] for o in opcoes if o in por_nome), None)
+
+def _books_enviados(df_books):
+    """Uma linha por chamado dos books: Book_Enviado = book pronto 'SIM' ou data de envio preenchida."""
+    col_chamado = _primeira_coluna(df_books, ['CHAMADO'])
+    if df_books.empty or col_chamado is None:
+        return pd.DataFrame(columns=['chave', 'Book_Enviado'])
+
+    col_pronto = _primeira_coluna(df_books, ['BOOK_PRONTO', 'BOOK PRONTO?', 'BOOK PRONTO', 'PRONTO'])
+    col_envio = _primeira_coluna(df_books, ['DATA_ENVIO', 'DATA ENVIO', 'ENVIO'])
+
+    pronto = df_books[col_pronto].astype(str).str.strip().str.upper().eq('SIM') if col_pronto else False
+    if col_envio:
+        envio = df_books[col_envio]
+        tem_envio = envio.notna() & ~envio.astype(str).str.strip().isin(['', 'nan', 'None'])
+    else:
+        tem_envio = False
+
+    books = pd.DataFrame({'chave': _chave_chamado(df_books[col_chamado]), 'Book_Enviado': pronto | tem_envio})
+    return books.drop_duplicates('chave', keep='last')
+
+def classificar_status_financeiro(df_chamados, df_books, df_lib):
+    """
+    Status_Fin, Cor_Fin e Book_Enviado de cada chamado, com um merge contra
+    books_faturamento e faturamento_liberado pelo Nº Chamado normalizado.
+    """
+    chave = _chave_chamado(df_chamados['Nº Chamado'])
+    liberados = _chave_chamado(df_lib['chamado']) if not df_lib.empty and 'chamado' in df_lib.columns else pd.Series(dtype=str)
+
+    books = pd.DataFrame({'chave': chave.to_numpy()}).merge(_books_enviados(df_books), on='chave', how='left')
+    tem_book = books['Book_Enviado'].notna().to_numpy()
+    book_enviado = books['Book_Enviado'].fillna(False).astype(bool).to_numpy()
+    faturado = chave.isin(liberados).to_numpy()
+
+    status = np.select(
+        [faturado, tem_book & book_enviado, tem_book],
+        ["FATURADO (Pago)", "PENDENTE FATURAMENTO", "PENDENTE ENVIO BOOK"],
+        default="POTENCIAL"
+    )
+    resultado = pd.DataFrame({'Status_Fin': status, 'Book_Enviado': book_enviado}, index=df_chamados.index)
+    resultado['Cor_Fin'] = resultado['Status_Fin'].map(CORES_STATUS_FINANCEIRO)
+    return resultado[['Status_Fin', 'Cor_Fin', 'Book_Enviado']]
+
+# --- 8. KPIs FINANCEIROS NO BANCO ---
+# Mesma regra do classificar_status_financeiro, em SQL: o topo do painel soma
+# os chamados por status sem trazer a tabela inteira para o pandas.
+
+SQL_STATUS_FINANCEIRO = """
+    WITH liberados AS (
+        SELECT DISTINCT btrim(chamado, E' \\t\\r\\n') AS chave FROM faturamento_liberado
+    ),
+    books AS (
+        SELECT DISTINCT ON (btrim(chamado, E' \\t\\r\\n'))
+            btrim(chamado, E' \\t\\r\\n') AS chave,
+            (upper(btrim(coalesce(book_pronto, ''), E' \\t\\r\\n')) = 'SIM' OR data_envio IS NOT NULL) AS book_enviado
+        FROM books_faturamento
+        ORDER BY btrim(chamado, E' \\t\\r\\n'), id DESC
+    ),
+    status_fin AS (
+        SELECT
+            c.id, c.data_abertura,
+            coalesce(c.valor_calculado, 0) AS valor,
+            coalesce(b.book_enviado, FALSE) AS book_enviado,
+            CASE
+                WHEN l.chave IS NOT NULL THEN 'FATURADO (Pago)'
+                WHEN b.book_enviado THEN 'PENDENTE FATURAMENTO'
+                WHEN b.chave IS NOT NULL THEN 'PENDENTE ENVIO BOOK'
+                ELSE 'POTENCIAL'
+            END AS status_fin
+        FROM chamados c
+        LEFT JOIN liberados l ON l.chave = btrim(c.chamado_id, E' \\t\\r\\n')
+        LEFT JOIN books b ON b.chave = btrim(c.chamado_id, E' \\t\\r\\n')
+    )
+"""
+
+@st.cache_data(ttl=60)
+def carregar_kpis_financeiros(ano=None):
+    """
+    {status: {'qtd', 'valor'}} para os 4 status financeiros e 'BOOKS ENVIADOS'.
+    'ano' filtra pela data de abertura do chamado (None = todos). Soma as linhas
+    de total dos meses fechados (fin_snapshots) com o período ainda aberto.
+    """
+    vazio = {s: {'qtd': 0, 'valor': 0.0} for s in list(CORES_STATUS_FINANCEIRO) + ['BOOKS ENVIADOS']}
+    conn = get_valid_conn_fin()
+    if not conn: return vazio
+
+    query = SQL_PERIODO_ABERTO + """
+        SELECT status_fin, sum(qtd), sum(valor) FROM (
+            SELECT status_fin, qtd, valor FROM fin_snapshots
+            WHERE agencia = '' AND (%(ano)s::INTEGER IS NULL OR EXTRACT(YEAR FROM periodo) = %(ano)s::INTEGER)
+            UNION ALL
+            SELECT status_fin, count(*), coalesce(sum(valor), 0) FROM aberto
+            WHERE %(ano)s::INTEGER IS NULL OR EXTRACT(YEAR FROM data_abertura) = %(ano)s::INTEGER
+            GROUP BY status_fin
+        ) t
+        GROUP BY status_fin
+    """
+    try:
+        with conn.cursor() as cur:
+            cur.execute(query, {'ano': ano})
+            linhas = cur.fetchall()
+        conn.commit()
+    except Exception as e:
+        conn.rollback()
+        st.error(f"Erro ao calcular KPIs financeiros: {e}")
+        return vazio
+
+    for status, qtd, valor in linhas:
+        vazio[status] = {'qtd': int(qtd), 'valor': float(valor)}
+    return vazio
+
+@st.cache_data(ttl=600)
+def carregar_anos_chamados():
+    """Anos (data de abertura) com chamados, do mais recente para o mais antigo."""
+    conn = get_valid_conn_fin()
+    if not conn: return []
+    try:
+        with conn.cursor() as cur:
+            cur.execute("SELECT DISTINCT EXTRACT(YEAR FROM data_abertura)::INTEGER FROM chamados WHERE data_abertura IS NOT NULL ORDER BY 1 DESC")
+            anos = [r[0] for r in cur.fetchall()]
+        conn.commit()
+        return anos
+    except Exception as e:
+        conn.rollback()
+        st.error(f"Erro ao carregar anos: {e}")
+        return []
+
+# --- 9. SINCRONIZAÇÃO DOS STATUS FINANCEIROS NA GESTÃO ---
+
+def sincronizar_status_financeiro():
+    """
+    Aplica o status financeiro (SQL_STATUS_FINANCEIRO) no Status/Sub-Status dos
+    chamados com um único UPDATE, gravando só as linhas que mudam e anexando o
+    log no mesmo formato do atualizar_chamado_db.
+    Retorna (sucesso, {status financeiro: chamados alterados}).
+    """
+    conn = get_valid_conn_fin()
+    if not conn: return False, {}
+
+    query = SQL_STATUS_FINANCEIRO + """
+        , alvo AS (
+            SELECT
+                id, status_fin,
+                'Finalizado' AS novo_status,
+                CASE status_fin
+                    WHEN 'FATURADO (Pago)' THEN 'Faturado'
+                    WHEN 'PENDENTE FATURAMENTO' THEN 'Aguardando faturamento'
+                    ELSE 'Enviar Book'
+                END AS novo_sub,
+                CASE WHEN status_fin = 'FATURADO (Pago)' THEN 'TRUE' END AS novo_chk_banco
+            FROM status_fin
+            WHERE status_fin <> 'POTENCIAL'
+        )
+        UPDATE chamados AS c SET
+            status_chamado = a.novo_status,
+            sub_status = a.novo_sub,
+            chk_financeiro_banco = COALESCE(a.novo_chk_banco, c.chk_financeiro_banco),
+            log_chamado = CASE
+                WHEN c.status_chamado IS DISTINCT FROM a.novo_status OR COALESCE(c.sub_status, '') <> a.novo_sub
+                THEN btrim(concat_ws(E'\\n',
+                    c.log_chamado,
+                    CASE WHEN c.status_chamado IS DISTINCT FROM a.novo_status
+                         THEN format('%%s %%s: Status ''%%s'' -> ''%%s''', %(hoje)s, %(usuario)s, COALESCE(c.status_chamado, 'None'), a.novo_status) END,
+                    CASE WHEN COALESCE(c.sub_status, '') <> a.novo_sub
+                         THEN format('%%s %%s: Ação ''%%s'' -> ''%%s''', %(hoje)s, %(usuario)s, COALESCE(c.sub_status, 'None'), a.novo_sub) END
+                ), E' \\t\\r\\n')
+                ELSE c.log_chamado
+            END
+        FROM alvo a
+        WHERE c.id = a.id
+          AND (c.status_chamado IS DISTINCT FROM a.novo_status
+               OR c.sub_status IS DISTINCT FROM a.novo_sub
+               OR (a.novo_chk_banco IS NOT NULL AND c.chk_financeiro_banco IS DISTINCT FROM a.novo_chk_banco))
+        RETURNING a.status_fin
+    """
+    params = {'hoje': date.today().strftime('%d/%m/%Y'), 'usuario': st.session_state.get('usuario', 'Sistema')}
+    try:
+        with conn.cursor() as cur:
+            cur.execute(query, params)
+            contagem = pd.Series([r[0] for r in cur.fetchall()], dtype=object).value_counts().to_dict()
+        conn.commit()
+        st.cache_data.clear()
+        return True, {s: int(contagem.get(s, 0)) for s in CORES_STATUS_FINANCEIRO if s != 'POTENCIAL'}
+    except Exception as e:
+        conn.rollback()
+        st.error(f"Erro ao sincronizar status financeiros: {e}")
+        return False, {}
+
+# --- 10. RESUMO FINANCEIRO POR AGÊNCIA (ROLLUP + PAGINAÇÃO POR CHAVE) ---
+# fin_status_chamados guarda, por chamado, a agência já formatada, o status
+# financeiro e o valor; fin_resumo_agencias soma isso por agência. As duas são
+# mantidas aqui: recálculo completo após importar books/liberação/LPU e
+# incremental (só os chamados e agências afetados) quando um chamado muda.
+# A lista da página anda pelas agências com WHERE agencia > última da página.
+
+COLUNAS_RESUMO_STATUS = {
+    "FATURADO (Pago)": "qtd_faturado",
+    "PENDENTE FATURAMENTO": "qtd_pendente_faturamento",
+    "PENDENTE ENVIO BOOK": "qtd_pendente_book",
+    "POTENCIAL": "qtd_potencial",
+}
+
+# Colunas de chamados que entram no resumo (agência, status pelo nº do chamado, valor e datas)
+COLUNAS_RESUMO_FINANCEIRO = ('chamado_id', 'agencia_id', 'agencia_nome', 'data_abertura', 'data_fechamento', 'valor_calculado')
+
+# agencia = coluna gerada chamados.agencia_combinada ("AG 0001 - NOME")
+SQL_FATO_FINANCEIRO = """
+    SELECT
+        c.id,
+        c.agencia_combinada AS agencia,
+        CASE
+            WHEN EXISTS (SELECT 1 FROM faturamento_liberado l WHERE btrim(l.chamado, E' \\t\\r\\n') = a.chave) THEN 'FATURADO (Pago)'
+            WHEN b.book_enviado THEN 'PENDENTE FATURAMENTO'
+            WHEN b.book_enviado IS NOT NULL THEN 'PENDENTE ENVIO BOOK'
+            ELSE 'POTENCIAL'
+        END AS status_fin,
+        coalesce(c.valor_calculado, 0) AS valor,
+        c.data_abertura,
+        greatest(c.data_abertura, c.data_fechamento, b.data_envio) AS ultima_movimentacao,
+        coalesce(b.book_enviado, FALSE) AS book_enviado
+    FROM chamados c
+    CROSS JOIN LATERAL (SELECT btrim(c.chamado_id, E' \\t\\r\\n') AS chave) a
+    LEFT JOIN LATERAL (
+        SELECT (upper(btrim(coalesce(bf.book_pronto, ''), E' \\t\\r\\n')) = 'SIM' OR bf.data_envio IS NOT NULL) AS book_enviado,
+               bf.data_envio
+        FROM books_faturamento bf
+        WHERE btrim(bf.chamado, E' \\t\\r\\n') = a.chave
+        ORDER BY bf.id DESC LIMIT 1
+    ) b ON TRUE
+"""
+INSERT_FATO_FINANCEIRO = "INSERT INTO fin_status_chamados (id, agencia, status_fin, valor, data_abertura, ultima_movimentacao, book_enviado)"
+
+def criar_tabelas_resumo_financeiro():
+    """
+    Cria fin_status_chamados / fin_resumo_agencias / fin_snapshots e monta o
+    resumo se ainda estiver vazio. Retorna True se deu certo.
+    """
+    conn = get_valid_conn_fin()
+    if not conn: return False
+
+    try:
+        with conn.cursor() as cur:
+            cur.execute("""
+                CREATE TABLE IF NOT EXISTS fin_status_chamados (
+                    id INTEGER PRIMARY KEY,
+                    agencia TEXT COLLATE "C" NOT NULL,
+                    status_fin TEXT NOT NULL,
+                    valor NUMERIC(12, 2),
+                    data_abertura DATE,
+                    ultima_movimentacao DATE,
+                    book_enviado BOOLEAN
+                );
+                CREATE INDEX IF NOT EXISTS idx_fin_status_chamados_agencia ON fin_status_chamados (agencia, status_fin);
+                CREATE INDEX IF NOT EXISTS idx_fin_status_chamados_abertura ON fin_status_chamados (data_abertura);
+
+                CREATE TABLE IF NOT EXISTS fin_resumo_agencias (
+                    agencia TEXT COLLATE "C" PRIMARY KEY,
+                    qtd_chamados INTEGER NOT NULL,
+                    valor_total NUMERIC(14, 2) NOT NULL,
+                    qtd_faturado INTEGER NOT NULL,
+                    qtd_pendente_faturamento INTEGER NOT NULL,
+                    qtd_pendente_book INTEGER NOT NULL,
+                    qtd_potencial INTEGER NOT NULL,
+                    ultima_movimentacao DATE
+                );
+
+                CREATE TABLE IF NOT EXISTS fin_snapshots (
+                    periodo DATE NOT NULL,
+                    agencia TEXT COLLATE "C" NOT NULL,
+                    status_fin TEXT NOT NULL,
+                    qtd INTEGER NOT NULL,
+                    valor NUMERIC(14, 2) NOT NULL,
+                    fechado_em TIMESTAMP NOT NULL DEFAULT now(),
+                    PRIMARY KEY (periodo, agencia, status_fin)
+                );
+            """)
+            # ALTER TABLE trava a tabela (ACCESS EXCLUSIVE) mesmo com IF NOT EXISTS: só roda se faltar a coluna
+            cur.execute("SELECT 1 FROM information_schema.columns WHERE table_name = 'fin_status_chamados' AND column_name = 'book_enviado';")
+            if cur.fetchone() is None:
+                cur.execute("ALTER TABLE fin_status_chamados ADD COLUMN book_enviado BOOLEAN;")
+            # Vazio (ou criado antes da coluna book_enviado): monta tudo, inclusive os snapshots
+            cur.execute("SELECT NOT EXISTS (SELECT 1 FROM fin_status_chamados WHERE book_enviado IS NOT NULL) AND EXISTS (SELECT 1 FROM chamados)")
+            if cur.fetchone()[0]:
+                _atualizar_resumo_financeiro(cur)
+        conn.commit()
+        return True
+    except Exception as e:
+        conn.rollback()
+        st.error(f"Erro ao criar tabelas do resumo financeiro: {e}")
+        return False
+
+def _atualizar_resumo_financeiro(cur, ids=None):
+    """
+    Recalcula o resumo (usa o cursor recebido, sem commit). ids = chamados.id
+    alterados, inseridos ou apagados; None = tudo.
+    """
+    contagens = sql.SQL(", ").join(
+        sql.SQL("count(*) FILTER (WHERE status_fin = {})").format(sql.Literal(status))
+        for status in COLUNAS_RESUMO_STATUS
+    )
+    colunas = sql.SQL(", ").join(map(sql.Identifier, COLUNAS_RESUMO_STATUS.values()))
+    insert_resumo = sql.SQL("""
+        INSERT INTO fin_resumo_agencias (agencia, qtd_chamados, valor_total, {colunas}, ultima_movimentacao)
+        SELECT agencia, count(*), coalesce(sum(valor), 0), {contagens}, max(ultima_movimentacao)
+        FROM fin_status_chamados {filtro}
+        GROUP BY agencia
+    """)
+
+    if ids is None:
+        cur.execute("TRUNCATE fin_status_chamados, fin_resumo_agencias;")
+        cur.execute(f"{INSERT_FATO_FINANCEIRO} {SQL_FATO_FINANCEIRO}")
+        cur.execute(insert_resumo.format(colunas=colunas, contagens=contagens, filtro=sql.SQL("")))
+        _fechar_periodos(cur)
+        return
+
+    ids = [int(i) for i in ids]
+    if not ids: return
+    cur.execute("DELETE FROM fin_status_chamados WHERE id = ANY(%s) RETURNING agencia, data_abertura", (ids,))
+    afetados = cur.fetchall()
+    cur.execute(f"{INSERT_FATO_FINANCEIRO} {SQL_FATO_FINANCEIRO} WHERE c.id = ANY(%s) RETURNING agencia, data_abertura", (ids,))
+    afetados += cur.fetchall()
+
+    agencias = list({agencia for agencia, _ in afetados})
+    cur.execute("DELETE FROM fin_resumo_agencias WHERE agencia = ANY(%s)", (agencias,))
+    cur.execute(insert_resumo.format(colunas=colunas, contagens=contagens, filtro=sql.SQL("WHERE agencia = ANY(%s)")), (agencias,))
+
+    # Meses já fechados que tinham (ou passaram a ter) esses chamados
+    periodos = {d.replace(day=1) for _, d in afetados if d is not None}
+    if periodos: _fechar_periodos(cur, sorted(periodos))
+
+def atualizar_resumo_financeiro(ids=None, cur=None):
+    """
+    Recalcula o resumo por agência (todos ou só os chamados.id informados).
+    Com cur, roda na transação dele: sem commit, e o erro sobe para quem chamou.
+    """
+    if cur is not None:
+        _atualizar_resumo_financeiro(cur, ids)
+        return True
+
+    conn = get_valid_conn_fin()
+    if not conn: return False
+
+    try:
+        with conn.cursor() as cur:
+            _atualizar_resumo_financeiro(cur, ids)
+        conn.commit()
+        st.cache_data.clear()
+        return True
+    except Exception as e:
+        conn.rollback()
+        st.error(f"Erro ao atualizar resumo financeiro: {e}")
+        return False
+
+def _filtro_agencias(status_fin, agencia, busca):
+    """WHERE sobre fin_resumo_agencias r para os filtros da lista (status, agência, busca)."""
+    status_fin = [s for s in status_fin if s in COLUNAS_RESUMO_STATUS]
+    params = {'status': status_fin}
+    condicoes = []
+    if busca:
+        # Busca: a agência entra se algum chamado dela (nos status filtrados) contém o texto
+        params['busca'] = '%' + re.sub(r'([\\%_])', r'\\\1', busca.strip()) + '%'
+        condicoes.append(sql.SQL("""EXISTS (
+            SELECT 1 FROM fin_status_chamados f JOIN chamados c ON c.id = f.id
+            WHERE f.agencia = r.agencia AND f.status_fin = ANY(%(status)s)
+              AND concat_ws(' ', c.chamado_id, f.agencia, c.protocolo, c.servico, c.nome_equipamento,
+                            c.projeto_nome, c.sistema, f.valor) ILIKE %(busca)s
+        )"""))
+    elif status_fin:
+        condicoes.append(sql.SQL("({})").format(sql.SQL(" OR ").join(
+            sql.SQL("r.{} > 0").format(sql.Identifier(COLUNAS_RESUMO_STATUS[s])) for s in status_fin
+        )))
+    else:
+        condicoes.append(sql.SQL("FALSE"))
+    if agencia and agencia != "Todas":
+        params['agencia'] = agencia
+        condicoes.append(sql.SQL("r.agencia = %(agencia)s"))
+    return sql.SQL(" AND ").join(condicoes), params
+
+@st.cache_data(ttl=60)
+def carregar_agencias_financeiro():
+    """Nomes de todas as agências do resumo, em ordem (opções do filtro)."""
+    conn = get_valid_conn_fin()
+    if not conn: return []
+    try:
+        with conn.cursor() as cur:
+            cur.execute("SELECT agencia FROM fin_resumo_agencias ORDER BY agencia")
+            agencias = [r[0] for r in cur.fetchall()]
+        conn.commit()
+        return agencias
+    except Exception as e:
+        conn.rollback()
+        st.error(f"Erro ao carregar agências: {e}")
+        return []
+
+@st.cache_data(ttl=60)
+def contar_agencias_financeiro(status_fin=tuple(COLUNAS_RESUMO_STATUS), agencia=None, busca=None):
+    conn = get_valid_conn_fin()
+    if not conn: return 0
+    filtro, params = _filtro_agencias(status_fin, agencia, busca)
+    try:
+        with conn.cursor() as cur:
+            cur.execute(sql.SQL("SELECT count(*) FROM fin_resumo_agencias r WHERE {}").format(filtro), params)
+            total = cur.fetchone()[0]
+        conn.commit()
+        return total
+    except Exception as e:
+        conn.rollback()
+        st.error(f"Erro ao contar agências: {e}")
+        return 0
+
+@st.cache_data(ttl=60)
+def carregar_pagina_agencias(status_fin=tuple(COLUNAS_RESUMO_STATUS), agencia=None, busca=None, apos=None, limite=10):
+    """
+    Próximas `limite` agências do resumo depois de `apos` (paginação por chave:
+    usa o índice da PK, o custo não cresce com o número de agências).
+    """
+    conn = get_valid_conn_fin()
+    if not conn: return pd.DataFrame()
+    filtro, params = _filtro_agencias(status_fin, agencia, busca)
+    if apos is not None:
+        filtro = sql.SQL("{} AND r.agencia > %(apos)s").format(filtro)
+        params['apos'] = apos
+    params['limite'] = limite
+    query = sql.SQL("SELECT r.* FROM fin_resumo_agencias r WHERE {} ORDER BY r.agencia LIMIT %(limite)s").format(filtro)
+    try:
+        df = pd.read_sql_query(query.as_string(conn), conn, params=params)
+        conn.commit()
+        return df
+    except Exception as e:
+        conn.rollback()
+        st.error(f"Erro ao carregar agências: {e}")
+        return pd.DataFrame()
+
+@st.cache_data(ttl=60)
+def carregar_chamados_das_agencias(agencias, status_fin=tuple(COLUNAS_RESUMO_STATUS), busca=None):
+    """Chamados (com status financeiro e valor) só das agências da página, na ordem da Gestão."""
+    colunas = ['Agencia_Combinada', 'Nº Chamado', 'Abertura', 'Status_Fin', 'Valor_Calculado', 'Serviço', 'Equipamento', 'Qtd.', 'Cor_Fin']
+    conn = get_valid_conn_fin()
+    if not conn or not agencias: return pd.DataFrame(columns=colunas)
+
+    params = {'agencias': list(agencias), 'status': [s for s in status_fin if s in COLUNAS_RESUMO_STATUS]}
+    filtro_busca = ""
+    if busca:
+        params['busca'] = '%' + re.sub(r'([\\%_])', r'\\\1', busca.strip()) + '%'
+        filtro_busca = """AND concat_ws(' ', c.chamado_id, f.agencia, c.protocolo, c.servico, c.nome_equipamento,
+                                        c.projeto_nome, c.sistema, f.valor) ILIKE %(busca)s"""
+    query = f"""
+        SELECT f.agencia AS "Agencia_Combinada", c.chamado_id AS "Nº Chamado", f.data_abertura AS "Abertura",
+               f.status_fin AS "Status_Fin", f.valor::float AS "Valor_Calculado",
+               c.servico AS "Serviço", c.nome_equipamento AS "Equipamento", c.quantidade AS "Qtd."
+        FROM fin_status_chamados f
+        JOIN chamados c ON c.id = f.id
+        WHERE f.agencia = ANY(%(agencias)s) AND f.status_fin = ANY(%(status)s) {filtro_busca}
+        ORDER BY f.agencia, c.data_agendamento DESC, c.id DESC
+    """
+    try:
+        df = pd.read_sql_query(query, conn, params=params)
+        conn.commit()
+    except Exception as e:
+        conn.rollback()
+        st.error(f"Erro ao carregar chamados das agências: {e}")
+        return pd.DataFrame(columns=colunas)
+    df['Cor_Fin'] = df['Status_Fin'].map(CORES_STATUS_FINANCEIRO)
+    return df
+
+
+# --- 11. SNAPSHOTS POR PERÍODO (FECHAMENTO MENSAL DOS KPIs) ---
+# fin_snapshots guarda, por mês de abertura já encerrado, qtd e valor de cada
+# status (e de 'BOOKS ENVIADOS') por agência e no total (agencia = '').
+# Os KPIs do ano e a evolução mensal somam essas poucas linhas com o período
+# aberto (mês corrente, meses ainda não fechados e chamados sem data), lido
+# ao vivo de fin_status_chamados. Como books/liberação mudam o status de
+# chamados antigos, os meses afetados são fechados de novo junto com o resumo.
+
+# Chamados de fin_status_chamados (com 'BOOKS ENVIADOS' duplicado) ainda fora dos snapshots
+SQL_PERIODO_ABERTO = """
+    WITH aberto AS (
+        SELECT f.data_abertura, s.status_fin, f.valor
+        FROM fin_status_chamados f
+        CROSS JOIN LATERAL (
+            SELECT f.status_fin UNION ALL SELECT 'BOOKS ENVIADOS' WHERE f.book_enviado
+        ) s
+        WHERE f.data_abertura IS NULL
+           OR f.data_abertura >= coalesce((SELECT max(periodo) FROM fin_snapshots) + interval '1 month', '-infinity')
+    )
+"""
+
+def _inicio_periodo_aberto():
+    """Primeiro dia do mês corrente: meses anteriores a ele podem ser fechados."""
+    return date.today().replace(day=1)
+
+def _fechar_periodos(cur, periodos=None):
+    """
+    (Re)grava os snapshots dos meses informados (1º dia do mês) ou de todos os
+    meses encerrados (None). Usa o cursor recebido, sem commit.
+    """
+    aberto = _inicio_periodo_aberto()
+    if periodos is None:
+        cur.execute("DELETE FROM fin_snapshots")
+        inicio, fim = date.min, aberto
+    else:
+        periodos = [p for p in periodos if p < aberto]
+        if not periodos: return
+        cur.execute("DELETE FROM fin_snapshots WHERE periodo = ANY(%s)", (periodos,))
+        inicio, fim = periodos[0], min(aberto, (pd.Timestamp(periodos[-1]) + pd.offsets.MonthBegin(1)).date())
+
+    cur.execute("""
+        INSERT INTO fin_snapshots (periodo, agencia, status_fin, qtd, valor)
+        SELECT periodo, coalesce(agencia, ''), status_fin, count(*), coalesce(sum(valor), 0)
+        FROM (
+            SELECT date_trunc('month', f.data_abertura)::date AS periodo, f.agencia, s.status_fin, f.valor
+            FROM fin_status_chamados f
+            CROSS JOIN LATERAL (
+                SELECT f.status_fin UNION ALL SELECT 'BOOKS ENVIADOS' WHERE f.book_enviado
+            ) s
+            WHERE f.data_abertura >= %(inicio)s AND f.data_abertura < %(fim)s
+        ) t
+        WHERE %(periodos)s::date[] IS NULL OR periodo = ANY(%(periodos)s::date[])
+        GROUP BY GROUPING SETS ((periodo, agencia, status_fin), (periodo, status_fin))
+    """, {'inicio': inicio, 'fim': fim, 'periodos': periodos})
+
+def _fechar_periodos_pendentes(cur):
+    """Fecha os meses encerrados depois do último snapshot (virada de mês)."""
+    cur.execute("SELECT max(periodo) FROM fin_snapshots")
+    ultimo = cur.fetchone()[0]
+    cur.execute("""
+        SELECT DISTINCT date_trunc('month', data_abertura)::date FROM fin_status_chamados
+        WHERE data_abertura >= %s AND data_abertura < %s ORDER BY 1
+    """, ((pd.Timestamp(ultimo) + pd.offsets.MonthBegin(1)).date() if ultimo else date.min, _inicio_periodo_aberto()))
+    pendentes = [r[0] for r in cur.fetchall()]
+    if pendentes: _fechar_periodos(cur, pendentes)
+
+# Chave = período aberto: roda uma vez por processo e por mês, não a cada rerun
+@st.cache_resource(max_entries=1, show_spinner=False)
+def _manutencao_do_periodo(aberto):
+    """Grava o valor dos chamados que ainda não têm e fecha os meses encerrados (levanta erro para não ir ao cache)."""
+    ok, _ = recalcular_valores_chamados(somente_pendentes=True)
+    conn = get_valid_conn_fin()
+    if not ok or not conn: raise RuntimeError("Falha ao gravar os valores pendentes")
+    try:
+        with conn.cursor() as cur:
+            _fechar_periodos_pendentes(cur)
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    return aberto
+
+def manter_resumo_financeiro():
+    """Valores pendentes e virada de mês do resumo financeiro (uma vez por mês em cada processo)."""
+    try:
+        _manutencao_do_periodo(_inicio_periodo_aberto())
+        return True
+    except Exception as e:
+        st.error(f"Erro ao fechar os meses encerrados: {e}")
+        return False
+
+@st.cache_data(ttl=60)
+def carregar_evolucao_financeira(ano=None, agencia=None):
+    """
+    Qtd e valor por mês de abertura e status (inclui 'BOOKS ENVIADOS'), dos
+    snapshots mais o período aberto. agencia=None = total de todas as agências.
+    """
+    colunas = ['Periodo', 'Status_Fin', 'Qtd', 'Valor']
+    conn = get_valid_conn_fin()
+    if not conn: return pd.DataFrame(columns=colunas)
+
+    query = SQL_PERIODO_ABERTO.replace("SELECT f.data_abertura,", "SELECT f.data_abertura, f.agencia,") + """
+        SELECT periodo AS "Periodo", status_fin AS "Status_Fin", sum(qtd)::int AS "Qtd", sum(valor)::float AS "Valor"
+        FROM (
+            SELECT periodo, status_fin, qtd, valor FROM fin_snapshots
+            WHERE agencia = coalesce(%(agencia)s, '')
+            UNION ALL
+            SELECT date_trunc('month', data_abertura)::date, status_fin, count(*), coalesce(sum(valor), 0) FROM aberto
+            WHERE data_abertura IS NOT NULL AND (%(agencia)s::TEXT IS NULL OR agencia = %(agencia)s)
+            GROUP BY 1, 2
+        ) t
+        WHERE %(ano)s::INTEGER IS NULL OR EXTRACT(YEAR FROM periodo) = %(ano)s::INTEGER
+        GROUP BY periodo, status_fin
+        ORDER BY periodo, status_fin
+    """
+    try:
+        df = pd.read_sql_query(query, conn, params={'ano': ano, 'agencia': agencia})
+        conn.commit()
+        return df
+    except Exception as e:
+        conn.rollback()
+        st.error(f"Erro ao carregar evolução financeira: {e}")
+        return pd.DataFrame(columns=colunas)
+
@@ -0,0 +1,283 @@
+import streamlit as st
+import pandas as pd
+import hashlib
+import importlib.util
+import re
+import utils_chamados
+
+# --- 1. LEDGER DE IMPORTAÇÕES (CHECKSUM DOS ARQUIVOS) ---
+# Cada arquivo aplicado fica registrado com seu SHA-256. Um re-upload do mesmo
+# arquivo é detectado antes do parse e pode ser pulado sem tocar no banco.
+
+def criar_tabela_ledger():
+    """Cria a tabela de histórico de importações, se não existir."""
+    conn = utils_chamados.get_valid_conn()
+    if not conn: return False
+
+    try:
+        with conn.cursor() as cur:
+            cur.execute("""
+                CREATE TABLE IF NOT EXISTS importacoes_ledger (
+                    id SERIAL PRIMARY KEY,
+                    checksum TEXT NOT NULL,
+                    tipo TEXT NOT NULL,
+                    nome_arquivo TEXT,
+                    tamanho_bytes BIGINT,
+                    linhas_lidas INTEGER,
+                    linhas_gravadas INTEGER,
+                    resultado TEXT,
+                    mensagem TEXT,
+                    usuario TEXT,
+                    data_importacao TIMESTAMP DEFAULT NOW()
+                );
+            """)
+            cur.execute("CREATE INDEX IF NOT EXISTS idx_importacoes_ledger_checksum ON importacoes_ledger (checksum, tipo);")
+        conn.commit()
+        return True
+    except Exception as e:
+        conn.rollback()
+        st.error(f"Erro ao criar tabela importacoes_ledger: {e}")
+        return False
+
+def calcular_checksum(arquivo):
+    """Retorna (sha256, tamanho em bytes) de um arquivo enviado pelo st.file_uploader."""
+    dados = arquivo.getvalue() if hasattr(arquivo, 'getvalue') else bytes(arquivo)
+    return hashlib.sha256(dados).hexdigest(), len(dados)
+
+def buscar_importacao_aplicada(checksum, tipo):
+    """Retorna a última importação bem-sucedida deste arquivo (dict) ou None."""
+    conn = utils_chamados.get_valid_conn()
+    if not conn: return None
+
+    try:
+        with conn.cursor() as cur:
+            cur.execute("""
+                SELECT nome_arquivo, linhas_lidas, linhas_gravadas, usuario, data_importacao
+                FROM importacoes_ledger
+                WHERE checksum = %s AND tipo = %s AND resultado = 'SUCESSO'
+                ORDER BY data_importacao DESC LIMIT 1
+            """, (checksum, tipo))
+            row = cur.fetchone()
+        conn.commit()
+    except Exception as e:
+        conn.rollback()
+        st.error(f"Erro ao consultar histórico de importações: {e}")
+        return None
+
+    if not row: return None
+    return dict(zip(['nome_arquivo', 'linhas_lidas', 'linhas_gravadas', 'usuario', 'data_importacao'], row))
+
+def registrar_importacao(checksum, tipo, nome_arquivo, tamanho, linhas_lidas, linhas_gravadas, sucesso, mensagem=""):
+    """Grava o resultado de uma importação no ledger."""
+    conn = utils_chamados.get_valid_conn()
+    if not conn: return False
+
+    try:
+        with conn.cursor() as cur:
+            cur.execute("""
+                INSERT INTO importacoes_ledger
+                (checksum, tipo, nome_arquivo, tamanho_bytes, linhas_lidas, linhas_gravadas, resultado, mensagem, usuario)
+                VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s)
+            """, (
+                checksum, tipo, nome_arquivo, int(tamanho), int(linhas_lidas or 0), int(linhas_gravadas or 0),
+                'SUCESSO' if sucesso else 'ERRO', str(mensagem)[:500],
+                st.session_state.get('usuario', 'Sistema')
+            ))
+        conn.commit()
+        return True
+    except Exception as e:
+        conn.rollback()
+        st.error(f"Erro ao registrar importação: {e}")
+        return False
+
+def verificar_arquivo_repetido(arquivo, tipo):
+    """
+    Calcula o checksum e avisa na tela se o arquivo já foi aplicado.
+    Retorna (checksum, tamanho, pular) - 'pular' é True se já foi importado
+    e o usuário não pediu para reprocessar.
+    """
+    checksum, tamanho = calcular_checksum(arquivo)
+    anterior = buscar_importacao_aplicada(checksum, tipo)
+    if not anterior:
+        return checksum, tamanho, False
+
+    data_fmt = pd.to_datetime(anterior['data_importacao']).strftime('%d/%m/%Y %H:%M')
+    st.info(
+        f"♻️ '{arquivo.name}' já foi importado em {data_fmt} por {anterior['usuario']} "
+        f"({anterior['linhas_gravadas']} registros). Nada a fazer."
+    )
+    forcar = st.checkbox("Reprocessar mesmo assim", key=f"forcar_{tipo}_{checksum[:12]}")
+    return checksum, tamanho, not forcar
+
+# --- 2. LEITURA DE PLANILHAS (MOTOR PLUGÁVEL) ---
+# Todos os importadores leem Excel por aqui. Se o python-calamine estiver
+# instalado (pandas >= 2.2) ele é usado; caso contrário, fica o openpyxl.
+
+def _calamine_disponivel():
+    if importlib.util.find_spec("python_calamine") is None: return False
+    versao = tuple(int(p) for p in re.findall(r'\d+', pd.__version__)[:2])
+    return versao >= (2, 2)
+
+MOTOR_EXCEL = "calamine" if _calamine_disponivel() else "openpyxl"
+
+def _voltar_inicio(arquivo):
+    if hasattr(arquivo, 'seek'): arquivo.seek(0)
+
+def ler_excel(arquivo, **kwargs):
+    """
+    Substituto do pd.read_excel usando o motor mais rápido disponível.
+    Se o calamine falhar em alguma planilha, tenta de novo com openpyxl.
+    """
+    try:
+        return pd.read_excel(arquivo, engine=MOTOR_EXCEL, **kwargs)
+    except Exception:
+        if MOTOR_EXCEL == "openpyxl": raise
+        _voltar_inicio(arquivo)
+        return pd.read_excel(arquivo, engine="openpyxl", **kwargs)
+
+def abrir_excel(arquivo):
+    """Substituto do pd.ExcelFile (para ler várias abas) com o mesmo motor."""
+    try:
+        return pd.ExcelFile(arquivo, engine=MOTOR_EXCEL)
+    except Exception:
+        if MOTOR_EXCEL == "openpyxl": raise
+        _voltar_inicio(arquivo)
+        return pd.ExcelFile(arquivo, engine="openpyxl")
+
+# --- 3. PIPELINE DA CARTEIRA DE CHAMADOS ---
+# Etapas separadas (ler, mapear, agrupar, separar, gravar, status) para que o
+# diálogo da Gestão e o benchmark em benchmarks/ rodem exatamente o mesmo código.
+
+def ler_planilha_chamados(arquivo):
+    """Lê a carteira (.xlsx ou .csv com ';' ou ',') com todas as colunas como texto."""
+    if arquivo.name.endswith('.csv'):
+        try:
+            df = pd.read_csv(arquivo, sep=';', header=0, dtype=str, encoding='utf-8-sig')
+            if len(df.columns) < 5:
+                arquivo.seek(0)
+                df = pd.read_csv(arquivo, sep=',', header=0, dtype=str, encoding='utf-8-sig')
+        except:
+            arquivo.seek(0)
+            df = pd.read_csv(arquivo, sep=None, engine='python', header=0, dtype=str)
+    else:
+        df = ler_excel(arquivo, header=0, dtype=str)
+
+    df.dropna(how='all', inplace=True)
+    return df
+
+def mapear_colunas_carteira(df_raw):
+    """Mapeia a carteira por posição fixa de coluna e formata o item de cada linha."""
+    dados_mapeados = {
+        'Nº Chamado': df_raw.iloc[:, 0], 'Cód. Agência': df_raw.iloc[:, 1], 'Nome Agência': df_raw.iloc[:, 2],
+        'agencia_uf': df_raw.iloc[:, 3], 'Analista': df_raw.iloc[:, 22] if len(df_raw.columns) > 22 else "",
+        'Gestor': df_raw.iloc[:, 20] if len(df_raw.columns) > 20 else "", 'Serviço': df_raw.iloc[:, 4],
+        'Projeto': df_raw.iloc[:, 5], 'Agendamento': df_raw.iloc[:, 6], 
+        'Sistema': df_raw.iloc[:, 8], 
+        'Cod_equipamento': df_raw.iloc[:, 9], 'Nome_equipamento': df_raw.iloc[:, 10], 'Qtd': df_raw.iloc[:, 11]
+    }
+    df_final = pd.DataFrame(dados_mapeados).fillna("")
+    df_final['Item_Formatado'] = utils_chamados.formatar_itens_importacao(df_final)
+    return df_final
+
+def agrupar_chamados_importados(df_final):
+    """Uma linha por chamado, com os itens de equipamento juntos sem repetição."""
+    colunas_ignoradas_agg = ['Sistema', 'Qtd', 'Item_Formatado', 'Nome_equipamento', 'Cod_equipamento']
+    regras = {c: 'first' for c in df_final.columns if c not in colunas_ignoradas_agg}
+    regras['Sistema'] = 'first'
+    regras['Item_Formatado'] = 'first' # Substituído abaixo pela junção sem repetição
+
+    df_grouped = df_final.groupby('Nº Chamado', as_index=False).agg(regras)
+    itens_por_chamado = utils_chamados.juntar_textos_unicos(df_final, 'Nº Chamado', 'Item_Formatado')
+    df_grouped['Item_Formatado'] = df_grouped['Nº Chamado'].map(itens_por_chamado).fillna("")
+    df_grouped['Equipamento'] = df_grouped['Item_Formatado']
+    df_grouped['Descrição'] = df_grouped['Item_Formatado']
+    return df_grouped
+
+def separar_novos_e_existentes(df_grouped, df_banco):
+    """Retorna (df_insert, df_update); no df_update vem o 'ID_Banco' do chamado existente."""
+    lista_novos = []; lista_atualizar = []
+    
+    if not df_banco.empty:
+        mapa_ids = dict(zip(df_banco['Nº Chamado'].astype(str).str.strip(), df_banco['ID']))
+        for row in df_grouped.to_dict('records'):
+            chamado_num = str(row['Nº Chamado']).strip()
+            if not chamado_num or chamado_num.lower() == 'nan': continue
+            if chamado_num in mapa_ids:
+                row['ID_Banco'] = mapa_ids[chamado_num]
+                lista_atualizar.append(row)
+            else: lista_novos.append(row)
+    else: lista_novos = [r for r in df_grouped.to_dict('records') if str(r['Nº Chamado']).strip()]
+
+    return pd.DataFrame(lista_novos), pd.DataFrame(lista_atualizar)
+
+def atualizar_chamados_existentes(df_update, ao_progredir=None):
+    """Atualiza dados básicos e equipamentos dos chamados que já estavam no banco. Retorna quantos gravaram."""
+    total = len(df_update)
+    gravados = 0
+    for i, row in enumerate(df_update.to_dict('records')):
+        updates = {
+            'Sistema': row['Sistema'], 
+            'Equipamento': row['Equipamento'],
+            'Descrição': row['Descrição'],
+            'Serviço': row['Serviço'], 'Projeto': row['Projeto'],
+            'Agendamento': row['Agendamento'], 'Analista': row['Analista'], 'Gestor': row['Gestor']
+        }
+        if utils_chamados.atualizar_chamado_db(row['ID_Banco'], updates): gravados += 1
+        if ao_progredir and total > 0: ao_progredir(i / total)
+    return gravados
+
+def recalcular_status_importados(df_grouped, ao_progredir=None):
+    """Reaplica as regras automáticas de status nos chamados da planilha. False se algum chamado não gravou."""
+    df_todos = utils_chamados.carregar_chamados_db()
+    if df_todos.empty: return False
+    chamados_imp = df_grouped['Nº Chamado'].astype(str).str.strip().tolist()
+    df_afetados = df_todos[df_todos['Nº Chamado'].astype(str).str.strip().isin(chamados_imp)]
+    
+    total_calc = len(df_afetados); passo = 0; ok = True
+    for num_chamado, grupo in df_afetados.groupby('Nº Chamado'):
+        ok &= bool(utils_chamados.calcular_e_atualizar_status_projeto(grupo, grupo['ID'].tolist()))
+        passo += len(grupo)
+        if ao_progredir: ao_progredir(passo / total_calc)
+    return ok
+
+# --- 4. PEDIDOS (Nº PEDIDO / DATA DE ENVIO) ---
+
+def aplicar_planilha_pedidos(df_ped, id_map, ao_progredir=None):
+    """
+    Grava Nº Pedido e Data Envio (colunas PEDIDO/DATA_ENVIO, já em maiúsculo)
+    nos chamados encontrados em id_map. Retorna (atualizados, falhas): updates
+    gravados no banco e os que o banco recusou.
+    """
+    tem_pedido = 'PEDIDO' in df_ped.columns
+    tem_data = 'DATA_ENVIO' in df_ped.columns
+    count = falhas = 0
+    total = len(df_ped)
+
+    for i, row in enumerate(df_ped.to_dict('records')):
+        chamado_key = str(row['CHAMADO']).strip()
+        
+        if chamado_key in id_map:
+            updates = {}
+            
+            # Processa Pedido
+            if tem_pedido:
+                val_ped = str(row['PEDIDO']).strip()
+                if val_ped and val_ped.lower() not in ['nan', 'none', '']:
+                    updates['Nº Pedido'] = val_ped
+                    
+            # Processa Data Envio
+            if tem_data:
+                val_dt = str(row['DATA_ENVIO']).strip()
+                if val_dt and val_dt.lower() not in ['nan', 'none', '']:
+                    try:
+                        updates['Data Envio'] = pd.to_datetime(val_dt, dayfirst=True).date()
+                    except:
+                        pass # Data inválida é ignorada
+            
+            if updates:
+                if utils_chamados.atualizar_chamado_db(id_map[chamado_key], updates): count += 1
+                else: falhas += 1
+        
+        if ao_progredir: ao_progredir((i + 1) / total)
+
+    return count, falhas
@@ -0,0 +1,370 @@
+import streamlit as st
+import pandas as pd
+import json
+import threading
+import time
+from datetime import date, timedelta
+import utils_chamados
+import utils_financeiro
+
+# --- 1. FATO DIÁRIO DE STATUS (HISTÓRICO PARA OS INDICADORES) ---
+# fato_status_diario guarda, por dia, quantos chamados havia em cada
+# combinação de status, sub-status, analista, projeto e situação de SLA.
+# Dias passados são remontados pelo log_chamado: o status de um chamado no
+# fim do dia D é o valor "de" da primeira mudança depois de D (ou o atual, se
+# não mudou mais). Analista, projeto e datas não têm log e entram como estão
+# no momento da gravação, por isso cada dia é gravado assim que termina.
+# Gravar um dia apaga e refaz as linhas dele: o job pode rodar de novo à vontade.
+# Roda pelo historico_status_diario.py (cron, logo depois da meia-noite), não ao
+# abrir a página; duas execuções ao mesmo tempo esperam uma pela outra.
+
+DIMENSOES_FATO = {
+    'Status': 'status',
+    'Sub-Status': 'sub_status',
+    'Analista': 'analista',
+    'Projeto': 'projeto',
+    'Situação SLA': 'situacao_sla',
+}
+
+DIAS_CARGA_INICIAL = 90 # Tabela vazia: quantos dias para trás o job remonta
+
+_trava_job = threading.Lock() # Sessões deste processo dividem a mesma conexão: um job por vez
+
+# Mudanças registradas por atualizar_chamado_db / sincronizar_status_financeiro
+PADRAO_LOG_STATUS = r"(\d{2}/\d{2}/\d{4}) [^\n]*?: (Status|Ação) '([^\n]*?)' -> '[^\n]*'"
+
+# Situação de SLA no dia %(dia)s (cores em utils_sla.CORES_SITUACAO); %(fim)s = STATUS_FIM
+_SQL_SITUACAO_SLA = """
+        CASE
+            WHEN lower(coalesce(status, 'None')) = ANY(%(fim)s) THEN
+                CASE WHEN data_fechamento > data_agendamento + 1 THEN 'Finalizado com Atraso' ELSE 'Finalizado no Prazo' END
+            WHEN strpos(lower(coalesce(status, 'None')), 'cancelado') > 0 THEN 'Cancelado'
+            WHEN data_agendamento < %(dia)s THEN 'Em Aberto (Atrasado)'
+            WHEN data_agendamento IS NOT NULL THEN 'Em Aberto (No Prazo)'
+            ELSE 'Sem Data'
+        END"""
+
+# Chamados agregados como estavam no fim de %(dia)s (usa a tabela temporária tmp_transicoes)
+SQL_FATO_DO_DIA = f"""
+    WITH estado AS (
+        SELECT
+            CASE WHEN st.existe THEN nullif(st.antes, 'None') ELSE c.status_chamado END AS status,
+            CASE WHEN ss.existe THEN nullif(ss.antes, 'None') ELSE c.sub_status END AS sub_status,
+            c.analista, c.projeto_nome, c.data_agendamento,
+            CASE WHEN c.data_fechamento <= %(dia)s THEN c.data_fechamento END AS data_fechamento
+        FROM chamados c
+        LEFT JOIN LATERAL (
+            SELECT TRUE AS existe, t.antes FROM tmp_transicoes t
+            WHERE t.id = c.id AND t.campo = 'Status' AND t.dia > %(dia)s ORDER BY t.ordem LIMIT 1
+        ) st ON TRUE
+        LEFT JOIN LATERAL (
+            SELECT TRUE AS existe, t.antes FROM tmp_transicoes t
+            WHERE t.id = c.id AND t.campo = 'Ação' AND t.dia > %(dia)s ORDER BY t.ordem LIMIT 1
+        ) ss ON TRUE
+        WHERE c.data_abertura IS NULL OR c.data_abertura <= %(dia)s
+    )
+    SELECT
+        %(dia)s::date AS dia,
+        coalesce(status, 'N/A') AS status,
+        coalesce(sub_status, 'N/A') AS sub_status,
+        coalesce(analista, 'Não Definido') AS analista,
+        coalesce(projeto_nome, 'Geral') AS projeto,
+        {_SQL_SITUACAO_SLA} AS situacao_sla,
+        count(*) AS qtd
+    FROM estado
+    GROUP BY 2, 3, 4, 5, 6
+"""
+
+def criar_tabela_fato_status_diario():
+    """Cria a tabela do histórico diário de status, se não existir."""
+    conn = utils_chamados.get_valid_conn()
+    if not conn: return False
+
+    try:
+        with conn.cursor() as cur:
+            cur.execute("""
+                CREATE TABLE IF NOT EXISTS fato_status_diario (
+                    dia DATE NOT NULL,
+                    status TEXT NOT NULL,
+                    sub_status TEXT NOT NULL,
+                    analista TEXT NOT NULL,
+                    projeto TEXT NOT NULL,
+                    situacao_sla TEXT NOT NULL,
+                    qtd INTEGER NOT NULL,
+                    PRIMARY KEY (dia, status, sub_status, analista, projeto, situacao_sla)
+                );
+            """)
+        conn.commit()
+        return True
+    except Exception as e:
+        conn.rollback()
+        st.error(f"Erro ao criar tabela fato_status_diario: {e}")
+        return False
+
+def _carregar_transicoes(cur, vazia=False):
+    """
+    Extrai as mudanças de Status/Ação de todos os logs para tmp_transicoes (some
+    no commit). Para o dia de hoje não há mudança posterior: vazia=True só cria.
+    """
+    cur.execute("CREATE TEMP TABLE IF NOT EXISTS tmp_transicoes (id INTEGER, dia DATE, campo TEXT, antes TEXT, ordem BIGINT) ON COMMIT DROP")
+    if vazia: return
+    cur.execute("""
+        INSERT INTO tmp_transicoes
+        SELECT c.id, to_date(m.r[1], 'DD/MM/YYYY'), m.r[2], m.r[3], m.ordem
+        FROM chamados c
+        CROSS JOIN LATERAL regexp_matches(c.log_chamado, %(padrao)s, 'g') WITH ORDINALITY AS m(r, ordem)
+        WHERE c.log_chamado LIKE '%%->%%';
+        CREATE INDEX ON tmp_transicoes (id, campo, dia);
+        ANALYZE tmp_transicoes;
+    """, {'padrao': PADRAO_LOG_STATUS})
+
+def _gravar_dias(cur, dias, ao_progredir=None):
+    _carregar_transicoes(cur)
+    for i, dia in enumerate(dias):
+        cur.execute("DELETE FROM fato_status_diario WHERE dia = %s", (dia,))
+        cur.execute(f"""
+            INSERT INTO fato_status_diario (dia, status, sub_status, analista, projeto, situacao_sla, qtd)
+            {SQL_FATO_DO_DIA}
+        """, {'dia': dia, 'fim': list(utils_chamados.STATUS_FIM)})
+        if ao_progredir: ao_progredir((i + 1) / len(dias))
+
+def _dias_pendentes(cur, inicio, fim):
+    if inicio is None:
+        cur.execute("SELECT max(dia) FROM fato_status_diario")
+        ultimo = cur.fetchone()[0]
+        cur.execute("SELECT min(data_abertura) FROM chamados")
+        primeiro = cur.fetchone()[0] or date.today()
+        inicio = ultimo + timedelta(days=1) if ultimo else max(primeiro, date.today() - timedelta(days=DIAS_CARGA_INICIAL))
+    fim = fim or date.today() - timedelta(days=1)
+    return [d.date() for d in pd.date_range(inicio, fim, freq='D')]
+
+def gravar_fato_status_diario(inicio=None, fim=None, ao_progredir=None):
+    """
+    Grava (ou regrava) os dias de inicio a fim. Sem datas, completa do dia
+    seguinte ao último gravado (ou DIAS_CARGA_INICIAL atrás, não antes do
+    primeiro chamado) até ontem.
+    Retorna os dias gravados; falha levanta exceção (com rollback).
+    """
+    conn = utils_chamados.get_valid_conn()
+    if not conn: raise RuntimeError("Falha na conexão ao gravar o histórico diário de status")
+
+    with _trava_job:
+        try:
+            with conn.cursor() as cur:
+                # Outros processos (servidor, cron): o último dia gravado só é lido depois da trava
+                cur.execute("SELECT pg_advisory_xact_lock(hashtext('fato_status_diario'))")
+                dias = _dias_pendentes(cur, inicio, fim)
+                if dias: _gravar_dias(cur, dias, ao_progredir)
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+    if dias: # Só o que depende do fato (o resto do cache_data do app fica)
+        _tendencia_por_versao.clear()
+        _spec_figura.clear()
+    return dias
+
+def registrar_fato_status_diario(inicio=None, fim=None, ao_progredir=None):
+    """gravar_fato_status_diario com o erro na tela. Retorna (sucesso, dias gravados)."""
+    try:
+        return True, len(gravar_fato_status_diario(inicio, fim, ao_progredir))
+    except Exception as e:
+        st.error(f"Erro ao gravar histórico diário de status: {e}")
+        return False, 0
+
+@st.cache_data(ttl=300, max_entries=32, show_spinner=False)
+def _tendencia_por_versao(versao, inicio, fim, dimensao, hoje):
+    # Mesma versão dos chamados que a chave dos gráficos (figura): o spec nunca
+    # é montado com uma série de antes da última gravação. Falha levanta exceção.
+    coluna = DIMENSOES_FATO[dimensao]
+    colunas = ['dia', dimensao, 'qtd']
+    conn = utils_chamados.get_valid_conn()
+    if not conn: raise RuntimeError("Falha na conexão ao carregar a tendência")
+
+    params = {'inicio': inicio, 'fim': min(fim, hoje - timedelta(days=1)), 'dia': hoje, 'fim_status': list(utils_chamados.STATUS_FIM)}
+    try:
+        with conn.cursor() as cur:
+            cur.execute(f"""
+                SELECT dia, {coluna}, sum(qtd) FROM fato_status_diario
+                WHERE dia BETWEEN %(inicio)s AND %(fim)s
+                GROUP BY 1, 2
+            """, params)
+            linhas = cur.fetchall()
+
+            if inicio <= hoje <= fim:
+                _carregar_transicoes(cur, vazia=True)
+                cur.execute(f"SELECT dia, {coluna}, sum(qtd) FROM ({SQL_FATO_DO_DIA}) f GROUP BY 1, 2",
+                            {'dia': hoje, 'fim': params['fim_status']})
+                linhas += cur.fetchall()
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+
+    df = pd.DataFrame(linhas, columns=colunas)
+    df['dia'] = pd.to_datetime(df['dia'])
+    df['qtd'] = df['qtd'].astype(int)
+    return df.sort_values(['dia', dimensao]).reset_index(drop=True)
+
+def carregar_tendencia(inicio, fim, dimensao='Status'):
+    """
+    Série diária (dia, <dimensao>, qtd) entre inicio e fim: dias gravados em
+    fato_status_diario mais o dia de hoje calculado na hora, se estiver no período.
+    """
+    try:
+        return _tendencia_por_versao(utils_financeiro.versao_dados('chamados'), inicio, fim, dimensao, date.today())
+    except Exception as e:
+        st.error(f"Erro ao carregar tendência de {dimensao}: {e}")
+        return pd.DataFrame(columns=['dia', dimensao, 'qtd'])
+
+# --- 2. CACHE DE FIGURAS DO DASHBOARD ---
+# Os gráficos do dashboard eram refeitos (preparo dos dados + Plotly) a cada
+# rerun, até quando só outro widget mudava ou na atualização automática da TV.
+# Cada gráfico guarda o spec já serializado por (gráfico, período, versão dos
+# chamados, dia): só é refeito o gráfico cujas entradas mudaram.
+
+_construcao = threading.local() # Tempo da última construção nesta thread (None = veio do cache)
+
+@st.cache_data(max_entries=64, show_spinner=False)
+def _spec_figura(grafico, inicio, fim, versao, hoje, _montar):
+    t = time.perf_counter()
+    fig = _montar()
+    spec = None if fig is None else json.loads(fig.to_json())
+    _construcao.ms = (time.perf_counter() - t) * 1000
+    return spec
+
+def figura(grafico, inicio, fim, montar):
+    """
+    Spec (dict) do gráfico para st.plotly_chart. montar() monta a figura e só
+    roda quando o gráfico não está em cache para o período, a versão dos
+    chamados e o dia. Tempos em st.session_state['tempos_figuras'].
+    """
+    _construcao.ms = None
+    t = time.perf_counter()
+    spec = _spec_figura(grafico, inicio, fim, utils_financeiro.versao_dados('chamados'), date.today(), montar)
+    total = (time.perf_counter() - t) * 1000
+    st.session_state.setdefault('tempos_figuras', {})[grafico] = {
+        'Origem': 'cache' if _construcao.ms is None else 'montado',
+        'Montagem (ms)': round(_construcao.ms or 0, 1),
+        'Total (ms)': round(total, 1),
+    }
+    return spec
+
+# --- 3. PAINEL DO DASHBOARD EM SQL ---
+# O dashboard carregava todos os chamados e montava os "projetos" (um por
+# agendamento, agência e projeto) em pandas para depois filtrar e contar várias
+# vezes. Aqui o banco agrupa só o período e devolve as contagens que a página
+# desenha: KPIs, SLA, SLA por analista, status e faixas de aging num GROUPING
+# SETS, e o histórico de entregas (pela data de fechamento) numa segunda consulta.
+
+FAIXAS_AGING = ['0-15 dias', '16-30 dias', '31-60 dias', '+60 dias']
+
+# Um projeto por (agendamento, agência, projeto); "primeiro" = primeiro não nulo
+# na ordem do carregar_chamados_db (id decrescente). filtro é o WHERE dos chamados.
+def _sql_projetos(filtro):
+    def _primeiro(col): return f"(array_agg({col} ORDER BY id DESC) FILTER (WHERE {col} IS NOT NULL))[1]"
+    return f"""
+        SELECT data_agendamento,
+               {_primeiro('status_chamado')} AS status,
+               {_primeiro('analista')} AS analista,
+               {_primeiro('data_fechamento')} AS data_fechamento,
+               {_primeiro('data_abertura')} AS data_abertura
+        FROM chamados
+        WHERE {filtro}
+        GROUP BY data_agendamento, coalesce(agencia_nome, 'N/A'), coalesce(projeto_nome, 'Geral')
+    """
+
+SQL_PAINEL = f"""
+    WITH projetos AS ({_sql_projetos("data_agendamento BETWEEN %(de)s AND %(ate)s")}),
+    classificados AS (
+        SELECT status, coalesce(analista, 'Não Definido') AS analista,
+               {_SQL_SITUACAO_SLA} AS situacao,
+               lower(coalesce(status, 'None')) <> ALL(%(fim)s) AND strpos(lower(coalesce(status, 'None')), 'cancelado') = 0 AS aberto,
+               status ~* 'Pendencia|Pendência' AS pendencia,
+               data_abertura
+        FROM projetos
+    ),
+    faixas AS (
+        SELECT *, CASE WHEN aberto AND data_abertura IS NOT NULL
+                       THEN width_bucket(%(dia)s - data_abertura, ARRAY[-998, 16, 31, 61, 10000]) END AS faixa
+        FROM classificados
+    )
+    SELECT CASE GROUPING(situacao, analista, status, faixa)
+               WHEN 15 THEN 'total' WHEN 7 THEN 'sla' WHEN 3 THEN 'sla_analista' WHEN 13 THEN 'status' ELSE 'aging'
+           END AS conjunto,
+           situacao, analista, status, faixa,
+           count(*) AS qtd,
+           count(*) FILTER (WHERE aberto) AS abertos,
+           count(*) FILTER (WHERE pendencia) AS pendencia,
+           count(*) FILTER (WHERE faixa IS NOT NULL) AS abertos_com_abertura
+    FROM faixas
+    GROUP BY GROUPING SETS ((), (situacao), (analista, situacao), (status), (faixa))
+"""
+
+# Entregas: projetos finalizados com fechamento no período, de qualquer agendamento
+_FILTRO_CHAVES_ENTREGAS = """
+    (data_agendamento, coalesce(agencia_nome, 'N/A'), coalesce(projeto_nome, 'Geral')) IN (
+        SELECT data_agendamento, agencia, projeto FROM chaves WHERE data_agendamento IS NOT NULL)
+    OR (data_agendamento IS NULL AND (coalesce(agencia_nome, 'N/A'), coalesce(projeto_nome, 'Geral')) IN (
+        SELECT agencia, projeto FROM chaves WHERE data_agendamento IS NULL))
+"""
+
+SQL_ENTREGAS = f"""
+    WITH chaves AS (
+        SELECT DISTINCT data_agendamento, coalesce(agencia_nome, 'N/A') AS agencia, coalesce(projeto_nome, 'Geral') AS projeto
+        FROM chamados WHERE data_fechamento BETWEEN %(de)s AND %(ate)s
+    ),
+    projetos AS ({_sql_projetos(_FILTRO_CHAVES_ENTREGAS)})
+    SELECT to_char(data_fechamento, 'DD/MM') COLLATE "C" AS dia, count(*) AS qtd
+    FROM projetos
+    WHERE lower(status) = ANY(%(fim)s) AND data_fechamento BETWEEN %(de)s AND %(ate)s
+    GROUP BY 1
+    ORDER BY 1
+"""
+
+@st.cache_data(max_entries=16, show_spinner=False)
+def _painel_por_versao(versao, inicio, fim, hoje):
+    # Falha levanta exceção: o cache não guarda erro, a próxima chamada tenta de novo
+    conn = utils_chamados.get_valid_conn()
+    if not conn: raise RuntimeError("Falha na conexão ao carregar os indicadores")
+
+    params = {'de': inicio, 'ate': fim, 'dia': hoje, 'fim': list(utils_chamados.STATUS_FIM)}
+    try:
+        df = pd.read_sql_query(SQL_PAINEL, conn, params=params)
+        df_entregas = pd.read_sql_query(SQL_ENTREGAS, conn, params=params)
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+
+    total = df[df['conjunto'] == 'total'].iloc[0]
+    sla = df[df['conjunto'] == 'sla'].set_index('situacao')['qtd']
+    aging = df[(df['conjunto'] == 'aging') & df['faixa'].between(1, len(FAIXAS_AGING))]
+    aging = aging.set_index('faixa')['qtd'].reindex(range(1, len(FAIXAS_AGING) + 1), fill_value=0)
+    status = df[(df['conjunto'] == 'status') & df['status'].notna()]
+    return {
+        'kpis': {
+            'total': int(total['qtd']), 'abertos': int(total['abertos']), 'pendencia': int(total['pendencia']),
+            'fin_prazo': int(sla.get("Finalizado no Prazo", 0)), 'fin_atraso': int(sla.get("Finalizado com Atraso", 0)),
+            'abertos_com_abertura': int(total['abertos_com_abertura']),
+        },
+        'sla': sla.sort_values(ascending=False, kind='stable').rename_axis('Situação').reset_index(name='Qtd'),
+        'sla_analista': df[df['conjunto'] == 'sla_analista'][['analista', 'situacao', 'qtd']]
+                        .sort_values(['analista', 'situacao']).set_axis(['Analista', 'Situacao_SLA', 'Qtd'], axis=1).reset_index(drop=True),
+        'aging': pd.DataFrame({'Faixa': FAIXAS_AGING, 'Qtd': aging.to_numpy()}),
+        'status': status[['status', 'qtd']].sort_values('qtd', ascending=False, kind='stable')
+                  .set_axis(['Status', 'Qtd'], axis=1).reset_index(drop=True),
+        'entregas': df_entregas.set_axis(['Dia/Mês', 'Qtd Entregue'], axis=1),
+    }
+
+def carregar_painel(inicio, fim):
+    """
+    Contagens do dashboard para os projetos agendados entre inicio e fim
+    (inclusive): kpis (dict) e os DataFrames sla, sla_analista, aging, status
+    e entregas, prontos para os gráficos. None se o banco falhar.
+    """
+    try:
+        return _painel_por_versao(utils_financeiro.versao_dados('chamados'), inicio, fim, date.today())
+    except Exception as e:
+        st.error(f"Erro ao carregar os indicadores: {e}")
+        return None
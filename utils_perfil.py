@@ -0,0 +1,58 @@
+import sys
+import threading
+import time
+
+# --- PERFIL DE INICIALIZAÇÃO DAS PÁGINAS ---
+# Cada página chama inicio_pagina() antes dos próprios imports, imports_prontos()
+# logo depois deles e fim_pagina() na última linha. A primeira execução da página
+# no processo (cold start) guarda o tempo dos imports, os pacotes que ela carregou
+# e o tempo até a página ficar pronta; as seguintes só atualizam a última execução.
+# Só usa a biblioteca padrão: importar este módulo não pode pesar na medição.
+
+PERFIS = {} # página -> medidas (um por processo, compartilhado entre as sessões)
+_trava = threading.Lock()
+_execucao = threading.local() # Cada sessão roda o script na própria thread
+
+def _pacotes_externos(modulos):
+    """Pacotes de topo fora da biblioteca padrão (os que pesam no cold start)."""
+    topo = {m.split('.')[0] for m in modulos}
+    return {m for m in topo if not m.startswith('_') and m not in sys.stdlib_module_names and m != 'cython_runtime'}
+
+def inicio_pagina(pagina):
+    """Começo do script da página: chame antes dos demais imports."""
+    _execucao.pagina = pagina
+    _execucao.inicio = time.perf_counter()
+    _execucao.imports = None
+    _execucao.modulos = set(sys.modules)
+
+def imports_prontos():
+    """Fim dos imports da página."""
+    _execucao.imports = time.perf_counter()
+
+def fim_pagina():
+    """Fim do script da página: grava a execução (st.stop/st.rerun antes daqui não contam)."""
+    pagina = getattr(_execucao, 'pagina', None)
+    if pagina is None: return
+    _execucao.pagina = None
+
+    fim = time.perf_counter()
+    total_ms = round((fim - _execucao.inicio) * 1000, 1)
+    imports_ms = round(((_execucao.imports or fim) - _execucao.inicio) * 1000, 1)
+    novos = set(sys.modules) - _execucao.modulos
+    with _trava:
+        perfil = PERFIS.get(pagina)
+        if perfil is None:
+            PERFIS[pagina] = perfil = {
+                'Imports (ms)': imports_ms,
+                'Primeira renderização (ms)': total_ms,
+                'Módulos carregados': len(novos),
+                'Pacotes carregados': ', '.join(sorted(_pacotes_externos(novos))),
+                'Execuções': 0,
+            }
+        perfil['Execuções'] += 1
+        perfil['Última execução (ms)'] = total_ms
+
+def relatorio():
+    """Cópia de PERFIS (página -> medidas) para exibir."""
+    with _trava:
+        return {pagina: dict(perfil) for pagina, perfil in PERFIS.items()}
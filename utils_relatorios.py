@@ -0,0 +1,406 @@
+import streamlit as st
+import pandas as pd
+import numpy as np
+import html
+import logging
+import queue
+import smtplib
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+from email.mime.multipart import MIMEMultipart
+from email.mime.text import MIMEText
+from psycopg2.extras import execute_values
+import utils_chamados
+
+log = logging.getLogger(__name__) # Erros de banco também vão para o log: fora do app (cron) o st.error não aparece
+
+# --- 1. TABELAS HTML DO E-MAIL ---
+# O HTML era montado célula a célula num iterrows, com o estilo calculado em
+# cada uma. Aqui os trechos de cada célula são modelos prontos: o escape, os
+# destaques (aging > 15 dias, agendamento hoje) e a cor das linhas saem por
+# coluna inteira, e as linhas são só concatenadas. Mesmo HTML de antes.
+
+FONTE = "'Arial', sans-serif"
+COR_CRITICO = "#D32F2F"
+LIMITE_AGING = 15 # Dias: acima disso o aging sai em destaque
+
+_TITULO = f"<h4 style='color:#34495E; font-family: {FONTE};'>{{titulo}}</h4>"
+_SEM_LINHAS = "<h4 style='color:#34495E; font-family: Arial, sans-serif;'>{titulo}</h4><p style='font-family:Arial, sans-serif; color: #555;'>Nenhum chamado encontrado.</p>"
+_TABELA = f"""<table style='border-collapse: collapse; width: 100%; font-family: {FONTE}; font-size: 0.85em; min-width: 600px; box-shadow: 0 0 10px rgba(0,0,0,0.1);'>"""
+_TH = "<th style='background-color: #1565C0; color: #FFFFFF; text-align: left; padding: 10px; border-bottom: 2px solid #0D47A1;'>{}</th>"
+_TR_PAR = "<tr style='background-color: #f3f3f3;'>"
+_TR_IMPAR = "<tr style='background-color: #ffffff;'>"
+_ESTILO_TD = "padding: 10px; text-align: left; border-bottom: 1px solid #dddddd;"
+_TD = f"<td style='{_ESTILO_TD}'>"
+_TD_DESTAQUE = f"<td style='{_ESTILO_TD} color: {COR_CRITICO}; font-weight: bold;'>"
+_FIM_TABELA = "</tbody></table><br>"
+
+_ESCAPES = [('&', '&amp;'), ('<', '&lt;'), ('>', '&gt;'), ('"', '&quot;'), ("'", '&#x27;')] # = html.escape
+
+def _texto_celulas(coluna):
+    """Texto escapado de cada célula da coluna ('' nos vazios), sem laço por célula."""
+    texto = coluna.astype(str)
+    for caractere, entidade in _ESCAPES:
+        texto = texto.str.replace(caractere, entidade, regex=False)
+    return texto.where(coluna.notna(), '').to_numpy(dtype=object)
+
+def _destaques(df, coluna, hoje):
+    """Células em destaque: aging (numérico) acima do limite e agendamento (dd/mm/aaaa) igual a hoje."""
+    valores = df[coluna]
+    if coluna == 'Aging (Dias)' and pd.api.types.is_numeric_dtype(valores) and not pd.api.types.is_bool_dtype(valores):
+        return (valores > LIMITE_AGING).to_numpy()
+    if coluna == 'Agendamento':
+        return (valores == hoje.strftime('%d/%m/%Y')).to_numpy()
+    return None
+
+def linhas_html(df, hoje):
+    """<tr>...</tr> de cada linha de df (zebrada pelo índice), montadas coluna a coluna."""
+    linhas = np.where(np.asarray(df.index) % 2 == 0, _TR_PAR, _TR_IMPAR).astype(object)
+    for col in df.columns:
+        destaque = _destaques(df, col, hoje)
+        abertura = _TD if destaque is None else np.where(destaque, _TD_DESTAQUE, _TD).astype(object)
+        linhas = linhas + abertura + _texto_celulas(df[col]) + "</td>"
+    return linhas + "</tr>"
+
+def _montar_tabela(colunas, linhas, titulo):
+    cabecalho = "".join(_TH.format(html.escape(str(col))) for col in colunas)
+    return f"{_TITULO.format(titulo=titulo)}{_TABELA}<thead><tr>{cabecalho}</tr></thead><tbody>{''.join(linhas)}{_FIM_TABELA}"
+
+def tabela_html(df, titulo, hoje):
+    """
+    Tabela do e-mail (título + cabeçalho azul, linhas zebradas pelo índice e
+    destaques em vermelho) para as colunas de df, na ordem em que estão.
+    """
+    if df.empty: return _SEM_LINHAS.format(titulo=titulo)
+    return _montar_tabela(df.columns, linhas_html(df, hoje).tolist(), titulo)
+
+# --- 2. RELATÓRIO DIÁRIO POR ANALISTA ---
+# Vencidos e agendados até a próxima segunda são separados uma vez e as linhas
+# HTML de cada parte saem de uma passada só; cada analista só junta as suas
+# (antes cada analista refiltrava os dois DataFrames e montava as tabelas).
+
+STATUS_FIM_RELATORIO = ["finalizado", "concluído", "faturado", "fechado", "cancelado"]
+COLUNAS_RELATORIO = ['Nº Chamado', 'Projeto', 'Nome Agência', 'Agendamento', 'Status', 'Aging (Dias)']
+
+def separar_relatorio(df, hoje):
+    """
+    Chamados do relatório (df de carregar_chamados_db): dict com 'vencidos'
+    (agendamento passado, não finalizado), 'semana' (de hoje até a próxima
+    segunda) e 'backlog' (sem agendamento, não finalizado), com Aging (Dias).
+    """
+    df = df.copy()
+    df['Agendamento'] = pd.to_datetime(df['Agendamento'], errors='coerce').dt.date
+    abertura = pd.to_datetime(df['Abertura'], errors='coerce').dt.normalize()
+    if 'Analista' not in df.columns: df['Analista'] = 'Não Definido'
+    df['Analista'] = df['Analista'].fillna('Sem Analista')
+    df['Aging (Dias)'] = (pd.Timestamp(hoje) - abertura).dt.days.fillna(0).astype(int)
+
+    proxima_segunda = hoje + timedelta(days=(7 - hoje.weekday()))
+    aberto = ~df['Status'].str.lower().isin(STATUS_FIM_RELATORIO)
+    return {
+        'vencidos': df[(df['Agendamento'] < hoje) & aberto],
+        'semana': df[(df['Agendamento'] >= hoje) & (df['Agendamento'] <= proxima_segunda)],
+        'backlog': df[pd.isna(df['Agendamento']) & aberto],
+    }
+
+def _por_analista(df, hoje):
+    """{analista: linhas HTML do relatório (Agendamento em dd/mm/aaaa)}, na ordem original das linhas."""
+    tabela = df[COLUNAS_RELATORIO].copy()
+    tabela['Agendamento'] = pd.to_datetime(tabela['Agendamento']).dt.strftime('%d/%m/%Y')
+    linhas = linhas_html(tabela, hoje)
+    return {analista: linhas[posicoes].tolist() for analista, posicoes in df.groupby('Analista', sort=False).indices.items()}
+
+_RODAPE = "<br><p style='color: #777; font-size: 0.8em;'><em>Gerado automaticamente pelo Sistema de Gestão.</em></p></body></html>"
+
+def _cabecalho_html(hoje, n_vencidos, n_semana, n_backlog, titulo_resumo="Resumo Geral da Operação"):
+    kpi_html = f"""
+    <h3 style="color: #2C3E50; font-family: {FONTE};">{titulo_resumo}</h3>
+    <table style="font-family: {FONTE}; width: 100%; border-collapse: collapse; border: 1px solid #ddd;">
+        <tr style="background-color: #f9f9f9;"><td style="padding: 10px;">🚨 Chamados Vencidos:</td><td style="padding: 10px; font-weight: bold; color: #D32F2F; text-align: right;">{n_vencidos}</td></tr>
+        <tr><td style="padding: 10px;">🗓️ Agendados (Semana):</td><td style="padding: 10px; font-weight: bold; text-align: right;">{n_semana}</td></tr>
+        <tr style="background-color: #f9f9f9;"><td style="padding: 10px;">🗃️ Backlog (Sem Data):</td><td style="padding: 10px; font-weight: bold; text-align: right;">{n_backlog}</td></tr>
+    </table><br>
+    """
+    return f"""
+    <html><head><meta http-equiv="Content-Type" content="text/html; charset=utf-8"></head>
+    <body style="font-family: {FONTE}; line-height: 1.6;">
+        <h2 style="color: #1565C0; border-bottom: 2px solid #1565C0;">
+            Relatório de Gestão - {hoje.strftime('%d/%m/%Y')}
+        </h2>{kpi_html}
+    """
+
+def _bloco_analista(analista, vencidos, semana):
+    blocos = [f"<hr><h3 style='background-color: #E3F2FD; padding: 10px; border-radius: 4px; color: #0D47A1;'>👤 {html.escape(str(analista))}</h3>"]
+    if analista in vencidos:
+        blocos.append(_montar_tabela(COLUNAS_RELATORIO, vencidos[analista], f"🚨 Vencidos ({len(vencidos[analista])})"))
+    if analista in semana:
+        blocos.append(_montar_tabela(COLUNAS_RELATORIO, semana[analista], f"🗓️ Próximos Agendamentos ({len(semana[analista])})"))
+    return "".join(blocos)
+
+def relatorio_html(df, hoje):
+    """E-mail completo do relatório diário: resumo geral e, por analista, vencidos e próximos agendamentos."""
+    partes = separar_relatorio(df, hoje)
+    vencidos, semana = _por_analista(partes['vencidos'], hoje), _por_analista(partes['semana'], hoje)
+
+    blocos = [_cabecalho_html(hoje, len(partes['vencidos']), len(partes['semana']), len(partes['backlog']))]
+    analistas = sorted(set(vencidos) | set(semana))
+    if not analistas: blocos.append("<p>Sem pendências críticas ou agendamentos próximos.</p>")
+    blocos += [_bloco_analista(analista, vencidos, semana) for analista in analistas]
+    blocos.append(_RODAPE)
+    return "".join(blocos)
+
+def relatorios_por_analista(df, hoje):
+    """
+    {analista: e-mail só com os chamados dele} para cada analista com vencidos
+    ou agendamentos até a próxima segunda; o resumo conta só os dele.
+    """
+    partes = separar_relatorio(df, hoje)
+    vencidos, semana = _por_analista(partes['vencidos'], hoje), _por_analista(partes['semana'], hoje)
+    backlog = partes['backlog']['Analista'].value_counts()
+
+    relatorios = {}
+    for analista in sorted(set(vencidos) | set(semana)):
+        cabecalho = _cabecalho_html(hoje, len(vencidos.get(analista, [])), len(semana.get(analista, [])),
+                                    int(backlog.get(analista, 0)), "Resumo dos Seus Chamados")
+        relatorios[analista] = cabecalho + _bloco_analista(analista, vencidos, semana) + _RODAPE
+    return relatorios
+
+# --- 3. ENVIO DE E-MAILS: FILA, POOL SMTP E LOG ---
+# Cada e-mail abria uma conexão nova (STARTTLS + login) e o relatório ia num
+# e-mail só. Aqui as conexões ficam num pool por configuração, guardado entre
+# os reruns, e os e-mails entram numa fila atendida por ENVIOS_SIMULTANEOS
+# threads. Falha temporária (resposta 4xx, conexão caída) tenta de novo com
+# espera dobrada; cada e-mail vira uma linha em log_envio_email.
+
+ENVIOS_SIMULTANEOS = 4
+TENTATIVAS_ENVIO = 3
+ESPERA_INICIAL = 2.0 # Segundos antes da 2ª tentativa; dobra a cada nova falha
+OCIOSA_MAX = 60 # Segundos parada no pool: testa com NOOP antes de reaproveitar
+
+def _fechar(smtp):
+    try: smtp.quit()
+    except Exception: smtp.close()
+
+class PoolSMTP:
+    """Conexões SMTP já autenticadas, reaproveitadas entre e-mails e entre envios."""
+
+    def __init__(self, config, timeout=30):
+        self.config = config
+        self.timeout = timeout
+        self.abertas = 0 # Conexões abertas desde a criação (handshakes pagos)
+        self._livres = queue.LifoQueue()
+        self._trava = threading.Lock()
+
+    def _conectar(self):
+        smtp = smtplib.SMTP(self.config["smtp_server"], int(self.config["smtp_port"]), timeout=self.timeout)
+        if self.config.get("starttls", True): smtp.starttls()
+        if self.config.get("password"): smtp.login(self.config["user"], self.config["password"])
+        with self._trava: self.abertas += 1
+        return smtp
+
+    def _pegar(self):
+        while True:
+            try: smtp, desde = self._livres.get_nowait()
+            except queue.Empty: return self._conectar()
+            if time.monotonic() - desde < OCIOSA_MAX: return smtp
+            try:
+                if smtp.noop()[0] == 250: return smtp
+            except OSError: pass
+            _fechar(smtp)
+
+    @contextmanager
+    def conexao(self):
+        """Conexão do pool; volta para ele no fim, ou é descartada se não der mais para usar."""
+        smtp = self._pegar()
+        try:
+            yield smtp
+        except Exception as e:
+            # Recusa do servidor deixa a conexão de pé: limpa a transação e devolve
+            if isinstance(e, smtplib.SMTPServerDisconnected) or not isinstance(e, smtplib.SMTPException): _fechar(smtp)
+            else:
+                try:
+                    smtp.rset()
+                    self._livres.put((smtp, time.monotonic()))
+                except OSError: _fechar(smtp)
+            raise
+        self._livres.put((smtp, time.monotonic()))
+
+    def fechar(self):
+        while True:
+            try: smtp, _ = self._livres.get_nowait()
+            except queue.Empty: return
+            _fechar(smtp)
+
+@st.cache_resource(show_spinner=False)
+def _pool_por_config(config):
+    return PoolSMTP(dict(config))
+
+def pool_smtp(config):
+    """PoolSMTP da configuração (st.secrets["email"]), o mesmo entre reruns e sessões."""
+    return _pool_por_config(tuple(sorted(config.items())))
+
+def _temporaria(erro):
+    """Falha que vale tentar de novo: resposta 4xx, conexão caída ou erro de rede."""
+    if isinstance(erro, smtplib.SMTPResponseException): return 400 <= erro.smtp_code < 500
+    if isinstance(erro, smtplib.SMTPServerDisconnected): return True
+    if isinstance(erro, smtplib.SMTPException): return False # Destinatário recusado, sem suporte, ...
+    return isinstance(erro, OSError)
+
+def _enviar(pool, mensagem, tentativas, espera):
+    msg = MIMEMultipart()
+    msg["From"] = pool.config["user"]
+    msg["To"] = mensagem["destinatarios"]
+    msg["Subject"] = mensagem["assunto"]
+    msg.attach(MIMEText(mensagem["corpo_html"], "html", "utf-8"))
+
+    resultado = {c: mensagem.get(c) for c in ['destinatarios', 'assunto', 'analista']}
+    inicio = time.perf_counter()
+    for tentativa in range(1, tentativas + 1):
+        try:
+            with pool.conexao() as smtp: smtp.send_message(msg)
+            resultado.update(situacao='enviado', erro=None)
+            break
+        except Exception as e:
+            resultado.update(situacao='falhou', erro=f"{type(e).__name__}: {e}")
+            if tentativa == tentativas or not _temporaria(e): break
+            time.sleep(espera * 2 ** (tentativa - 1))
+    resultado.update(tentativas=tentativa, duracao_ms=int((time.perf_counter() - inicio) * 1000))
+    return resultado
+
+def novo_lote():
+    """Identificador de um lote de envios (data e hora do envio)."""
+    return datetime.now().strftime('%Y%m%d-%H%M%S-%f')
+
+def enviar_emails(mensagens, config, ao_progredir=None, paralelos=ENVIOS_SIMULTANEOS,
+                  tentativas=TENTATIVAS_ENVIO, espera=ESPERA_INICIAL, registrar=True):
+    """
+    Envia as mensagens (dicts com destinatarios, assunto, corpo_html e,
+    opcional, analista) pela fila, usando o pool da config, e grava o log
+    (registrar=False: quem chama grava com registrar_envios e confere o retorno).
+    Retorna um resultado por mensagem, na ordem recebida: situacao
+    ('enviado'/'falhou'), tentativas, erro e duracao_ms. ao_progredir(feitos, total).
+    """
+    pool = pool_smtp(config)
+    lote = novo_lote()
+    resultados = [None] * len(mensagens)
+    with ThreadPoolExecutor(max_workers=paralelos, thread_name_prefix="envio_email") as fila:
+        futuros = {fila.submit(_enviar, pool, m, tentativas, espera): i for i, m in enumerate(mensagens)}
+        for feitos, futuro in enumerate(as_completed(futuros), 1):
+            resultados[futuros[futuro]] = futuro.result()
+            if ao_progredir: ao_progredir(feitos, len(mensagens))
+    if registrar: registrar_envios(lote, resultados)
+    return resultados
+
+def emails_dos_analistas(df_usuarios):
+    """{NOME EM MAIÚSCULAS: e-mail} dos usuários cadastrados, para achar o e-mail de cada analista."""
+    if df_usuarios.empty: return {}
+    validos = df_usuarios.dropna(subset=['nome', 'email'])
+    return {str(n).strip().upper(): str(e).strip() for n, e in zip(validos['nome'], validos['email']) if '@' in str(e)}
+
+def criar_tabela_log_email():
+    """Cria a tabela do log de envios de e-mail, se não existir."""
+    conn = utils_chamados.get_valid_conn()
+    if not conn: return False
+
+    try:
+        with conn.cursor() as cur:
+            cur.execute("""
+                CREATE TABLE IF NOT EXISTS log_envio_email (
+                    id SERIAL PRIMARY KEY,
+                    lote TEXT NOT NULL,
+                    enviado_em TIMESTAMP NOT NULL DEFAULT now(),
+                    destinatarios TEXT NOT NULL,
+                    assunto TEXT,
+                    analista TEXT,
+                    situacao TEXT NOT NULL,
+                    tentativas INTEGER NOT NULL,
+                    erro TEXT,
+                    duracao_ms INTEGER
+                );
+                CREATE INDEX IF NOT EXISTS idx_log_envio_email_data ON log_envio_email (enviado_em DESC);
+            """)
+        conn.commit()
+        return True
+    except Exception as e:
+        conn.rollback()
+        log.exception("Erro ao criar tabela log_envio_email")
+        st.error(f"Erro ao criar tabela log_envio_email: {e}")
+        return False
+
+def registrar_envios(lote, resultados):
+    """Grava uma linha por e-mail do lote em log_envio_email. Retorna True se gravou (ou não havia o que gravar)."""
+    if not resultados: return True
+    conn = utils_chamados.get_valid_conn()
+    if not conn:
+        log.error("Sem conexão: log do lote %s não gravado", lote)
+        return False
+
+    colunas = ['destinatarios', 'assunto', 'analista', 'situacao', 'tentativas', 'erro', 'duracao_ms']
+    try:
+        with conn.cursor() as cur:
+            execute_values(cur, f"INSERT INTO log_envio_email (lote, {', '.join(colunas)}) VALUES %s",
+                           [(lote, *[r[c] for c in colunas]) for r in resultados])
+        conn.commit()
+        return True
+    except Exception as e:
+        conn.rollback()
+        log.exception("Erro ao gravar o log do lote %s", lote)
+        st.error(f"Erro ao gravar o log de envios: {e}")
+        return False
+
+def carregar_log_envios(limite=200):
+    """Últimos envios (mais recentes primeiro) para a tela de relatórios."""
+    conn = utils_chamados.get_valid_conn()
+    if not conn: return pd.DataFrame()
+
+    try:
+        df = pd.read_sql_query("""
+            SELECT enviado_em, destinatarios, analista, situacao, tentativas, duracao_ms, erro, lote
+            FROM log_envio_email ORDER BY id DESC LIMIT %s
+        """, conn, params=(limite,))
+        conn.commit()
+    except Exception as e:
+        conn.rollback()
+        st.error(f"Erro ao ler o log de envios: {e}")
+        return pd.DataFrame()
+    return df.rename(columns={
+        'enviado_em': 'Enviado em', 'destinatarios': 'Para', 'analista': 'Analista', 'situacao': 'Situação',
+        'tentativas': 'Tentativas', 'duracao_ms': 'Duração (ms)', 'erro': 'Erro', 'lote': 'Lote'})
+
+# --- 4. RELATÓRIO DIÁRIO: MENSAGENS (PÁGINA E LINHA DE COMANDO) ---
+# O que ir para quem saía de dentro do botão da página de Relatórios. Aqui
+# fica separado da tela para relatorio_diario.py (cron/systemd, sem sessão
+# do Streamlit) montar e enviar exatamente o mesmo relatório.
+
+def config_email():
+    """st.secrets["email"] como dict (user, password, smtp_server, smtp_port), ou None se faltar."""
+    try:
+        config = dict(st.secrets["email"])
+    except Exception:
+        return None
+    return config if all(c in config for c in ["user", "smtp_server", "smtp_port"]) else None
+
+def separar_emails(texto):
+    """E-mails de um texto separado por vírgula ou ponto e vírgula (ignora o que não tem @)."""
+    return [e.strip() for e in (texto or "").replace(';', ',').split(',') if '@' in e]
+
+def mensagens_relatorio(df, hoje, destinatarios, emails_analistas=None):
+    """
+    Mensagens do relatório diário para enviar_emails: o consolidado para os
+    destinatários (se houver) e, com emails_analistas ({NOME: e-mail}), um
+    individual por analista. Retorna (mensagens, analistas sem e-mail).
+    """
+    assunto = f"Relatório Gestão - {hoje.strftime('%d/%m/%Y')}"
+    mensagens, sem_email = [], []
+    if destinatarios:
+        mensagens.append({'destinatarios': ", ".join(destinatarios), 'assunto': assunto,
+                          'corpo_html': relatorio_html(df, hoje)})
+    if emails_analistas is not None:
+        for analista, corpo_html in relatorios_por_analista(df, hoje).items():
+            email = emails_analistas.get(str(analista).strip().upper())
+            if email: mensagens.append({'destinatarios': email, 'assunto': assunto, 'corpo_html': corpo_html, 'analista': analista})
+            else: sem_email.append(str(analista))
+    return mensagens, sem_email
@@ -0,0 +1,130 @@
+import streamlit as st
+import pandas as pd
+import numpy as np
+from datetime import date
+
+# --- 1. SITUAÇÃO DE SLA (DASHBOARD DE INDICADORES) ---
+# O prazo é a própria data de agendamento, com 1 dia de tolerância para os
+# finalizados. A situação é calculada no banco (_SQL_SITUACAO_SLA de
+# utils_indicadores); aqui ficam só as cores dos gráficos.
+
+CORES_SITUACAO = {
+    "Finalizado no Prazo": "#2E7D32",
+    "Finalizado com Atraso": "#F9A825",
+    "Em Aberto (No Prazo)": "#1565C0",
+    "Em Aberto (Atrasado)": "#C62828",
+    "Cancelado": "#9E9E9E",
+    "Sem Data": "#607D8B"
+}
+
+def _datas(df, coluna):
+    """Coluna como datetime (NaT se faltar ou não for data), cada valor interpretado como no pd.to_datetime avulso."""
+    if coluna not in df.columns: return pd.Series(pd.NaT, index=df.index, dtype='datetime64[ns]')
+    if pd.api.types.is_datetime64_any_dtype(df[coluna]): return df[coluna]
+    return pd.to_datetime(df[coluna], errors='coerce', format='mixed')
+
+# --- 2. SLA POR REGRA (CONFIGURAÇÕES > ABA "sla") ---
+# A aba sla é compilada uma vez num dicionário (PROJETO, demanda) -> prazo,
+# com a regra do projeto (demanda vazia) como reserva. Cada linha só consulta
+# o dicionário, uma vez por par distinto, e as datas são calculadas na coluna inteira.
+
+COLUNAS_SLA = ["Nome do Projeto", "Demanda", "Prazo (dias)"]
+DEMANDAS_VAZIAS = ('', 'nan', 'None')
+PRAZO_INVALIDO = -1 # Regra achada, mas o prazo não é número
+
+def _prazo_dias(valor):
+    try: return int(float(valor))
+    except (ValueError, TypeError, OverflowError): return PRAZO_INVALIDO
+
+class RegrasSLA:
+    """Aba sla compilada: prazo por (projeto, demanda) e por projeto, e a classificação das linhas."""
+
+    def __init__(self, df_sla):
+        self.vazia = df_sla.empty
+        self.valida = not self.vazia and all(c in df_sla.columns for c in COLUNAS_SLA)
+        self.por_demanda = {}
+        self.por_projeto = {}
+        if not self.valida: return
+        for projeto, demanda, prazo in zip(df_sla["Nome do Projeto"], df_sla["Demanda"], df_sla["Prazo (dias)"]):
+            projeto, demanda = str(projeto).upper(), str(demanda)
+            self.por_demanda.setdefault((projeto, demanda), _prazo_dias(prazo))
+            if demanda in DEMANDAS_VAZIAS: self.por_projeto.setdefault(projeto, _prazo_dias(prazo))
+
+    def prazo(self, projeto, demanda):
+        """Prazo em dias da regra do projeto/demanda (PRAZO_INVALIDO se não for número), ou None."""
+        projeto, demanda = str(projeto).upper(), str(demanda)
+        prazo = self.por_demanda.get((projeto, demanda))
+        return self.por_projeto.get(projeto) if prazo is None else prazo
+
+    def prazos(self, df):
+        """prazo() de cada linha ('Projeto', 'Demanda'), resolvido uma vez por par distinto; NaN = sem regra."""
+        projetos = df['Projeto'] if 'Projeto' in df.columns else pd.Series("", index=df.index)
+        demandas = df['Demanda'] if 'Demanda' in df.columns else pd.Series("", index=df.index)
+        codigos, pares = pd.factorize(pd.MultiIndex.from_arrays([projetos.astype(object), demandas.astype(object)]), use_na_sentinel=False)
+        resolvidos = np.array([self.prazo(p, d) for p, d in pares], dtype=float)
+        return pd.Series(resolvidos[codigos], index=df.index)
+
+    def classificar(self, df, hoje=None):
+        """
+        Rótulo e cor do SLA de cada linha ('Agendamento', 'Data de Finalização',
+        'Projeto', 'Demanda') de uma vez. Retorna DataFrame com SLA e Cor_SLA.
+        """
+        hoje = pd.Timestamp(hoje or date.today()).normalize()
+        agend = _datas(df, 'Agendamento').dt.normalize()
+        rotulo = pd.Series("SLA: N/D", index=df.index, dtype=object)
+        cor = pd.Series("gray", index=df.index, dtype=object)
+        tem_data = agend.notna()
+        if not self.valida:
+            if tem_data.any() and not self.vazia: st.warning("Arquivo SLA sem colunas esperadas.")
+            rotulo[tem_data] = "SLA: N/A" if self.vazia else "SLA: Config Inválida"
+            return pd.DataFrame({'SLA': rotulo, 'Cor_SLA': cor})
+
+        prazo = self.prazos(df)
+        fim = _datas(df, 'Data de Finalização').dt.normalize()
+        dias_fim = (fim - agend).dt.days
+        restantes = prazo - (hoje - agend).dt.days
+        com_regra = tem_data & prazo.notna() & (prazo != PRAZO_INVALIDO)
+        finalizado = com_regra & fim.notna()
+        aberto = com_regra & fim.isna()
+
+        def _texto(serie): return serie.astype('Int64').astype(str)
+        escolhas = [
+            (tem_data & prazo.isna(), "SLA: N/A (Regra ñ enc.)", "gray"),
+            (tem_data & (prazo == PRAZO_INVALIDO), "SLA: Inválido", "red"),
+            (finalizado & (dias_fim <= prazo), "Finalizado Prazo (" + _texto(dias_fim) + "d)", "#66BB6A"),
+            (finalizado, "Finalizado Atraso (" + _texto(dias_fim - prazo) + "d)", "#EF5350"),
+            (aberto & (restantes < 0), "Atrasado " + _texto(-restantes) + "d", "#EF5350"),
+            (aberto & (restantes == 0), "SLA Vence Hoje!", "#FFA726"),
+            (aberto, "SLA: " + _texto(restantes) + "d restantes", "#66BB6F"),
+        ]
+        for mascara, texto, cor_regra in reversed(escolhas):
+            rotulo = rotulo.mask(mascara, texto)
+            cor = cor.mask(mascara, cor_regra)
+        return pd.DataFrame({'SLA': rotulo, 'Cor_SLA': cor})
+
+    def classificar_linha(self, row, hoje=None):
+        """classificar() de uma linha só (Series ou dict), com prazo() e datas avulsas: (rótulo, cor)."""
+        agend = pd.to_datetime(row.get('Agendamento'), errors='coerce')
+        if pd.isna(agend): return "SLA: N/D", "gray"
+        if not self.valida:
+            if not self.vazia: st.warning("Arquivo SLA sem colunas esperadas.")
+            return ("SLA: N/A" if self.vazia else "SLA: Config Inválida"), "gray"
+
+        prazo = self.prazo(row.get('Projeto', ''), row.get('Demanda', ''))
+        if prazo is None: return "SLA: N/A (Regra ñ enc.)", "gray"
+        if prazo == PRAZO_INVALIDO: return "SLA: Inválido", "red"
+        inicio = agend.date()
+        fim = pd.to_datetime(row.get('Data de Finalização'), errors='coerce')
+        if pd.notna(fim):
+            dias = (fim.date() - inicio).days
+            if dias <= prazo: return f"Finalizado Prazo ({dias}d)", "#66BB6A"
+            return f"Finalizado Atraso ({dias - prazo}d)", "#EF5350"
+        restantes = prazo - (pd.Timestamp(hoje or date.today()).date() - inicio).days
+        if restantes < 0: return f"Atrasado {-restantes}d", "#EF5350"
+        if restantes == 0: return "SLA Vence Hoje!", "#FFA726"
+        return f"SLA: {restantes}d restantes", "#66BB6F"
+
+@st.cache_resource(max_entries=4, show_spinner=False)
+def compilar_regras_sla(df_sla):
+    """RegrasSLA da aba sla; recompila só quando o conteúdo da aba muda."""
+    return RegrasSLA(df_sla)